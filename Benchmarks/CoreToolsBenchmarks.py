@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# CoreTools benchmarks for WxFixBoot
+# This file is part of WxFixBoot.
+# Copyright (C) 2013-2020 Hamish McIntyre-Bhatty
+# WxFixBoot is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3 or,
+# at your option, any later version.
+#
+# WxFixBoot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WxFixBoot.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Benchmarks for the process handling code in CoreTools.
+"""
+
+#Import modules
+import os
+import sys
+import time
+import tempfile
+import tracemalloc
+import subprocess
+
+#Import other modules.
+sys.path.append('..') #Need to be able to import the Tools module from here.
+
+import Tools.coretools as CoreTools #pylint: disable=wrong-import-position
+
+#Sizes of the synthetic outputs to read, in megabytes.
+OUTPUT_SIZES = (1, 4)
+
+#How many short commands to spawn when measuring CPU time per command.
+SPAWN_COUNT = 200
+
+#Short commands like the ones we run hundreds of times during startup.
+SHORT_COMMANDS = (["true"], ["echo", "x86_64"], ["sh", "-c", "sleep 0.01; echo done"])
+
+#Fake commands standing in for slow independent probes, like which, dpkg and apt-cache.
+FAKE_PROBES = ["sh -c \"sleep 0.3; echo 'Probe "+str(number)+"'\"" for number in range(12)]
+
+#How many packages to put in the fake package list for the output capture benchmark.
+PACKAGE_COUNT = 60000
+
+def make_output_file(megabytes):
+    """
+    Write a file full of output like a package manager or fsck would produce, with
+    normal lines, carriage-return progress lines, backspaces and some UTF-8, and
+    return its path.
+    """
+
+    block = ("Unpacking linux-image-generic (5.4.0.42.45) ...\n"
+             + "".join(["Progress: ["+str(percent)+"%]\r" for percent in range(0, 100, 10)])
+             + "Progress: [100%]\n"
+             + "Spinner: |\x08/\x08-\x08\\\x08done\n"
+             + "Einrichten von größe-daten (1.0) …\n").encode("utf-8")
+
+    output_file = tempfile.NamedTemporaryFile(prefix="wxfixboot-bench-", delete=False)
+
+    with output_file:
+        output_file.write(block * ((megabytes * 1024 * 1024) // len(block)))
+
+    return output_file.name
+
+def time_reader(reader, filename, testing):
+    """Run cat on the given file, read its output with the given reader, and time it"""
+    cmd = subprocess.Popen(["cat", filename], stdin=subprocess.DEVNULL,
+                           stdout=subprocess.PIPE, stderr=subprocess.STDOUT, shell=False)
+
+    start_wall = time.perf_counter()
+    start_cpu = time.process_time()
+
+    output = reader(cmd, testing)
+
+    return (time.perf_counter() - start_wall, time.process_time() - start_cpu, output)
+
+def read_with_drain_heuristic(cmd, testing=False): #pylint: disable=unused-argument
+    """
+    The old way of reading output, for comparison. This polls the process and reads up to
+    100 empty strings after EOF before giving up.
+    """
+
+    counter = 0
+    output = b""
+
+    while cmd.poll() is None or counter < 100:
+        char = cmd.stdout.read(1)
+
+        if char == b"":
+            counter += 1
+            continue
+
+        output += char
+
+    return output
+
+def time_spawns(reader, argv):
+    """Spawn a command SPAWN_COUNT times, reading its output with reader, and time it"""
+    start_wall = time.perf_counter()
+    start_cpu = time.process_time()
+
+    for _ in range(SPAWN_COUNT):
+        cmd = subprocess.Popen(argv, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT, shell=False)
+
+        reader(cmd, False)
+        cmd.stdout.close()
+
+    return ((time.perf_counter() - start_wall) / SPAWN_COUNT,
+            (time.process_time() - start_cpu) / SPAWN_COUNT)
+
+def benchmark_process_cpu_time():
+    """Measure how much CPU time WxFixBoot uses for each short command it spawns"""
+    print("CPU time used by WxFixBoot per spawned command ("+str(SPAWN_COUNT)+" runs each):\n")
+
+    readers = (("drain heuristic", read_with_drain_heuristic), ("bytewise", CoreTools.read),
+               ("chunked", CoreTools.read_chunked))
+
+    for argv in SHORT_COMMANDS:
+        print(' '.join(argv)+":")
+
+        for name, reader in readers:
+            wall, cpu = time_spawns(reader, argv)
+
+            print("    "+(name+":").ljust(17)+"wall "+str(round(wall * 1000, 3))+"ms, cpu "
+                  + str(round(cpu * 1000, 3))+"ms")
+
+        print()
+
+def benchmark_readers():
+    """Compare the bytewise and chunked readers on large synthetic outputs"""
+    print("Reader benchmarks (STARTUP mode, output not sent to the GUI):\n")
+
+    for megabytes in OUTPUT_SIZES:
+        filename = make_output_file(megabytes)
+
+        try:
+            for testing in (False, True):
+                bytewise = time_reader(CoreTools.read, filename, testing)
+                chunked = time_reader(CoreTools.read_chunked, filename, testing)
+
+                assert bytewise[2] == chunked[2], "Readers gave different output!"
+
+                print(str(megabytes)+" MB, testing="+str(testing)+":")
+                print("    bytewise: wall "+str(round(bytewise[0], 3))+"s, cpu "
+                      + str(round(bytewise[1], 3))+"s")
+                print("    chunked:  wall "+str(round(chunked[0], 3))+"s, cpu "
+                      + str(round(chunked[1], 3))+"s")
+                print("    speedup:  "+str(round(bytewise[0] / max(chunked[0], 1e-9), 1))+"x\n")
+
+        finally:
+            os.remove(filename)
+
+def benchmark_output_box_framing():
+    """Time how long it takes to split output into output box lines"""
+    print("Output box framing benchmark:\n")
+
+    for megabytes in OUTPUT_SIZES:
+        filename = make_output_file(megabytes)
+
+        try:
+            with open(filename, "rb") as output_file:
+                data = output_file.read()
+
+        finally:
+            os.remove(filename)
+
+        start = time.perf_counter()
+
+        lines, leftover = CoreTools.split_output_box_lines(data)
+
+        print(str(megabytes)+" MB: "+str(len(lines))+" lines, "+str(len(leftover))
+              + " leftover bytes, "+str(round(time.perf_counter() - start, 3))+"s\n")
+
+def benchmark_concurrent_processes():
+    """Compare running independent commands one after another, and all at once"""
+    print("Concurrent process benchmark ("+str(len(FAKE_PROBES))+" fake probes):\n")
+
+    start = time.perf_counter()
+    sequential = [CoreTools.start_process(cmd, return_output=True) for cmd in FAKE_PROBES]
+    sequential_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    concurrent = CoreTools.start_processes(FAKE_PROBES, return_output=True)
+    concurrent_time = time.perf_counter() - start
+
+    assert sequential == concurrent, "Concurrent processes gave different results!"
+
+    print("    start_process():   "+str(round(sequential_time, 3))+"s")
+    print("    start_processes(): "+str(round(concurrent_time, 3))+"s (max "
+          + str(CoreTools.MAX_CONCURRENT_PROCESSES)+" at once)")
+    print("    speedup:           "+str(round(sequential_time / concurrent_time, 1))+"x\n")
+
+def make_package_list():
+    """Write a file like the output of dpkg --get-selections, and return its path"""
+    output_file = tempfile.NamedTemporaryFile(prefix="wxfixboot-bench-", delete=False)
+
+    with output_file:
+        for number in range(PACKAGE_COUNT):
+            output_file.write(("lib-fake-package-"+str(number)+":amd64\t\t\t\tinstall\n")
+                              .encode("utf-8"))
+
+        output_file.write(b"grub-pc\t\t\t\t\tinstall\n")
+
+    return output_file.name
+
+def scan_returned_output(filename):
+    """Look for grub-pc in a package list the old way, returning the output as a string"""
+    output = CoreTools.start_process("cat "+filename, return_output=True)[1].split("\n")
+
+    return any("grub-pc" in line for line in output)
+
+def scan_captured_output(filename):
+    """Look for grub-pc in a package list using captured output"""
+    with CoreTools.start_process("cat "+filename, capture_output=True)[1] as output:
+        return any("grub-pc" in line for line in output.lines())
+
+def benchmark_output_capture():
+    """Compare the peak memory used by returned and captured output for a big package list"""
+    print("Output capture benchmark ("+str(PACKAGE_COUNT)+" packages, peak Python memory "
+          + "while running and scanning the list):\n")
+
+    filename = make_package_list()
+
+    try:
+        print("    package list: "+str(round(os.path.getsize(filename) / 1024 / 1024, 2))+" MB")
+
+        for name, scan in (("returned:", scan_returned_output),
+                           ("captured:", scan_captured_output)):
+            tracemalloc.start()
+            start = time.perf_counter()
+
+            assert scan(filename), "Didn't find the package!"
+
+            wall = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            print("    "+name.ljust(14)+"peak "+str(round(peak / 1024 / 1024, 2))+" MB, wall "
+                  + str(round(wall, 3))+"s")
+
+        print()
+
+    finally:
+        os.remove(filename)
+
+def run_benchmarks():
+    """Run all the CoreTools benchmarks"""
+    #Stops the readers from trying to send data to the output box.
+    startup = CoreTools.STARTUP
+    CoreTools.STARTUP = True
+
+    try:
+        benchmark_readers()
+        benchmark_process_cpu_time()
+        benchmark_output_box_framing()
+        benchmark_concurrent_processes()
+        benchmark_output_capture()
+
+    finally:
+        CoreTools.STARTUP = startup
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# DeviceTools benchmarks for WxFixBoot
+# This file is part of WxFixBoot.
+# Copyright (C) 2013-2020 Hamish McIntyre-Bhatty
+# WxFixBoot is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3 or,
+# at your option, any later version.
+#
+# WxFixBoot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WxFixBoot.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Benchmarks for the device index in DeviceTools, on systems with lots of LVM volumes.
+"""
+
+#Import modules
+import os
+import sys
+import time
+import tempfile
+
+#Import other modules.
+sys.path.append('..') #Need to be able to import the Tools module from here.
+
+import Tools.coretools as CoreTools #pylint: disable=wrong-import-position
+import Tools.devicetools as DeviceTools #pylint: disable=wrong-import-position
+import Tools.mounttools as MountTools #pylint: disable=wrong-import-position
+from Tools.dictionaries import DISK_INFO #pylint: disable=wrong-import-position
+
+#How many LVM volumes to put in the fake disk information.
+LV_COUNTS = (100, 300, 1000)
+
+def make_disk_info(lv_count):
+    """Return fake DISK_INFO for a disk with an LVM volume group holding lv_count volumes"""
+    disk_info = {"/dev/sda": {"Product": "Disk", "Type": "Device", "UUID": "N/A"},
+                 "/dev/sda1": {"Product": "Partition", "Type": "Partition",
+                               "UUID": "1A2B-3C4D", "Aliases": []}}
+
+    for number in range(lv_count):
+        disk_info["/dev/vg/lv"+str(number)] = {"Product": "LVM Partition", "Type": "Partition",
+                                              "UUID": "lv-uuid-"+str(number),
+                                              "Aliases": ["/dev/mapper/vg-lv"+str(number),
+                                                          "/dev/dm-"+str(number)]}
+
+    return disk_info
+
+def make_mountinfo(lv_count):
+    """Write a mountinfo file with every other LVM volume mounted, and return its path"""
+    output_file = tempfile.NamedTemporaryFile(prefix="wxfixboot-bench-", delete=False)
+
+    with output_file:
+        output_file.write(b"1 0 8:1 / / rw,relatime shared:1 - ext4 /dev/sda1 rw\n")
+
+        for number in range(0, lv_count, 2):
+            output_file.write((str(number+2)+" 1 253:"+str(number)+" / /mnt/lv"+str(number)
+                               + " rw,relatime shared:1 - ext4 /dev/mapper/vg-lv"+str(number)
+                               + " rw\n").encode("utf-8"))
+
+    return output_file.name
+
+def is_mounted_by_scanning(partition):
+    """
+    The old way of checking whether a partition is mounted, for comparison. This looks up
+    the partition's aliases in DISK_INFO and checks each of them.
+    """
+
+    if partition in DISK_INFO and DISK_INFO[partition]["Product"] == "LVM Partition":
+        return any(MountTools.MOUNT_TABLE.is_mounted(alias)
+                   for alias in DISK_INFO[partition]["Aliases"])
+
+    return MountTools.MOUNT_TABLE.is_mounted(partition)
+
+def find_uuid_by_scanning(uuid):
+    """The old way of finding the device with a UUID, for comparison."""
+    for disk in DISK_INFO:
+        if DISK_INFO[disk]["UUID"] == uuid:
+            return disk
+
+    return None
+
+def find_alias_by_scanning(alias):
+    """The old way of finding which device an alias (like the root filesystem) belongs to."""
+    for disk in DISK_INFO:
+        if alias == disk or alias in DISK_INFO[disk].get("Aliases", []):
+            return disk
+
+    return None
+
+def time_calls(function, names):
+    """Call the given function once for each name, returning the results and time taken"""
+    start = time.perf_counter()
+    results = [function(name) for name in names]
+
+    return (results, time.perf_counter() - start)
+
+def benchmark_device_index(lv_count):
+    """Compare scanning DISK_INFO with using the device index, with lv_count LVM volumes"""
+    print(str(lv_count)+" LVM volumes:")
+
+    DISK_INFO.clear()
+    DISK_INFO.update(make_disk_info(lv_count))
+
+    start = time.perf_counter()
+    DeviceTools.DEVICE_INDEX.build(DISK_INFO)
+
+    print("    build index:       "+str(round((time.perf_counter() - start) * 1000, 3))+"ms, "
+          + str(DeviceTools.DEVICE_INDEX.get_stats()["Names"])+" names")
+
+    volumes = ["/dev/vg/lv"+str(number) for number in range(lv_count)]
+    uuids = ["lv-uuid-"+str(number) for number in range(lv_count)]
+    aliases = ["/dev/dm-"+str(number) for number in range(lv_count)]
+
+    comparisons = (("is_mounted:", is_mounted_by_scanning, CoreTools.is_mounted, volumes),
+                   ("UUID to device:", find_uuid_by_scanning,
+                    lambda uuid: DeviceTools.DEVICE_INDEX.canonical("UUID="+uuid), uuids),
+                   ("alias to device:", find_alias_by_scanning,
+                    DeviceTools.DEVICE_INDEX.canonical, aliases))
+
+    for name, old, new, names in comparisons:
+        old_results, old_time = time_calls(old, names)
+        new_results, new_time = time_calls(new, names)
+
+        assert old_results == new_results, "The index gave different results for "+name
+
+        print("    "+name.ljust(19)+"scanning "+str(round(old_time * 1000, 3))+"ms, index "
+              + str(round(new_time * 1000, 3))+"ms, speedup "
+              + str(round(old_time / max(new_time, 1e-9), 1))+"x")
+
+    print()
+
+def run_benchmarks():
+    """Run all the DeviceTools benchmarks"""
+    #Stops CoreTools from trying to send data to the output box.
+    startup = CoreTools.STARTUP
+    CoreTools.STARTUP = True
+
+    print("Device index benchmarks (every other volume mounted):\n")
+
+    mount_table = MountTools.MOUNT_TABLE
+
+    try:
+        for lv_count in LV_COUNTS:
+            filename = make_mountinfo(lv_count)
+            MountTools.MOUNT_TABLE = MountTools.MountTable(filename)
+
+            try:
+                benchmark_device_index(lv_count)
+
+            finally:
+                MountTools.MOUNT_TABLE.close()
+                os.remove(filename)
+
+    finally:
+        MountTools.MOUNT_TABLE = mount_table
+        CoreTools.STARTUP = startup
+
+        DISK_INFO.clear()
+        DeviceTools.DEVICE_INDEX.invalidate()
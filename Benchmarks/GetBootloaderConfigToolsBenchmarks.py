@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# GetBootloaderConfigTools benchmarks for WxFixBoot
+# This file is part of WxFixBoot.
+# Copyright (C) 2013-2020 Hamish McIntyre-Bhatty
+# WxFixBoot is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3 or,
+# at your option, any later version.
+#
+# WxFixBoot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WxFixBoot.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Benchmarks for the single-pass GRUB2 menu parser in GetBootloaderConfigTools, compared with
+the old parser, on big generated grub.cfg files, and for the cache of parsed config files.
+"""
+
+#Import modules
+import logging
+import os
+import sys
+import tempfile
+import time
+
+#Import other modules.
+sys.path.append('..') #Need to be able to import the Tools module from here.
+
+import Tools.StartupTools.getbootloaderconfigtools as BootloaderConfigObtainingTools #pylint: disable=wrong-import-position
+from Tests.Tools.StartupTools import GetBootloaderConfigStartupToolsTestData as Data #pylint: disable=wrong-import-position
+from Tests.Tools.StartupTools import GetBootloaderConfigStartupToolsTestFunctions as Functions #pylint: disable=wrong-import-position
+
+#The configs to parse: (description, kernels, other OSs). Each kernel has a normal and a
+#recovery mode entry.
+CONFIGS = (("kernel-hoarding machine", 250, 5),
+           ("os-prober with many OSs", 5, 500),
+           ("both", 500, 500))
+
+#How many times to run each benchmark.
+REPEATS = 5
+
+def time_calls(function, menu_data):
+    """Call the given function REPEATS times, returning the result and the average time"""
+    start = time.perf_counter()
+
+    for _ in range(REPEATS):
+        result = function(menu_data=menu_data)
+
+    return (result, (time.perf_counter() - start) / REPEATS)
+
+def print_time(name, seconds):
+    """Print the time taken for a benchmark"""
+    print("    "+name.ljust(36)+str(round(seconds * 1000, 3))+"ms")
+
+def benchmark_cache(menu_data):
+    """Time reading the menu entries from grub.cfg with and without the cache"""
+    with tempfile.TemporaryDirectory() as mount_point:
+        os.makedirs(mount_point+"/boot/grub")
+
+        with open(mount_point+"/boot/grub/grub.cfg", "w") as grub_cfg:
+            grub_cfg.write("\n".join(menu_data)+"\n")
+
+        start = time.perf_counter()
+
+        for _ in range(REPEATS):
+            BootloaderConfigObtainingTools.invalidate_grub2_config_cache()
+            BootloaderConfigObtainingTools.parse_grub2_menu_data(mount_point=mount_point)
+
+        cold_time = (time.perf_counter() - start) / REPEATS
+
+        start = time.perf_counter()
+
+        for _ in range(REPEATS):
+            BootloaderConfigObtainingTools.parse_grub2_menu_data(mount_point=mount_point)
+
+        cached_time = (time.perf_counter() - start) / REPEATS
+
+        BootloaderConfigObtainingTools.invalidate_grub2_config_cache()
+
+    print("reading grub.cfg from a mounted OS ("+str(len(menu_data))+" lines):")
+    print_time("read and parse:", cold_time)
+    print_time("unchanged, from the cache:", cached_time)
+    print()
+
+def run_benchmarks():
+    """Run all the GetBootloaderConfigTools benchmarks"""
+    print("GRUB2 menu parser benchmarks (average of "+str(REPEATS)+" runs):\n")
+
+    #Both parsers log an error for every entry without a partition or kernel options.
+    logging.disable(logging.CRITICAL)
+
+    try:
+        for description, kernels, other_oss in CONFIGS:
+            menu_data = Data.return_fake_grub_cfg(kernels, other_oss)
+
+            print(description+" ("+str(kernels*2 + other_oss + 2)+" entries, "
+                  + str(len(menu_data))+" lines):")
+
+            _, tree_time = time_calls(lambda menu_data: BootloaderConfigObtainingTools
+                                      .parse_grub2_config(menu_data), menu_data)
+
+            new_result, new_time = time_calls(BootloaderConfigObtainingTools
+                                              .parse_grub2_menu_data, menu_data)
+
+            old_result, old_time = time_calls(Functions.parse_grub2_menu_data, menu_data)
+
+            assert new_result == old_result, "The parsers gave different menu entries"
+
+            print_time("single-pass tokenizer (tree only):", tree_time)
+            print_time("single-pass parser:", new_time)
+            print_time("old parser:", old_time)
+            print("    speedup: "+str(round(old_time / max(new_time, 1e-9), 1))+"x")
+            print()
+
+        benchmark_cache(Data.return_fake_grub_cfg(*CONFIGS[-1][1:]))
+
+    finally:
+        logging.disable(logging.NOTSET)
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# PackageTools benchmarks for WxFixBoot
+# This file is part of WxFixBoot.
+# Copyright (C) 2013-2020 Hamish McIntyre-Bhatty
+# WxFixBoot is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3 or,
+# at your option, any later version.
+#
+# WxFixBoot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WxFixBoot.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Benchmarks for reading package databases directly in PackageTools, compared with running
+dpkg --get-selections and searching its output like we used to, and for building the index
+of packages that can be installed from apt's package lists.
+"""
+
+#Import modules
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import time
+import tempfile
+
+#Import other modules.
+sys.path.append('..') #Need to be able to import the Tools module from here.
+
+import Tools.StartupTools.packages as PackageTools #pylint: disable=wrong-import-position
+
+#How many packages to put in the fake package databases.
+PACKAGE_COUNT = 3000
+
+#How many packages to put in the fake apt package lists. Debian's main archive has about this
+#many for each architecture.
+LIST_PACKAGE_COUNT = 60000
+
+#How many times to run each benchmark.
+REPEATS = 20
+
+#The packages we look for, and where to put the GRUB package in the database.
+APT_PACKAGES = ("grub-efi", "grub-pc")
+DNF_PACKAGES = ("grub2-efi-x64", "grub2-pc")
+
+def make_dpkg_status(root, grub_position):
+    """
+    Write a realistic dpkg status file with PACKAGE_COUNT packages to root, with
+    grub-efi-amd64 at the given position. grub-pc is never installed.
+    """
+
+    os.makedirs(os.path.join(root, "var/lib/dpkg"))
+
+    with open(os.path.join(root, "var/lib/dpkg/status"), "w") as status_file:
+        for number in range(PACKAGE_COUNT):
+            name = "libexample"+str(number)
+
+            if number == grub_position:
+                name = "grub-efi-amd64"
+
+            status_file.write("Package: "+name+"\nStatus: install ok installed\n"
+                              + "Priority: optional\nSection: libs\nInstalled-Size: "
+                              + str(100 + number)+"\nMaintainer: Example Maintainers "
+                              + "<maintainers@example.org>\nArchitecture: amd64\n"
+                              + "Multi-Arch: same\nSource: example\nVersion: 1."+str(number)
+                              + "-1\nDepends: libc6 (>= 2.34), libgcc-s1 (>= 3.0), "
+                              + "libstdc++6 (>= 12)\nDescription: example library "
+                              + str(number)+"\n This is an example library, used to make a "
+                              + "status file that looks\n like a real one for the benchmarks.\n"
+                              + " .\n This package contains the shared library.\n"
+                              + "Homepage: https://example.org/\n\n")
+
+def make_rpmdb(root):
+    """Write a fake rpm database with PACKAGE_COUNT packages to root."""
+    os.makedirs(os.path.join(root, "var/lib/rpm"))
+    database = sqlite3.connect(os.path.join(root, "var/lib/rpm/rpmdb.sqlite"))
+
+    with database:
+        database.execute("CREATE TABLE Packages (hnum INTEGER PRIMARY KEY AUTOINCREMENT, "
+                         + "blob BLOB NOT NULL)")
+        database.execute("CREATE TABLE Name (key TEXT NOT NULL, hnum INTEGER NOT NULL, "
+                         + "idx INTEGER NOT NULL)")
+
+        names = ["example"+str(number) for number in range(PACKAGE_COUNT - 2)]
+        names += ["grub2-efi-x64", "grub2-pc-modules"]
+
+        database.executemany("INSERT INTO Name VALUES (?, ?, 0)",
+                             [(name, number) for number, name in enumerate(names)])
+
+    database.close()
+
+def make_apt_lists(root):
+    """
+    Write a fake apt package list with LIST_PACKAGE_COUNT packages to root, with the same
+    fields a real one has.
+    """
+
+    os.makedirs(os.path.join(root, "var/lib/apt/lists"))
+
+    with open(os.path.join(root, "var/lib/apt/lists/deb.example.org_debian_dists_stable_main_"
+                           + "binary-amd64_Packages"), "w") as package_list:
+
+        for number in range(LIST_PACKAGE_COUNT):
+            package_list.write("Package: libexample"+str(number)+"\nSource: example\n"
+                               + "Version: 1."+str(number)+"-1\nInstalled-Size: 100\n"
+                               + "Maintainer: Example Maintainers <maintainers@example.org>\n"
+                               + "Architecture: amd64\nDepends: libc6 (>= 2.34)\n"
+                               + "Description: example library "+str(number)+"\n"
+                               + "Multi-Arch: same\nHomepage: https://example.org/\n"
+                               + "Description-md5: 0123456789abcdef0123456789abcdef\n"
+                               + "Section: libs\nPriority: optional\n"
+                               + "Filename: pool/main/e/example/libexample"+str(number)+".deb\n"
+                               + "Size: 12345\nSHA256: "+"0"*64+"\n\n")
+
+        package_list.write("Package: grub-pc\nVersion: 2.06-13\n\n")
+
+def get_selections_and_search(root):
+    """
+    The old way: run dpkg --get-selections and search every line for each package. We can't
+    chroot into the fake OS, so this uses --admindir instead.
+    """
+
+    output = subprocess.run(["dpkg", "--admindir="+os.path.join(root, "var/lib/dpkg"),
+                             "--get-selections"], stdout=subprocess.PIPE, check=True).stdout
+
+    installed_packages = set()
+
+    for line in output.decode("UTF-8").split("\n"):
+        for package in APT_PACKAGES:
+            if package in line and package not in installed_packages:
+                if line.split()[1] != "install":
+                    continue
+
+                installed_packages.add(package)
+
+        if len(installed_packages) == len(APT_PACKAGES):
+            break
+
+    return installed_packages
+
+def time_calls(function, *args):
+    """Call the given function REPEATS times, returning the result and the average time"""
+    start = time.perf_counter()
+
+    for _ in range(REPEATS):
+        result = function(*args)
+
+    return (result, (time.perf_counter() - start) / REPEATS)
+
+def print_time(name, seconds):
+    """Print the time taken for a benchmark"""
+    print("    "+name.ljust(36)+str(round(seconds * 1000, 3))+"ms")
+
+def run_benchmarks():
+    """Run all the PackageTools benchmarks"""
+    print("Package database benchmarks ("+str(PACKAGE_COUNT)+" packages, average of "
+          + str(REPEATS)+" runs):\n")
+
+    for description, position in (("grub-efi-amd64 near the start", 100),
+                                  ("grub-efi-amd64 near the end", PACKAGE_COUNT - 100)):
+
+        root = tempfile.mkdtemp(prefix="wxfixboot-bench-")
+
+        try:
+            make_dpkg_status(root, position)
+            print("dpkg status file, "+description+":")
+
+            new_result, new_time = time_calls(PackageTools.get_installed_packages, root,
+                                              "apt-get", APT_PACKAGES)
+
+            #grub-pc is never installed, so we always have to read the whole file.
+            print_time("read status file:", new_time)
+
+            _, early_time = time_calls(PackageTools.get_installed_packages, root, "apt-get",
+                                       ("grub-efi",))
+
+            print_time("read status file (grub-efi only):", early_time)
+
+            if shutil.which("dpkg"):
+                old_result, old_time = time_calls(get_selections_and_search, root)
+
+                assert old_result == new_result, "Reading the status file gave different results"
+
+                print_time("dpkg --get-selections and search:", old_time)
+                print("    speedup: "+str(round(old_time / max(new_time, 1e-9), 1))+"x")
+
+            print()
+
+        finally:
+            shutil.rmtree(root)
+
+    roots = [tempfile.mkdtemp(prefix="wxfixboot-bench-") for _ in range(2)]
+
+    try:
+        make_apt_lists(roots[0])
+        shutil.copytree(os.path.join(roots[0], "var/lib/apt/lists"),
+                        os.path.join(roots[1], "var/lib/apt/lists"))
+
+        print("apt package lists ("+str(LIST_PACKAGE_COUNT)+" packages):")
+
+        start = time.perf_counter()
+
+        for _ in range(REPEATS):
+            PackageTools.PACKAGE_INDEXES.clear()
+            result = PackageTools.get_available_packages(roots[0], "apt-get", APT_PACKAGES)
+
+        assert result == {"grub-pc"}, "Reading the package lists failed"
+
+        print_time("build index:", (time.perf_counter() - start) / REPEATS)
+
+        #Another OS with the same lists should reuse the index.
+        _, shared_time = time_calls(PackageTools.get_available_packages, roots[1], "apt-get",
+                                    APT_PACKAGES)
+
+        print_time("index for OS with the same lists:", shared_time)
+        print()
+
+    finally:
+        PackageTools.PACKAGE_INDEXES.clear()
+
+        for root in roots:
+            shutil.rmtree(root)
+
+    root = tempfile.mkdtemp(prefix="wxfixboot-bench-")
+
+    try:
+        make_rpmdb(root)
+        print("rpm database:")
+
+        result, new_time = time_calls(PackageTools.get_installed_packages, root, "dnf",
+                                      DNF_PACKAGES)
+
+        assert result == {"grub2-efi-x64", "grub2-pc"}, "Reading the rpm database failed"
+
+        print_time("read rpmdb.sqlite:", new_time)
+        print()
+
+    finally:
+        shutil.rmtree(root)
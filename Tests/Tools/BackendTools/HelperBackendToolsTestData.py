@@ -90,3 +90,17 @@ def return_fake_disk_info():
 
 def return_expected_result_finding_missing_fsck_modules():
     return []
+
+def return_fake_os_info():
+    #Two OSs sharing an EFI partition.
+    return {"Ubuntu 22.04": {"Partition": "/dev/sda2", "BootPartition": "Unknown",
+                             "EFIPartition": "/dev/sda1"},
+            "Fedora 39": {"Partition": "/dev/sda4", "BootPartition": "/dev/sda3",
+                          "EFIPartition": "/dev/sda1"}}
+
+def return_fake_partition_uuids():
+    #The UUIDs of the partitions used by the OSs above.
+    return {"/dev/sda1": {"UUID": "8E2A-1F3C"},
+            "/dev/sda2": {"UUID": "4ba1d1a8-9e0b-4a0c-8b0a-3c9a4f3d2e11"},
+            "/dev/sda3": {"UUID": "7d0c2b65-27b1-4f4e-9d3a-6a1e5c0b9f02"},
+            "/dev/sda4": {"UUID": "c3a9e0f4-5b8d-4a61-b2c7-1e6f9d8a7b30"}}
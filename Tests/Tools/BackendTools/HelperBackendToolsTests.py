@@ -196,6 +196,31 @@ class TestWaitUntilPackageManagerFree(unittest.TestCase):
         HelperBackendTools.wait_until_packagemanager_free(mount_point="",
                                                           package_manager="dnf")
 
+class TestPartitionMatchesOS(unittest.TestCase):
+    def setUp(self):
+        OS_INFO.update(Data.return_fake_os_info())
+        DISK_INFO.update(Data.return_fake_partition_uuids())
+
+    def tearDown(self):
+        OS_INFO.clear()
+        DISK_INFO.clear()
+
+    def test_partition_matches_os_1(self):
+        """Test #1: Test matching partitions to OSs by name and UUID"""
+        os_index = Tools.StartupTools.core.build_os_index()
+
+        for partition, _os, matches in (("/dev/sda2", "Ubuntu 22.04", True),
+                                        ("/dev/sda2", "Fedora 39", False),
+                                        ("7d0c2b65-27b1-4f4e-9d3a-6a1e5c0b9f02", "Fedora 39",
+                                         True),
+                                        ("8E2A-1F3C", "Fedora 39", True),
+                                        ("/dev/sdb1", "Ubuntu 22.04", False),
+                                        ("Unknown", "Ubuntu 22.04", False)):
+
+            self.assertEqual(HelperBackendTools.partition_matches_os(partition, _os), matches)
+            self.assertEqual(HelperBackendTools.partition_matches_os(partition, _os, os_index),
+                             matches)
+
 class TestFindMissingFSCKModules(unittest.TestCase):
     def setUp(self):
         Tools.coretools.STARTUP = True
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# BrokerTools tests for WxFixBoot
+# This file is part of WxFixBoot.
+# Copyright (C) 2013-2020 Hamish McIntyre-Bhatty
+# WxFixBoot is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3 or,
+# at your option, any later version.
+#
+# WxFixBoot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WxFixBoot.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=too-few-public-methods
+#
+# Reason (too-few-public-methods): Test classes.
+
+#Import modules
+import unittest
+import os
+import sys
+import tempfile
+import time
+
+#Import other modules.
+sys.path.append('../..') #Need to be able to import the Tools module from here.
+
+import Tools
+import Tools.brokertools as BrokerTools
+import Tools.coretools as CoreTools
+
+#Import test data.
+from . import CoreToolsTestData as Data
+
+class TestBroker(unittest.TestCase):
+    def setUp(self):
+        #Use the unprivileged stand-in broker, so we don't need pkexec.
+        self.assertTrue(BrokerTools.start_broker(local=True))
+
+    def tearDown(self):
+        BrokerTools.stop_broker()
+
+    def run_in_broker(self, argv, stdin=None):
+        """Run a command in the broker, and return its output and return value"""
+        cmd = BrokerTools.BROKER.run(argv, env={"LC_ALL": "C"}, stdin=stdin)
+        output = cmd.stdout.read()
+        cmd.stdout.close()
+
+        return (cmd.wait(), output)
+
+    def test_run_1(self):
+        """Test #1: Test that output and return values come back from the broker"""
+        self.assertEqual(self.run_in_broker(["echo", "Test"]), (0, b"Test\n"))
+        self.assertEqual(self.run_in_broker(["sh", "-c", "echo Error >&2; exit 3"]),
+                         (3, b"Error\n"))
+
+    def test_run_2(self):
+        """Test #2: Test that missing commands return 127, like sh"""
+        retval, output = self.run_in_broker(["/nonexistent/wxfixboot-test"])
+
+        self.assertEqual(retval, 127)
+        self.assertIn(b"not found", output)
+
+    def test_run_3(self):
+        """Test #3: Test that stdin is passed to commands"""
+        self.assertEqual(self.run_in_broker(["cat"], stdin=b"Some\ndata\x00\xff"),
+                         (0, b"Some\ndata\x00\xff"))
+
+    def test_run_4(self):
+        """Test #4: Test that several requests can run at once"""
+        cmds = [BrokerTools.BROKER.run(["sh", "-c", "sleep 0.2; echo "+str(number)])
+                for number in range(10)]
+
+        for number, cmd in enumerate(cmds):
+            self.assertEqual(cmd.stdout.read(), (str(number)+"\n").encode("utf-8"))
+            self.assertEqual(cmd.wait(), 0)
+            cmd.stdout.close()
+
+    def test_run_5(self):
+        """Test #5: Test that a reader that stops reading doesn't hold up other requests"""
+        stalled = BrokerTools.BROKER.run(["head", "-c", "1000000", "/dev/zero"])
+
+        #The stalled request's output is much bigger than the pipe, so wait until the broker
+        #has had to keep some of it.
+        deadline = time.time() + 10
+
+        while stalled.writer is None and time.time() < deadline:
+            time.sleep(0.01)
+
+        self.assertIsNotNone(stalled.writer)
+        self.assertEqual(self.run_in_broker(["echo", "Test"]), (0, b"Test\n"))
+
+        #None of the stalled request's output is lost.
+        self.assertEqual(len(stalled.stdout.read()), 1000000)
+        self.assertEqual(stalled.wait(5), 0)
+        stalled.stdout.close()
+
+    def test_run_batch_1(self):
+        """Test #1: Test that batches run every step, and send back the result of each"""
+        cmd = BrokerTools.BROKER.run_batch([["echo", "Test"], ["sh", "-c", "exit 3"], ["true"]])
+
+        self.assertEqual(cmd.stdout.read(), b"Test\n")
+        self.assertEqual(cmd.wait(), 3)
+        cmd.stdout.close()
+
+        self.assertEqual([result["ReturnValue"] for result in cmd.results], [0, 3, 0])
+        self.assertTrue(all(result["Time"] >= 0 for result in cmd.results))
+
+    def test_stop_broker_1(self):
+        """Test #1: Test that the broker can be stopped"""
+        self.assertTrue(BrokerTools.broker_available())
+
+        BrokerTools.stop_broker()
+
+        self.assertFalse(BrokerTools.broker_available())
+
+    def test_stop_broker_2(self):
+        """Test #2: Test that commands that have hung don't stop the broker from exiting"""
+        hung = BrokerTools.BROKER.run(["sleep", "1000"])
+        stubborn = BrokerTools.BROKER.run(["sh", "-c",
+                                           "trap '' TERM; while true; do sleep 0.1; done"])
+
+        #Give the commands time to start.
+        time.sleep(0.5)
+
+        start = time.monotonic()
+        BrokerTools.stop_broker()
+
+        self.assertLess(time.monotonic() - start, BrokerTools.BROKER_EXIT_TIMEOUT)
+        self.assertTrue(hung.done.wait(5))
+        self.assertTrue(stubborn.done.wait(5))
+
+        hung.stdout.close()
+        stubborn.stdout.close()
+
+class TestStartProcessWithBroker(unittest.TestCase):
+    def setUp(self):
+        self.commands = Data.return_fake_commands()
+        self.commands.update(Data.return_fake_framing_commands())
+
+        #Stops startprocess from trying to send data to the output box.
+        Tools.coretools.STARTUP = True
+        self.maxDiff = None
+
+        self.assertTrue(BrokerTools.start_broker(local=True))
+
+    def tearDown(self):
+        del self.commands
+        del Tools.coretools.STARTUP
+
+        BrokerTools.stop_broker()
+
+    def test_start_process_1(self):
+        """Test #1: Test that privileged commands give the same results through the broker"""
+        for command in self.commands:
+            retval, output = CoreTools.start_process(command, return_output=True, testing=True,
+                                                     privileged=True)
+            self.assertEqual(retval, self.commands[command]["Retval"])
+            self.assertEqual(output, self.commands[command]["Output"])
+
+    def test_start_process_2(self):
+        """Test #2: Test that privileged commands that time out are killed by the broker"""
+        start = time.perf_counter()
+
+        self.assertEqual(CoreTools.start_process("sh -c 'sleep 10 & sleep 10'", show_output=False,
+                                                 privileged=True, timeout=0.5),
+                         CoreTools.TIMEOUT_RETVAL)
+
+        self.assertLess(time.perf_counter() - start, 5)
+
+        #The broker should still work afterwards.
+        self.assertEqual(CoreTools.start_process("echo Test", return_output=True,
+                                                 privileged=True), (0, "Test"))
+
+    def test_read_privileged_file_1(self):
+        """Test #1: Test that files written through the broker can be read back"""
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "grub")
+
+            cmd = BrokerTools.BROKER.write_file(filename, b"GRUB_TIMEOUT=10\nGRUB_DEFAULT=0\n")
+            cmd.stdout.close()
+
+            self.assertEqual(cmd.wait(), 0)
+            self.assertEqual(CoreTools.read_privileged_file(filename),
+                             ["GRUB_TIMEOUT=10", "GRUB_DEFAULT=0"])
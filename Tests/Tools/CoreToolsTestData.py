@@ -32,3 +32,66 @@ def return_fake_commands():
     dictionary[""" sh -c "TIMES=1; while [ $TIMES -lt 6000 ]; do echo 'Fast Task'; sleep 0.001; TIMES=$(( $TIMES + 1 )); done" """]["Retval"] = 0
 
     return dictionary
+
+def return_fake_framing_commands():
+    dictionary = {}
+    dictionary["printf 'Carriage\\rReturn\\r\\nWindows\\r\\n'"] = {}
+    dictionary["printf 'Carriage\\rReturn\\r\\nWindows\\r\\n'"]["Output"] = "Carriage\rReturn\r\nWindows\r\n"
+    dictionary["printf 'Carriage\\rReturn\\r\\nWindows\\r\\n'"]["Retval"] = 0
+    dictionary["printf 'Backspace\\b\\b\\bNo newline'"] = {}
+    dictionary["printf 'Backspace\\b\\b\\bNo newline'"]["Output"] = "Backspace\x08\x08\x08No newline"
+    dictionary["printf 'Backspace\\b\\b\\bNo newline'"]["Retval"] = 0
+    dictionary["sh -c \"yes 'Lots of output' | head -n 100000\""] = {}
+    dictionary["sh -c \"yes 'Lots of output' | head -n 100000\""]["Output"] = "Lots of output\n"*100000
+    dictionary["sh -c \"yes 'Lots of output' | head -n 100000\""]["Retval"] = 0
+
+    return dictionary
+
+def return_fake_slow_commands():
+    return ["sleep 1"] * 4 + ["sh -c \"sleep 1; exit 0\""]
+
+def return_fake_cache_invalidating_commands():
+    #Commands, and how many of the 2 cached results should be left after running them.
+    dictionary = {}
+    dictionary[("mount", "-l")] = 2
+    dictionary[("umount", "/dev/sda1")] = 1
+    dictionary[("pkexec", "/usr/share/wxfixboot/Tools/helpers/runasroot_linux.sh",
+                "mount", "/dev/sda1", "/mnt/wxfixboot/mountpoints/dev/sda1")] = 1
+    dictionary[("mount", "/dev/sdb1", "/mnt/wxfixboot/mountpoints/dev/sdb1")] = 2
+    dictionary[("chroot", "/mnt/wxfixboot/mountpoints/dev/sdb1", "dpkg", "--get-selections")] = 2
+    dictionary[("chroot", "/mnt/wxfixboot/mountpoints/dev/sdb1", "dnf", "-y", "install",
+                "grub2")] = 0
+    dictionary[("sh", "-c", "DEBIAN_FRONTEND=noninteractive apt-get install -y grub-pc")] = 0
+    dictionary[("sh", "-c", "echo Hello && apt-get purge -y grub-efi")] = 0
+    dictionary[("sh", "-c", "apt-cache search grub")] = 2
+
+    return dictionary
+
+def return_fake_output_box_data():
+    dictionary = {}
+    dictionary[b"Line\n"] = ([b"Line\n"], b"")
+    dictionary[b"Windows\r\nLine\r\n"] = ([b"Windows\n", b"Line\n"], b"")
+    dictionary[b"10%\r20%\r30%"] = ([b"10%\r2", b"0%\r3"], b"0%")
+    dictionary[b"Waiting\r"] = ([], b"Waiting\r")
+    dictionary[b"123\x08\x08\x08456"] = ([b"123\x08", b"\x08", b"\x08"], b"456")
+    dictionary[b"CR\r\x08Backspace\n"] = ([b"CR\r\x08", b"Backspace\n"], b"")
+    dictionary[b""] = ([], b"")
+
+    return dictionary
+
+def return_fake_crashed_mountinfo():
+    #What's left in our mountpoints directory after a crash: two OSs with chroots, one with
+    #a separate /boot, and something mounted on top of another mount. Other mounts, like /,
+    #and things mounted in similarly named directories, must be left alone.
+    return b"""1 0 8:2 / / rw - ext4 /dev/sda2 rw
+2 1 0:5 / /dev rw - devtmpfs udev rw
+3 1 8:3 / /mnt/wxfixboot/mountpoints/dev/sda3 rw - ext4 /dev/sda3 rw
+4 3 8:4 / /mnt/wxfixboot/mountpoints/dev/sda3/boot rw - ext4 /dev/sda4 rw
+5 3 0:5 / /mnt/wxfixboot/mountpoints/dev/sda3/dev rw - devtmpfs udev rw
+6 5 0:6 / /mnt/wxfixboot/mountpoints/dev/sda3/dev/pts rw - devpts devpts rw
+7 3 0:7 / /mnt/wxfixboot/mountpoints/dev/sda3/proc rw - proc proc rw
+8 1 8:5 / /mnt/wxfixboot/mountpoints/dev/sda5 rw - ext4 /dev/sda5 rw
+9 8 8:6 / /mnt/wxfixboot/mountpoints/dev/sda5 rw - ext4 /dev/sda6 rw
+10 9 0:7 / /mnt/wxfixboot/mountpoints/dev/sda5/proc rw - proc proc rw
+11 1 8:7 / /mnt/wxfixboot/mountpoints-old rw - ext4 /dev/sda7 rw
+"""
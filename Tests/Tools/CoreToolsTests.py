@@ -23,7 +23,11 @@
 #Import modules
 import unittest
 import os
+import json
+import tempfile
+import threading
 import sys
+import time
 import wx
 
 #Import other modules.
@@ -71,6 +75,742 @@ class TestStartProcess(unittest.TestCase):
             self.assertEqual(retval, self.commands[command]["Retval"])
             self.assertEqual(output, self.commands[command]["Output"])
 
+class TestStartProcessAsync(unittest.TestCase):
+    def setUp(self):
+        self.commands = Data.return_fake_commands()
+        self.commands.update(Data.return_fake_framing_commands())
+
+        #Stops startprocess from trying to send data to the output box.
+        Tools.coretools.STARTUP = True
+        self.maxDiff = None
+
+    def tearDown(self):
+        del self.commands
+        del Tools.coretools.STARTUP
+
+    def test_start_processes_1(self):
+        """Test #1: Test that running commands concurrently gives the same results"""
+        commands = list(self.commands)
+        results = CoreTools.start_processes(commands, return_output=True, testing=True)
+
+        for command, (retval, output) in zip(commands, results):
+            self.assertEqual(retval, self.commands[command]["Retval"])
+            self.assertEqual(output, self.commands[command]["Output"])
+
+    def test_start_processes_2(self):
+        """Test #2: Test that output is split into lines the same way as start_process()"""
+        commands = list(self.commands)
+        results = CoreTools.start_processes(commands, return_output=True)
+
+        for command, result in zip(commands, results):
+            self.assertEqual(result, CoreTools.start_process(command, return_output=True))
+
+    def test_start_processes_3(self):
+        """Test #3: Test that independent commands actually run at the same time"""
+        commands = Data.return_fake_slow_commands()
+
+        start = time.time()
+        results = CoreTools.start_processes(commands, max_concurrent=len(commands))
+        elapsed = time.time() - start
+
+        self.assertEqual(results, [0] * len(commands))
+
+        #Each command takes a second, so this would take 5 seconds one after another.
+        self.assertLess(elapsed, 2.5)
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        #Stops startprocess from trying to send data to the output box.
+        Tools.coretools.STARTUP = True
+        CoreTools.invalidate_cache()
+
+        self.commands = Data.return_fake_cache_invalidating_commands()
+
+    def tearDown(self):
+        del Tools.coretools.STARTUP
+        del self.commands
+
+        CoreTools.invalidate_cache()
+
+    def test_idempotent_1(self):
+        """Test #1: Test that idempotent commands are only run once"""
+        hits = CoreTools.CACHE_STATS["Hits"]
+
+        first = CoreTools.start_process("date +%N", return_output=True, idempotent=True)
+        second = CoreTools.start_process("date  +%N", return_output=True, idempotent=True)
+
+        self.assertEqual(first, second)
+        self.assertEqual(CoreTools.CACHE_STATS["Hits"], hits + 1)
+
+    def test_idempotent_2(self):
+        """Test #2: Test that commands that aren't marked as idempotent are not cached"""
+        first = CoreTools.start_process("date +%N", return_output=True)
+        second = CoreTools.start_process("date +%N", return_output=True)
+
+        self.assertNotEqual(first, second)
+        self.assertEqual(CoreTools.RESULT_CACHE, {})
+
+    def test_invalidate_cache_1(self):
+        """Test #1: Test that only results that mention the given path are invalidated"""
+        CoreTools.start_process("ls /mnt/wxfixboot/mountpoints/dev/sda1", idempotent=True)
+        CoreTools.start_process("uname -r", idempotent=True)
+
+        CoreTools.invalidate_cache("/dev/sda1")
+
+        self.assertEqual([key[0] for key in CoreTools.RESULT_CACHE], [("uname", "-r")])
+
+    def test_invalidate_cache_for_command_1(self):
+        """Test #1: Test that mount, umount and package operations invalidate the right results"""
+        for command in self.commands:
+            CoreTools.start_process("ls /mnt/wxfixboot/mountpoints/dev/sda1", idempotent=True)
+            CoreTools.start_process("uname -r", idempotent=True)
+
+            CoreTools.invalidate_cache_for_command(command)
+
+            self.assertEqual(len(CoreTools.RESULT_CACHE), self.commands[tuple(command)])
+
+            CoreTools.invalidate_cache()
+
+class TestTrace(unittest.TestCase):
+    def setUp(self):
+        #Stops startprocess from trying to send data to the output box.
+        Tools.coretools.STARTUP = True
+
+        with CoreTools.TRACE_LOCK:
+            CoreTools.TRACE.clear()
+
+    def tearDown(self):
+        del Tools.coretools.STARTUP
+
+        with CoreTools.TRACE_LOCK:
+            CoreTools.TRACE.clear()
+
+    def test_record_trace_1(self):
+        """Test #1: Test that each command is recorded in the trace, with its details"""
+        CoreTools.start_process("echo Trace", show_output=False)
+        CoreTools.start_processes(["sh -c 'exit 3'"])
+
+        trace = CoreTools.TRACE
+
+        self.assertEqual([event["Command"] for event in trace],
+                         [["echo", "Trace"], ["sh", "-c", "exit 3"]])
+
+        self.assertEqual([event["ReturnValue"] for event in trace], [0, 3])
+        self.assertEqual(trace[0]["OutputBytes"], 5)
+        self.assertFalse(trace[0]["Privileged"])
+
+        #Both should be attributed to this test, not CoreTools or asyncio.
+        for event in trace:
+            self.assertEqual(event["Caller"], __name__+".test_record_trace_1")
+            self.assertGreaterEqual(event["SpawnLatency"], 0)
+            self.assertGreaterEqual(event["Runtime"], 0)
+
+    def test_record_trace_2(self):
+        """Test #2: Test that commands answered from the cache are recorded too"""
+        CoreTools.invalidate_cache()
+
+        for _ in range(2):
+            CoreTools.start_process("echo Cached", show_output=False, idempotent=True)
+
+        CoreTools.invalidate_cache()
+
+        trace = CoreTools.TRACE
+
+        self.assertEqual([event["Command"] for event in trace], [["echo", "Cached"]] * 2)
+        self.assertEqual([event["Cached"] for event in trace], [False, True])
+        self.assertEqual((trace[1]["SpawnLatency"], trace[1]["Runtime"]), (0, 0))
+        self.assertEqual((trace[1]["ReturnValue"], trace[1]["OutputBytes"]), (0, 6))
+        self.assertEqual(trace[1]["Caller"], __name__+".test_record_trace_2")
+
+    def test_get_slowest_commands_1(self):
+        """Test #1: Test that the slowest commands come first"""
+        for cmd in ("true", "sleep 0.2", "sleep 0.1"):
+            CoreTools.start_process(cmd, show_output=False)
+
+        self.assertEqual([event["Command"] for event in CoreTools.get_slowest_commands(2)],
+                         [["sleep", "0.2"], ["sleep", "0.1"]])
+
+    def test_export_trace_1(self):
+        """Test #1: Test that the trace is exported in Chrome's trace event format"""
+        CoreTools.start_process("echo Trace", show_output=False)
+
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "trace.json")
+
+            self.assertTrue(CoreTools.export_trace(filename))
+
+            with open(filename, "r") as trace_file:
+                trace = json.load(trace_file)
+
+        self.assertEqual(len(trace["traceEvents"]), 1)
+
+        event = trace["traceEvents"][0]
+
+        self.assertEqual((event["name"], event["ph"]), ("echo Trace", "X"))
+        self.assertEqual(event["args"]["argv"], ["echo", "Trace"])
+        self.assertEqual(event["args"]["return_value"], 0)
+
+class TestTimeoutsAndCancellation(unittest.TestCase):
+    def setUp(self):
+        #Stops startprocess from trying to send data to the output box.
+        Tools.coretools.STARTUP = True
+
+    def tearDown(self):
+        del Tools.coretools.STARTUP
+
+        CoreTools.reset_cancellation()
+
+    def run_in_thread(self, function, *args, **kwargs):
+        """Start a thread running the given function, and return the thread and its result"""
+        result = []
+
+        thread = threading.Thread(target=lambda: result.append(function(*args, **kwargs)))
+        thread.start()
+
+        return thread, result
+
+    def test_timeout_1(self):
+        """Test #1: Test that commands that take too long are killed and reported"""
+        start = time.perf_counter()
+
+        self.assertEqual(CoreTools.start_process("sleep 10", show_output=False, timeout=0.5),
+                         CoreTools.TIMEOUT_RETVAL)
+
+        self.assertLess(time.perf_counter() - start, 5)
+        self.assertEqual(CoreTools.RUNNING_PROCESSES, {})
+
+    def test_timeout_2(self):
+        """Test #2: Test that children of commands that time out are killed too"""
+        start = time.perf_counter()
+
+        #The background sleep keeps the output pipe open, so this would hang if only sh
+        #was killed.
+        self.assertEqual(CoreTools.start_process("sh -c 'sleep 10 & sleep 10'", show_output=False,
+                                                 timeout=0.5),
+                         CoreTools.TIMEOUT_RETVAL)
+
+        self.assertLess(time.perf_counter() - start, 5)
+
+    def test_timeout_3(self):
+        """Test #3: Test that commands that finish in time are unaffected"""
+        self.assertEqual(CoreTools.start_process("echo Test", return_output=True, timeout=5),
+                         (0, "Test"))
+
+        self.assertEqual(CoreTools.start_processes(["sleep 10", "sh -c 'exit 3'"],
+                                                   timeout=0.5),
+                         [CoreTools.TIMEOUT_RETVAL, 3])
+
+    def test_cancel_processes_1(self):
+        """Test #1: Test that cancelling kills running commands, and stops new ones running"""
+        thread, result = self.run_in_thread(CoreTools.start_process, "sleep 10",
+                                            show_output=False)
+
+        #Give it a chance to start.
+        time.sleep(0.5)
+
+        start = time.perf_counter()
+        CoreTools.cancel_processes()
+        thread.join()
+
+        self.assertLess(time.perf_counter() - start, 5)
+        self.assertEqual(result, [CoreTools.CANCELLED_RETVAL])
+
+        #New commands should be refused outside the GUI thread.
+        thread, result = self.run_in_thread(CoreTools.start_process, "echo Test",
+                                            return_output=True)
+        thread.join()
+
+        self.assertEqual(result, [(CoreTools.CANCELLED_RETVAL, "")])
+
+        #But still allowed on the GUI thread, so the log file can be saved.
+        self.assertEqual(CoreTools.start_process("echo Test", return_output=True), (0, "Test"))
+
+class TestCaptureOutput(unittest.TestCase):
+    def setUp(self):
+        #Stops startprocess from trying to send data to the output box.
+        Tools.coretools.STARTUP = True
+
+    def tearDown(self):
+        del Tools.coretools.STARTUP
+
+    def test_capture_output_1(self):
+        """Test #1: Test that captured output has the same lines as returned output"""
+        cmd = "sh -c 'seq 1 300000; printf \\\"no newline\\\"; exit 2'"
+
+        retval, output = CoreTools.start_process(cmd, return_output=True)
+        capture_retval, capture = CoreTools.start_process(cmd, capture_output=True)
+
+        with capture:
+            self.assertEqual((capture_retval, list(capture.lines())),
+                             (retval, output.split("\n")))
+
+            self.assertTrue(capture.spilled())
+
+    def test_capture_output_2(self):
+        """Test #2: Test that output can be captured with start_processes()"""
+        results = CoreTools.start_processes(["echo Test", "sh -c 'exit 3'"], capture_output=True)
+
+        self.assertEqual([(retval, list(capture.lines())) for retval, capture in results],
+                         [(0, ["Test"]), (3, [])])
+
+class TestMountSessions(unittest.TestCase):
+    def setUp(self):
+        #Stops startprocess from trying to send data to the output box.
+        Tools.coretools.STARTUP = True
+
+        #Use the stand-in broker, and tmpfs mounts with unique names, so we don't touch any
+        #real disks.
+        self.assertTrue(Tools.brokertools.start_broker(local=True))
+
+        self.directory = tempfile.mkdtemp(prefix="wxfixboot-test-")
+        self.mount_point = self.directory+"/os"
+        self.options = "-t tmpfs"
+
+        CoreTools.MOUNT_STATS.update({"Mounts": 0, "Unmounts": 0, "Reused": 0, "Upgrades": 0})
+
+    def tearDown(self):
+        CoreTools.release_all_mounts()
+
+        for source, mount_point in (("wxfixboot-test-boot", self.mount_point+"/boot"),
+                                    ("wxfixboot-test-os", self.mount_point)):
+            if CoreTools.is_mounted(source, mount_point):
+                CoreTools.unmount(mount_point)
+
+        Tools.brokertools.stop_broker()
+
+        os.system("rm -rf --one-file-system "+self.directory)
+
+        del Tools.coretools.STARTUP
+
+    def test_acquire_mount_1(self):
+        """Test #1: Test that nested users reuse the mount, and it's kept until released"""
+        for _ in range(3):
+            self.assertEqual(CoreTools.acquire_mount("wxfixboot-test-os", self.mount_point,
+                                                     self.options), 0)
+
+        for _ in range(3):
+            self.assertEqual(CoreTools.release_mount("wxfixboot-test-os", self.mount_point), 0)
+
+        #It should still be mounted, for whoever needs it next.
+        self.assertTrue(CoreTools.is_mounted("wxfixboot-test-os", self.mount_point))
+
+        self.assertEqual(CoreTools.release_idle_mounts(), 0)
+        self.assertFalse(CoreTools.is_mounted("wxfixboot-test-os", self.mount_point))
+
+        stats = CoreTools.get_mount_stats()
+
+        self.assertEqual((stats["Mounts"], stats["Unmounts"], stats["Reused"], stats["Avoided"],
+                          stats["Kept"]), (1, 1, 2, 4, 0))
+
+    def test_acquire_mount_2(self):
+        """Test #2: Test that probe mounts are read-only, and made read-write when needed"""
+        with CoreTools.mount_session("wxfixboot-test-os", self.mount_point, self.options,
+                                     probe=True):
+            self.assertTrue(Tools.mounttools.MOUNT_TABLE.is_read_only(self.mount_point))
+
+        self.assertEqual(CoreTools.acquire_mount("wxfixboot-test-os", self.mount_point,
+                                                 self.options), 0)
+
+        self.assertTrue(CoreTools.is_mounted("wxfixboot-test-os", self.mount_point))
+        self.assertFalse(Tools.mounttools.MOUNT_TABLE.is_read_only(self.mount_point))
+
+        #Probing it again shouldn't make it read-only.
+        with CoreTools.mount_session("wxfixboot-test-os", self.mount_point, self.options,
+                                     probe=True):
+            self.assertFalse(Tools.mounttools.MOUNT_TABLE.is_read_only(self.mount_point))
+
+        stats = CoreTools.get_mount_stats()
+
+        self.assertEqual((stats["Mounts"], stats["Unmounts"], stats["Upgrades"]), (2, 1, 1))
+
+    def test_acquire_mount_3(self):
+        """Test #3: Test that probe mounts are never made read-write while they're held"""
+        with CoreTools.mount_session("wxfixboot-test-os", self.mount_point, self.options,
+                                     probe=True):
+            self.assertNotEqual(CoreTools.acquire_mount("wxfixboot-test-os", self.mount_point,
+                                                        self.options), 0)
+
+            self.assertTrue(Tools.mounttools.MOUNT_TABLE.is_read_only(self.mount_point))
+            self.assertEqual(CoreTools.MOUNT_HOLDS[("wxfixboot-test-os", self.mount_point)]
+                             ["Holders"], 1)
+
+        #Once it's released, it can be mounted again read-write.
+        self.assertEqual(CoreTools.acquire_mount("wxfixboot-test-os", self.mount_point,
+                                                 self.options), 0)
+
+        self.assertFalse(Tools.mounttools.MOUNT_TABLE.is_read_only(self.mount_point))
+
+        stats = CoreTools.get_mount_stats()
+
+        self.assertEqual((stats["Mounts"], stats["Unmounts"], stats["Upgrades"]), (2, 1, 1))
+
+    def test_acquire_mount_4(self):
+        """Test #4: Test that different partitions can be mounted at the same time"""
+        barrier = threading.Barrier(2, timeout=10)
+        mount_partition = CoreTools.mount_partition
+        results = {}
+
+        def slow_mount_partition(partition, mount_point, options=""):
+            """Wait until both partitions are being mounted, then mount this one."""
+            barrier.wait()
+            return mount_partition(partition, mount_point, options)
+
+        def acquire(name):
+            """Acquire a mount for the given name in a thread."""
+            results[name] = CoreTools.acquire_mount("wxfixboot-test-"+name,
+                                                    self.directory+"/"+name, self.options)
+
+        CoreTools.mount_partition = slow_mount_partition
+
+        try:
+            threads = [threading.Thread(target=acquire, args=(name,)) for name in ("a", "b")]
+
+            for thread in threads:
+                thread.start()
+
+            for thread in threads:
+                thread.join()
+
+        finally:
+            CoreTools.mount_partition = mount_partition
+
+        self.assertEqual(results, {"a": 0, "b": 0})
+        self.assertFalse(barrier.broken)
+        self.assertEqual(CoreTools.get_mount_stats()["Mounts"], 2)
+
+    def test_get_probe_mount_options_1(self):
+        """Test #1: Test that probe mounts skip journal replay where they can"""
+        Tools.coretools.DISK_INFO.update({"/dev/wxfixboot-test-1": {"FileSystem": "ext4"},
+                                          "/dev/wxfixboot-test-2": {"FileSystem": "ntfs"}})
+
+        try:
+            self.assertEqual(CoreTools.get_probe_mount_options("/dev/wxfixboot-test-1"),
+                             "-o ro,noload")
+            self.assertEqual(CoreTools.get_probe_mount_options("/dev/wxfixboot-test-2"), "-o ro")
+            self.assertEqual(CoreTools.get_probe_mount_options("/dev/wxfixboot-test-3"), "-o ro")
+
+        finally:
+            del Tools.coretools.DISK_INFO["/dev/wxfixboot-test-1"]
+            del Tools.coretools.DISK_INFO["/dev/wxfixboot-test-2"]
+
+    def test_release_mount_1(self):
+        """Test #1: Test that the mount is only unmounted when the last holder releases it"""
+        with CoreTools.mount_session("wxfixboot-test-os", self.mount_point, self.options,
+                                     linger=False) as retval:
+            self.assertEqual(retval, 0)
+
+            with CoreTools.mount_session("wxfixboot-test-os", self.mount_point, self.options,
+                                         linger=False):
+                pass
+
+            self.assertTrue(CoreTools.is_mounted("wxfixboot-test-os", self.mount_point))
+
+        self.assertFalse(CoreTools.is_mounted("wxfixboot-test-os", self.mount_point))
+        self.assertEqual(CoreTools.MOUNT_HOLDS, {})
+
+    def test_release_mount_2(self):
+        """Test #2: Test that mounts made by someone else are never unmounted"""
+        self.assertEqual(CoreTools.mount_partition("wxfixboot-test-os", self.mount_point,
+                                                   self.options), 0)
+
+        with CoreTools.mount_session("wxfixboot-test-os", self.mount_point,
+                                     self.options, linger=False):
+            pass
+
+        CoreTools.release_all_mounts()
+
+        self.assertTrue(CoreTools.is_mounted("wxfixboot-test-os", self.mount_point))
+        self.assertEqual(CoreTools.get_mount_stats()["Mounts"], 0)
+
+    def test_unmount_1(self):
+        """Test #1: Test that unmounting directly unmounts idle mounts inside it first"""
+        CoreTools.acquire_mount("wxfixboot-test-os", self.mount_point, self.options)
+        CoreTools.acquire_mount("wxfixboot-test-boot", self.mount_point+"/boot", self.options)
+
+        CoreTools.release_mount("wxfixboot-test-boot", self.mount_point+"/boot")
+        CoreTools.release_mount("wxfixboot-test-os", self.mount_point)
+
+        self.assertEqual(CoreTools.unmount("wxfixboot-test-os"), 0)
+
+        self.assertFalse(CoreTools.is_mounted("wxfixboot-test-boot"))
+        self.assertFalse(CoreTools.is_mounted("wxfixboot-test-os"))
+        self.assertEqual(CoreTools.MOUNT_HOLDS, {})
+
+class TestChrootPool(unittest.TestCase):
+    def setUp(self):
+        #Stops startprocess from trying to send data to the output box.
+        Tools.coretools.STARTUP = True
+
+        #Use the stand-in broker, and a tmpfs mount for the OS, so we don't touch any real disks.
+        self.assertTrue(Tools.brokertools.start_broker(local=True))
+
+        self.directory = tempfile.mkdtemp(prefix="wxfixboot-test-")
+        self.mount_point = self.directory+"/os"
+
+        self.assertEqual(CoreTools.acquire_mount("wxfixboot-test-os", self.mount_point,
+                                                 "-t tmpfs"), 0)
+
+        os.makedirs(self.mount_point+"/etc")
+
+        with open(self.mount_point+"/etc/resolv.conf", "w") as resolv_conf:
+            resolv_conf.write("nameserver 127.0.0.1\n")
+
+        CoreTools.CHROOT_STATS.update({"Built": 0, "Reused": 0, "Rebuilt": 0, "TornDown": 0})
+        CoreTools.TRACE.clear()
+
+    def tearDown(self):
+        CoreTools.release_all_mounts()
+        Tools.brokertools.stop_broker()
+
+        os.system("rm -rf --one-file-system "+self.directory)
+
+        del Tools.coretools.STARTUP
+
+    def test_acquire_chroot_1(self):
+        """Test #1: Test that chroots are set up once, and reused after that"""
+        for _ in range(3):
+            self.assertEqual(CoreTools.acquire_chroot(self.mount_point), 0)
+            self.assertEqual(CoreTools.release_chroot(self.mount_point), 0)
+
+        for file_system in CoreTools.CHROOT_BIND_MOUNTS:
+            self.assertTrue(Tools.mounttools.MOUNT_TABLE.is_mount_point(self.mount_point
+                                                                        + file_system))
+
+        with open(self.mount_point+"/etc/resolv.conf.bak") as resolv_conf:
+            self.assertEqual(resolv_conf.read(), "nameserver 127.0.0.1\n")
+
+        stats = CoreTools.get_chroot_stats()
+
+        self.assertEqual((stats["Built"], stats["Reused"], stats["Rebuilt"], stats["Pooled"]),
+                         (1, 2, 0, 1))
+
+    def test_acquire_chroot_2(self):
+        """Test #2: Test that broken chroots are set up again"""
+        CoreTools.acquire_chroot(self.mount_point)
+        CoreTools.unmount(self.mount_point+"/proc")
+
+        self.assertEqual(CoreTools.acquire_chroot(self.mount_point), 0)
+        self.assertTrue(CoreTools.chroot_is_healthy(self.mount_point))
+        self.assertEqual(CoreTools.get_chroot_stats()["Rebuilt"], 1)
+
+    def test_acquire_chroot_3(self):
+        """Test #3: Test that chroots set up read-only are set up again once it's read-write"""
+        for file_system in CoreTools.CHROOT_BIND_MOUNTS:
+            os.makedirs(self.mount_point+file_system)
+
+        self.assertEqual(CoreTools.remount_partition(self.mount_point, "ro"), 0)
+        self.assertEqual(CoreTools.acquire_chroot(self.mount_point), 0)
+        self.assertFalse(os.path.lexists(self.mount_point+"/etc/resolv.conf.bak"))
+
+        self.assertEqual(CoreTools.remount_partition(self.mount_point, "rw"), 0)
+        self.assertFalse(CoreTools.chroot_is_healthy(self.mount_point))
+
+        self.assertEqual(CoreTools.acquire_chroot(self.mount_point), 0)
+        self.assertTrue(CoreTools.chroot_is_healthy(self.mount_point))
+
+        with open(self.mount_point+"/etc/resolv.conf.bak") as resolv_conf:
+            self.assertEqual(resolv_conf.read(), "nameserver 127.0.0.1\n")
+
+        self.assertEqual(CoreTools.get_chroot_stats()["Rebuilt"], 1)
+
+    def test_acquire_chroot_4(self):
+        """Test #4: Test that other partitions can be mounted while a chroot is being set up"""
+        started = threading.Event()
+        mounted = threading.Event()
+        run_batch = CoreTools.run_batch
+        results = {}
+
+        def slow_run_batch(steps, timeout=None):
+            """Wait until the other partition has been mounted, then run the batch."""
+            started.set()
+            results["Mounted"] = mounted.wait(10)
+            return run_batch(steps, timeout)
+
+        CoreTools.run_batch = slow_run_batch
+
+        try:
+            thread = threading.Thread(target=CoreTools.acquire_chroot, args=(self.mount_point,))
+            thread.start()
+
+            self.assertTrue(started.wait(10))
+            self.assertEqual(CoreTools.acquire_mount("wxfixboot-test-other",
+                                                     self.directory+"/other", "-t tmpfs"), 0)
+
+            mounted.set()
+            thread.join()
+
+        finally:
+            CoreTools.run_batch = run_batch
+
+        self.assertTrue(results["Mounted"])
+        self.assertTrue(CoreTools.chroot_is_healthy(self.mount_point))
+
+    def test_setup_chroot_1(self):
+        """Test #1: Test that chroots are set up and torn down in one batch, and timed"""
+        self.assertEqual(CoreTools.setup_chroot(self.mount_point), 0)
+        self.assertEqual(len(CoreTools.get_mounts_inside(self.mount_point)), 5)
+
+        self.assertEqual(CoreTools.teardown_chroot(self.mount_point), 0)
+        self.assertEqual(CoreTools.get_mounts_inside(self.mount_point), ())
+
+        with open(self.mount_point+"/etc/resolv.conf") as resolv_conf:
+            self.assertEqual(resolv_conf.read(), "nameserver 127.0.0.1\n")
+
+        timing = CoreTools.get_chroot_timing(self.mount_point)
+
+        #Each of the binds needed a directory making, too.
+        self.assertEqual((timing["SetupSteps"], timing["TeardownSteps"]), (13, 5))
+        self.assertGreater(timing["Setup"], 0)
+
+        #Each batch should only have gone through the broker once.
+        self.assertEqual(len([event for event in CoreTools.TRACE
+                              if event["Command"][0] == "batch:"]), 2)
+
+    def test_teardown_chroots_1(self):
+        """Test #1: Test that unmounting the partition tears down its chroot first"""
+        CoreTools.acquire_chroot(self.mount_point)
+        CoreTools.release_mount("wxfixboot-test-os", self.mount_point)
+
+        self.assertEqual(CoreTools.unmount("wxfixboot-test-os"), 0)
+
+        self.assertEqual(CoreTools.get_mounts_inside(self.directory), ())
+        self.assertEqual(CoreTools.get_chroot_stats()["Pooled"], 0)
+
+        self.assertFalse(CoreTools.is_mounted("wxfixboot-test-os"))
+
+    def test_teardown_chroots_2(self):
+        """Test #2: Test that other partitions can be unmounted while a chroot is torn down"""
+        CoreTools.acquire_chroot(self.mount_point)
+
+        started = threading.Event()
+        unmounted = threading.Event()
+        run_batch = CoreTools.run_batch
+        results = {}
+
+        def slow_run_batch(steps, timeout=None):
+            """Wait until the other partition has been unmounted, then run the batch."""
+            started.set()
+            results["Unmounted"] = unmounted.wait(10)
+            return run_batch(steps, timeout)
+
+        CoreTools.run_batch = slow_run_batch
+
+        try:
+            thread = threading.Thread(target=CoreTools.teardown_chroots,
+                                      args=(self.mount_point,))
+            thread.start()
+
+            self.assertTrue(started.wait(10))
+
+            with CoreTools.mount_session("wxfixboot-test-other", self.directory+"/other",
+                                         "-t tmpfs", linger=False) as retval:
+                self.assertEqual(retval, 0)
+
+            self.assertFalse(CoreTools.is_mounted("wxfixboot-test-other"))
+
+            unmounted.set()
+            thread.join()
+
+        finally:
+            CoreTools.run_batch = run_batch
+
+        self.assertTrue(results["Unmounted"])
+        self.assertEqual(CoreTools.get_chroot_stats()["Pooled"], 0)
+
+class TestUnmountTree(unittest.TestCase):
+    def setUp(self):
+        #Stops startprocess from trying to send data to the output box.
+        Tools.coretools.STARTUP = True
+
+        #Use the stand-in broker, and tmpfs mounts, so we don't touch any real disks.
+        self.assertTrue(Tools.brokertools.start_broker(local=True))
+
+        self.directory = tempfile.mkdtemp(prefix="wxfixboot-test-")
+
+    def tearDown(self):
+        os.system("umount --recursive --lazy "+self.directory+"/* > /dev/null 2>&1")
+        os.system("rm -rf --one-file-system "+self.directory)
+
+        Tools.brokertools.stop_broker()
+
+        del Tools.coretools.STARTUP
+
+    def test_get_unmount_levels_1(self):
+        """Test #1: Test that mounts are unmounted leaves first"""
+        mounts = Tools.mounttools.parse_mountinfo(Data.return_fake_crashed_mountinfo())
+        directory = "/mnt/wxfixboot/mountpoints"
+
+        self.assertEqual(CoreTools.get_unmount_levels(mounts, directory),
+                         [[directory+"/dev/sda3/boot", directory+"/dev/sda3/dev/pts",
+                           directory+"/dev/sda3/proc", directory+"/dev/sda5/proc"],
+                          [directory+"/dev/sda3/dev", directory+"/dev/sda5"],
+                          [directory+"/dev/sda3", directory+"/dev/sda5"]])
+
+        self.assertEqual(CoreTools.get_unmount_levels(mounts, "/mnt/wxfixboot/none"), [])
+
+    def test_unmount_tree_1(self):
+        """Test #1: Test that nested and stacked mounts are all unmounted"""
+        for mount_point in ("/os1", "/os1/boot", "/os1/boot/efi", "/os2", "/os2", "/os2/proc"):
+            os.makedirs(self.directory+mount_point, exist_ok=True)
+
+            self.assertEqual(CoreTools.start_process("mount -t tmpfs wxfixboot-test "
+                                                     + self.directory+mount_point,
+                                                     show_output=False, privileged=True), 0)
+
+        self.assertEqual(len(CoreTools.get_mounts_inside(self.directory)), 6)
+
+        self.assertEqual(CoreTools.unmount_tree(self.directory), 0)
+        self.assertEqual(CoreTools.get_mounts_inside(self.directory), ())
+
+class TestReadChunked(unittest.TestCase):
+    def setUp(self):
+        self.commands = Data.return_fake_commands()
+        self.commands.update(Data.return_fake_framing_commands())
+
+        #Stops startprocess from trying to send data to the output box.
+        Tools.coretools.STARTUP = True
+        self.maxDiff = None
+
+    def tearDown(self):
+        del self.commands
+        del Tools.coretools.STARTUP
+        Tools.coretools.READER_ENGINE = "chunked"
+
+    def test_read_chunked_1(self):
+        """Test #1: Test that the chunked reader gives the same output as the bytewise reader"""
+        for command in self.commands:
+            Tools.coretools.READER_ENGINE = "bytewise"
+            bytewise = CoreTools.start_process(command, return_output=True, testing=True)
+
+            Tools.coretools.READER_ENGINE = "chunked"
+            chunked = CoreTools.start_process(command, return_output=True, testing=True)
+
+            self.assertEqual(chunked, bytewise)
+
+    def test_read_chunked_2(self):
+        """Test #2: Test that lines are split the same way as the bytewise reader"""
+        for command in self.commands:
+            Tools.coretools.READER_ENGINE = "bytewise"
+            bytewise = CoreTools.start_process(command, return_output=True)
+
+            Tools.coretools.READER_ENGINE = "chunked"
+            chunked = CoreTools.start_process(command, return_output=True)
+
+            self.assertEqual(chunked, bytewise)
+
+class TestSplitOutputBoxLines(unittest.TestCase):
+    def setUp(self):
+        self.data = Data.return_fake_output_box_data()
+
+    def tearDown(self):
+        del self.data
+
+    def test_split_output_box_lines_1(self):
+        """Test #1: Test that output box lines are framed like the bytewise reader frames them"""
+        for raw_output in self.data:
+            self.assertEqual(CoreTools.split_output_box_lines(raw_output),
+                             self.data[raw_output])
+
 class TestIsMounted(unittest.TestCase):
     def setUp(self):
         self.app = wx.App()
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# DeviceTools test data for WxFixBoot
+# This file is part of WxFixBoot.
+# Copyright (C) 2013-2020 Hamish McIntyre-Bhatty
+# WxFixBoot is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3 or,
+# at your option, any later version.
+#
+# WxFixBoot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WxFixBoot.  If not, see <http://www.gnu.org/licenses/>.
+
+def return_fake_disk_info():
+    #DISK_INFO for a disk with two partitions and an LVM volume group with two volumes.
+    return {"/dev/sda": {"Product": "Disk", "Type": "Device", "UUID": "N/A"},
+            "/dev/sda1": {"Product": "Partition", "Type": "Partition", "UUID": "1A2B-3C4D"},
+            "/dev/sda2": {"Product": "Partition", "Type": "Partition", "UUID": "Unknown"},
+            "/dev/fedora/root": {"Product": "LVM Partition", "Type": "Partition",
+                                 "UUID": "0f5e7a5c-5f1b-4cde-9a3b-6c1d2e3f4a5b",
+                                 "Aliases": ["/dev/mapper/fedora-root", "/dev/dm-0"]},
+            "/dev/fedora/swap": {"Product": "LVM Partition", "Type": "Partition",
+                                 "UUID": "7d2c9e1a-3b4f-4a6e-8c5d-9e0f1a2b3c4d",
+                                 "Aliases": ["/dev/mapper/fedora-swap", "/dev/dm-1"]}}
+
+def return_fake_partuuid_links():
+    #Symlinks in /dev/disk/by-partuuid, and the devices they point to.
+    return {"a1b2c3d4-01": "/dev/sda1", "a1b2c3d4-02": "/dev/sda2",
+            "a1b2c3d4-03": "/dev/sdz3"}
+
+def return_fake_label_links():
+    #Symlinks in /dev/disk/by-label, escaped like udev does it, and the devices they point to.
+    return {"EFI": "/dev/sda1", "Fedora\\x20Root": "/dev/dm-0"}
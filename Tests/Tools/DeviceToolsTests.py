@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# DeviceTools tests for WxFixBoot
+# This file is part of WxFixBoot.
+# Copyright (C) 2013-2020 Hamish McIntyre-Bhatty
+# WxFixBoot is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3 or,
+# at your option, any later version.
+#
+# WxFixBoot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WxFixBoot.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=too-few-public-methods
+#
+# Reason (too-few-public-methods): Test classes.
+
+#Import modules
+import unittest
+import os
+import sys
+import tempfile
+
+#Import other modules.
+sys.path.append('../..') #Need to be able to import the Tools module from here.
+
+import Tools.devicetools as DeviceTools
+from Tools.dictionaries import DISK_INFO
+
+#Import test data.
+from . import DeviceToolsTestData as Data
+
+class TestDeviceIndex(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+        self.by_partuuid = self.make_links("by-partuuid", Data.return_fake_partuuid_links())
+        self.by_label = self.make_links("by-label", Data.return_fake_label_links())
+
+        self.index = DeviceTools.DeviceIndex(self.by_partuuid, self.by_label)
+
+        DISK_INFO.update(Data.return_fake_disk_info())
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+        del self.index
+        del self.by_partuuid
+        del self.by_label
+        del self.directory
+
+        DISK_INFO.clear()
+
+    def make_links(self, name, links):
+        """Make a directory of fake udev symlinks, and return its path"""
+        path = os.path.join(self.directory.name, name)
+        os.mkdir(path)
+
+        for link, target in links.items():
+            os.symlink(target, os.path.join(path, link))
+
+        return path
+
+    def test_canonical_1(self):
+        """Test #1: Test that devices and their aliases are found"""
+        self.assertEqual(self.index.canonical("/dev/sda1"), "/dev/sda1")
+        self.assertEqual(self.index.canonical("/dev/fedora/root"), "/dev/fedora/root")
+        self.assertEqual(self.index.canonical("/dev/mapper/fedora-root"), "/dev/fedora/root")
+        self.assertEqual(self.index.canonical("/dev/dm-1"), "/dev/fedora/swap")
+
+        self.assertIsNone(self.index.canonical("/dev/sdc1"))
+
+    def test_canonical_2(self):
+        """Test #2: Test that devices are found by UUID, PARTUUID and label"""
+        self.assertEqual(self.index.canonical("UUID=1A2B-3C4D"), "/dev/sda1")
+        self.assertEqual(self.index.canonical("UUID=0f5e7a5c-5f1b-4cde-9a3b-6c1d2e3f4a5b"),
+                         "/dev/fedora/root")
+
+        self.assertEqual(self.index.canonical("PARTUUID=a1b2c3d4-02"), "/dev/sda2")
+        self.assertEqual(self.index.canonical("LABEL=EFI"), "/dev/sda1")
+        self.assertEqual(self.index.canonical("LABEL=Fedora Root"), "/dev/fedora/root")
+
+        #Unknown UUIDs, and links to devices we don't know about, aren't indexed.
+        self.assertIsNone(self.index.canonical("UUID=Unknown"))
+        self.assertIsNone(self.index.canonical("UUID=N/A"))
+        self.assertIsNone(self.index.canonical("PARTUUID=a1b2c3d4-03"))
+
+    def test_canonical_or_same_1(self):
+        """Test #1: Test that unknown names are returned unchanged"""
+        self.assertEqual(self.index.canonical_or_same("UUID=1A2B-3C4D"), "/dev/sda1")
+        self.assertEqual(self.index.canonical_or_same("UUID=FFFF-FFFF"), "UUID=FFFF-FFFF")
+
+    def test_names_for_1(self):
+        """Test #1: Test that every name a device might be mounted under is returned"""
+        self.assertEqual(self.index.names_for("/dev/fedora/root"),
+                         ("/dev/fedora/root", "/dev/mapper/fedora-root", "/dev/dm-0"))
+
+        self.assertEqual(self.index.names_for("/dev/sda1"), ("/dev/sda1",))
+        self.assertEqual(self.index.names_for("/dev/sdc1"), ("/dev/sdc1",))
+
+    def test_same_device_1(self):
+        """Test #1: Test checking whether two names are the same device"""
+        self.assertTrue(self.index.same_device("/dev/fedora/root", "/dev/mapper/fedora-root"))
+        self.assertTrue(self.index.same_device("/dev/dm-0", "LABEL=Fedora Root"))
+        self.assertTrue(self.index.same_device("/dev/sdc1", "/dev/sdc1"))
+
+        self.assertFalse(self.index.same_device("/dev/fedora/root", "/dev/dm-1"))
+        self.assertFalse(self.index.same_device("/dev/sdc1", "/dev/sdc2"))
+
+    def test_refresh_1(self):
+        """Test #1: Test that the index is only rebuilt when DISK_INFO changes"""
+        self.assertEqual(self.index.canonical("/dev/dm-0"), "/dev/fedora/root")
+        self.assertEqual(self.index.canonical("/dev/dm-1"), "/dev/fedora/swap")
+        self.assertEqual(self.index.get_stats()["Builds"], 1)
+
+        DISK_INFO["/dev/sdb1"] = {"Product": "Partition", "UUID": "5E6F-7A8B"}
+
+        self.assertEqual(self.index.canonical("UUID=5E6F-7A8B"), "/dev/sdb1")
+        self.assertEqual(self.index.get_stats()["Builds"], 2)
+
+        #Changes that don't add or remove devices need invalidate().
+        DISK_INFO["/dev/sdb1"]["UUID"] = "9C0D-1E2F"
+        self.assertIsNone(self.index.canonical("UUID=9C0D-1E2F"))
+
+        self.index.invalidate()
+        self.assertEqual(self.index.canonical("UUID=9C0D-1E2F"), "/dev/sdb1")
+
+class TestUnescapeLabel(unittest.TestCase):
+    def test_unescape_label_1(self):
+        """Test #1: Test that udev's escapes in labels are undone"""
+        self.assertEqual(DeviceTools.unescape_label("My\\x20Disk"), "My Disk")
+        self.assertEqual(DeviceTools.unescape_label("a\\x2fb"), "a/b")
+        self.assertEqual(DeviceTools.unescape_label("Plain"), "Plain")
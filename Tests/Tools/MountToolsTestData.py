@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# MountTools test data for WxFixBoot
+# This file is part of WxFixBoot.
+# Copyright (C) 2013-2020 Hamish McIntyre-Bhatty
+# WxFixBoot is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3 or,
+# at your option, any later version.
+#
+# WxFixBoot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WxFixBoot.  If not, see <http://www.gnu.org/licenses/>.
+
+def return_fake_mountinfo():
+    #A mount table like a live disk with a couple of OSs mounted by WxFixBoot, with an LVM
+    #volume, a chroot with bind mounts, an escaped space, and two things mounted at /mnt/usb.
+    return b"""22 28 0:20 / /sys rw,nosuid,nodev,noexec,relatime shared:7 - sysfs sysfs rw
+23 28 0:21 / /proc rw,nosuid,nodev,noexec,relatime shared:13 - proc proc rw
+24 28 0:5 / /dev rw,nosuid,relatime shared:2 - devtmpfs udev rw,size=4007452k,mode=755
+28 1 8:2 / / rw,relatime shared:1 - ext4 /dev/sda2 rw,errors=remount-ro
+30 28 8:1 / /boot/efi rw,relatime shared:3 - vfat /dev/sda1 rw,fmask=0077,dmask=0077
+40 28 253:0 / /mnt/wxfixboot/mountpoints/dev/mapper/fedora-root rw,relatime shared:20 - xfs /dev/mapper/fedora-root rw,attr2,inode64
+41 40 8:5 / /mnt/wxfixboot/mountpoints/dev/mapper/fedora-root/boot rw,relatime shared:21 - ext4 /dev/sda5 rw
+50 28 8:3 / /mnt/wxfixboot/mountpoints/dev/sda3 rw,relatime shared:30 - ext4 /dev/sda3 rw
+51 50 0:5 / /mnt/wxfixboot/mountpoints/dev/sda3/dev rw,nosuid,relatime shared:2 - devtmpfs udev rw,size=4007452k,mode=755
+52 50 0:21 / /mnt/wxfixboot/mountpoints/dev/sda3/proc rw,nosuid,nodev,noexec,relatime shared:13 - proc proc rw
+60 28 8:17 / /media/user/My\\040Disk ro,nosuid,nodev,relatime shared:40 - vfat /dev/sdb1 rw
+61 28 8:18 / /mnt/usb rw,relatime shared:41 - ext4 /dev/sdb2 rw
+62 61 8:19 / /mnt/usb rw,relatime shared:42 - ext4 /dev/sdb3 rw
+63 28 8:2 /home /home rw,relatime shared:1 - ext4 /dev/sda2 rw,errors=remount-ro
+"""
+
+def return_fake_mountinfo_after_unmount():
+    #The same mount table after /mnt/usb and sda3's chroot have been unmounted.
+    return b"""22 28 0:20 / /sys rw,nosuid,nodev,noexec,relatime shared:7 - sysfs sysfs rw
+23 28 0:21 / /proc rw,nosuid,nodev,noexec,relatime shared:13 - proc proc rw
+24 28 0:5 / /dev rw,nosuid,relatime shared:2 - devtmpfs udev rw,size=4007452k,mode=755
+28 1 8:2 / / rw,relatime shared:1 - ext4 /dev/sda2 rw,errors=remount-ro
+30 28 8:1 / /boot/efi rw,relatime shared:3 - vfat /dev/sda1 rw,fmask=0077,dmask=0077
+40 28 253:0 / /mnt/wxfixboot/mountpoints/dev/mapper/fedora-root rw,relatime shared:20 - xfs /dev/mapper/fedora-root rw,attr2,inode64
+41 40 8:5 / /mnt/wxfixboot/mountpoints/dev/mapper/fedora-root/boot rw,relatime shared:21 - ext4 /dev/sda5 rw
+60 28 8:17 / /media/user/My\\040Disk ro,nosuid,nodev,relatime shared:40 - vfat /dev/sdb1 rw
+63 28 8:2 /home /home rw,relatime shared:1 - ext4 /dev/sda2 rw,errors=remount-ro
+"""
+
+def return_fake_lvm_disk_info():
+    #DISK_INFO entries for the LVM volume in the fake mount table.
+    return {"/dev/fedora/root": {"Product": "LVM Partition",
+                                 "Aliases": ["/dev/mapper/fedora-root", "/dev/dm-0"]},
+            "/dev/sda3": {"Product": "Partition", "Aliases": []}}
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# MountTools tests for WxFixBoot
+# This file is part of WxFixBoot.
+# Copyright (C) 2013-2020 Hamish McIntyre-Bhatty
+# WxFixBoot is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3 or,
+# at your option, any later version.
+#
+# WxFixBoot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WxFixBoot.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=too-few-public-methods
+#
+# Reason (too-few-public-methods): Test classes.
+
+#Import modules
+import unittest
+import os
+import sys
+import tempfile
+
+#Import other modules.
+sys.path.append('../..') #Need to be able to import the Tools module from here.
+
+import Tools.devicetools as DeviceTools
+import Tools.mounttools as MountTools
+import Tools.coretools as CoreTools
+from Tools.dictionaries import DISK_INFO
+
+#Import test data.
+from . import MountToolsTestData as Data
+
+class TestMountTable(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "mountinfo")
+        self.write_mountinfo(Data.return_fake_mountinfo())
+
+        self.table = MountTools.MountTable(self.path)
+
+        DISK_INFO.update(Data.return_fake_lvm_disk_info())
+        DeviceTools.DEVICE_INDEX.invalidate()
+
+    def tearDown(self):
+        self.table.close()
+        self.directory.cleanup()
+
+        del self.table
+        del self.path
+        del self.directory
+
+        DISK_INFO.clear()
+        DeviceTools.DEVICE_INDEX.invalidate()
+
+    def write_mountinfo(self, data):
+        """Write a fake mountinfo file"""
+        with open(self.path, "wb") as mountinfo:
+            mountinfo.write(data)
+
+    def test_get_mount_point_1(self):
+        """Test #1: Test that mount points are found for devices, and the last mount wins"""
+        self.assertEqual(self.table.get_mount_point("/dev/sda1"), "/boot/efi")
+        self.assertEqual(self.table.get_mount_point("/dev/sda2"), "/home")
+        self.assertEqual(self.table.get_mount_point("/dev/sdb1"), "/media/user/My Disk")
+        self.assertEqual(self.table.get_mount_point("udev"),
+                         "/mnt/wxfixboot/mountpoints/dev/sda3/dev")
+
+        self.assertIsNone(self.table.get_mount_point("/dev/sdc1"))
+
+    def test_get_mount_point_2(self):
+        """Test #2: Test that LVM volumes are found by their aliases"""
+        self.assertEqual(self.table.get_mount_point("/dev/fedora/root"),
+                         "/mnt/wxfixboot/mountpoints/dev/mapper/fedora-root")
+
+        #Aliases of other devices don't count.
+        self.assertIsNone(self.table.get_mount_point("/dev/dm-0"))
+
+    def test_get_partition_mounted_at_1(self):
+        """Test #1: Test that the partition on top is found for each mount point"""
+        self.assertEqual(self.table.get_partition_mounted_at("/"), "/dev/sda2")
+        self.assertEqual(self.table.get_partition_mounted_at("/mnt/usb"), "/dev/sdb3")
+        self.assertEqual(self.table.get_partition_mounted_at("/media/user/My Disk"), "/dev/sdb1")
+        self.assertIsNone(self.table.get_partition_mounted_at("/mnt"))
+
+    def test_is_mounted_1(self):
+        """Test #1: Test checking whether devices and mount points are in use"""
+        self.assertTrue(self.table.is_mounted("/dev/sda3"))
+        self.assertFalse(self.table.is_mounted("/dev/fedora/root"))
+        self.assertTrue(self.table.is_mount_point("/mnt/wxfixboot/mountpoints/dev/sda3/proc"))
+
+        #Partial paths aren't mount points.
+        self.assertFalse(self.table.is_mount_point("/mnt/wxfixboot/mountpoints/dev/sda"))
+
+    def test_is_mounted_2(self):
+        """Test #2: Test that LVM volumes are only found by their aliases when asked"""
+        self.assertFalse(self.table.is_mounted("/dev/fedora/root"))
+        self.assertTrue(self.table.is_mounted("/dev/fedora/root", aliases=True))
+        self.assertFalse(self.table.is_mounted("/dev/sdc1", aliases=True))
+
+    def test_is_read_only_1(self):
+        """Test #1: Test checking whether mount points are mounted read-only"""
+        self.assertTrue(self.table.is_read_only("/media/user/My Disk"))
+        self.assertFalse(self.table.is_read_only("/mnt/wxfixboot/mountpoints/dev/sda3"))
+
+        #Nothing is mounted here.
+        self.assertFalse(self.table.is_read_only("/mnt"))
+
+    def test_invalidate_1(self):
+        """Test #1: Test that the table is only re-read when it is invalidated"""
+        self.assertTrue(self.table.is_mounted("/dev/sdb3"))
+
+        self.write_mountinfo(Data.return_fake_mountinfo_after_unmount())
+
+        #Regular files don't signal changes, so this is still the old table.
+        self.assertTrue(self.table.is_mounted("/dev/sdb3"))
+        self.assertEqual(self.table.get_stats()["Reads"], 1)
+
+        self.table.invalidate()
+
+        self.assertFalse(self.table.is_mounted("/dev/sdb3"))
+        self.assertFalse(self.table.is_mount_point("/mnt/usb"))
+        self.assertEqual(self.table.get_stats()["Reads"], 2)
+
+    def test_invalidate_2(self):
+        """Test #2: Test that running mount or umount invalidates the table"""
+        mount_table = MountTools.MOUNT_TABLE
+        MountTools.MOUNT_TABLE = self.table
+
+        try:
+            self.table.refresh()
+            self.assertFalse(self.table.changed())
+
+            CoreTools.invalidate_cache_for_command(["chroot", "/mnt/test", "umount", "/proc"])
+            self.assertTrue(self.table.changed())
+
+        finally:
+            MountTools.MOUNT_TABLE = mount_table
+
+    def test_core_tools_1(self):
+        """Test #1: Test that the CoreTools mount functions use the mount table"""
+        mount_table = MountTools.MOUNT_TABLE
+        MountTools.MOUNT_TABLE = self.table
+
+        try:
+            self.assertEqual(CoreTools.get_mount_point_of("/dev/fedora/root"),
+                             "/mnt/wxfixboot/mountpoints/dev/mapper/fedora-root")
+
+            self.assertTrue(CoreTools.is_mounted("/dev/fedora/root"))
+            self.assertTrue(CoreTools.is_mounted("/dev/sda3",
+                                                 "/mnt/wxfixboot/mountpoints/dev/sda3"))
+            self.assertEqual(CoreTools.get_partition_mounted_at("/boot/efi"), "/dev/sda1")
+
+        finally:
+            MountTools.MOUNT_TABLE = mount_table
+
+class TestParseMountinfo(unittest.TestCase):
+    def test_parse_mountinfo_1(self):
+        """Test #1: Test parsing the real mount table"""
+        with open(MountTools.MOUNTINFO, "rb") as mountinfo:
+            mounts = MountTools.parse_mountinfo(mountinfo.read())
+
+        self.assertIn("/", [mount["MountPoint"] for mount in mounts])
+
+    def test_changed_1(self):
+        """Test #1: Test that the real mount table isn't re-read when it hasn't changed"""
+        table = MountTools.MountTable()
+
+        try:
+            table.refresh()
+            self.assertFalse(table.changed())
+
+        finally:
+            table.close()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# OutputTools test data for WxFixBoot
+# This file is part of WxFixBoot.
+# Copyright (C) 2013-2020 Hamish McIntyre-Bhatty
+# WxFixBoot is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3 or,
+# at your option, any later version.
+#
+# WxFixBoot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WxFixBoot.  If not, see <http://www.gnu.org/licenses/>.
+
+def return_fake_badblocks_output():
+    #Output like badblocks sends it, split up the way the readers would send it.
+    pieces = ["Checking for bad blocks (read-only test): \n"]
+
+    for percent in range(0, 101):
+        pieces.extend(["  "+str(percent)+".00% done, 0:0"+str(percent % 10)+" elapsed. "
+                       + "(0/0/0 errors)"]+["\x08"] * 40)
+
+    pieces.append("done                                                 \n")
+
+    return pieces
+
+def return_fake_progress_output():
+    #Output like apt sends it, with carriage returns. The readers keep the character after
+    #a lone \r with the line before it.
+    return ["Reading package lists... 0%\rR", "eading package lists... 50%\rR",
+            "eading package lists... Done\n", "Building dependency tree\n", "Progress: [ 10%]\rP",
+            "rogress: [ 20%]\rP", "rogress: [100%]"]
+
+def return_fake_package_list():
+    #Output like dpkg --get-selections, split up into chunks the way the readers would get it.
+    #The last line has no newline, and one line uses \r\n.
+    data = ''.join(["package-"+str(number)+"\t\t\tinstall\n" for number in range(2000)])
+    data += "grub-pc\t\t\tinstall\r\nlinux-image-größe\t\t\tdeinstall"
+    data = data.encode("utf-8")
+
+    return [data[position:position+1000] for position in range(0, len(data), 1000)]
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# OutputTools tests for WxFixBoot
+# This file is part of WxFixBoot.
+# Copyright (C) 2013-2020 Hamish McIntyre-Bhatty
+# WxFixBoot is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3 or,
+# at your option, any later version.
+#
+# WxFixBoot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WxFixBoot.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=too-few-public-methods
+#
+# Reason (too-few-public-methods): Test classes.
+
+#Import modules
+import unittest
+import sys
+import wx
+
+#Import other modules.
+sys.path.append('../..') #Need to be able to import the Tools module from here.
+
+import Tools.outputtools as OutputTools
+
+#Import test data.
+from . import OutputToolsTestData as Data
+
+class TestOutputChannel(unittest.TestCase):
+    def setUp(self):
+        self.app = wx.App()
+        self.updates = []
+        self.channel = OutputTools.OutputChannel(target=self.record_update)
+
+    def tearDown(self):
+        del self.updates
+        del self.channel
+        del self.app
+
+    def record_update(self, text, show_output):
+        """Record what would have been sent to the output box"""
+        self.updates.append((text, show_output))
+
+    def test_flush_1(self):
+        """Test #1: Test that lots of output is sent in one update, in the right order"""
+        pieces = Data.return_fake_badblocks_output()
+
+        for piece in pieces:
+            self.channel.put(piece)
+
+        self.channel.flush(final=True)
+
+        self.assertEqual(self.updates, [(''.join(pieces), True)])
+
+        stats = self.channel.get_stats()
+        self.assertEqual(stats["Pieces"], len(pieces))
+        self.assertEqual(stats["Updates"], 1)
+        self.assertEqual(stats["DroppedRedraws"], len(pieces) - 1)
+        self.assertEqual(stats["MaxQueueDepth"], min(len(pieces), OutputTools.BUFFER_SIZE))
+        self.assertEqual(stats["QueueDepth"], 0)
+
+    def test_flush_2(self):
+        """Test #2: Test that unfinished lines are kept back until the command finishes"""
+        pieces = Data.return_fake_progress_output()
+
+        for piece in pieces:
+            self.channel.put(piece)
+
+        self.channel.flush()
+
+        #Everything up to the last carriage return should be sent.
+        self.assertEqual(self.updates, [(''.join(pieces)[:-len("Progress: [100%]")], True)])
+        self.assertEqual(self.channel.get_stats()["QueueDepth"], 1)
+
+        self.channel.flush(final=True)
+
+        self.assertEqual(''.join([text for text, show_output in self.updates]), ''.join(pieces))
+
+    def test_flush_3(self):
+        """Test #3: Test that output with different show_output settings isn't mixed up"""
+        self.channel.put("Shown 1\n")
+        self.channel.put("Shown 2\n")
+        self.channel.put("Hidden\n", show_output=False)
+        self.channel.put("Shown 3\n")
+
+        self.channel.flush(final=True)
+
+        self.assertEqual(self.updates, [("Shown 1\nShown 2\n", True), ("Hidden\n", False),
+                                        ("Shown 3\n", True)])
+
+    def test_flush_4(self):
+        """Test #4: Test that output isn't flushed faster than the frame rate"""
+        self.channel.put("Line 1\n")
+        self.channel.flush()
+        self.channel.put("Line 2\n")
+        self.channel.flush()
+
+        self.assertEqual(self.updates, [("Line 1\n", True)])
+
+    def test_put_1(self):
+        """Test #1: Test that nothing is lost when the buffer is full"""
+        channel = OutputTools.OutputChannel(buffer_size=10, target=self.record_update)
+
+        for number in range(100):
+            channel.put(str(number)+"\n")
+
+        self.assertEqual(channel.get_stats()["MaxQueueDepth"], 10)
+
+        channel.flush(final=True)
+
+        self.assertEqual(self.updates, [(''.join([str(number)+"\n" for number in range(100)]),
+                                         True)])
+
+    def test_put_2(self):
+        """Test #2: Test that the buffer stays the same size when shown and hidden output mix"""
+        channel = OutputTools.OutputChannel(buffer_size=10, target=self.record_update)
+
+        for number in range(1000):
+            channel.put(str(number)+"\n", show_output=(number % 2 == 0))
+
+            #Sometimes send several pieces of the same kind in a row too.
+            if number % 7 == 0:
+                channel.put("Hidden\n", show_output=False)
+                channel.put("Hidden\n", show_output=False)
+
+        self.assertEqual(channel.get_stats()["MaxQueueDepth"], 10)
+
+        channel.flush(final=True)
+
+        #Nothing is lost, and each kind of output is still in order.
+        for show_output in (True, False):
+            expected = ""
+
+            for number in range(1000):
+                if number % 2 == (0 if show_output else 1):
+                    expected += str(number)+"\n"
+
+                if number % 7 == 0 and not show_output:
+                    expected += "Hidden\n"*2
+
+            self.assertEqual(''.join(text for text, shown in self.updates
+                                     if shown == show_output), expected)
+
+class TestOutputCapture(unittest.TestCase):
+    def setUp(self):
+        self.chunks = Data.return_fake_package_list()
+        self.lines = b''.join(self.chunks).decode("utf-8").replace("\r\n", "\n").split("\n")
+
+    def tearDown(self):
+        del self.chunks
+        del self.lines
+
+    def capture(self, spill_threshold):
+        """Capture the fake output with the given spill threshold"""
+        capture = OutputTools.OutputCapture(spill_threshold=spill_threshold)
+
+        for chunk in self.chunks:
+            capture.write(chunk)
+
+        capture.close()
+
+        return capture
+
+    def test_lines_1(self):
+        """Test #1: Test that small outputs are kept in memory and read back correctly"""
+        with self.capture(OutputTools.SPILL_THRESHOLD) as capture:
+            self.assertFalse(capture.spilled())
+            self.assertEqual(list(capture.lines()), self.lines)
+            self.assertEqual(capture.size, len(b''.join(self.chunks)))
+
+    def test_lines_2(self):
+        """Test #2: Test that big outputs are spilled to disk and read back correctly"""
+        with self.capture(4096) as capture:
+            self.assertTrue(capture.spilled())
+            self.assertEqual(list(capture), self.lines)
+            self.assertEqual(capture.data()[:9], b"package-0")
+
+    def test_lines_3(self):
+        """Test #3: Test that empty output gives no lines"""
+        capture = OutputTools.OutputCapture()
+        capture.close()
+
+        self.assertEqual(list(capture.lines()), [])
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# CoreStartupTools test data for WxFixBoot
+# This file is part of WxFixBoot.
+# Copyright (C) 2013-2020 Hamish McIntyre-Bhatty
+# WxFixBoot is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3 or,
+# at your option, any later version.
+#
+# WxFixBoot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WxFixBoot.  If not, see <http://www.gnu.org/licenses/>.
+
+def return_fake_os_info():
+    #Two Linux OSs sharing an EFI partition, with a separate /boot for Fedora, and Windows.
+    return {"Ubuntu 22.04": {"Partition": "/dev/sda2", "BootPartition": "Unknown",
+                             "EFIPartition": "/dev/sda1"},
+            "Fedora 39": {"Partition": "/dev/sda4", "BootPartition": "/dev/sda3",
+                          "EFIPartition": "/dev/sda1"},
+            "Windows 10": {"Partition": "/dev/sdb1", "BootPartition": "Unknown",
+                           "EFIPartition": "Unknown"}}
+
+def return_fake_disk_info():
+    #The partitions used by the OSs above. We don't know the Windows partition's UUID.
+    return {"/dev/sda1": {"UUID": "8E2A-1F3C"},
+            "/dev/sda2": {"UUID": "4ba1d1a8-9e0b-4a0c-8b0a-3c9a4f3d2e11"},
+            "/dev/sda3": {"UUID": "7d0c2b65-27b1-4f4e-9d3a-6a1e5c0b9f02"},
+            "/dev/sda4": {"UUID": "c3a9e0f4-5b8d-4a61-b2c7-1e6f9d8a7b30"},
+            "/dev/sdb1": {"UUID": "Unknown"}}
+
+def return_fake_menu_entries():
+    #GRUB's menu entries for the OSs above, as parse_grub2_menu_data() would find them.
+    return {"MainMenu": {"Order": ["Ubuntu", "Fedora Linux 39 (on /dev/sda4)",
+                                   "Windows Boot Manager (on /dev/sda1)"],
+                         "Ubuntu": {"ID": "0", "Partition": "/dev/sda2"},
+                         "Fedora Linux 39 (on /dev/sda4)": {"ID": "2", "Partition": "/dev/sda3"},
+                         "Windows Boot Manager (on /dev/sda1)": {"ID": "3",
+                                                                 "Partition": "/dev/sda1"}},
+            "Advanced options for Ubuntu": {"Order": ["Ubuntu, with Linux 6.5.0-14-generic"],
+                                            "Ubuntu, with Linux 6.5.0-14-generic":
+                                                {"ID": "1>0", "Partition": "/dev/sda2"}}}
@@ -26,6 +26,9 @@ import unittest
 import sys
 import wx
 
+#Import test data.
+from . import CoreStartupToolsTestData as Data
+
 #Import other modules.
 sys.path.append('../..') #Need to be able to import the Tools module from here.
 
@@ -84,6 +87,93 @@ class TestDetermineOSArchitecture(unittest.TestCase):
         """Test #1: Test that we can determine the OS architecture without error."""
         CoreStartupTools.determine_os_architecture(mount_point="")
 
+class TestMatchPartitionToOS(unittest.TestCase):
+    def setUp(self):
+        OS_INFO.update(Data.return_fake_os_info())
+        DISK_INFO.update(Data.return_fake_disk_info())
+
+        for os_name in OS_INFO:
+            BOOTLOADER_INFO[os_name] = {"MenuEntries": Data.return_fake_menu_entries(),
+                                        "BLSpecificDefaultOS": "Unknown",
+                                        "DefaultBootDevice": "Unknown"}
+
+    def tearDown(self):
+        OS_INFO.clear()
+        DISK_INFO.clear()
+        BOOTLOADER_INFO.clear()
+
+    def get_default_os(self, bootloader_specific_default_os):
+        """Find Ubuntu's bootloader's default OS, given the entry GRUB boots by default"""
+        BOOTLOADER_INFO["Ubuntu 22.04"]["BLSpecificDefaultOS"] = bootloader_specific_default_os
+
+        CoreStartupTools.get_defaultoss_partition("Ubuntu 22.04")
+        CoreStartupTools.match_partition_to_os("Ubuntu 22.04")
+
+        return (BOOTLOADER_INFO["Ubuntu 22.04"]["DefaultOS"],
+                BOOTLOADER_INFO["Ubuntu 22.04"]["DefaultBootDeviceMatchedWith"])
+
+    def test_build_os_index_1(self):
+        """Test #1: Test that OSs are indexed by all their partitions, and shared ones kept"""
+        os_index = CoreStartupTools.build_os_index()
+
+        self.assertEqual(os_index["/dev/sda1"], [("Ubuntu 22.04", "EFIPartition"),
+                                                 ("Fedora 39", "EFIPartition")])
+
+        self.assertEqual(os_index["8E2A-1F3C"], os_index["/dev/sda1"])
+        self.assertEqual(os_index["7d0c2b65-27b1-4f4e-9d3a-6a1e5c0b9f02"],
+                         [("Fedora 39", "BootPartition")])
+
+        self.assertEqual(os_index["/dev/sdb1"], [("Windows 10", "Partition")])
+        self.assertNotIn("Unknown", os_index)
+
+    def test_match_partition_to_os_1(self):
+        """Test #1: Test matching the default menu entry to an OS by partition"""
+        self.assertEqual(self.get_default_os("Ubuntu"), ("Ubuntu 22.04", "Partition"))
+        self.assertEqual(BOOTLOADER_INFO["Ubuntu 22.04"]["DefaultBootDevice"], "/dev/sda2")
+        self.assertEqual(BOOTLOADER_INFO["Ubuntu 22.04"]["DefaultBootDeviceUUID"],
+                         "4ba1d1a8-9e0b-4a0c-8b0a-3c9a4f3d2e11")
+
+        self.assertEqual(self.get_default_os("Ubuntu, with Linux 6.5.0-14-generic"),
+                         ("Ubuntu 22.04", "Partition"))
+
+    def test_match_partition_to_os_2(self):
+        """Test #2: Test matching by boot partition, and by shared EFI partition"""
+        self.assertEqual(self.get_default_os("Fedora Linux 39 (on /dev/sda4)"),
+                         ("Fedora 39", "BootPartition"))
+
+        #The first OS with that EFI partition wins, like it always has.
+        self.assertEqual(self.get_default_os("Windows Boot Manager (on /dev/sda1)"),
+                         ("Ubuntu 22.04", "EFIPartition"))
+
+        #OSs we didn't find a bootloader for are skipped.
+        os_index = CoreStartupTools.build_os_index()
+        BOOTLOADER_INFO["Fedora 39"]["DefaultBootDeviceUUID"] = "8E2A-1F3C"
+        del BOOTLOADER_INFO["Ubuntu 22.04"]
+
+        CoreStartupTools.match_partition_to_os("Fedora 39", os_index)
+        self.assertEqual(BOOTLOADER_INFO["Fedora 39"]["DefaultOS"], "Fedora 39")
+
+    def test_match_partition_to_os_3(self):
+        """Test #3: Test that unknown default OSs and partitions aren't matched"""
+        self.assertEqual(self.get_default_os("Not In The Menu"), ("Unknown", "Unknown"))
+
+        #We don't know the Windows partition's UUID, so don't match that with anything.
+        BOOTLOADER_INFO["Ubuntu 22.04"]["DefaultBootDeviceUUID"] = "Unknown"
+        CoreStartupTools.match_partition_to_os("Ubuntu 22.04")
+        self.assertEqual(BOOTLOADER_INFO["Ubuntu 22.04"]["DefaultOS"], "Unknown")
+
+    def test_find_default_boot_device_1(self):
+        """Test #1: Test finding the partition a bootloader boots another OS from"""
+        self.assertEqual(CoreStartupTools.find_default_boot_device("Ubuntu 22.04", "Fedora 39"),
+                         "/dev/sda3")
+
+        self.assertEqual(CoreStartupTools.find_default_boot_device("Ubuntu 22.04",
+                                                                   "Ubuntu 22.04"), "/dev/sda2")
+
+        #There's no menu entry on the Windows partition, so we use the partition itself.
+        self.assertEqual(CoreStartupTools.find_default_boot_device("Ubuntu 22.04",
+                                                                   "Windows 10"), "/dev/sdb1")
+
 class TestGetOSNameWithLSB(unittest.TestCase):
     def setUp(self):
         Tools.coretools.STARTUP = True
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# GetBootloaderConfigStartupTools test data for WxFixBoot
+# This file is part of WxFixBoot.
+# Copyright (C) 2013-2020 Hamish McIntyre-Bhatty
+# WxFixBoot is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3 or,
+# at your option, any later version.
+#
+# WxFixBoot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WxFixBoot.  If not, see <http://www.gnu.org/licenses/>.
+
+ROOT_UUID = "4ba1d1a8-9e0b-4a0c-8b0a-3c9a4f3d2e11"
+
+def return_fake_grub_cfg_header():
+    #The start of a grub.cfg made by grub-mkconfig on Ubuntu.
+    return """#
+# DO NOT EDIT THIS FILE
+#
+# It is automatically generated by grub-mkconfig using templates
+# from /etc/grub.d and settings from /etc/default/grub
+#
+
+### BEGIN /etc/grub.d/00_header ###
+if [ -s $prefix/grubenv ]; then
+  set have_grubenv=true
+  load_env
+fi
+if [ "${next_entry}" ] ; then
+   set default="${next_entry}"
+   set next_entry=
+   save_env next_entry
+   set boot_once=true
+else
+   set default="0"
+fi
+
+if [ x"${feature_menuentry_id}" = xy ]; then
+  menuentry_id_option="--id"
+else
+  menuentry_id_option=""
+fi
+
+export menuentry_id_option
+
+function savedefault {
+  if [ -z "${boot_once}" ]; then
+    saved_entry="${chosen}"
+    save_env saved_entry
+  fi
+}
+function load_video {
+  if [ x$feature_all_video_module = xy ]; then
+    insmod all_video
+  else
+    insmod efi_gop
+    insmod efi_uga
+  fi
+}
+
+set timeout_style=hidden
+set timeout=10
+### END /etc/grub.d/00_header ###
+""".split("\n")
+
+def return_fake_linux_entry(title, kernel, indent="", recovery=False):
+    #A menu entry for a Linux kernel, like 10_linux makes.
+    options = "ro  single" if recovery else "ro  quiet splash $vt_handoff"
+    entry_id = "gnulinux-"+kernel+("-recovery-" if recovery else "-advanced-")+ROOT_UUID
+
+    return (indent+"menuentry '"+title+"' --class ubuntu --class gnu-linux --class gnu --class os "
+            + "$menuentry_id_option '"+entry_id+"' {\n"
+            + indent+"\trecordfail\n"
+            + indent+"\tload_video\n"
+            + indent+"\tgfxmode $linux_gfx_mode\n"
+            + indent+"\tinsmod gzio\n"
+            + indent+"\tif [ x$grub_platform = xxen ]; then insmod xzio; insmod lzopio; fi\n"
+            + indent+"\tinsmod part_gpt\n"
+            + indent+"\tinsmod ext2\n"
+            + indent+"\tset root='hd0,gpt2'\n"
+            + indent+"\tif [ x$feature_platform_search_hint = xy ]; then\n"
+            + indent+"\t  search --no-floppy --fs-uuid --set=root --hint-bios=hd0,gpt2 "
+            + "--hint-efi=hd0,gpt2 --hint-baremetal=ahci0,gpt2  "+ROOT_UUID+"\n"
+            + indent+"\telse\n"
+            + indent+"\t  search --no-floppy --fs-uuid --set=root "+ROOT_UUID+"\n"
+            + indent+"\tfi\n"
+            + indent+"\techo\t'Loading Linux "+kernel+" ...'\n"
+            + indent+"\tlinux\t/boot/vmlinuz-"+kernel+" root=UUID="+ROOT_UUID+" "+options+"\n"
+            + indent+"\techo\t'Loading initial ramdisk ...'\n"
+            + indent+"\tinitrd\t/boot/initrd.img-"+kernel+"\n"
+            + indent+"}").split("\n")
+
+def return_fake_other_os_entry(number):
+    #A menu entry for another OS found by os-prober.
+    uuid = "%08x-0000-4000-8000-%012x" % (number, number)
+    partition = str(number % 100 + 3)
+
+    return ("menuentry 'Debian GNU/Linux "+str(number)+" (on /dev/sdb"+partition+")' "
+            + "--class debian --class gnu-linux --class gnu --class os $menuentry_id_option "
+            + "'osprober-gnulinux-simple-"+uuid+"' {\n"
+            + "\tinsmod part_gpt\n"
+            + "\tinsmod ext2\n"
+            + "\tset root='hd1,gpt"+partition+"'\n"
+            + "\tif [ x$feature_platform_search_hint = xy ]; then\n"
+            + "\t  search --no-floppy --fs-uuid --set=root --hint-bios=hd1,gpt"+partition+" "
+            + uuid+"\n"
+            + "\telse\n"
+            + "\t  search --no-floppy --fs-uuid --set=root "+uuid+"\n"
+            + "\tfi\n"
+            + "\tlinux /boot/vmlinuz-6.1.0-"+str(number)+"-amd64 root=UUID="+uuid+" ro quiet\n"
+            + "\tinitrd /boot/initrd.img-6.1.0-"+str(number)+"-amd64\n"
+            + "}").split("\n")
+
+def return_fake_grub_cfg(kernels=3, other_oss=1):
+    #A whole grub.cfg, with a submenu for older kernels (each with a recovery mode entry),
+    #other OSs found by os-prober, and the firmware settings entry.
+    kernel_versions = ["5.15.0-"+str(100 - number)+"-generic" for number in range(kernels)]
+
+    lines = return_fake_grub_cfg_header()
+    lines.append("### BEGIN /etc/grub.d/10_linux ###")
+    lines += return_fake_linux_entry("Ubuntu", kernel_versions[0])
+
+    lines.append("submenu 'Advanced options for Ubuntu' $menuentry_id_option "
+                 + "'gnulinux-advanced-"+ROOT_UUID+"' {")
+
+    for kernel in kernel_versions:
+        lines += return_fake_linux_entry("Ubuntu, with Linux "+kernel, kernel, indent="\t")
+        lines += return_fake_linux_entry("Ubuntu, with Linux "+kernel+" (recovery mode)",
+                                         kernel, indent="\t", recovery=True)
+
+    lines.append("}")
+    lines.append("")
+    lines.append("### END /etc/grub.d/10_linux ###")
+    lines.append("")
+    lines.append("### BEGIN /etc/grub.d/30_os-prober ###")
+
+    for number in range(other_oss):
+        lines += return_fake_other_os_entry(number)
+
+    lines.append("set timeout_style=menu")
+    lines.append("if [ \"${timeout}\" = 0 ]; then")
+    lines.append("  set timeout=10")
+    lines.append("fi")
+    lines.append("### END /etc/grub.d/30_os-prober ###")
+    lines.append("")
+    lines.append("### BEGIN /etc/grub.d/30_uefi-firmware ###")
+    lines.append("menuentry 'UEFI Firmware Settings' $menuentry_id_option 'uefi-firmware' {")
+    lines.append("\tfwsetup")
+    lines.append("}")
+    lines.append("### END /etc/grub.d/30_uefi-firmware ###")
+    lines.append("")
+
+    return lines
+
+def return_fake_default_grub():
+    #/etc/default/grub on Ubuntu, with the default OS set to an entry in a submenu.
+    return """# If you change this file, run 'update-grub' afterwards to update
+# /boot/grub/grub.cfg.
+
+GRUB_DEFAULT="1>0"
+GRUB_TIMEOUT_STYLE=hidden
+GRUB_TIMEOUT=10
+GRUB_DISTRIBUTOR=`lsb_release -i -s 2> /dev/null || echo Debian`
+GRUB_CMDLINE_LINUX_DEFAULT="quiet splash"
+GRUB_CMDLINE_LINUX=""
+"""
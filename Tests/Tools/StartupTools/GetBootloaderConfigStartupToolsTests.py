@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# GetBootloaderConfigStartupTools tests for WxFixBoot
+# This file is part of WxFixBoot.
+# Copyright (C) 2013-2020 Hamish McIntyre-Bhatty
+# WxFixBoot is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3 or,
+# at your option, any later version.
+#
+# WxFixBoot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WxFixBoot.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=too-few-public-methods
+#
+# Reason (too-few-public-methods): Test classes.
+
+#Import modules
+import unittest
+import logging
+import os
+import sys
+import tempfile
+
+#Import test data and functions.
+from . import GetBootloaderConfigStartupToolsTestData as Data
+from . import GetBootloaderConfigStartupToolsTestFunctions as Functions
+
+#Import other modules.
+sys.path.append('../../..') #Need to be able to import the Tools module from here.
+
+from Tools.dictionaries import DISK_INFO
+import Tools.StartupTools.getbootloaderconfigtools as BootloaderConfigObtainingTools
+
+class TestParseGRUB2MenuData(unittest.TestCase):
+    def setUp(self):
+        #Both parsers complain about the entries with no partition or kernel options.
+        logging.disable(logging.CRITICAL)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def test_parse_grub2_menu_data_1(self):
+        """Test #1: Test that we get the same menu entries as the old parser"""
+        for kernels, other_oss in ((1, 0), (3, 1), (40, 20)):
+            menu_data = Data.return_fake_grub_cfg(kernels, other_oss)
+
+            self.assertEqual(BootloaderConfigObtainingTools.parse_grub2_menu_data(menu_data),
+                             Functions.parse_grub2_menu_data(menu_data))
+
+    def test_parse_grub2_menu_data_2(self):
+        """Test #2: Test the menu entries we get from a grub.cfg"""
+        menu_entries = BootloaderConfigObtainingTools.parse_grub2_menu_data(
+            Data.return_fake_grub_cfg(kernels=2))[1]
+
+        self.assertEqual(list(menu_entries.keys()), ["MainMenu", "Advanced options for Ubuntu"])
+        self.assertEqual(menu_entries["MainMenu"]["Order"],
+                         ["Ubuntu", "Debian GNU/Linux 0 (on /dev/sdb3)",
+                          "UEFI Firmware Settings"])
+
+        #The submenu is entry 1, so the IDs go 0, 2, 3.
+        self.assertEqual([entry["ID"] for name, entry in menu_entries["MainMenu"].items()
+                          if name != "Order"], ["0", "2", "3"])
+
+        entry = menu_entries["Advanced options for Ubuntu"][
+            "Ubuntu, with Linux 5.15.0-99-generic (recovery mode)"]
+
+        self.assertEqual(entry["ID"], "1>3")
+        self.assertEqual(entry["Partition"], "/dev/sda2")
+        self.assertEqual(entry["KernelOptions"], ["ro", "single"])
+        self.assertEqual(entry["RawMenuEntryData"][-2:],
+                         ["\t\tinitrd\t/boot/initrd.img-5.15.0-99-generic", "\t}"])
+
+    def test_parse_grub2_config_1(self):
+        """Test #1: Test that identical lines in different places are kept apart"""
+        menu_data = ["submenu 'Old kernels' {"]
+        menu_data += Data.return_fake_linux_entry("Ubuntu", "5.4.0-1-generic")
+        menu_data += ["}", "submenu 'Old kernels' {"]
+        menu_data += Data.return_fake_linux_entry("Ubuntu", "5.4.0-2-generic")
+        menu_data += ["}"]
+
+        tree = BootloaderConfigObtainingTools.parse_grub2_config(menu_data)
+        second = tree["Children"][1]["Children"][0]
+
+        self.assertEqual([node["ID"] for node in tree["Children"]], ["0>", "1>"])
+        self.assertEqual(second["ID"], "1>0")
+        self.assertEqual(second["Span"], [len(menu_data) - 20, len(menu_data) - 1])
+        self.assertIn("5.4.0-2-generic", second["Linux"])
+
+    def test_parse_grub2_config_2(self):
+        """Test #2: Test braces in strings and comments, nested submenus, and one-line entries"""
+        menu_data = ["# menuentry 'Not an entry' {",
+                     "menuentry \"Say '{' and \\\"}\\\"\" { echo '}'; linux /vmlinuz quiet; }",
+                     "submenu Outer {",
+                     "  submenu Inner {",
+                     "    menuentry 'Rescue' --id rescue {",
+                     "      echo 'Multi-line",
+                     "      message }'",
+                     "      set root='hd0,msdos1'",
+                     "    }",
+                     "  }",
+                     "}"]
+
+        tree = BootloaderConfigObtainingTools.parse_grub2_config(menu_data)
+
+        self.assertEqual([node["Title"] for node in tree["Children"]],
+                         ["Say '{' and \"}\"", "Outer"])
+
+        one_line = tree["Children"][0]
+        self.assertEqual(one_line["Span"], [1, 2])
+        self.assertIn("linux /vmlinuz", one_line["Linux"])
+
+        rescue = tree["Children"][1]["Children"][0]["Children"][0]
+        self.assertEqual(rescue["ID"], "1>0>0")
+        self.assertEqual(rescue["Span"], [4, 9])
+        self.assertEqual(rescue["Root"], "      set root='hd0,msdos1'")
+
+class TestGRUB2MenuIndex(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+
+        DISK_INFO["/dev/sdb3"] = {"UUID": "0a1b2c3d-0000-4000-8000-000000000003"}
+
+        self.menu_entries = BootloaderConfigObtainingTools.parse_grub2_menu_data(
+            Data.return_fake_grub_cfg(kernels=2, other_oss=2))[1]
+
+        self.menu_index = BootloaderConfigObtainingTools.build_grub2_menu_index(
+            self.menu_entries)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+        DISK_INFO.clear()
+
+        del self.menu_index
+        del self.menu_entries
+
+    def test_build_grub2_menu_index_1(self):
+        """Test #1: Test that every menu entry is indexed by ID and by title"""
+        for menu in self.menu_entries:
+            for entry in self.menu_entries[menu]["Order"]:
+                self.assertEqual(self.menu_index["IDs"][self.menu_entries[menu][entry]["ID"]],
+                                 (menu, entry))
+
+                self.assertEqual(self.menu_index["Titles"][entry], (menu, entry))
+
+        self.assertEqual(self.menu_index["IDs"]["1>2"],
+                         ("Advanced options for Ubuntu", "Ubuntu, with Linux 5.15.0-99-generic"))
+
+    def test_build_grub2_menu_index_2(self):
+        """Test #2: Test that menu entries are indexed by partition and UUID, in order"""
+        self.assertEqual(self.menu_index["Partitions"]["/dev/sda2"][:2],
+                         [("MainMenu", "Ubuntu"), ("Advanced options for Ubuntu",
+                                                   "Ubuntu, with Linux 5.15.0-100-generic")])
+
+        self.assertEqual(len(self.menu_index["Partitions"]["/dev/sda2"]), 5)
+        self.assertEqual(self.menu_index["Partitions"]["0a1b2c3d-0000-4000-8000-000000000003"],
+                         [("MainMenu", "Debian GNU/Linux 0 (on /dev/sdb3)")])
+
+        #Entries with no partition aren't indexed by it.
+        self.assertNotIn("Unknown", self.menu_index["Partitions"])
+
+    def test_find_grub2_menu_entry_1(self):
+        """Test #1: Test finding the first main menu entry for any of an OS's partitions"""
+        self.assertEqual(BootloaderConfigObtainingTools.find_grub2_menu_entry(
+            self.menu_index, ["/dev/sdb4", "0a1b2c3d-0000-4000-8000-000000000003"]),
+                         ("MainMenu", "Debian GNU/Linux 0 (on /dev/sdb3)"))
+
+        self.assertEqual(BootloaderConfigObtainingTools.find_grub2_menu_entry(
+            self.menu_index, ["/dev/sda2"]), ("MainMenu", "Ubuntu"))
+
+        self.assertEqual(BootloaderConfigObtainingTools.find_grub2_menu_entry(
+            self.menu_index, ["/dev/sda2"], menu="Advanced options for Ubuntu"),
+                         ("Advanced options for Ubuntu", "Ubuntu, with Linux 5.15.0-100-generic"))
+
+        self.assertIsNone(BootloaderConfigObtainingTools.find_grub2_menu_entry(
+            self.menu_index, ["/dev/sdc1"]))
+
+class TestGRUB2ConfigCache(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.mount_point = os.path.join(self.directory.name, "os")
+        self.grub_cfg = os.path.join(self.mount_point, "boot/grub/grub.cfg")
+        self.default_grub = os.path.join(self.mount_point, "etc/default/grub")
+
+        os.makedirs(os.path.dirname(self.grub_cfg))
+        os.makedirs(os.path.dirname(self.default_grub))
+
+        self.write_file(self.grub_cfg, "\n".join(Data.return_fake_grub_cfg())+"\n")
+        self.write_file(self.default_grub, Data.return_fake_default_grub())
+
+        BootloaderConfigObtainingTools.GRUB2_CONFIG_CACHE.clear()
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+        BootloaderConfigObtainingTools.GRUB2_CONFIG_CACHE.clear()
+        self.directory.cleanup()
+
+        del self.default_grub
+        del self.grub_cfg
+        del self.mount_point
+        del self.directory
+
+    def write_file(self, path, contents):
+        """Write the given contents to a fake config file"""
+        with open(path, "w") as config_file:
+            config_file.write(contents)
+
+    def get_tree(self):
+        """Get the parsed menu tree from grub.cfg, using the cache if we can"""
+        return BootloaderConfigObtainingTools.get_grub2_file(self.grub_cfg,
+                                                             BootloaderConfigObtainingTools
+                                                             .parse_grub2_config)[1]
+
+    def test_get_grub2_file_1(self):
+        """Test #1: Test that unchanged files aren't parsed again"""
+        stats = BootloaderConfigObtainingTools.GRUB2_CONFIG_CACHE_STATS
+        hits = stats["Hits"]
+
+        tree = self.get_tree()
+        self.assertIs(self.get_tree(), tree)
+
+        #Rewriting it with the same contents changes the modification time, but not the hash.
+        self.write_file(self.grub_cfg, "\n".join(Data.return_fake_grub_cfg())+"\n")
+        self.assertIs(self.get_tree(), tree)
+        self.assertEqual(stats["Hits"], hits + 2)
+
+        #Now change it.
+        self.write_file(self.grub_cfg, "\n".join(Data.return_fake_grub_cfg(kernels=5))+"\n")
+        self.assertEqual(len(self.get_tree()["Children"][1]["Children"]), 10)
+
+    def test_get_grub2_file_2(self):
+        """Test #2: Test that files are read the same way as read_privileged_file() reads them"""
+        self.write_file(self.grub_cfg, "a\r\nb\n\nc\n")
+
+        self.assertEqual(BootloaderConfigObtainingTools.get_grub2_file(self.grub_cfg)[0],
+                         ["a", "b", "", "c"])
+
+    def test_invalidate_grub2_config_cache_1(self):
+        """Test #1: Test that cached files are forgotten for an OS, or a single file"""
+        #An OS mounted next to this one, with a similar name.
+        other_grub_cfg = self.grub_cfg.replace("/os/", "/os2/")
+        os.makedirs(os.path.dirname(other_grub_cfg))
+        self.write_file(other_grub_cfg, "")
+
+        tree = self.get_tree()
+        BootloaderConfigObtainingTools.get_grub2_file(other_grub_cfg)
+
+        BootloaderConfigObtainingTools.invalidate_grub2_config_cache(self.mount_point)
+
+        self.assertEqual(list(BootloaderConfigObtainingTools.GRUB2_CONFIG_CACHE.keys()),
+                         [(other_grub_cfg, None)])
+
+        self.assertIsNot(self.get_tree(), tree)
+
+        BootloaderConfigObtainingTools.invalidate_grub2_config_cache(self.grub_cfg)
+        self.assertEqual(len(BootloaderConfigObtainingTools.GRUB2_CONFIG_CACHE), 1)
+
+    def test_get_grub2_config_1(self):
+        """Test #1: Test getting GRUB2's settings, and matching the default OS by ID"""
+        menu_entries = BootloaderConfigObtainingTools.parse_grub2_menu_data(
+            mount_point=self.mount_point)[1]
+
+        for _ in range(2):
+            self.assertEqual(BootloaderConfigObtainingTools.get_grub2_config(
+                self.default_grub, self.mount_point+"/boot/grub/grubenv", menu_entries),
+                             (10, "quiet splash", "Ubuntu, with Linux 5.15.0-100-generic"))
+
+    def test_get_grub2_config_2(self):
+        """Test #2: Test matching the default OS by name, and falling back to the 1st entry"""
+        menu_entries = BootloaderConfigObtainingTools.parse_grub2_menu_data(
+            mount_point=self.mount_point)[1]
+
+        for grub_default, default_os in (("Debian GNU/Linux 0 (on /dev/sdb3)",
+                                          "Debian GNU/Linux 0 (on /dev/sdb3)"),
+                                         ("Not In The Menu", "Ubuntu")):
+
+            self.write_file(self.default_grub, Data.return_fake_default_grub()
+                            .replace("1>0", grub_default))
+
+            self.assertEqual(BootloaderConfigObtainingTools.get_grub2_config(
+                self.default_grub, self.mount_point+"/boot/grub/grubenv", menu_entries)[2],
+                             default_os)
@@ -25,6 +25,7 @@ sys.path.append('../../..') #Need to be able to import the Tools module from her
 import Tools.coretools as CoreTools
 from Tools.dictionaries import *
 import Tools.StartupTools.core as CoreStartupTools
+import Tools.StartupTools.osidentity as OSIdentityTools
 import Tests.DialogFunctionsForTests as DialogTools
 
 WOULD_EMERGENCY_EXIT = False
@@ -140,35 +141,15 @@ def get_oss():
 
                 was_mounted = True
 
-            #Check if there's a Windows/WinNT dir.
-            if not (os.path.isdir(mount_point+"/WinNT") or os.path.isdir(mount_point+"/Windows") or os.path.isdir(mount_point+"/WINDOWS")):
+            #Look for Windows, and find out which version it is.
+            os_name = OSIdentityTools.get_windows_edition(
+                OSIdentityTools.get_windows_fingerprint(mount_point))
+
+            if os_name is None:
                 #Skip this partition, and unmount if needed.
                 pass
 
             else:
-                #Look for lots of different Windows editions.
-                if CoreStartupTools.has_windows_9x(mount_point):
-                    os_name = "Windows 95/98/ME"
-
-                elif CoreStartupTools.has_windows_xp(mount_point):
-                    os_name = "Windows XP"
-
-                elif CoreStartupTools.has_windows_vista(mount_point):
-                    os_name = "Windows Vista"
-
-                elif CoreStartupTools.has_windows_7(mount_point):
-                    os_name = "Windows 7"
-
-                elif CoreStartupTools.has_windows_8(mount_point):
-                    os_name = "Windows 8/8.1"
-
-                elif CoreStartupTools.has_windows_10(mount_point):
-                    os_name = "Windows 10"
-
-                else:
-                    #Unknown Windows.
-                    os_name = "Windows"
-
                 #Create OS_INFO entry for it.
                 os_name = os_name+" ("+partition+")"
                 OS_INFO[os_name] = {}
@@ -23,6 +23,7 @@
 
 #Import modules
 import unittest
+import os
 import sys
 import wx
 import getdevinfo
@@ -129,6 +130,78 @@ class TestGetOSs(unittest.TestCase):
         if Functions.get_oss() != ("Unknown", "Unknown"):
             MainStartupTools.get_oss()
 
+class TestGetOSsConcurrently(unittest.TestCase):
+    def setUp(self):
+        Tools.coretools.STARTUP = True
+        self.assertTrue(Tools.brokertools.start_broker(local=True))
+
+        #The current OS, and partitions that can't be mounted, so we don't touch any real disks.
+        self.root_filesystem = Tools.coretools.get_partition_mounted_at("/")
+
+        DISK_INFO.update({self.root_filesystem: {"Type": "Partition", "FileSystem": "ext4",
+                                                 "Product": "Partition", "UUID": "Unknown"},
+                          "/dev/wxfixboot-test": {"Type": "Device", "FileSystem": "N/A",
+                                                  "Product": "Disk", "UUID": "N/A"},
+                          "/dev/wxfixboot-test-1": {"Type": "Partition", "FileSystem": "ext4",
+                                                    "Product": "Partition", "UUID": "Unknown"},
+                          "/dev/wxfixboot-test-2": {"Type": "Partition", "FileSystem": "vfat",
+                                                    "Product": "Partition", "UUID": "Unknown"}})
+
+    def tearDown(self):
+        Tools.coretools.release_all_mounts()
+        Tools.brokertools.stop_broker()
+
+        os.system("rm -rf --one-file-system /mnt/wxfixboot/mountpoints/dev/wxfixboot-test-*")
+
+        DISK_INFO.clear()
+        SYSTEM_INFO.clear()
+
+        del Tools.coretools.STARTUP
+        del self.root_filesystem
+
+    def test_get_oss_2(self):
+        """Test #2: Test that looking at partitions concurrently gives the same results"""
+        serial = MainStartupTools.get_oss(max_concurrent=1)
+        concurrent = MainStartupTools.get_oss(max_concurrent=4)
+
+        self.assertEqual(serial, concurrent)
+
+        os_info, system_info = concurrent
+
+        self.assertEqual([os_info[_os]["Partition"] for _os in os_info], [self.root_filesystem])
+        self.assertTrue(system_info["CurrentOS"]["IsCurrentOS"])
+
+    def test_get_oss_3(self):
+        """Test #3: Test that a probe that fails doesn't lose the other results"""
+        probe_partition = MainStartupTools.probe_partition
+        emergency_exit = Tools.coretools.emergency_exit
+        messages = []
+
+        def failing_probe_partition(partition, root_filesystem):
+            """Fail for one of the partitions."""
+            if partition == "/dev/wxfixboot-test-2":
+                raise OSError("Test error")
+
+            return probe_partition(partition, root_filesystem)
+
+        def fake_emergency_exit(message):
+            """Remember the message, and stop get_oss() like a real emergency exit would."""
+            messages.append(message)
+            raise SystemExit(1)
+
+        MainStartupTools.probe_partition = failing_probe_partition
+        Tools.coretools.emergency_exit = fake_emergency_exit
+
+        try:
+            self.assertRaises(SystemExit, MainStartupTools.get_oss, max_concurrent=4)
+
+        finally:
+            MainStartupTools.probe_partition = probe_partition
+            Tools.coretools.emergency_exit = emergency_exit
+
+        self.assertEqual(len(messages), 1)
+        self.assertIn("/dev/wxfixboot-test-2", messages[0])
+
 class TestGetFirmwareType(unittest.TestCase):
     def setUp(self):
         self.app = wx.App()
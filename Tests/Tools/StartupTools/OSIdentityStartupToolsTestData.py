@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# OSIdentityStartupTools test data for WxFixBoot
+# This file is part of WxFixBoot.
+# Copyright (C) 2013-2020 Hamish McIntyre-Bhatty
+# WxFixBoot is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3 or,
+# at your option, any later version.
+#
+# WxFixBoot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WxFixBoot.  If not, see <http://www.gnu.org/licenses/>.
+
+#Import modules
+import struct
+
+#Trees are dictionaries of paths to their contents. Contents are bytes for files, ("link",
+#target) for symlinks, and ("exec", data) for executable files.
+
+def make_elf_header(machine, is_64_bit=True, little_endian=True):
+    #The start of an ELF binary for the given machine number.
+    byte_order = "<" if little_endian else ">"
+
+    return b"\x7fELF" + bytes([2 if is_64_bit else 1, 1 if little_endian else 2, 1]) \
+           + bytes(9) + struct.pack(byte_order+"HH", 2, machine) + bytes(44)
+
+def return_fake_debian_tree():
+    #A merged-/usr Debian install, with an absolute os-release symlink.
+    return {"etc/os-release": ("link", "/usr/lib/os-release"),
+            "usr/lib/os-release": b'PRETTY_NAME="Debian GNU/Linux 12 (bookworm)"\nNAME="Debian '
+                                  + b'GNU/Linux"\nVERSION_ID="12"\nID=debian\n',
+            "bin": ("link", "usr/bin"),
+            "sbin": ("link", "usr/sbin"),
+            "lib": ("link", "usr/lib"),
+            "usr/sbin/init": ("link", "../lib/systemd/systemd"),
+            "usr/lib/systemd/systemd": ("exec", make_elf_header(0x3E)),
+            "usr/bin/sh": ("link", "dash"),
+            "usr/bin/dash": ("exec", make_elf_header(0x3E)),
+            "usr/bin/apt-get": ("exec", make_elf_header(0x3E))}
+
+def return_fake_fedora_tree():
+    #A 32-bit ARM Fedora install with only a shell, and dnf in /usr/bin.
+    return {"etc/os-release": ("link", "../usr/lib/os-release"),
+            "usr/lib/os-release": b"NAME=Fedora\nPRETTY_NAME='Fedora Linux 39 (Server Edition)'\n",
+            "bin/sh": ("link", "bash"),
+            "bin/bash": ("exec", make_elf_header(0x28, is_64_bit=False)),
+            "usr/bin/dnf": ("exec", b"#!/usr/bin/python3\n")}
+
+def return_fake_old_ubuntu_tree():
+    #An old 32-bit Ubuntu install with only lsb-release, and a loop instead of /sbin/init.
+    return {"etc/lsb-release": b"DISTRIB_ID=Ubuntu\nDISTRIB_RELEASE=10.04\n"
+                               + b'DISTRIB_DESCRIPTION="Ubuntu 10.04.4 LTS"\n',
+            "sbin/init": ("link", "/sbin/init2"),
+            "sbin/init2": ("link", "/sbin/init"),
+            "bin/sh": ("exec", make_elf_header(3, is_64_bit=False)),
+            "usr/bin/apt-get": b"Not executable",
+            "usr/sbin/apt-get": ("exec", make_elf_header(3, is_64_bit=False))}
+
+def return_fake_data_tree():
+    #A data partition, with an /etc directory but no OS. Its links point out of the partition.
+    return {"etc/fstab": b"# Nothing here\n",
+            "etc/os-release": ("link", "../../../../etc/os-release"),
+            "sbin/init": ("link", "/../../../../../sbin/init"),
+            "bin": ("link", "/"),
+            "Documents/notes.txt": b"Some notes\n"}
+
+def make_hive(values, subkey_list="lh"):
+    #A tiny registry hive with the given string values in Microsoft\Windows NT\CurrentVersion.
+    cells = bytearray(b"hbin" + bytes(28))
+
+    def add_cell(data):
+        offset = len(cells)
+        size = (4 + len(data) + 7) // 8 * 8
+        cells.extend(struct.pack("<i", -size) + data + bytes(size - 4 - len(data)))
+        return offset
+
+    def add_key(name, subkeys=(), value_offsets=()):
+        subkey_offset = values_offset = 0xFFFFFFFF
+
+        if subkeys and subkey_list == "li":
+            subkey_offset = add_cell(b"li" + struct.pack("<H", len(subkeys))
+                                     + b"".join(struct.pack("<I", key) for key in subkeys))
+
+        elif subkeys:
+            subkey_offset = add_cell(b"lh" + struct.pack("<H", len(subkeys))
+                                     + b"".join(struct.pack("<II", key, 0) for key in subkeys))
+
+        if value_offsets:
+            values_offset = add_cell(b"".join(struct.pack("<I", value)
+                                              for value in value_offsets))
+
+        return add_cell(b"nk" + struct.pack("<H", 0x20) + bytes(16)
+                        + struct.pack("<IIII", len(subkeys), 0, subkey_offset, 0xFFFFFFFF)
+                        + struct.pack("<II", len(value_offsets), values_offset) + bytes(28)
+                        + struct.pack("<HH", len(name), 0) + name.encode("latin-1"))
+
+    value_offsets = []
+
+    for name, value in values.items():
+        data = (value+"\x00").encode("UTF-16-LE")
+        value_offsets.append(add_cell(b"vk" + struct.pack("<HIIIHH", len(name), len(data),
+                                                          add_cell(data), 1, 1, 0)
+                                      + name.encode("latin-1")))
+
+    #Other keys, so we have to look for the right one.
+    other = add_key("Classes")
+    current_version = add_key("CurrentVersion", value_offsets=value_offsets)
+    windows_nt = add_key("Windows NT", subkeys=[add_key("Windows"), current_version])
+    microsoft = add_key("Microsoft", subkeys=[windows_nt])
+    root = add_key("ROOT", subkeys=[other, microsoft])
+
+    base_block = bytearray(4096)
+    base_block[0:4] = b"regf"
+    struct.pack_into("<I", base_block, 0x24, root)
+
+    return bytes(base_block + cells)
+
+def return_fake_windows_10_tree():
+    #Windows 10, with a license file that mentions Windows 8 after the arbitration note.
+    return {"Windows/System32/license.rtf": b"{\\rtf1 MICROSOFT SOFTWARE LICENSE TERMS\n"
+                                            + b"IF YOU LIVE IN THE UNITED STATES, SECTION 10 "
+                                            + b"CONTAINS A BINDING ARBITRATION CLAUSE\n"
+                                            + b"Upgrades from Windows 8.1 and Windows 7\n",
+            "Users/Public/desktop.ini": b"",
+            "pagefile.sys": b""}
+
+def return_fake_windows_8_tree():
+    #Windows 8.1, with only a license file.
+    return {"Windows/System32/license.rtf": b"{\\rtf1 MICROSOFT SOFTWARE LICENSE TERMS\n"
+                                            + b"WINDOWS 8.1\nBINDING ARBITRATION CLAUSE\n"}
+
+def return_fake_windows_7_tree():
+    #Windows 7, with a registry hive and its directories in a different case.
+    return {"WINDOWS/system32/config/SOFTWARE": make_hive({"ProductName": "Windows 7 Ultimate",
+                                                           "CurrentBuildNumber": "7601"},
+                                                          subkey_list="li"),
+            "WINDOWS/system32/license.rtf": b"Windows Vista\n"}
+
+def return_fake_windows_11_tree():
+    #Windows 11, which still says it's Windows 10 in the registry.
+    return {"Windows/System32/config/SOFTWARE": make_hive({"ProductName": "Windows 10 Pro",
+                                                           "CurrentBuildNumber": "22631"}),
+            "Windows/System32/license.rtf": b"Windows 8\n"}
+
+def return_fake_windows_xp_tree():
+    #Windows XP, with a damaged registry hive.
+    return {"WINDOWS/system32/config/software": b"regf" + bytes(60),
+            "boot.ini": b"[boot loader]\n",
+            "ntldr": b"",
+            "NTDETECT.COM": b"",
+            "Documents and Settings/All Users/ntuser.dat": b""}
+
+def return_fake_windows_98_tree():
+    #Windows 98, which doesn't have a System32 directory.
+    return {"WINDOWS/SYSTEM/KERNEL32.DLL": b"",
+            "AUTOEXEC.BAT": b"",
+            "COMMAND.COM": b"",
+            "My Documents/readme.txt": b""}
+
+def return_fake_efi_tree():
+    #An EFI system partition, with a file called Windows but no Windows directory.
+    return {"EFI/Microsoft/Boot/bootmgfw.efi": b"",
+            "Windows": b"Not a directory\n"}
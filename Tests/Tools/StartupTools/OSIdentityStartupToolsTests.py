@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# OSIdentityStartupTools tests for WxFixBoot
+# This file is part of WxFixBoot.
+# Copyright (C) 2013-2020 Hamish McIntyre-Bhatty
+# WxFixBoot is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3 or,
+# at your option, any later version.
+#
+# WxFixBoot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WxFixBoot.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=too-few-public-methods
+#
+# Reason (too-few-public-methods): Test classes.
+
+#Import modules
+import unittest
+import os
+import sys
+import tempfile
+
+#Import test data.
+from . import OSIdentityStartupToolsTestData as Data
+
+#Import other modules.
+sys.path.append('../../..') #Need to be able to import the Tools module from here.
+
+import Tools.StartupTools.osidentity as OSIdentityTools
+
+class TestOSIdentity(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = self.directory.name
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+        del self.root
+        del self.directory
+
+    def make_tree(self, tree):
+        """Create the given fake OS tree in the temporary directory"""
+        for path, contents in tree.items():
+            path = os.path.join(self.root, path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+            if isinstance(contents, tuple) and contents[0] == "link":
+                os.symlink(contents[1], path)
+                continue
+
+            if isinstance(contents, tuple):
+                contents = contents[1]
+                mode = 0o755
+
+            else:
+                mode = 0o644
+
+            with open(path, "wb") as the_file:
+                the_file.write(contents)
+
+            os.chmod(path, mode)
+
+    def test_get_os_name_1(self):
+        """Test #1: Test getting names from os-release, following symlinks inside the OS"""
+        self.make_tree(Data.return_fake_debian_tree())
+        self.assertEqual(OSIdentityTools.get_os_name(self.root), "Debian GNU/Linux 12 (bookworm)")
+
+    def test_get_os_name_2(self):
+        """Test #2: Test that single quotes are removed, and lsb-release is used as a fallback"""
+        self.make_tree(Data.return_fake_fedora_tree())
+        self.assertEqual(OSIdentityTools.get_os_name(self.root), "Fedora Linux 39 (Server Edition)")
+
+        self.directory.cleanup()
+        os.mkdir(self.root)
+
+        self.make_tree(Data.return_fake_old_ubuntu_tree())
+        self.assertEqual(OSIdentityTools.get_os_name(self.root), "Ubuntu 10.04.4 LTS")
+
+    def test_get_os_name_3(self):
+        """Test #3: Test that links out of the OS don't find our own os-release"""
+        self.make_tree(Data.return_fake_data_tree())
+        self.assertIsNone(OSIdentityTools.get_os_name(self.root))
+
+    def test_get_architecture_1(self):
+        """Test #1: Test reading the architecture from /sbin/init or /bin/sh"""
+        for tree, architecture in ((Data.return_fake_debian_tree(), "x86_64"),
+                                   (Data.return_fake_fedora_tree(), "armv7l"),
+                                   (Data.return_fake_old_ubuntu_tree(), "i386"),
+                                   (Data.return_fake_data_tree(), None)):
+
+            self.directory.cleanup()
+            os.mkdir(self.root)
+            self.make_tree(tree)
+
+            self.assertEqual(OSIdentityTools.get_architecture(self.root), architecture)
+
+    def test_get_elf_architecture_1(self):
+        """Test #1: Test architectures that depend on the word size and byte order"""
+        self.assertEqual(OSIdentityTools.get_elf_architecture(Data.make_elf_header(0x15)),
+                         "ppc64le")
+        self.assertEqual(OSIdentityTools.get_elf_architecture(
+            Data.make_elf_header(0x15, little_endian=False)), "ppc64")
+        self.assertEqual(OSIdentityTools.get_elf_architecture(
+            Data.make_elf_header(0x16, is_64_bit=False, little_endian=False)), "s390")
+
+        self.assertIsNone(OSIdentityTools.get_elf_architecture(b"#!/bin/sh\n"))
+
+    def test_get_package_manager_1(self):
+        """Test #1: Test finding apt-get and dnf, which have to be executable files"""
+        for tree, package_manager in ((Data.return_fake_debian_tree(), "apt-get"),
+                                      (Data.return_fake_fedora_tree(), "dnf"),
+                                      (Data.return_fake_old_ubuntu_tree(), "apt-get"),
+                                      (Data.return_fake_data_tree(), "Unknown")):
+
+            self.directory.cleanup()
+            os.mkdir(self.root)
+            self.make_tree(tree)
+
+            self.assertEqual(OSIdentityTools.get_package_manager(self.root), package_manager)
+
+    def test_current_os_1(self):
+        """Test #1: Test that we get the same results as running arch and which on this OS"""
+        machine = os.uname().machine
+
+        #We call all 32-bit x86 systems i386, like GRUB does.
+        if machine in ("i486", "i586", "i686"):
+            machine = "i386"
+
+        self.assertEqual(OSIdentityTools.get_architecture("/"), machine)
+
+        self.assertEqual(OSIdentityTools.find_program("/", "apt-get") is not None,
+                         any(os.access(os.path.join(directory, "apt-get"), os.X_OK)
+                             for directory in os.environ.get("PATH", "").split(":")))
+
+    def test_get_windows_edition_1(self):
+        """Test #1: Test finding which version of Windows is installed"""
+        for tree, edition in ((Data.return_fake_windows_10_tree(), "Windows 10"),
+                              (Data.return_fake_windows_8_tree(), "Windows 8/8.1"),
+                              (Data.return_fake_windows_7_tree(), "Windows 7"),
+                              (Data.return_fake_windows_11_tree(), "Windows 11"),
+                              (Data.return_fake_windows_xp_tree(), "Windows XP"),
+                              (Data.return_fake_windows_98_tree(), "Windows 95/98/ME"),
+                              (Data.return_fake_efi_tree(), None)):
+
+            self.directory.cleanup()
+            os.mkdir(self.root)
+            self.make_tree(tree)
+
+            fingerprint = OSIdentityTools.get_windows_fingerprint(self.root)
+            self.assertEqual(OSIdentityTools.get_windows_edition(fingerprint), edition)
+
+    def test_get_windows_edition_2(self):
+        """Test #2: Test that the license file is used if we don't read the registry"""
+        self.make_tree(Data.return_fake_windows_11_tree())
+
+        fingerprint = OSIdentityTools.get_windows_fingerprint(self.root, read_registry=False)
+
+        self.assertIsNone(fingerprint["ProductName"])
+        self.assertEqual(OSIdentityTools.get_windows_edition(fingerprint), "Windows 8/8.1")
+
+    def test_get_windows_version_info_1(self):
+        """Test #1: Test reading the Windows version from a SOFTWARE registry hive"""
+        path = os.path.join(self.root, "SOFTWARE")
+
+        with open(path, "wb") as hive:
+            hive.write(Data.make_hive({"ProductName": "Windows 10 Home", "InstallDate": "1",
+                                       "CurrentBuildNumber": "19045"}))
+
+        self.assertEqual(OSIdentityTools.get_windows_version_info(path),
+                         {"ProductName": "Windows 10 Home", "CurrentBuildNumber": "19045"})
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# PackageStartupTools test data for WxFixBoot
+# This file is part of WxFixBoot.
+# Copyright (C) 2013-2020 Hamish McIntyre-Bhatty
+# WxFixBoot is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3 or,
+# at your option, any later version.
+#
+# WxFixBoot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WxFixBoot.  If not, see <http://www.gnu.org/licenses/>.
+
+def return_fake_dpkg_status():
+    #A dpkg status file with GRUB for UEFI installed, and GRUB for BIOS removed.
+    return b"""Package: base-files
+Status: install ok installed
+Priority: required
+Section: admin
+Installed-Size: 340
+Maintainer: Santiago Vila <sanvila@debian.org>
+Architecture: amd64
+Version: 12.4+deb12u5
+Description: Debian base system miscellaneous files
+ This package contains the basic filesystem hierarchy of a Debian system, and
+ several important miscellaneous files.
+
+Package: grub-pc
+Status: deinstall ok config-files
+Priority: optional
+Section: admin
+Architecture: amd64
+Version: 2.06-13+deb12u1
+Description: GRand Unified Bootloader, version 2 (PC/BIOS version)
+
+Package: grub-efi-amd64
+Status: install ok installed
+Priority: optional
+Section: admin
+Architecture: amd64
+Version: 2.06-13+deb12u1
+Description: GRand Unified Bootloader, version 2 (EFI-AMD64 version)
+
+Package: grub-pc-bin
+Status: hold ok installed
+Priority: optional
+Section: admin
+Architecture: amd64
+Version: 2.06-13+deb12u1
+Description: GRand Unified Bootloader, version 2 (PC/BIOS modules)
+
+Package: zlib1g
+Status: install ok installed
+Priority: optional
+Section: libs
+Architecture: amd64
+Version: 1:1.2.13.dfsg-1
+Description: compression library - runtime
+"""
+
+def return_fake_rpm_packages():
+    #Installed packages on a Fedora system booted with UEFI.
+    return ("bash", "fedora-release", "grub2-common", "grub2-efi-x64", "grub2-pc-modules",
+            "grub2-tools", "kernel-core", "shim-x64")
+
+def return_fake_apt_packages_list():
+    #Part of an apt Packages list from a mirror. grub-efi itself isn't here, only
+    #grub-efi-amd64, so it can't be installed.
+    return b"""Package: grub-efi-amd64
+Architecture: amd64
+Version: 2.06-13
+Description: GRand Unified Bootloader, version 2 (EFI-AMD64 version)
+
+Package: grub-pc
+Architecture: amd64
+Version: 2.06-13
+Description: GRand Unified Bootloader, version 2 (PC/BIOS version)
+
+Package: zlib1g
+Architecture: amd64
+Version: 1:1.2.13.dfsg-1
+Description: compression library - runtime
+"""
+
+def return_fake_primary_xml():
+    #Part of the primary metadata for a dnf repository.
+    return b"""<?xml version="1.0" encoding="UTF-8"?>
+<metadata xmlns="http://linux.duke.edu/metadata/common" packages="2">
+<package type="rpm">
+  <name>grub2-efi-x64</name>
+  <arch>x86_64</arch>
+  <summary>GRUB for EFI systems.</summary>
+  <format>
+    <rpm:provides>
+      <rpm:entry name="grub2-efi"/>
+    </rpm:provides>
+  </format>
+</package>
+<package type="rpm">
+  <name>grub2-pc-modules</name>
+  <arch>noarch</arch>
+  <summary>Modules used to build custom grub images</summary>
+</package>
+</metadata>
+"""
+
+def return_fake_repomd_xml(primary_name):
+    #The index of a dnf repository's metadata.
+    return b"""<?xml version="1.0" encoding="UTF-8"?>
+<repomd xmlns="http://linux.duke.edu/metadata/repo">
+  <data type="filelists">
+    <location href="repodata/0123-filelists.xml.gz"/>
+  </data>
+  <data type="primary">
+    <checksum type="sha256">4567</checksum>
+    <location href="repodata/""" + primary_name.encode() + b""""/>
+  </data>
+</repomd>
+"""
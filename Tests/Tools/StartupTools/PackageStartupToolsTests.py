@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# PackageStartupTools tests for WxFixBoot
+# This file is part of WxFixBoot.
+# Copyright (C) 2013-2020 Hamish McIntyre-Bhatty
+# WxFixBoot is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3 or,
+# at your option, any later version.
+#
+# WxFixBoot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WxFixBoot.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=too-few-public-methods
+#
+# Reason (too-few-public-methods): Test classes.
+
+#Import modules
+import unittest
+import gzip
+import io
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+
+#Import test data.
+from . import PackageStartupToolsTestData as Data
+
+#Import other modules.
+sys.path.append('../../..') #Need to be able to import the Tools module from here.
+
+import Tools.StartupTools.packages as PackageTools
+
+class TestReadDpkgStatus(unittest.TestCase):
+    def test_read_dpkg_status_1(self):
+        """Test #1: Test that only packages selected for installation are found"""
+        status_file = io.BytesIO(Data.return_fake_dpkg_status())
+
+        self.assertEqual(PackageTools.read_dpkg_status(status_file, ("grub-efi", "grub-pc")),
+                         {"grub-efi"})
+
+    def test_read_dpkg_status_2(self):
+        """Test #2: Test that we stop reading once every package has been found"""
+        data = Data.return_fake_dpkg_status()
+        status_file = io.BytesIO(data)
+
+        self.assertEqual(PackageTools.read_dpkg_status(status_file, ("grub-efi", "base-files"),
+                                                       chunk_size=64),
+                         {"grub-efi", "base-files"})
+
+        #zlib1g comes after grub-efi-amd64, so we shouldn't have read that far.
+        self.assertLess(status_file.tell(), data.index(b"Package: zlib1g"))
+
+    @unittest.skipUnless(shutil.which("dpkg") and os.path.isfile("/var/lib/dpkg/status"),
+                         "This isn't a Debian-based OS")
+    def test_read_dpkg_status_3(self):
+        """Test #3: Test that we get the same results as dpkg --get-selections on this OS"""
+        selections = subprocess.run(["dpkg", "--get-selections"], stdout=subprocess.PIPE,
+                                    check=True).stdout.decode("UTF-8").split("\n")
+
+        packages = ("grub-efi", "grub-pc", "linux-image", "python3", "bash", "not-a-package")
+        expected = set()
+
+        for line in selections:
+            for package in packages:
+                if package in line and line.split()[1] == "install":
+                    expected.add(package)
+
+        self.assertEqual(PackageTools.get_installed_packages("/", "apt-get", packages), expected)
+
+class TestGetInstalledPackages(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = self.directory.name
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+        del self.root
+        del self.directory
+
+    def make_rpmdb(self):
+        """Make a fake rpm database, in /usr/lib/sysimage/rpm with a symlink like Fedora"""
+        os.makedirs(os.path.join(self.root, "usr/lib/sysimage/rpm"))
+        os.makedirs(os.path.join(self.root, "var/lib"))
+        os.symlink("../../usr/lib/sysimage/rpm", os.path.join(self.root, "var/lib/rpm"))
+
+        database = sqlite3.connect(os.path.join(self.root, "usr/lib/sysimage/rpm/rpmdb.sqlite"))
+
+        with database:
+            database.execute("CREATE TABLE Packages (hnum INTEGER PRIMARY KEY AUTOINCREMENT, "
+                             + "blob BLOB NOT NULL)")
+            database.execute("CREATE TABLE Name (key TEXT NOT NULL, hnum INTEGER NOT NULL, "
+                             + "idx INTEGER NOT NULL)")
+
+            database.executemany("INSERT INTO Name VALUES (?, ?, 0)",
+                                 [(name, number) for number, name
+                                  in enumerate(Data.return_fake_rpm_packages())])
+
+        database.close()
+
+    def test_get_installed_packages_1(self):
+        """Test #1: Test reading the rpm database, following symlinks inside the OS"""
+        self.make_rpmdb()
+        os.remove(os.path.join(self.root, "var/lib/rpm"))
+        os.symlink("/usr/lib/sysimage/rpm", os.path.join(self.root, "var/lib/rpm"))
+
+        #Only look through the symlink.
+        rpmdb_files = PackageTools.RPMDB_FILES
+        PackageTools.RPMDB_FILES = ("/var/lib/rpm/rpmdb.sqlite",)
+
+        try:
+            self.assertEqual(PackageTools.get_installed_packages(self.root, "dnf",
+                                                                 ("grub2-efi-x64", "grub2-pc",
+                                                                  "grub2-efi-ia32")),
+                             {"grub2-efi-x64", "grub2-pc"})
+
+        finally:
+            PackageTools.RPMDB_FILES = rpmdb_files
+
+    def test_get_installed_packages_2(self):
+        """Test #2: Test that None is returned if we can't read the package database"""
+        self.assertIsNone(PackageTools.get_installed_packages(self.root, "dnf", ("grub2-pc",)))
+        self.assertIsNone(PackageTools.get_installed_packages(self.root, "apt-get",
+                                                              ("grub-pc",)))
+
+        #We shouldn't have made an empty database.
+        self.assertEqual(os.listdir(self.root), [])
+
+        #The old Berkeley DB format isn't supported.
+        os.makedirs(os.path.join(self.root, "var/lib/rpm"))
+
+        with open(os.path.join(self.root, "var/lib/rpm/rpmdb.sqlite"), "wb") as database:
+            database.write(b"\x00\x06\x15\x61" + bytes(4092))
+
+        self.assertIsNone(PackageTools.get_installed_packages(self.root, "dnf", ("grub2-pc",)))
+
+    def test_get_installed_packages_3(self):
+        """Test #3: Test reading a dpkg status file"""
+        os.makedirs(os.path.join(self.root, "var/lib/dpkg"))
+
+        with open(os.path.join(self.root, "var/lib/dpkg/status"), "wb") as status_file:
+            status_file.write(Data.return_fake_dpkg_status())
+
+        self.assertEqual(PackageTools.get_installed_packages(self.root, "apt-get",
+                                                             ("grub-efi", "grub-pc")),
+                         {"grub-efi"})
+
+class TestGetPackageIndex(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.directory.name, "os1")
+        PackageTools.PACKAGE_INDEXES.clear()
+
+    def tearDown(self):
+        self.directory.cleanup()
+        PackageTools.PACKAGE_INDEXES.clear()
+
+        del self.root
+        del self.directory
+
+    def make_apt_lists(self, root):
+        """Make some fake apt package lists, one of them compressed"""
+        lists = os.path.join(root, "var/lib/apt/lists")
+        os.makedirs(lists)
+
+        with open(os.path.join(lists, "deb.example.org_debian_dists_stable_main_binary-amd64"
+                               + "_Packages"), "wb") as package_list:
+            package_list.write(Data.return_fake_apt_packages_list())
+
+        with gzip.open(os.path.join(lists, "deb.example.org_debian_dists_stable_contrib_"
+                                    + "binary-amd64_Packages.gz"), "wb") as package_list:
+            package_list.write(b"Package: grub-customizer\nVersion: 5.2.3-1\n")
+
+        #These aren't lists of packages.
+        with open(os.path.join(lists, "deb.example.org_debian_dists_stable_InRelease"),
+                  "wb") as release:
+            release.write(b"Package: not-a-package\n")
+
+        return lists
+
+    def test_get_package_index_1(self):
+        """Test #1: Test reading apt's package lists"""
+        self.make_apt_lists(self.root)
+
+        self.assertEqual(PackageTools.get_package_index(self.root, "apt-get"),
+                         {"grub-efi-amd64", "grub-pc", "zlib1g", "grub-customizer"})
+
+        #Unlike installed packages, names have to match exactly, like apt-cache search.
+        self.assertEqual(PackageTools.get_available_packages(self.root, "apt-get",
+                                                             ("grub-efi", "grub-pc")),
+                         {"grub-pc"})
+
+    def test_get_package_index_2(self):
+        """Test #2: Test that OSs with the same package lists share an index"""
+        lists = self.make_apt_lists(self.root)
+        other_root = os.path.join(self.directory.name, "os2")
+        shutil.copytree(lists, os.path.join(other_root, "var/lib/apt/lists"))
+
+        misses = PackageTools.PACKAGE_INDEX_STATS["Misses"]
+        index = PackageTools.get_package_index(self.root, "apt-get")
+
+        self.assertIs(PackageTools.get_package_index(other_root, "apt-get"), index)
+        self.assertEqual(PackageTools.PACKAGE_INDEX_STATS["Misses"], misses + 1)
+
+        #Different lists get their own index.
+        with open(os.path.join(other_root, "var/lib/apt/lists/deb.example.org_debian_dists"
+                               + "_stable_main_binary-amd64_Packages"), "ab") as package_list:
+            package_list.write(b"\nPackage: grub-efi\nVersion: 2.06-13\n")
+
+        self.assertIn("grub-efi", PackageTools.get_package_index(other_root, "apt-get"))
+        self.assertNotIn("grub-efi", PackageTools.get_package_index(self.root, "apt-get"))
+
+    def test_get_package_index_3(self):
+        """Test #3: Test reading dnf's cached repository metadata"""
+        repodata = os.path.join(self.root, "var/cache/dnf/fedora-0123456789abcdef/repodata")
+        os.makedirs(repodata)
+
+        with open(os.path.join(repodata, "repomd.xml"), "wb") as repomd:
+            repomd.write(Data.return_fake_repomd_xml("89ab-primary.xml.gz"))
+
+        with gzip.open(os.path.join(repodata, "89ab-primary.xml.gz"), "wb") as primary:
+            primary.write(Data.return_fake_primary_xml())
+
+        #An old copy of the metadata that dnf hasn't cleaned up yet.
+        with gzip.open(os.path.join(repodata, "0000-primary.xml.gz"), "wb") as primary:
+            primary.write(b"<package><name>grub2-pc</name></package>\n")
+
+        self.assertEqual(PackageTools.get_available_packages(self.root, "dnf",
+                                                             ("grub2-efi-x64", "grub2-pc")),
+                         {"grub2-efi-x64"})
+
+    def test_get_package_index_4(self):
+        """Test #4: Test that None is returned if we can't read every package list"""
+        self.assertIsNone(PackageTools.get_package_index(self.root, "apt-get"))
+        self.assertIsNone(PackageTools.get_package_index(self.root, "dnf"))
+
+        #We don't know how to decompress lz4.
+        lists = self.make_apt_lists(self.root)
+
+        with open(os.path.join(lists, "deb.example.org_debian_dists_stable_non-free_"
+                               + "binary-amd64_Packages.lz4"), "wb") as package_list:
+            package_list.write(b"\x04\x22\x4d\x18")
+
+        self.assertIsNone(PackageTools.get_available_packages(self.root, "apt-get",
+                                                              ("grub-pc",)))
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SignatureStartupTools test data for WxFixBoot
+# This file is part of WxFixBoot.
+# Copyright (C) 2013-2020 Hamish McIntyre-Bhatty
+# WxFixBoot is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3 or,
+# at your option, any later version.
+#
+# WxFixBoot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WxFixBoot.  If not, see <http://www.gnu.org/licenses/>.
+
+#Import modules
+import struct
+
+#Size of the fake images.
+IMAGE_SIZE = 131072
+
+def make_image():
+    #An empty image, to build the others in.
+    return bytearray(IMAGE_SIZE)
+
+def make_ext_directory(names, block_size):
+    #A directory block holding ".", ".." and the given names.
+    block = bytearray()
+    names = [".", ".."] + list(names)
+
+    for number, name in enumerate(names):
+        encoded = name.encode("utf-8")
+        record_length = (8 + len(encoded) + 3) // 4 * 4
+
+        if number == len(names) - 1:
+            #The last entry takes up the rest of the block.
+            record_length = block_size - len(block)
+
+        block += struct.pack("<IHBB", 11+number, record_length, len(encoded), 2) + encoded
+        block += bytes(record_length - 8 - len(encoded))
+
+    return block
+
+def return_fake_ext_image(names, extents=True):
+    #A tiny ext4 (or ext2, without extents) filesystem with the given names in its root directory.
+    image = make_image()
+    block_size = 1024
+    inode_size = 256
+    inode_table = 5
+    directory_block = 20
+
+    #Superblock.
+    struct.pack_into("<II", image, 1024+0x14, 1, 0)
+    struct.pack_into("<I", image, 1024+0x28, 32)
+    struct.pack_into("<H", image, 1024+0x38, 0xEF53)
+    struct.pack_into("<I", image, 1024+0x4C, 1)
+    struct.pack_into("<H", image, 1024+0x58, inode_size)
+
+    if extents:
+        struct.pack_into("<III", image, 1024+0x5C, 0x4, 0x2|0x40|0x200, 0)
+
+    else:
+        struct.pack_into("<III", image, 1024+0x5C, 0, 0x2, 0)
+
+    #Group descriptor for the first block group.
+    struct.pack_into("<I", image, 2*block_size+0x8, inode_table)
+
+    #Root inode.
+    inode = inode_table*block_size + inode_size
+    struct.pack_into("<HHI", image, inode, 0x41ED, 0, block_size)
+
+    if extents:
+        struct.pack_into("<I", image, inode+0x20, 0x80000)
+        struct.pack_into("<HHHHI", image, inode+0x28, 0xF30A, 1, 4, 0, 0)
+        struct.pack_into("<IHHI", image, inode+0x28+12, 0, 1, 0, directory_block)
+
+    else:
+        struct.pack_into("<I", image, inode+0x28, directory_block)
+
+    #Root directory.
+    image[directory_block*block_size:(directory_block+1)*block_size] = \
+    make_ext_directory(names, block_size)
+
+    return bytes(image)
+
+def return_fake_fat32_image(directories, end_marker=True):
+    #A tiny FAT32 filesystem with the given directories in its root directory.
+    image = make_image()
+
+    #Boot sector: 512 byte sectors, 1 sector per cluster, 32 reserved sectors, 2 FATs of 8
+    #sectors, and the root directory in cluster 2.
+    image[0:11] = b"\xebX\x90mkfs.fat"
+    struct.pack_into("<HBHBH", image, 11, 512, 1, 32, 2, 0)
+    struct.pack_into("<IHHI", image, 36, 8, 0, 0, 2)
+    image[82:90] = b"FAT32   "
+    image[510:512] = b"\x55\xaa"
+
+    #Root directory, starting with the volume label.
+    root = (32 + 2*8) * 512
+    entries = [(b"EFI        ", 0x08)] + [(name.ljust(11).encode("ascii"), 0x10)
+                                         for name in directories]
+
+    if not end_marker:
+        #Fill the whole cluster, so there's no end marker.
+        entries += [(b"FILE    TXT", 0x20)] * (16 - len(entries))
+
+    for number, (name, attributes) in enumerate(entries):
+        image[root+number*32:root+number*32+11] = name
+        image[root+number*32+11] = attributes
+
+    return bytes(image)
+
+def return_fake_ntfs_image():
+    #The boot sector of an NTFS filesystem.
+    image = make_image()
+    image[0:11] = b"\xebR\x90NTFS    "
+    image[510:512] = b"\x55\xaa"
+
+    return bytes(image)
+
+def return_fake_hfsplus_image(blessed):
+    #The volume header of an HFS+ filesystem, with the given blessed system folder ID.
+    image = make_image()
+    image[1024:1028] = b"H+\x00\x04"
+    struct.pack_into(">I", image, 1024+80, blessed)
+
+    return bytes(image)
+
+def return_fake_swap_image():
+    #Swap space, with 4 KiB pages.
+    image = make_image()
+    image[1024:1028] = struct.pack("<I", 1)
+    image[4086:4096] = b"SWAPSPACE2"
+
+    return bytes(image)
+
+def return_fake_luks_image():
+    #A LUKS1 header.
+    image = make_image()
+    image[0:8] = b"LUKS\xba\xbe\x00\x01"
+    image[8:13] = b"aes\x00\x00"
+
+    return bytes(image)
+
+def return_fake_btrfs_image():
+    #A btrfs superblock, 64 KiB in.
+    image = make_image()
+    image[65536+64:65536+72] = b"_BHRfS_M"
+
+    return bytes(image)
+
+def return_fake_empty_image():
+    #Nothing at all.
+    return bytes(make_image())
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SignatureStartupTools tests for WxFixBoot
+# This file is part of WxFixBoot.
+# Copyright (C) 2013-2020 Hamish McIntyre-Bhatty
+# WxFixBoot is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3 or,
+# at your option, any later version.
+#
+# WxFixBoot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WxFixBoot.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=too-few-public-methods
+#
+# Reason (too-few-public-methods): Test classes.
+
+#Import modules
+import unittest
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+#Import test data.
+from . import SignatureStartupToolsTestData as Data
+
+#Import other modules.
+sys.path.append('../../..') #Need to be able to import the Tools module from here.
+
+import Tools
+from Tools.dictionaries import DISK_INFO
+import Tools.StartupTools.main as MainStartupTools
+import Tools.StartupTools.signatures as SignatureTools
+
+class TestReadSignature(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "image")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+        del self.path
+        del self.directory
+
+    def read_image(self, data):
+        """Write a fake image, and return its signature"""
+        with open(self.path, "wb") as image:
+            image.write(data)
+
+        return SignatureTools.read_signature(self.path)
+
+    def test_ext_1(self):
+        """Test #1: Test that ext4 filesystems with a Linux root directory are kept"""
+        signature = self.read_image(Data.return_fake_ext_image(["bin", "etc", "usr"]))
+
+        self.assertEqual(signature["Signature"], "ext4")
+        self.assertTrue(signature["CanHostOS"])
+
+    def test_ext_2(self):
+        """Test #2: Test that ext4 filesystems without /etc are skipped"""
+        signature = self.read_image(Data.return_fake_ext_image(["Documents", "lost+found"]))
+
+        self.assertEqual(signature["Signature"], "ext4")
+        self.assertFalse(signature["CanHostOS"])
+
+    def test_ext_3(self):
+        """Test #3: Test that ext2 filesystems (without extents) are read too"""
+        signature = self.read_image(Data.return_fake_ext_image(["etc"], extents=False))
+        self.assertEqual(signature["Signature"], "ext2")
+        self.assertTrue(signature["CanHostOS"])
+
+        signature = self.read_image(Data.return_fake_ext_image(["home"], extents=False))
+        self.assertFalse(signature["CanHostOS"])
+
+    @unittest.skipUnless(shutil.which("mkfs.ext4"), "mkfs.ext4 isn't installed")
+    def test_ext_4(self):
+        """Test #4: Test reading real ext4 filesystems made by mkfs.ext4"""
+        for directories, can_host_os in ((["etc", "usr"], True), (["Music"], False)):
+            root = tempfile.TemporaryDirectory()
+
+            with root:
+                for directory in directories:
+                    os.mkdir(os.path.join(root.name, directory))
+
+                with open(self.path, "wb") as image:
+                    image.truncate(16*1024*1024)
+
+                subprocess.run(["mkfs.ext4", "-q", "-F", "-d", root.name, self.path],
+                               check=True, stdout=subprocess.DEVNULL)
+
+            self.assertEqual(SignatureTools.read_signature(self.path)["CanHostOS"], can_host_os)
+
+    def test_fat_1(self):
+        """Test #1: Test that EFI system partitions are skipped"""
+        signature = self.read_image(Data.return_fake_fat32_image(["EFI"]))
+
+        self.assertEqual(signature["Signature"], "vfat")
+        self.assertFalse(signature["CanHostOS"])
+
+    def test_fat_2(self):
+        """Test #2: Test that FAT partitions with Windows on them are kept"""
+        self.assertTrue(self.read_image(Data.return_fake_fat32_image(["WINDOWS"]))["CanHostOS"])
+
+    def test_fat_3(self):
+        """Test #3: Test that FAT partitions are kept if we can't read all of the root directory"""
+        data = Data.return_fake_fat32_image(["EFI"], end_marker=False)
+        self.assertTrue(self.read_image(data)["CanHostOS"])
+
+    def test_other_1(self):
+        """Test #1: Test that NTFS, btrfs and blessed HFS+ filesystems are kept"""
+        for data, name in ((Data.return_fake_ntfs_image(), "ntfs"),
+                           (Data.return_fake_btrfs_image(), "btrfs"),
+                           (Data.return_fake_hfsplus_image(blessed=22), "hfsplus")):
+
+            signature = self.read_image(data)
+
+            self.assertEqual(signature["Signature"], name)
+            self.assertTrue(signature["CanHostOS"])
+
+    def test_other_2(self):
+        """Test #2: Test that swap, LUKS, empty and unblessed HFS+ partitions are skipped"""
+        for data, name in ((Data.return_fake_swap_image(), "swap"),
+                           (Data.return_fake_luks_image(), "luks"),
+                           (Data.return_fake_empty_image(), "empty"),
+                           (Data.return_fake_hfsplus_image(blessed=0), "hfsplus")):
+
+            signature = self.read_image(data)
+
+            self.assertEqual(signature["Signature"], name)
+            self.assertFalse(signature["CanHostOS"])
+
+    def test_other_3(self):
+        """Test #3: Test that partitions we can't read or recognise are kept"""
+        self.assertTrue(self.read_image(os.urandom(Data.IMAGE_SIZE))["CanHostOS"])
+
+        os.remove(self.path)
+        self.assertTrue(SignatureTools.read_signature(self.path)["CanHostOS"])
+
+    def test_other_4(self):
+        """Test #4: Test that partitions we can't open ourselves are read as root with one dd"""
+        Tools.coretools.STARTUP = True
+        self.assertTrue(Tools.brokertools.start_broker(local=True))
+        Tools.coretools.TRACE.clear()
+
+        try:
+            for data, name, can_host_os in ((Data.return_fake_ext_image(["etc"]), "ext4", True),
+                                            (Data.return_fake_ext_image(["srv"]), "ext4", False),
+                                            (Data.return_fake_btrfs_image(), "btrfs", True)):
+
+                with open(self.path, "wb") as image:
+                    image.write(data)
+
+                with SignatureTools.BlockReader(self.path) as reader:
+                    reader.read_as_root()
+                    signature = SignatureTools.identify(reader)
+
+                self.assertEqual((signature["Signature"], signature["CanHostOS"]),
+                                 (name, can_host_os))
+
+            #Anything past what was read as root is treated as unreadable.
+            with SignatureTools.BlockReader(self.path) as reader:
+                reader.read_as_root()
+                self.assertRaises(OSError, reader.read, SignatureTools.PRIVILEGED_READ_SIZE, 1)
+
+            self.assertEqual(len([event for event in Tools.coretools.TRACE
+                                  if event["Command"][0] == "dd"]), 4)
+
+        finally:
+            Tools.brokertools.stop_broker()
+            del Tools.coretools.STARTUP
+
+class TestProbePartition(unittest.TestCase):
+    def setUp(self):
+        Tools.coretools.STARTUP = True
+
+        self.image = tempfile.NamedTemporaryFile(prefix="wxfixboot-test-")
+        self.image.write(Data.return_fake_swap_image())
+        self.image.flush()
+
+        DISK_INFO[self.image.name] = {"Type": "Partition", "FileSystem": "swap",
+                                      "Product": "Partition", "UUID": "Unknown", "Aliases": []}
+
+    def tearDown(self):
+        self.image.close()
+        del self.image
+
+        DISK_INFO.clear()
+        Tools.devicetools.DEVICE_INDEX.invalidate()
+
+    def test_probe_partition_1(self):
+        """Test #1: Test that partitions that can't have an OS on them aren't mounted"""
+        with self.assertLogs(MainStartupTools.logger, level="INFO") as logs:
+            result = MainStartupTools.probe_partition(self.image.name, "/dev/sdz1")
+
+        self.assertIn("because it is swap space", "".join(logs.output))
+        self.assertIsNone(result["OSName"])
+        self.assertIsNone(result["MountPoint"])
+        self.assertFalse(os.path.exists("/mnt/wxfixboot/mountpoints"+self.image.name))
@@ -34,7 +34,8 @@ sys.path.append('../../..') #Need to be able to import the Tools module from her
 import Tools.coretools as CoreTools #pylint: disable=wrong-import-position
 import Tools.dialogtools as DialogTools #pylint: disable=wrong-import-position
 from Tools.dictionaries import BOOTLOADER_INFO #pylint: disable=wrong-import-position
-from .. import helpers as HelperBackendTools #pylint: disable=wrong-import-position
+import Tools.StartupTools.core as CoreStartupTools #pylint: disable=wrong-import-position
+import Tools.StartupTools.getbootloaderconfigtools as BootloaderConfigObtainingTools #pylint: disable=wrong-import-position
 
 #Set up logging.
 logger = logging.getLogger(__name__)
@@ -53,14 +54,22 @@ def set_grub2_config(_os, filetoopen, bootloader_timeout, kernel_options, packag
     #recovery options + misc).
     bootloader_specific_default_os = "Unknown"
 
-    for entry in BOOTLOADER_INFO[_os]["NewMenuEntries"]["MainMenu"]["Order"]:
-        if HelperBackendTools.partition_matches_os(BOOTLOADER_INFO[_os]["NewMenuEntries"]["MainMenu"][entry]["Partition"],
-                                                   BOOTLOADER_INFO[_os]["Settings"]["DefaultOS"]):
-            bootloader_specific_default_os = \
-            BOOTLOADER_INFO[_os]["NewMenuEntries"]["MainMenu"][entry]["ID"]
+    if "NewMenuIndex" not in BOOTLOADER_INFO[_os]:
+        BOOTLOADER_INFO[_os]["NewMenuIndex"] = \
+        BootloaderConfigObtainingTools.build_grub2_menu_index(BOOTLOADER_INFO[_os]
+                                                              ["NewMenuEntries"])
 
-            logger.info("set_grub2_config(): Found Default OS's GRUB2 ID...")
-            break
+    partitions = [partition for partition, _kind in
+                  CoreStartupTools.get_os_partitions(BOOTLOADER_INFO[_os]["Settings"]["DefaultOS"])]
+
+    found = BootloaderConfigObtainingTools.find_grub2_menu_entry(BOOTLOADER_INFO[_os]
+                                                                 ["NewMenuIndex"], partitions)
+
+    if found is not None:
+        bootloader_specific_default_os = \
+        BOOTLOADER_INFO[_os]["NewMenuEntries"]["MainMenu"][found[1]]["ID"]
+
+        logger.info("set_grub2_config(): Found Default OS's GRUB2 ID...")
 
     #Log if we couldn't match them.
     if bootloader_specific_default_os == "Unknown":
@@ -79,7 +88,9 @@ def set_grub2_config(_os, filetoopen, bootloader_timeout, kernel_options, packag
     logger.debug("set_grub2_config(): Attempting to modify existing lines in the config file "
                  + "first, without making any new ones...")
 
-    config_file = CoreTools.read_privileged_file(filetoopen)
+    #This is usually still cached from when we got the config during startup.
+    parser = BootloaderConfigObtainingTools.parse_grub2_settings
+    config_file = BootloaderConfigObtainingTools.get_grub2_file(filetoopen, parser)[0]
 
     new_file_contents = []
 
@@ -166,6 +177,7 @@ def set_grub2_config(_os, filetoopen, bootloader_timeout, kernel_options, packag
     #Write the finished lines to the file.
     logger.info("set_grub2_config(): Writing new config to file...")
     CoreTools.write_privileged_file(filetoopen, ''.join(new_file_contents))
+    BootloaderConfigObtainingTools.invalidate_grub2_config_cache(filetoopen)
 
     logger.info("set_grub2_config(): Done!")
 
@@ -234,5 +246,12 @@ def update_grub2(_os, package_manager, use_chroot, mount_point):
 
     retval = CoreTools.start_process(cmd, show_output=False, privileged=True)
 
+    #grub.cfg has changed, so it will need reading again.
+    if use_chroot:
+        BootloaderConfigObtainingTools.invalidate_grub2_config_cache(mount_point)
+
+    else:
+        BootloaderConfigObtainingTools.invalidate_grub2_config_cache()
+
     #Return the return value.
     return retval
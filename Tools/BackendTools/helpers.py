@@ -34,54 +34,37 @@ import logging
 #Import other modules.
 sys.path.append('../..') #Need to be able to import the Tools module from here.
 import Tools.coretools as CoreTools #pylint: disable=wrong-import-position
+import Tools.devicetools as DeviceTools #pylint: disable=wrong-import-position
 import Tools.dialogtools as DialogTools #pylint: disable=wrong-import-position
 from Tools.dictionaries import * #pylint: disable=wrong-import-position
+import Tools.StartupTools.core as CoreStartupTools #pylint: disable=wrong-import-position
 
 #Set up logging.
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.getLogger("WxFixBoot").getEffectiveLevel())
 
-def partition_matches_os(partition, _os):
+def partition_matches_os(partition, _os, os_index=None):
     """
-    Matches the given boot device to an OS, using the info we gathered at startup
-    using the function above
+    Matches the given boot device to an OS, using the info we gathered at startup, and an
+    index from CoreStartupTools.build_os_index(), which is made here if it isn't given.
     """
 
-    #Try to match it by UUID or by name, looking for the same type of match we got before,
-    #to avoid false positives.
+    #Try to match it by UUID or by name, with the OS's partition, boot partition, or EFI
+    #partition.
     logger.debug("partition_matches_os(): Partition To Match: "+partition+"...")
     logger.debug("partition_matches_os(): OS to match with: "+_os+"...")
-    logger.debug("partition_matches_os(): Trying to match (1st) with: "
-                 + OS_INFO[_os]["Partition"]+"...")
-
-    logger.debug("partition_matches_os(): Trying to match (2nd) with: "
-                 + OS_INFO[_os]["BootPartition"]+"...")
-
-    logger.debug("partition_matches_os(): Trying to match (3rd) with: "
-                 + OS_INFO[_os]["EFIPartition"]+"...")
 
     #If partition is unknown ignore it.
     if partition == "Unknown":
         return False
 
-    #If the eg EFI partition isn't known, don't do the rest of the test in the if statement to
-    #avoid erors (short-circuit logic).
-    if OS_INFO[_os]["Partition"] != "Unknown" \
-        and partition in (OS_INFO[_os]["Partition"], DISK_INFO[OS_INFO[_os]["Partition"]]["UUID"]):
-        return True
-
-    elif OS_INFO[_os]["BootPartition"] != "Unknown" \
-        and partition in (OS_INFO[_os]["BootPartition"],
-                          DISK_INFO[OS_INFO[_os]["BootPartition"]]["UUID"]):
-
-        return True
-
-    elif OS_INFO[_os]["EFIPartition"] != "Unknown" \
-        and partition in (OS_INFO[_os]["EFIPartition"],
-                          DISK_INFO[OS_INFO[_os]["EFIPartition"]]["UUID"]):
-
-        return True
+    if os_index is None:
+        os_index = CoreStartupTools.build_os_index()
 
+    for os_name, kind in os_index.get(partition, ()):
+        if os_name == _os:
+            logger.debug("partition_matches_os(): Matched with "+_os+"'s "+kind+"...")
+            return True
 
     #Otherwise return false.
     return False
@@ -111,6 +94,10 @@ def wait_until_packagemanager_free(mount_point, package_manager):
     while retval not in success_retvals:
         retval = CoreTools.start_process(cmd, show_output=False, privileged=True)
 
+        #Stop waiting if the user has cancelled operations.
+        if retval == CoreTools.CANCELLED_RETVAL:
+            return
+
         #Get the package cache if there is none. 200 - locking failure.
         if package_manager == "dnf" and retval not in (0, 200):
             CoreTools.start_process("sh -c 'echo No cache available, "
@@ -122,7 +109,8 @@ def wait_until_packagemanager_free(mount_point, package_manager):
             else:
                 cmd2 = "dnf check-update"
 
-            CoreTools.start_process(cmd2, show_output=False, privileged=True)
+            CoreTools.start_process(cmd2, show_output=False, privileged=True,
+                                    timeout=CoreTools.NETWORK_TIMEOUT)
 
         time.sleep(5)
 
@@ -139,7 +127,7 @@ def find_missing_fsck_modules():
         if DISK_INFO[disk]["FileSystem"] not in ("Unknown", "N/A"):
             #Check if this module is present.
             if CoreTools.start_process("which fsck."+DISK_INFO[disk]["FileSystem"],
-                                       show_output=False) != 0:
+                                       show_output=False, idempotent=True) != 0:
                 #Couldn't find it, add it to the failed list.
                 logger.warning("FSCKModules(): Couldn't find FSCK module fsck."
                                + DISK_INFO[disk]["FileSystem"]
@@ -163,6 +151,12 @@ def find_checkable_file_systems():
     logger.info("find_checkable_file_systems(): Finding and returning all filesystems/partitions "
                 + "that can be checked...")
 
+    #Unmount everything we kept mounted from earlier (and the chroots set up on them), so
+    #those partitions don't look busy, and aren't unmounted behind the mount sessions' backs.
+    if CoreTools.release_all_mounts() != 0:
+        logger.warning("find_checkable_file_systems(): Failed to unmount some of the partitions "
+                       + "WxFixBoot mounted earlier! They will be skipped if they're busy...")
+
     #Do setup.
     do_not_check_list = []
     filesystems_to_check = {}
@@ -196,7 +190,7 @@ def find_checkable_file_systems():
             reason = "disk is busy."
 
         #Extra check for LVM disks using aliases.
-        elif DISK_INFO[disk]["Product"] == "LVM Partition" and root_fs in DISK_INFO[disk]["Aliases"]:
+        elif root_fs != disk and DeviceTools.DEVICE_INDEX.canonical(root_fs) == disk:
             mount_point = "/"
             check_this_fs = False
             remount_fs_after = False
@@ -211,20 +205,12 @@ def find_checkable_file_systems():
                 reason = "filesystem was not recognised."
 
             else:
-                #Check if the partition is mounted.
+                #Check if the partition (or any of its aliases) is mounted.
                 if CoreTools.is_mounted(disk) is False:
                     mount_point = "None"
                     check_this_fs = True
                     remount_fs_after = False
 
-                #Extra check for LVM disks using aliases.
-                elif DISK_INFO[disk]["Product"] == "LVM Partition" and \
-                     CoreTools.any_mounted(DISK_INFO[disk]["Aliases"]) is False:
-
-                    mount_point = "None"
-                    check_this_fs = True
-                    remount_fs_after = False
-
                 else:
                     #Unmount the FS temporarily, to avoid data corruption.
                     mount_point = CoreTools.get_mount_point_of(disk)
@@ -109,6 +109,13 @@ def manage_bootloader(_os):
 
             success = function(_os)
 
+            #Don't ask about trying again if the user has cancelled operations.
+            if success is False and CoreTools.is_cancelled():
+                logger.warning("manage_bootloader(): Operations were cancelled while trying to "
+                               + operation+" "+_os+"'s bootloader! Giving up...")
+
+                return False
+
             #Warn user if an error occured.
             if success is False:
                 logger.error("manage_bootloader(): Failed to "+operation+" "+_os
@@ -158,6 +165,25 @@ def manage_bootloader(_os):
 
     logger.info("manage_bootloader(): Done!")
 
+def release_os_mounts(_os, mount_point, chroot=True, boot=False, efi=False):
+    """
+    Give back what was acquired for the given OS before giving up part way through an
+    operation: the EFI and /boot partitions if asked, then the chroot (if it was set up) and
+    the OS's own partition if it isn't the current OS. This keeps the mount holds balanced.
+    """
+
+    if efi:
+        CoreTools.release_mount(OS_INFO[_os]["EFIPartition"], mount_point+"/boot/efi")
+
+    if boot:
+        CoreTools.release_mount(OS_INFO[_os]["BootPartition"], mount_point+"/boot")
+
+    if not OS_INFO[_os]["IsCurrentOS"]:
+        if chroot:
+            CoreTools.release_chroot(mount_point)
+
+        CoreTools.release_mount(OS_INFO[_os]["Partition"], mount_point)
+
 def remove_old_bootloader(_os):
     """Remove the currently installed bootloader."""
     logger.info("remove_old_bootloader(): Removing "+BOOTLOADER_INFO[_os]["Bootloader"]+" from "
@@ -173,33 +199,29 @@ def remove_old_bootloader(_os):
     #If this is the current OS, let the remover function know that we aren't using chroot.
     if OS_INFO[_os]["IsCurrentOS"]:
         logger.debug("remove_old_bootloader(): Modifying current OS so not using chroot...")
-        use_chroot, unmount_after, mount_point = (False, False, "")
+        use_chroot, mount_point = (False, "")
 
     else:
         logger.debug("remove_old_bootloader(): Using chroot to modify another OS...")
         use_chroot = True
         mount_point = "/mnt/wxfixboot/mountpoints"+OS_INFO[_os]["Partition"]
 
-        #Check if the partition is mounted.
-        unmount_after = not CoreTools.is_mounted(OS_INFO[_os]["Partition"], mount_point)
-
-        if unmount_after:
-            #Mount the partition using the global mount function.
-            if CoreTools.mount_partition(partition=OS_INFO[_os]["Partition"],
-                                         mount_point=mount_point) != 0:
+        #Mount the partition, or reuse the mount if it's still there from earlier.
+        if CoreTools.acquire_mount(partition=OS_INFO[_os]["Partition"],
+                                   mount_point=mount_point) != 0:
 
-                logger.error("remove_old_bootloader(): Failed to mount "+OS_INFO[_os]["Partition"]
-                             + "! Warning the user and giving up...")
+            logger.error("remove_old_bootloader(): Failed to mount "+OS_INFO[_os]["Partition"]
+                         + "! Warning the user and giving up...")
 
-                DialogTools.show_msg_dlg(kind="error",
-                                         message="WxFixBoot failed to mount the partition "
-                                         + "containing "+_os+"! Giving up. You will be prompted "
-                                         + "to try again if you wish.")
+            DialogTools.show_msg_dlg(kind="error",
+                                     message="WxFixBoot failed to mount the partition "
+                                     + "containing "+_os+"! Giving up. You will be prompted "
+                                     + "to try again if you wish.")
 
-                return False
+            return False
 
         #Set up chroot.
-        if CoreTools.setup_chroot(mount_point) != 0:
+        if CoreTools.acquire_chroot(mount_point) != 0:
             logger.error("remove_old_bootloader(): Failed to set up chroot at "+mount_point
                          + "! Giving up...")
 
@@ -207,11 +229,13 @@ def remove_old_bootloader(_os):
                                      message="WxFixBoot failed to set up a chroot for "+_os
                                      + "! Giving up. You will be prompted to try again if "
                                      + "you wish.")
+
+            release_os_mounts(_os, mount_point, chroot=False)
             return False
 
     #Mount a /boot partition if it exists.
     if OS_INFO[_os]["BootPartition"] != "Unknown":
-        if CoreTools.mount_partition(OS_INFO[_os]["BootPartition"], mount_point+"/boot") != 0:
+        if CoreTools.acquire_mount(OS_INFO[_os]["BootPartition"], mount_point+"/boot") != 0:
             logger.error("remove_old_bootloader(): Failed to mount "+_os+"'s /boot partition! "
                          + "Skipping bootloader removal for this OS.")
 
@@ -220,16 +244,13 @@ def remove_old_bootloader(_os):
                                      + _os+"'s /boot partition! Giving up. You will be prompted "
                                      + "to try again if you wish.")
 
-            if not OS_INFO[_os]["IsCurrentOS"]:
-                CoreTools.teardown_chroot(mount_point)
-                CoreTools.unmount(mount_point)
-
+            release_os_mounts(_os, mount_point)
             return False
 
     #Mount the UEFI partition at mount_point/boot/efi, if it exists.
     if OS_INFO[_os]["EFIPartition"] != "Unknown":
-        if CoreTools.mount_partition(partition=OS_INFO[_os]["EFIPartition"],
-                                     mount_point=mount_point+"/boot/efi") != 0:
+        if CoreTools.acquire_mount(partition=OS_INFO[_os]["EFIPartition"],
+                                   mount_point=mount_point+"/boot/efi") != 0:
             logger.error("remove_old_bootloader(): Failed to mount "+OS_INFO[_os]["EFIPartition"]
                          + "! to "+mount_point+"/boot/efi! Aborting bootloader installation and "
                          + "warning user...")
@@ -239,6 +260,9 @@ def remove_old_bootloader(_os):
                                      + _os+"'s EFI partition! Giving up. You will be prompted to "
                                      + "try again if you wish.")
 
+            release_os_mounts(_os, mount_point,
+                              boot=OS_INFO[_os]["BootPartition"] != "Unknown")
+
             return False
 
     #Wait until no other application is using APT/DNF.
@@ -322,30 +346,34 @@ def remove_old_bootloader(_os):
 
         DialogTools.show_msg_dlg(kind="error", message="WxFixBoot failed to remove "
                                  + BOOTLOADER_INFO[_os]["Bootloader"]+" from "+_os+"!")
+
+        release_os_mounts(_os, mount_point,
+                          boot=OS_INFO[_os]["BootPartition"] != "Unknown",
+                          efi=OS_INFO[_os]["EFIPartition"] != "Unknown")
+
         return False
 
     #If there's a seperate EFI partition for this OS, make sure it's unmounted before removing
     #the chroot.
     if OS_INFO[_os]["EFIPartition"] != "Unknown":
-        if CoreTools.unmount(mount_point+"/boot/efi") != 0:
+        if CoreTools.release_mount(OS_INFO[_os]["EFIPartition"],
+                                   mount_point+"/boot/efi") != 0:
             logger.error("remove_old_bootloader(): Failed to unmount "+mount_point
                          + "/boot/efi! This probably doesn't matter...")
 
     #unmount a /boot partition if it exists.
     if OS_INFO[_os]["BootPartition"] != "Unknown":
-        if CoreTools.unmount(mount_point+"/boot") != 0:
+        if CoreTools.release_mount(OS_INFO[_os]["BootPartition"], mount_point+"/boot") != 0:
             logger.error("remove_old_bootloader(): Failed to unmount "+_os
                          + "'s /boot partition! Continuing anyway...")
 
-    #Tear down chroot if needed.
+    #Release the chroot. It is kept set up for the next operation.
     if use_chroot:
-        if CoreTools.teardown_chroot(mount_point=mount_point) != 0:
-            logger.error("remove_old_bootloader(): Failed to remove chroot at "+mount_point
-                         + "! Attempting to continue anyway...")
+        CoreTools.release_chroot(mount_point)
 
-    #unmount partition if needed.
-    if unmount_after:
-        if CoreTools.unmount(mount_point) != 0:
+    #Release the partition. It's kept mounted until WxFixBoot exits, in case it's needed again.
+    if use_chroot:
+        if CoreTools.release_mount(OS_INFO[_os]["Partition"], mount_point) != 0:
             logger.error("remove_old_bootloader(): Couldn't unmount "+mount_point
                          + "! Continuing anyway...")
 
@@ -404,7 +432,7 @@ def install_new_bootloader(_os):
     #If this is the current OS, let the installer functions know that we aren't using chroot.
     if OS_INFO[_os]["IsCurrentOS"]:
         logger.debug("install_new_bootloader(): Modifying current OS so not using chroot...")
-        use_chroot, unmount_after, mount_point = (False, False, "")
+        use_chroot, mount_point = (False, "")
 
     #Otherwise, setup the chroot and everything else first, and tell them we are using chroot,
     #and pass the mountpoint to them.
@@ -413,26 +441,23 @@ def install_new_bootloader(_os):
         use_chroot = True
         mount_point = "/mnt/wxfixboot/mountpoints"+OS_INFO[_os]["Partition"]
 
-        #Check if the partition is mounted.
-        unmount_after = not CoreTools.is_mounted(OS_INFO[_os]["Partition"], mount_point)
-
-        if unmount_after:
-            if CoreTools.mount_partition(partition=OS_INFO[_os]["Partition"],
-                                         mount_point=mount_point) != 0:
-                logger.error("install_new_bootloader(): Failed to mount "+OS_INFO[_os]["Partition"]
-                             + "! Warn the user and skip this OS.")
+        #Mount the partition, or reuse the mount if it's still there from earlier.
+        if CoreTools.acquire_mount(partition=OS_INFO[_os]["Partition"],
+                                   mount_point=mount_point) != 0:
+            logger.error("install_new_bootloader(): Failed to mount "+OS_INFO[_os]["Partition"]
+                         + "! Warn the user and skip this OS.")
 
-                DialogTools.show_msg_dlg(kind="error",
-                                         message="WxFixBoot failed to mount the partition "
-                                         + "containing "+_os+"! Bootloader installation cannot "
-                                         + "continue! This may leave your system, or this OS, in "
-                                         + "an unbootable state. Please close any open programs, "
-                                         + "then try again when prompted.")
+            DialogTools.show_msg_dlg(kind="error",
+                                     message="WxFixBoot failed to mount the partition "
+                                     + "containing "+_os+"! Bootloader installation cannot "
+                                     + "continue! This may leave your system, or this OS, in "
+                                     + "an unbootable state. Please close any open programs, "
+                                     + "then try again when prompted.")
 
-                return False
+            return False
 
         #Set up chroot.
-        if CoreTools.setup_chroot(mount_point=mount_point) != 0:
+        if CoreTools.acquire_chroot(mount_point=mount_point) != 0:
             logger.error("install_new_bootloader(): Failed to set up chroot at "+mount_point
                          + "! Warning user and giving up...")
 
@@ -440,12 +465,14 @@ def install_new_bootloader(_os):
                                      message="WxFixBoot failed to set up a chroot for "
                                      + _os+"! Giving up. You will be prompted to try again if "
                                      + "you wish.")
+
+            release_os_mounts(_os, mount_point, chroot=False)
             return False
 
     #If there's a seperate /boot partition for this OS, make sure it's mounted.
     if OS_INFO[_os]["BootPartition"] != "Unknown":
-        if CoreTools.mount_partition(partition=OS_INFO[_os]["BootPartition"],
-                                     mount_point=mount_point+"/boot") != 0:
+        if CoreTools.acquire_mount(partition=OS_INFO[_os]["BootPartition"],
+                                   mount_point=mount_point+"/boot") != 0:
             logger.error("remove_old_bootloader(): Failed to mount "
                          + OS_INFO[_os]["BootPartition"]+"! Warn the user and skip this OS.")
 
@@ -454,6 +481,7 @@ def install_new_bootloader(_os):
                                      + "containing "+_os+"'s /boot partition! Giving up. "
                                      + "You will be prompted to try again if you wish.")
 
+            release_os_mounts(_os, mount_point)
             return False
 
     #Update the package lists.
@@ -466,14 +494,27 @@ def install_new_bootloader(_os):
     if use_chroot:
         cmd = "chroot "+mount_point+" "+cmd
 
-    if CoreTools.start_process(cmd, privileged=True) not in (0, 100):
+    retval = CoreTools.start_process(cmd, privileged=True, timeout=CoreTools.NETWORK_TIMEOUT)
+
+    if retval == CoreTools.CANCELLED_RETVAL:
+        release_os_mounts(_os, mount_point, boot=OS_INFO[_os]["BootPartition"] != "Unknown")
+        return False
+
+    if retval not in (0, 100):
         logger.error("install_new_bootloader(): Failed to Update the Package Information! "
                      + "Continuing anyway...")
 
+        if retval == CoreTools.TIMEOUT_RETVAL:
+            reason = " It took too long, so check your internet connection."
+
+        else:
+            reason = ""
+
         DialogTools.show_msg_dlg(kind="error", message="WxfixBoot failed to update "+_os
-                                 + "'s package information! Giving up. You will be prompted "
-                                 + "to try again if you wish.")
+                                 + "'s package information!"+reason+" Giving up. You will be "
+                                 + "prompted to try again if you wish.")
 
+        release_os_mounts(_os, mount_point, boot=OS_INFO[_os]["BootPartition"] != "Unknown")
         return False
 
     wx.CallAfter(wx.GetApp().TopWindow.update_current_operation_text,
@@ -517,8 +558,8 @@ def install_new_bootloader(_os):
         logger.info("install_new_bootloader(): Installing GRUB-UEFI...")
 
         #Mount the UEFI partition at mount_point/boot/efi.
-        if CoreTools.mount_partition(partition=OS_INFO[_os]["EFIPartition"],
-                                     mount_point=mount_point+"/boot/efi") != 0:
+        if CoreTools.acquire_mount(partition=OS_INFO[_os]["EFIPartition"],
+                                   mount_point=mount_point+"/boot/efi") != 0:
 
             logger.error("install_new_bootloader(): Failed to mount "+OS_INFO[_os]["EFIPartition"]
                          + " to "+mount_point+"/boot/efi! Aborting bootloader installation and "
@@ -529,6 +570,9 @@ def install_new_bootloader(_os):
                                      + _os+"'s EFI partition! Giving up. You will be prompted to "
                                      + "try again if you wish.")
 
+            release_os_mounts(_os, mount_point,
+                              boot=OS_INFO[_os]["BootPartition"] != "Unknown")
+
             return False
 
         if OS_INFO[_os]["PackageManager"] == "apt-get":
@@ -547,30 +591,27 @@ def install_new_bootloader(_os):
         DialogTools.show_msg_dlg(kind="error", message="WxfixBoot failed to install "+_os
                                  + "'s new bootloader! Continuing anyway...")
 
-    #If there's a seperate EFI partition for this OS, make sure it's unmounted before removing
-    #the chroot.
-    if OS_INFO[_os]["EFIPartition"] != "Unknown":
-        if CoreTools.unmount(mount_point+"/boot/efi") != 0:
+    #If we mounted the EFI partition for GRUB-UEFI, release it before removing the chroot.
+    if BOOTLOADER_INFO[_os]["Settings"]["NewBootloader"] == "GRUB-UEFI":
+        if CoreTools.release_mount(OS_INFO[_os]["EFIPartition"],
+                                   mount_point+"/boot/efi") != 0:
             logger.error("install_new_bootloader(): Failed to unmount "+mount_point
                          + "/boot/efi! This probably doesn't matter...")
 
     #If there's a seperate /boot partition for this OS, make sure it's unmounted before
     #removing the chroot.
     if OS_INFO[_os]["BootPartition"] != "Unknown":
-        if CoreTools.unmount(mount_point+"/boot") != 0:
+        if CoreTools.release_mount(OS_INFO[_os]["BootPartition"], mount_point+"/boot") != 0:
             logger.error("install_new_bootloader(): Failed to unmount "+mount_point
                          + "/boot! This probably doesn't matter...")
 
     if use_chroot:
-        logger.debug("install_new_bootloader(): Removing chroot...")
-
-        #Tear down chroot.
-        if CoreTools.teardown_chroot(mount_point=mount_point) != 0:
-            logger.error("install_new_bootloader(): Failed to remove chroot at "+mount_point
-                         + "! Attempting to continue anyway...")
+        #Release the chroot. It is kept set up for the next operation.
+        CoreTools.release_chroot(mount_point)
 
-    if unmount_after:
-        if CoreTools.unmount(mount_point) != 0:
+    #Release the partition. It's kept mounted until WxFixBoot exits, in case it's needed again.
+    if use_chroot:
+        if CoreTools.release_mount(OS_INFO[_os]["Partition"], mount_point) != 0:
             logger.error("install_new_bootloader(): Failed to unmount "+mount_point
                          + "! Continuing anyway...")
 
@@ -627,28 +668,24 @@ def set_new_bootloader_config(_os):
         logger.debug("set_new_bootloader_config(): We're modifying the current OS...")
         #If so, make sure this will work for this OS too, and avoid setting mountpoint, so the
         #config instructions below look in the right place for the config files.
-        use_chroot, unmount_after, mount_point = (False, False, "")
+        use_chroot, mount_point = (False, "")
 
     else:
         logger.debug("set_new_bootloader_config(): We're modifying another OS...")
         use_chroot = True
         mount_point = "/mnt/wxfixboot/mountpoints"+OS_INFO[_os]["Partition"]
 
-        #Check if the partition is mounted.
-        unmount_after = not CoreTools.is_mounted(OS_INFO[_os]["Partition"], mount_point)
-
-        if unmount_after:
-            #Mount the partition.
-            if CoreTools.mount_partition(partition=OS_INFO[_os]["Partition"],
-                                         mount_point=mount_point) != 0:
-                #Ignore this partition.
-                logger.warning("set_new_bootloader_config(): Failed to mount "
-                               + OS_INFO[_os]["Partition"]+"! Giving up...")
+        #Mount the partition, or reuse the mount if it's still there from earlier.
+        if CoreTools.acquire_mount(partition=OS_INFO[_os]["Partition"],
+                                   mount_point=mount_point) != 0:
+            #Ignore this partition.
+            logger.warning("set_new_bootloader_config(): Failed to mount "
+                           + OS_INFO[_os]["Partition"]+"! Giving up...")
 
-                return False
+            return False
 
         #Set up chroot.
-        if CoreTools.setup_chroot(mount_point=mount_point) != 0:
+        if CoreTools.acquire_chroot(mount_point=mount_point) != 0:
             logger.error("set_new_bootloader_config(): Failed to set up chroot at "+mount_point
                          + "! Giving up...")
 
@@ -657,26 +694,24 @@ def set_new_bootloader_config(_os):
                                      + "! Giving up. You will be prompted to try again if "
                                      + "you wish.")
 
+            release_os_mounts(_os, mount_point, chroot=False)
             return False
 
         wx.CallAfter(wx.GetApp().TopWindow.update_current_progress, 81)
 
     #Mount a /boot partition if it exists.
     if OS_INFO[_os]["BootPartition"] != "Unknown":
-        if CoreTools.mount_partition(OS_INFO[_os]["BootPartition"], mount_point+"/boot") != 0:
+        if CoreTools.acquire_mount(OS_INFO[_os]["BootPartition"], mount_point+"/boot") != 0:
             logger.error("set_new_bootloader_config(): Failed to mount "+_os
                          + "'s /boot partition! Skipping bootloader config setting for this OS.")
 
-            if not OS_INFO[_os]["IsCurrentOS"]:
-                CoreTools.teardown_chroot(mount_point)
-                CoreTools.unmount(mount_point)
-
+            release_os_mounts(_os, mount_point)
             return False
 
     #If there's a seperate EFI partition for this OS, make sure it's mounted.
     if OS_INFO[_os]["EFIPartition"] != "Unknown":
-        if CoreTools.mount_partition(partition=OS_INFO[_os]["EFIPartition"],
-                                     mount_point=mount_point+"/boot/efi") != 0:
+        if CoreTools.acquire_mount(partition=OS_INFO[_os]["EFIPartition"],
+                                   mount_point=mount_point+"/boot/efi") != 0:
             logger.error("remove_old_bootloader(): Failed to mount "+OS_INFO[_os]["EFIPartition"]
                          + "! Warn the user and skip this OS.")
 
@@ -685,6 +720,9 @@ def set_new_bootloader_config(_os):
                                      + _os+"'s EFI partition! Giving up. You will be prompted to "
                                      + "try again if you wish.")
 
+            release_os_mounts(_os, mount_point,
+                              boot=OS_INFO[_os]["BootPartition"] != "Unknown")
+
             return False
 
     #On GRUB2, get the new menuentries so we can set the default OS.
@@ -701,6 +739,10 @@ def set_new_bootloader_config(_os):
         BootloaderConfigObtainingTools.parse_grub2_menu_data(menu_data="",
                                                              mount_point=mount_point)[1]
 
+        BOOTLOADER_INFO[_os]["NewMenuIndex"] = \
+        BootloaderConfigObtainingTools.build_grub2_menu_index(BOOTLOADER_INFO[_os]
+                                                              ["NewMenuEntries"])
+
     #Look for the configuration file, based on which SetConfig() function we're about to run.
     if BOOTLOADER_INFO[_os]["Settings"]["NewBootloader"] in ("GRUB2", "GRUB-UEFI"):
         #Check mount_point/etc/default/grub exists.
@@ -715,8 +757,8 @@ def set_new_bootloader_config(_os):
 
         if BOOTLOADER_INFO[_os]["Settings"]["NewBootloader"] == "GRUB-UEFI":
             #Mount the UEFI partition at mount_point/boot/efi.
-            if CoreTools.mount_partition(partition=OS_INFO[_os]["EFIPartition"],
-                                         mount_point=mount_point+"/boot/efi") != 0:
+            if CoreTools.acquire_mount(partition=OS_INFO[_os]["EFIPartition"],
+                                       mount_point=mount_point+"/boot/efi") != 0:
                 logger.error("set_new_bootloader_config(): Couldn't mount EFI partition "
                              + OS_INFO[_os]["EFIPartition"]+" to install bootloader! Giving up "
                              + "and warning user...")
@@ -725,6 +767,10 @@ def set_new_bootloader_config(_os):
                                          + "'s EFI partition! You will now be promtped to give "
                                          + "up or try again.")
 
+                release_os_mounts(_os, mount_point,
+                                  boot=OS_INFO[_os]["BootPartition"] != "Unknown",
+                                  efi=OS_INFO[_os]["EFIPartition"] != "Unknown")
+
                 return False
 
             #Now Install GRUB-UEFI to the UEFI Partition.
@@ -782,7 +828,7 @@ def set_new_bootloader_config(_os):
                 grub_dir = mount_point+"/boot/efi/EFI/fedora"
 
             #Correct the commands if needed.
-            config = CoreTools.read_privileged_file(grub_dir+"/grub.cfg")
+            config = BootloaderConfigObtainingTools.get_grub2_file(grub_dir+"/grub.cfg")[0]
 
             new_config = []
 
@@ -806,11 +852,7 @@ def set_new_bootloader_config(_os):
 
             #Write the fixed config.
             CoreTools.write_privileged_file(grub_dir+"/grub.cfg", ''.join(new_config))
-
-            #unmount the EFI partition.
-            if CoreTools.unmount(OS_INFO[_os]["EFIPartition"]) != 0:
-                logger.error("set_new_bootloader_config(): Couldn't unmount EFI partition! "
-                             + "This probably won't matter, so we'll continue anyway...")
+            BootloaderConfigObtainingTools.invalidate_grub2_config_cache(grub_dir+"/grub.cfg")
 
             logger.info("set_new_bootloader_config(): Done!")
 
@@ -834,7 +876,7 @@ def set_new_bootloader_config(_os):
                 grub_dir = mount_point+"/boot/grub2"
 
             #Correct the commands if needed.
-            config = CoreTools.read_privileged_file(grub_dir+"/grub.cfg")
+            config = BootloaderConfigObtainingTools.get_grub2_file(grub_dir+"/grub.cfg")[0]
 
             new_config = []
 
@@ -844,31 +886,38 @@ def set_new_bootloader_config(_os):
 
             #Write the fixed config.
             CoreTools.write_privileged_file(grub_dir+"/grub.cfg", ''.join(new_config))
+            BootloaderConfigObtainingTools.invalidate_grub2_config_cache(grub_dir+"/grub.cfg")
 
             logger.info("set_new_bootloader_config(): Done!")
 
+        #Release the EFI partition we mounted to install GRUB-UEFI.
+        if BOOTLOADER_INFO[_os]["Settings"]["NewBootloader"] == "GRUB-UEFI":
+            if CoreTools.release_mount(OS_INFO[_os]["EFIPartition"],
+                                       mount_point+"/boot/efi") != 0:
+                logger.error("set_new_bootloader_config(): Couldn't unmount EFI partition! "
+                             + "This probably won't matter, so we'll continue anyway...")
+
     #If there's a seperate EFI partition for this OS, make sure it's unmounted before
     #removing the chroot.
     if OS_INFO[_os]["EFIPartition"] != "Unknown":
-        if CoreTools.unmount(mount_point+"/boot/efi") != 0:
+        if CoreTools.release_mount(OS_INFO[_os]["EFIPartition"],
+                                   mount_point+"/boot/efi") != 0:
             logger.error("set_new_bootloader_config(): Failed to unmount "+mount_point
                          + "/boot/efi! This probably doesn't matter...")
 
     #unmount a /boot partition if it exists.
     if OS_INFO[_os]["BootPartition"] != "Unknown":
-        if CoreTools.unmount(mount_point+"/boot") != 0:
+        if CoreTools.release_mount(OS_INFO[_os]["BootPartition"], mount_point+"/boot") != 0:
             logger.error("set_new_bootloader_config(): Failed to unmount "+_os
                          + "'s /boot partition! Continuing anyway...")
 
-    #Tear down chroot if needed.
+    #Release the chroot. It is kept set up for the next operation.
     if use_chroot:
-        if CoreTools.teardown_chroot(mount_point=mount_point) != 0:
-            logger.error("set_new_bootloader_config(): Failed to remove chroot at "
-                         + mount_point+"! Attempting to continue anyway...")
+        CoreTools.release_chroot(mount_point)
 
-    #unmount the partition if needed.
-    if unmount_after:
-        if CoreTools.unmount(mount_point) != 0:
+    #Release the partition. It's kept mounted until WxFixBoot exits, in case it's needed again.
+    if use_chroot:
+        if CoreTools.release_mount(OS_INFO[_os]["Partition"], mount_point) != 0:
             logger.error("set_new_bootloader_config(): Failed to unmount "+mount_point
                          + "! Continuing anyway...")
 
@@ -24,7 +24,6 @@ This module contains the core functions used during WxFixBoot's startup procedur
 """
 
 #Import modules.
-import os
 import sys
 import logging
 
@@ -32,9 +31,14 @@ import logging
 sys.path.append('../..') #Need to be able to import the Tools module from here.
 
 import Tools.coretools as CoreTools #pylint: disable=wrong-import-position
+import Tools.devicetools as DeviceTools #pylint: disable=wrong-import-position
 import Tools.dialogtools as DialogTools #pylint: disable=wrong-import-position
 from Tools.dictionaries import * #pylint: disable=wrong-import-position
 
+from . import getbootloaderconfigtools as BootloaderConfigObtainingTools #pylint: disable=wrong-import-position
+from . import osidentity as OSIdentityTools #pylint: disable=wrong-import-position
+from . import packages as PackageTools #pylint: disable=wrong-import-position
+
 #Set up logging.
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.getLogger("WxFixBoot").getEffectiveLevel())
@@ -147,95 +151,61 @@ def make_bootloaderinfo_entry_for_windows(the_os):
     BOOTLOADER_INFO[the_os]["GUIState"]["RestoreBootloaderCheckBoxState"] = True
     BOOTLOADER_INFO[the_os]["GUIState"]["RestoreBootloaderChoiceState"] = False
 
-def has_windows_9x(mount_point):
-    """Try to find a Windows 9X installation. Return True if found, False if not."""
-    return os.path.isdir(mount_point+"/WINDOWS") and os.path.exists(mount_point+"/AUTOEXEC.BAT") \
-           and os.path.exists(mount_point+"/COMMAND.COM") \
-           and os.path.isdir(mount_point+"/My Documents")
-
-def has_windows_xp(mount_point):
-    """Try to find a Windows XP installation. Return True if found, False if not."""
-    return os.path.isfile(mount_point+"/boot.ini") and os.path.isfile(mount_point+"/ntldr") \
-           and os.path.isfile(mount_point+"/NTDETECT.COM") \
-           and os.path.isdir(mount_point+"/Documents and Settings")
-
-def has_windows_vista(mount_point):
-    """Try to find a Windows Vista installation. Return True if found, False if not."""
-    #Read /Windows/System32/license.rtf and search for "VISTA".
-    try:
-        with open(mount_point+"/Windows/System32/license.rtf") as file:
-            for line in file:
-                if "VISTA" in line.upper():
-                    return True
-
-    except (IOError, OSError):
-        return False
-
-    return False
-
-def has_windows_7(mount_point):
-    """Try to find a Windows 7 installation. Return True if found, False if not."""
-    #Read /Windows/System32/license.rtf and search for "WINDOWS 7".
-    try:
-        with open(mount_point+"/Windows/System32/license.rtf") as file:
-            for line in file:
-                if "WINDOWS 7" in line.upper():
-                    return True
-
-    except (IOError, OSError):
-        return False
-
-    return False
-
-def has_windows_8(mount_point):
-    """Try to find a Windows 8/8.1 installation. Return True if found, False if not."""
-    #Read /Windows/System32/license.rtf and search for "WINDOWS 8".
-    try:
-        with open(mount_point+"/Windows/System32/license.rtf") as file:
-            for line in file:
-                if "WINDOWS 8" in line.upper():
-                    return True
-
-    except (IOError, OSError):
-        return False
-
-    return False
-
-def has_windows_10(mount_point):
-    """Try to find a Windows 10 installation. Return True if found, False if not."""
-    #Read /Windows/System32/license.rtf and search for "BINDING ARBITRATION CLAUSE".
-    #(Windows version not found here, but this note is at the start of the license)
-    try:
-        with open(mount_point+"/Windows/System32/license.rtf") as file:
-            for line in file:
-                #If this is Windows 8/8.1, this will come up first.
-                if "WINDOWS 8" in line.upper():
-                    return False
-
-                elif "BINDING ARBITRATION CLAUSE" in line.upper():
-                    return True
-
-    except (IOError, OSError):
-        return False
-
-    return False
+def get_os_partitions(os_name):
+    """
+    Return the partitions an OS in OS_INFO can be matched with, as (partition, kind) tuples,
+    where kind is "Partition", "BootPartition" or "EFIPartition". Each partition is given by
+    device name, and then by UUID if we know it, and unknown partitions are skipped.
+    """
+
+    partitions = []
+
+    for kind in ("Partition", "BootPartition", "EFIPartition"):
+        partition = OS_INFO[os_name][kind]
+
+        if partition == "Unknown":
+            continue
+
+        partitions.append((partition, kind))
+
+        if partition in DISK_INFO and DISK_INFO[partition]["UUID"] != "Unknown":
+            partitions.append((DISK_INFO[partition]["UUID"], kind))
+
+    return partitions
+
+def build_os_index():
+    """
+    Index the OSs in OS_INFO by their partitions, boot partitions, and EFI partitions (see
+    get_os_partitions()), so a partition can be matched to an OS with one lookup. Partitions
+    can be shared (EFI partitions usually are), so each one has a list of (OS name, kind)
+    tuples, in the order we'd match them in.
+    """
+
+    os_index = {}
+
+    for os_name in OS_INFO:
+        for partition, kind in get_os_partitions(os_name):
+            os_index.setdefault(partition, []).append((os_name, kind))
+
+    return os_index
 
 def get_defaultoss_partition(the_os):
     """Get the partition for the given OS's default OS to boot"""
     default_boot_device = "Unknown"
 
-    for menu in BOOTLOADER_INFO[the_os]["MenuEntries"]:
-        for entry in BOOTLOADER_INFO[the_os]["MenuEntries"][menu]:
-            if entry == BOOTLOADER_INFO[the_os]["BLSpecificDefaultOS"]:
-                default_boot_device = \
-                BOOTLOADER_INFO[the_os]["MenuEntries"][menu][entry]["Partition"]
+    #Use the menu index if we made one when we read the menu entries.
+    if "MenuIndex" not in BOOTLOADER_INFO[the_os]:
+        BOOTLOADER_INFO[the_os]["MenuIndex"] = \
+        BootloaderConfigObtainingTools.build_grub2_menu_index(BOOTLOADER_INFO[the_os]
+                                                              ["MenuEntries"])
 
-                logger.info("get_defaultoss_partition(): Found Default OS's partition...")
-                break
+    found = BOOTLOADER_INFO[the_os]["MenuIndex"]["Titles"].get(BOOTLOADER_INFO[the_os]
+                                                               ["BLSpecificDefaultOS"])
 
-        #Break out if possible.
-        if default_boot_device != "Unknown":
-            break
+    if found is not None:
+        menu, entry = found
+        default_boot_device = BOOTLOADER_INFO[the_os]["MenuEntries"][menu][entry]["Partition"]
+        logger.info("get_defaultoss_partition(): Found Default OS's partition...")
 
     if default_boot_device != "Unknown":
         BOOTLOADER_INFO[the_os]["DefaultBootDevice"] = default_boot_device
@@ -248,56 +218,62 @@ def get_defaultoss_partition(the_os):
         else:
             BOOTLOADER_INFO[the_os]["DefaultBootDeviceUUID"] = "Unknown"
 
-def match_partition_to_os(the_os):
-    """Matches the default boot device (in a menu entry) to an OS in OS_INFO"""
+def match_partition_to_os(the_os, os_index=None):
+    """
+    Matches the default boot device (in a menu entry) to an OS in OS_INFO, using an index
+    from build_os_index(), which is made here if it isn't given.
+    """
+
     BOOTLOADER_INFO[the_os]["DefaultBootDeviceMatchedWith"] = "Unknown"
     BOOTLOADER_INFO[the_os]["DefaultOS"] = "Unknown"
 
-    for os_name in OS_INFO:
-        if os_name not in BOOTLOADER_INFO:
-            continue
+    if os_index is None:
+        os_index = build_os_index()
 
-        if "DefaultBootDeviceUUID" in BOOTLOADER_INFO[the_os]:
-            disk = BOOTLOADER_INFO[the_os]["DefaultBootDeviceUUID"]
+    if "DefaultBootDeviceUUID" in BOOTLOADER_INFO[the_os]:
+        disk = BOOTLOADER_INFO[the_os]["DefaultBootDeviceUUID"]
 
-        else:
-            disk = BOOTLOADER_INFO[the_os]["DefaultBootDevice"]
+    else:
+        disk = BOOTLOADER_INFO[the_os]["DefaultBootDevice"]
 
-        if OS_INFO[os_name]["Partition"] != "Unknown" \
-            and disk in (OS_INFO[os_name]["Partition"],
-                         DISK_INFO[OS_INFO[os_name]["Partition"]]["UUID"]):
+    for os_name, kind in os_index.get(disk, ()):
+        if os_name not in BOOTLOADER_INFO:
+            continue
 
-            #Set it.
-            BOOTLOADER_INFO[the_os]["DefaultBootDeviceMatchedWith"] = "Partition"
-            BOOTLOADER_INFO[the_os]["DefaultOS"] = os_name
-            logger.info("match_partition_to_os(): Successfully matched with the partition. "
-                        + "The Default OS is "+os_name+"...")
+        #Set it.
+        BOOTLOADER_INFO[the_os]["DefaultBootDeviceMatchedWith"] = kind
+        BOOTLOADER_INFO[the_os]["DefaultOS"] = os_name
+        logger.info("match_partition_to_os(): Successfully matched with the "
+                    + {"Partition": "partition", "BootPartition": "boot partition",
+                       "EFIPartition": "EFI partition"}[kind]+". The Default OS is "+os_name
+                    + "...")
 
-            break
+        break
 
-        elif OS_INFO[os_name]["BootPartition"] != "Unknown" \
-            and disk in (OS_INFO[os_name]["BootPartition"],
-                         DISK_INFO[OS_INFO[os_name]["BootPartition"]]["UUID"]):
+def find_default_boot_device(the_os, default_os):
+    """
+    Find the partition that the given OS's bootloader boots the given default OS from, by
+    looking for it in the main menu with the menu index. If the bootloader has no menu entry
+    for it, the default OS's own partition is returned instead.
+    """
 
-            #Set it.
-            BOOTLOADER_INFO[the_os]["DefaultBootDeviceMatchedWith"] = "BootPartition"
-            BOOTLOADER_INFO[the_os]["DefaultOS"] = os_name
-            logger.info("match_partition_to_os(): Successfully matched with the boot partition. "
-                        + "The Default OS is "+os_name+"...")
+    if "MenuEntries" not in BOOTLOADER_INFO[the_os]:
+        return OS_INFO[default_os]["Partition"]
 
-            break
+    if "MenuIndex" not in BOOTLOADER_INFO[the_os]:
+        BOOTLOADER_INFO[the_os]["MenuIndex"] = \
+        BootloaderConfigObtainingTools.build_grub2_menu_index(BOOTLOADER_INFO[the_os]
+                                                              ["MenuEntries"])
 
-        elif OS_INFO[os_name]["EFIPartition"] != "Unknown" \
-            and disk in (OS_INFO[os_name]["EFIPartition"],
-                         DISK_INFO[OS_INFO[os_name]["EFIPartition"]]["UUID"]):
+    found = BootloaderConfigObtainingTools.find_grub2_menu_entry(
+        BOOTLOADER_INFO[the_os]["MenuIndex"],
+        [partition for partition, _kind in get_os_partitions(default_os)])
 
-            #Set it.
-            BOOTLOADER_INFO[the_os]["DefaultBootDeviceMatchedWith"] = "EFIPartition"
-            BOOTLOADER_INFO[the_os]["DefaultOS"] = os_name
-            logger.info("match_partition_to_os(): Successfully matched with the EFI partition. "
-                        + "The Default OS is "+os_name+"...")
+    if found is None:
+        return OS_INFO[default_os]["Partition"]
 
-            break
+    menu, entry = found
+    return BOOTLOADER_INFO[the_os]["MenuEntries"][menu][entry]["Partition"]
 
 def determine_package_manager(apt_cmd, dnf_cmd):
     """
@@ -306,9 +282,11 @@ def determine_package_manager(apt_cmd, dnf_cmd):
 
     package_manager = "Unknown"
 
-    for cmd in (apt_cmd, dnf_cmd):
-        retval = CoreTools.start_process(cmd, show_output=False, privileged=True)
+    #Look for both at once, but still prefer apt if both are found.
+    retvals = CoreTools.start_processes((apt_cmd, dnf_cmd), show_output=False, privileged=True,
+                                        idempotent=True)
 
+    for cmd, retval in zip((apt_cmd, dnf_cmd), retvals):
         if retval != 0:
             if cmd == apt_cmd:
                 #Couldn't find apt!
@@ -349,42 +327,84 @@ def look_for_bootloaders_on_partition(the_os, package_manager, mount_point, usin
     bootloader = "Unknown"
     available_bootloaders = []
 
-    #Okay, let's run a command in the chroot that was set up in FindBootloaderRemovalOSs(),
-    #depending on which package manager this OS uses, and which bootloader is currently installed.
+    #Look for them in a specific order to be as fast a possible and to avoid false positives.
     if package_manager == "apt-get":
-        cmd = "dpkg --get-selections"
+        bootloader_packages = ("grub-efi", "grub-pc")
+        package_dictionary = {"grub-efi": "GRUB-UEFI", "grub-pc": "GRUB2"}
+        search_cmds = ["apt-cache search "+package for package in bootloader_packages]
 
     else:
-        cmd = "dnf -C list installed"
+        bootloader_packages = ("grub2-efi-x64", "grub2-pc")
+        package_dictionary = {"grub2-efi-x64": "GRUB-UEFI", "grub2-pc": "GRUB2"}
+        search_cmds = ["dnf -C search "+package for package in bootloader_packages]
 
+    #Read the package database and package lists directly if we can. This is much faster than
+    #running dpkg, apt-cache or dnf in a chroot.
     if using_chroot:
-        cmd = "chroot "+mount_point+" "+cmd
+        root = mount_point
 
-    output = CoreTools.start_process(cmd, show_output=False, return_output=True,
-                                     privileged=True)[1].split("\n")
+    else:
+        root = "/"
 
-    #Look for them in a specific order to be as fast a possible and to avoid false positives.
+    installed_packages = PackageTools.get_installed_packages(root, package_manager,
+                                                             bootloader_packages)
+
+    available_packages = PackageTools.get_available_packages(root, package_manager,
+                                                             bootloader_packages)
+
+    #Otherwise, run commands in the chroot that was set up in FindBootloaderRemovalOSs(),
+    #depending on which package manager this OS uses.
+    cmds = []
+
+    if installed_packages is None:
+        if package_manager == "apt-get":
+            cmds.append("dpkg --get-selections")
+
+        else:
+            cmds.append("dnf -C list installed")
+
+    if available_packages is None:
+        cmds += search_cmds
+
+    if using_chroot:
+        cmds = ["chroot "+mount_point+" "+_cmd for _cmd in cmds]
+
+    #Run the queries all at once. They only read from the package databases, but dnf takes
+    #a lock even for those, so only do this with apt.
     if package_manager == "apt-get":
-        bootloader_packages = ("grub-efi", "grub-pc")
-        package_dictionary = {"grub-efi": "GRUB-UEFI", "grub-pc": "GRUB2"}
+        max_concurrent = len(cmds)
 
     else:
-        bootloader_packages = ("grub2-efi-x64", "grub2-pc")
-        package_dictionary = {"grub2-efi-x64": "GRUB-UEFI", "grub2-pc": "GRUB2"}
+        max_concurrent = 1
 
-    for package in bootloader_packages:
-        found = False
+    #The list of installed packages can be huge, so capture the output rather than making
+    #a string of it, and scan it once for all of the bootloader packages.
+    outputs = []
 
-        for line in output:
-            if package in line:
-                if package_manager == "apt-get":
-                    if line.split()[1] != "install":
-                        continue
+    if cmds:
+        outputs = [result[1] for result in
+                   CoreTools.start_processes(cmds, max_concurrent=max_concurrent,
+                                             show_output=False, privileged=True,
+                                             capture_output=True)]
 
-                found = True
-                break
+    if installed_packages is None:
+        installed_packages = set()
+
+        with outputs.pop(0) as output:
+            for line in output.lines():
+                for package in bootloader_packages:
+                    if package in line and package not in installed_packages:
+                        if package_manager == "apt-get":
+                            if line.split()[1] != "install":
+                                continue
+
+                        installed_packages.add(package)
 
-        if found:
+                if len(installed_packages) == len(bootloader_packages):
+                    break
+
+    for package in bootloader_packages:
+        if package in installed_packages:
             #On Fedora, GRUB2 for BIOS and GRUB2 for UEFI are both installed by default!
             #To figure out which way we're booting (and which is being used), see whether
             #we are booting in EFI mode or not.
@@ -400,34 +420,31 @@ def look_for_bootloaders_on_partition(the_os, package_manager, mount_point, usin
             break
 
     #Look for any other bootloaders that might be available for installation.
-    for package in bootloader_packages:
-        if package_manager == "apt-get":
-            cmd = "apt-cache search "+package
+    if available_packages is None:
+        available_packages = set()
 
-        else:
-            cmd = "dnf -C search "+package
-
-        if using_chroot:
-            cmd = "chroot "+mount_point+" "+cmd
+        for package, output in zip(bootloader_packages, outputs):
+            with output:
+                #Only look in the package name.
+                for line in output.lines():
+                    try:
+                        if package_manager == "apt-get":
+                            correct_section = line.split()[0]
 
-        output = CoreTools.start_process(cmd, show_output=False, return_output=True,
-                                         privileged=True)[1].split("\n")
+                        else:
+                            correct_section = line.split()[0].split(".")[0]
 
-        #Only look in the package name.
-        for line in output:
-            try:
-                if package_manager == "apt-get":
-                    correct_section = line.split()[0]
+                    except IndexError:
+                        continue
 
-                else:
-                    correct_section = line.split()[0].split(".")[0]
+                    if package == correct_section:
+                        available_packages.add(package)
 
-            except IndexError:
-                continue
+    for package in bootloader_packages:
+        if package in available_packages \
+            and package_dictionary[package] not in available_bootloaders:
 
-            if package == correct_section:
-                if package_dictionary[package] not in available_bootloaders:
-                    available_bootloaders.append(package_dictionary[package])
+            available_bootloaders.append(package_dictionary[package])
 
     #Log info.
     available_bootloaders.sort()
@@ -466,16 +483,11 @@ def get_fstab_info(mount_point, os_name):
 
             temp = line.split()[0]
 
-            #If we have a UUID, convert it into a device node.
-            if "UUID=" in temp:
-                uuid = temp.split("=")[1]
-                logger.debug("get_fstab_info(): Found UUID "+uuid
-                             + ". Trying to find device name...")
+            #If we have a UUID, PARTUUID or label, convert it into a device node.
+            if "=" in temp:
+                logger.debug("get_fstab_info(): Found "+temp+". Trying to find device name...")
 
-                for disk in DISK_INFO:
-                    if DISK_INFO[disk]["UUID"] == uuid:
-                        temp = disk
-                        break
+                temp = DeviceTools.DEVICE_INDEX.canonical_or_same(temp)
 
             #In case we had a UUID with no match, check again before adding it to OS_INFO,
             #else ignore it.
@@ -508,6 +520,12 @@ def determine_os_architecture(mount_point):
     else:
         logger.info("determine_os_architecture(): Trying to find OS arch for Current OS...")
 
+    #Read it from the OS's binaries if we can. This is much faster than running commands.
+    os_architecture = OSIdentityTools.get_architecture(mount_point or "/")
+
+    if os_architecture is not None:
+        return os_architecture
+
     #Do setup.
     os_architecture = None
     cmd = "arch"
@@ -516,7 +534,8 @@ def determine_os_architecture(mount_point):
         if mount_point != "":
             cmd = "chroot "+mount_point+" "+cmd
 
-        retval, os_architecture = CoreTools.start_process(cmd, return_output=True, privileged=True)
+        retval, os_architecture = CoreTools.start_process(cmd, return_output=True, privileged=True,
+                                                          idempotent=True)
 
         #If the command failed, try a second approach.
         if retval != 0 and "arch" in cmd:
@@ -555,8 +574,8 @@ def get_os_name_with_lsb(partition, mount_point, is_current_os):
         logger.info("get_os_name_with_lsb(): OS isn't the currently running OS...")
         cmd = "chroot "+mount_point+" lsb_release -sd"
 
-    retval, output = CoreTools.start_process(cmd, show_output=False,
-                                             return_output=True, privileged=True)
+    retval, output = CoreTools.start_process(cmd, show_output=False, return_output=True,
+                                             privileged=True, idempotent=True)
 
     if retval != 0 or output == "":
         logger.error("get_os_name_with_lsb(): Couldn't get OS name! Returning None...")
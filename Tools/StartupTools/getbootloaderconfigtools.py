@@ -26,18 +26,44 @@ startup procedures.
 
 #Import modules
 import os
+import re
 import sys
+import hashlib
 import logging
+import threading
 
 #Import other modules.
 sys.path.append('../..') #Need to be able to import the Tools module from here.
 import Tools.coretools as CoreTools #pylint: disable=wrong-import-position
+import Tools.devicetools as DeviceTools #pylint: disable=wrong-import-position
 from Tools.dictionaries import DISK_INFO #pylint: disable=wrong-import-position
 
 #Set up logging.
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.getLogger("WxFixBoot").getEffectiveLevel())
 
+#Define global variables
+#Tokens in a GRUB2 config file: comments, command separators, and words, which can have
+#quoted strings and escaped characters in them. A quote that isn't closed takes the rest of
+#the line with it (see tokenize_grub2_line()).
+_GRUB2_WORD = re.compile(r"""(?:[^\s;'"\\]|\\.?|'[^']*'|"(?:[^"\\]|\\.)*")+""")
+_GRUB2_TOKEN = re.compile(r"#.*|;|"+_GRUB2_WORD.pattern+r"""|['"].*""")
+
+#Lines without any braces, double quotes, or escaped characters.
+_GRUB2_PLAIN_LINE = re.compile(r'[^{}"\\]*')
+
+#Escaped characters, and quoted strings in a word.
+_GRUB2_ESCAPED = re.compile(r"\\(.)")
+_GRUB2_QUOTED = re.compile(r'''\\(.)|'([^']*)'|"((?:[^"\\]|\\.)*)"''')
+
+#GRUB2 config files (grub.cfg and /etc/default/grub) we've already read and parsed, keyed by
+#path and parser. Each has the device, inode, size and modification time of the file, a hash
+#of its contents, its lines, and what the parser made of them, so a file only has to be read
+#and parsed again if it has changed. See get_grub2_file().
+GRUB2_CONFIG_CACHE = {}
+GRUB2_CONFIG_CACHE_LOCK = threading.Lock()
+GRUB2_CONFIG_CACHE_STATS = {"Hits": 0, "Misses": 0, "Invalidations": 0}
+
 def find_grub(os_partition, grub_version):
     """Find GRUB for the given OS."""
     logger.info("find_grub(): Looking for "+grub_version+"...")
@@ -70,176 +96,360 @@ def find_grub(os_partition, grub_version):
     logger.info("find_grub(): Didn't find "+grub_version+" on any likely disks...")
     return "Unknown"
 
-def parse_grub2_menu_data(menu_data="", mount_point="", menu_entries=None, menu_name="MainMenu",
-                          menu_ids=None, menu_id=""):
-    """Find and parse GRUB2 (EFI and BIOS) menu entries in the given line list"""
-    if menu_entries is None:
-        menu_entries = {}
+def find_grub2_config(mount_point):
+    """Find the directory with grub.cfg in it for the OS at the given mount point"""
+    grub_dir = ""
 
-    if menu_ids is None:
-        menu_ids = {}
+    #Find grub.cfg. (Ubuntu).
+    if os.path.isdir(mount_point+"/boot/grub"):
+        grub_dir = mount_point+"/boot/grub"
 
-    if menu_data != "":
-        logger.info("parse_grub2_menu_data(): Finding and parsing menu entries in given "
-                    + "menu data...")
+    #(Fedora, BIOS)
+    elif os.path.isdir(mount_point+"/boot/grub2"):
+        grub_dir = mount_point+"/boot/grub2"
 
-        grub_dir = ""
+    #(Fedora, EFI)
+    if os.path.isfile(grub_dir+"/grub.cfg") is False \
+        and os.path.isdir(mount_point+"/boot/efi/EFI/fedora"):
 
-    else:
-        logger.info("parse_grub2_menu_data(): Finding and opening GRUB config file...")
+        grub_dir = mount_point+"/boot/efi/EFI/fedora"
+
+    return grub_dir
+
+def get_file_signature(path):
+    """
+    Return the device, inode, size and modification time of the given file, or None if we
+    can't find them out (eg if we aren't allowed to).
+    """
+
+    try:
+        info = os.stat(path)
+
+    except OSError:
+        return None
+
+    return (info.st_dev, info.st_ino, info.st_size, info.st_mtime_ns)
 
-        #Find grub.cfg. (Ubuntu).
-        if os.path.isdir(mount_point+"/boot/grub"):
-            grub_dir = mount_point+"/boot/grub"
+def read_grub2_file(path):
+    """
+    Return the lines of the given GRUB2 config file, like CoreTools.read_privileged_file()
+    does. The file is read directly if we're allowed to, which is much quicker.
+    """
 
-        #(Fedora, BIOS)
-        elif os.path.isdir(mount_point+"/boot/grub2"):
-            grub_dir = mount_point+"/boot/grub2"
+    try:
+        with open(path, "rb") as config_file:
+            text = config_file.read().decode("UTF-8", errors="ignore").replace("\x00", "")
 
-        #(Fedora, EFI)
-        if os.path.isfile(grub_dir+"/grub.cfg") is False \
-            and os.path.isdir(mount_point+"/boot/efi/EFI/fedora"):
+    except OSError:
+        return CoreTools.read_privileged_file(path)
 
-            grub_dir = mount_point+"/boot/efi/EFI/fedora"
+    if text.endswith("\n"):
+        text = text[:-1]
 
-        #Process menu entries, and pass the entire contents of the menu entries file to the parser.
-        menu_data = CoreTools.read_privileged_file(grub_dir+"/grub.cfg")
+    return [line.rstrip("\r") for line in text.split("\n")]
 
-        logger.info("parse_grub2_menu_data(): Finding and parsing menu entries in "
-                    + grub_dir+"/grub.cfg...")
+def get_grub2_file(path, parser=None):
+    """
+    Return the lines of the given GRUB2 config file, and what the given parser function made of
+    them (None if there isn't one). These come from the cache if the file hasn't changed
+    since we last read it, and are shared, so don't modify them.
+    """
+
+    key = (path, parser.__name__ if parser is not None else None)
+    signature = get_file_signature(path)
+
+    with GRUB2_CONFIG_CACHE_LOCK:
+        cached = GRUB2_CONFIG_CACHE.get(key)
+
+    #If we can see the file hasn't changed, we don't even need to read it.
+    if cached is not None and signature is not None and cached["Signature"] == signature:
+        with GRUB2_CONFIG_CACHE_LOCK:
+            GRUB2_CONFIG_CACHE_STATS["Hits"] += 1
+
+        logger.debug("get_grub2_file(): Using cached copy of "+path+"...")
+        return (cached["Lines"], cached["Parsed"])
+
+    lines = read_grub2_file(path)
+    content_hash = hashlib.sha256("\n".join(lines).encode("UTF-8")).hexdigest()
+
+    if cached is not None and cached["Hash"] == content_hash:
+        with GRUB2_CONFIG_CACHE_LOCK:
+            GRUB2_CONFIG_CACHE_STATS["Hits"] += 1
+            cached["Signature"] = signature
+
+        logger.debug("get_grub2_file(): "+path+" hasn't changed, using cached copy...")
+        return (cached["Lines"], cached["Parsed"])
 
-    logger.debug("parse_grub2_menu_data(): Parsing menu data for menu: "+menu_name+"...")
+    parsed = parser(lines) if parser is not None else None
 
-    menu_entries[menu_name] = {}
-    menu_entries[menu_name]["Order"] = []
-    menu_ids[menu_name] = {}
-    menu_ids[menu_name]["ID"] = menu_id
+    with GRUB2_CONFIG_CACHE_LOCK:
+        GRUB2_CONFIG_CACHE_STATS["Misses"] += 1
+        GRUB2_CONFIG_CACHE[key] = {"Signature": signature, "Hash": content_hash, "Lines": lines,
+                                   "Parsed": parsed}
 
-    entry_counter = 0
-    skip_until = 0
-    line_counter = 0
+    return (lines, parsed)
 
-    #Read each line.
-    for line in menu_data:
-        line_counter += 1
+def invalidate_grub2_config_cache(path=""):
+    """
+    Forget the cached GRUB2 config files at or under the given path (eg a config file, or an
+    OS's mount point), or all of them if it's empty (eg for the current OS). Call this after
+    changing them, like with update-grub.
+    """
+
+    prefix = path.rstrip("/")+"/"
+
+    with GRUB2_CONFIG_CACHE_LOCK:
+        keys = [key for key in GRUB2_CONFIG_CACHE
+                if not path or key[0] == path or key[0].startswith(prefix)]
+
+        for key in keys:
+            del GRUB2_CONFIG_CACHE[key]
+
+        GRUB2_CONFIG_CACHE_STATS["Invalidations"] += len(keys)
+
+    if keys:
+        logger.debug("invalidate_grub2_config_cache(): Forgot "+str(len(keys))+" cached GRUB2 "
+                     + "config files in "+(path or "all OSs")+"...")
+
+def tokenize_grub2_line(line):
+    """
+    Split a line of a GRUB2 config file into tokens, like GRUB's own lexer does: words
+    (with any quotes left in), "{", "}", and ";" between commands. Comments are dropped.
+    If the line ends inside a quoted string, the unfinished string is returned as well, so it
+    can be continued on the next line. Otherwise, this is None.
+    """
+
+    tokens = _GRUB2_TOKEN.findall(line)
+    unfinished = None
+
+    if tokens and tokens[-1][0] in "'\"" and not _GRUB2_WORD.fullmatch(tokens[-1]):
+        unfinished = tokens.pop()
+
+    elif tokens and tokens[-1][0] == "#":
+        tokens.pop()
+
+    return tokens, unfinished
+
+def unquote_grub2_word(word):
+    """Remove the quotes and escapes from a word in a GRUB2 config file"""
+    #Escaped characters in double quotes need unescaping too.
+    return _GRUB2_QUOTED.sub(lambda match: _GRUB2_ESCAPED.sub(r"\1", match.group(3))
+                             if match.lastindex == 3 else match.group(match.lastindex), word)
+
+def new_grub2_menu_node(node_type, title, node_id, start):
+    """Return a new node for the GRUB2 menu tree made by parse_grub2_config()"""
+    return {"Type": node_type, "Title": title, "ID": node_id, "Span": [start, None],
+            "Search": None, "Root": None, "Linux": None, "Children": []}
+
+def note_grub2_menu_entry_line(node, line):
+    """Remember the lines in a menu entry that say where it boots from, and what it boots"""
+    #These are matched the same way as they always have been, so menu entries don't change.
+    if node["Search"] is None and "search " in line:
+        node["Search"] = line
+
+    if node["Root"] is None and "set root" in line:
+        node["Root"] = line
+
+    if "linux" in line:
+        node["Linux"] = line
+
+def parse_grub2_config(menu_data, menu_name="MainMenu", menu_id=""):
+    """
+    Walk the given lines of a GRUB2 config file once, keeping track of braces with a stack, and
+    return a tree of its menus. Each node is a dictionary with the type ("menu", "submenu" or
+    "menuentry"), the title, GRUB's ID for it, the span of lines it covers (start and end, like
+    a slice), the search, set root, and linux lines for menu entries, and any children.
+    """
+
+    tree = new_grub2_menu_node("menu", menu_name, menu_id, 0)
+
+    #What each open brace belongs to: a menu node, or None for anything else (eg functions).
+    stack = [tree]
+    menus = [tree]
+    entries = []
+
+    command = []
+    command_start = 0
+    unfinished = ""
+
+    for line_number, line in enumerate(menu_data):
+        #The menu entries this line is part of.
+        touched = entries[-1:]
+
+        #Most lines can't open or close anything, so don't bother splitting them up. Without
+        #double quotes or escapes, an even number of single quotes means none are left open.
+        if not unfinished and _GRUB2_PLAIN_LINE.fullmatch(line) and line.count("'") % 2 == 0:
+            for node in touched:
+                note_grub2_menu_entry_line(node, line)
 
-        #Skip some lines if needed.
-        if line_counter < skip_until:
             continue
 
-        #Parse any menu entries we find.
-        if "menuentry " in line:
-            logger.info("parse_grub2_menu_data(): Found a menu entry. Assembling into a "
-                        + "dictionary with assemble_grub2_menu_entry()...")
+        #Carry on with a quoted string from the line before if there is one.
+        tokens, unfinished = tokenize_grub2_line(unfinished+line if unfinished else line)
+
+        if unfinished is not None:
+            unfinished += "\n"
+
+        for token in tokens:
+            if token == ";":
+                command = []
+
+            elif token == "{":
+                node = None
+
+                if command and command[0] in ("menuentry", "submenu"):
+                    #Keep counting entries in this menu even if we can't get a title.
+                    menu = menus[-1]
+                    title = unquote_grub2_word(command[1]) if len(command) > 1 else ""
+                    node_id = menu["ID"]+str(len(menu["Children"]))
+
+                    if command[0] == "submenu":
+                        node_id += ">"
+
+                    node = new_grub2_menu_node(command[0], title, node_id, command_start)
+                    menu["Children"].append(node)
+
+                    if command[0] == "submenu":
+                        menus.append(node)
+
+                    else:
+                        entries.append(node)
+                        touched.append(node)
+
+                stack.append(node)
+                command = []
+
+            elif token == "}":
+                if len(stack) == 1:
+                    logger.warning("parse_grub2_config(): Unmatched '}' on line "
+                                   + str(line_number+1)+"! Ignoring it...")
+
+                    continue
 
-            menu_entries = assemble_grub2_menu_entry(menu_entries, menu_ids, menu_data, menu_name,
-                                                     line, entry_counter)
+                node = stack.pop()
 
-            logger.info("parse_grub2_menu_data(): Done!")
+                if node is not None:
+                    node["Span"][1] = line_number+1
 
-            #Increment the entry counter.
-            entry_counter += 1
+                    if node["Type"] == "submenu":
+                        menus.pop()
 
-        #Handle submenus correctly.
-        elif "submenu " in line:
-            logger.info("parse_grub2_menu_data(): Found submenu...")
-            #Get the submenu's name, create a sub-dictionary for it, save its ID, and change the
-            #Value of "menu_name" to the submenu's name.
-            #Keep compatibility with older versions of GRUB2.
-            try:
-                sub_menu_name = line.split("'")[1].replace("\"", "").replace("\'", "")
+                    else:
+                        entries.pop()
 
-            except IndexError:
-                sub_menu_name = line.split("\"")[1].replace("\"", "").replace("\'", "")
+                command = []
 
-            #Get the entire contents of the submenu.
-            logger.info("parse_grub2_menu_data(): Getting the entire text content of the "
-                        + "submenu...")
+            else:
+                if not command:
+                    command_start = line_number
+
+                command.append(token)
+
+        #Commands end at the end of the line, unless we're in the middle of a string.
+        if unfinished is None:
+            command = []
+            unfinished = ""
+
+        for node in touched:
+            note_grub2_menu_entry_line(node, line)
+
+    #Anything left open goes on to the end of the file.
+    for node in stack[1:]:
+        if node is not None:
+            logger.warning("parse_grub2_config(): "+node["Type"]+" "+node["Title"]+" isn't "
+                           + "closed!")
+
+            node["Span"][1] = len(menu_data)
+
+    tree["Span"][1] = len(menu_data)
+    return tree
+
+def parse_grub2_menu_data(menu_data="", mount_point="", menu_entries=None, menu_name="MainMenu",
+                          menu_ids=None, menu_id=""):
+    """
+    Find and parse GRUB2 (EFI and BIOS) menu entries in the given line list, or grub.cfg in
+    the OS at the given mount point if there isn't one. menu_name and menu_id are only used
+    for given line lists.
+    """
+
+    if menu_entries is None:
+        menu_entries = {}
+
+    if menu_ids is None:
+        menu_ids = {}
+
+    if menu_data != "":
+        logger.info("parse_grub2_menu_data(): Finding and parsing menu entries in given "
+                    + "menu data...")
 
-            bracket_count = 0
-            sub_menu_data = []
+        grub_dir = ""
+        tree = parse_grub2_config(menu_data, menu_name, menu_id)
 
-            for sub_menu_data_line in menu_data[menu_data.index(line):]:
-                #Don't add the first line to the sub_menu_data to avoid an endless recursive call.
-                if "submenu " not in sub_menu_data_line:
-                    sub_menu_data.append(sub_menu_data_line)
+    else:
+        logger.info("parse_grub2_menu_data(): Finding and opening GRUB config file...")
+        grub_dir = find_grub2_config(mount_point)
 
-                if "{" in sub_menu_data_line:
-                    bracket_count += 1
+        #Read and parse grub.cfg, unless it hasn't changed since last time.
+        logger.info("parse_grub2_menu_data(): Finding and parsing menu entries in "
+                    + grub_dir+"/grub.cfg...")
 
-                elif "}" in sub_menu_data_line:
-                    bracket_count -= 1
+        menu_data, tree = get_grub2_file(grub_dir+"/grub.cfg", parse_grub2_config)
 
-                if bracket_count == 0:
-                    break
+    #Go through the tree, adding each menu and its entries.
+    menus = [tree]
 
-            logger.info("parse_grub2_menu_data(): Done! Processing any menu entries in the "
-                        + "submenu with recursive call...")
+    while menus:
+        menu = menus.pop(0)
+        menu_name = menu["Title"]
 
-            #Call this function again with the contents of the submenu, and some arguments so
-            #everything works correctly.
-            menu_entries, menu_ids = parse_grub2_menu_data(sub_menu_data, mount_point=mount_point,
-                                                           menu_entries=menu_entries,
-                                                           menu_name=sub_menu_name,
-                                                           menu_ids=menu_ids,
-                                                           menu_id=str(entry_counter)+">")[1:]
+        logger.debug("parse_grub2_menu_data(): Parsing menu data for menu: "+menu_name+"...")
 
-            logger.info("parse_grub2_menu_data(): Done! Jumping past the submenu data to avoid "
-                        + "duplicating menu entries...")
+        menu_entries[menu_name] = {}
+        menu_entries[menu_name]["Order"] = []
+        menu_ids[menu_name] = {}
+        menu_ids[menu_name]["ID"] = menu["ID"]
 
-            #Increment the entry counter.
-            entry_counter += 1
+        for node in menu["Children"]:
+            if node["Type"] == "submenu":
+                logger.info("parse_grub2_menu_data(): Found submenu "+node["Title"]+"...")
+                menus.append(node)
 
-            #Skip the submenu data, and set "menu" back to "MainMenu" again so entries are added
-            #correctly.
-            skip_until = line_counter+len(sub_menu_data)
+            else:
+                menu_entries = assemble_grub2_menu_entry(menu_entries, menu_ids, menu_data,
+                                                         menu_name, node)
 
     logger.info("parse_grub2_menu_data(): Finished!")
     return grub_dir, menu_entries, menu_ids
 
-def assemble_grub2_menu_entry(menu_entries, menu_ids, menu_entries_file_contents, menu, line,
-                              entry_counter):
+def assemble_grub2_menu_entry(menu_entries, menu_ids, menu_entries_file_contents, menu, node):
     """
-    Assemble a menu entry in the dictionary for GRUB2 (BIOS and UEFI)
+    Assemble a menu entry in the dictionary for GRUB2 (BIOS and UEFI), from its node in the
+    tree made by parse_grub2_config()
     """
 
     logger.info("assemble_grub2_menu_entry(): Preparing to get menu entry info...")
 
     #Get the menu entry name.
-    if "\'" in line:
-        menu_entry_name = line.split("\'")[1]
-
-    else:
-        menu_entry_name = line.split("\"")[1]
+    menu_entry_name = node["Title"]
+    menu_entry_id = node["ID"]
 
     logger.debug("assemble_grub2_menu_entry(): Menu Entry name: "+menu_entry_name+"...")
 
     #Handle duplicate names.
     if menu_entry_name in menu_entries[menu]["Order"]:
-        menu_entry_name = menu_entry_name+" (ID "+menu_ids[menu]["ID"]+str(entry_counter)+")"
+        menu_entry_name = menu_entry_name+" (ID "+menu_entry_id+")"
 
     #Get the menu entry ID.
     menu_entries[menu]["Order"].append(menu_entry_name)
     menu_entries[menu][menu_entry_name] = {}
-    menu_entries[menu][menu_entry_name]["ID"] = menu_ids[menu]["ID"]+str(entry_counter)
+    menu_entries[menu][menu_entry_name]["ID"] = menu_entry_id
 
     logger.debug("assemble_grub2_menu_entry(): Menu Entry ID: "
                  + menu_entries[menu][menu_entry_name]["ID"]+"...")
 
-    #Get the full contents of the menuentry (keep adding lines to the list until we find a "}").
-    logger.info("assemble_grub2_menu_entry(): Getting menu entry data...")
-
-    menu_entries[menu][menu_entry_name]["RawMenuEntryData"] = []
-
-    for menu_entry_data in menu_entries_file_contents[menu_entries_file_contents.index(line):]:
-        menu_entries[menu][menu_entry_name]["RawMenuEntryData"].append(menu_entry_data)
-
-        try:
-            if menu_entry_data.split()[-1] == "}":
-                break
-
-        except IndexError:
-            pass
+    #Get the full contents of the menuentry.
+    start, end = node["Span"]
+    menu_entries[menu][menu_entry_name]["RawMenuEntryData"] = menu_entries_file_contents[start:end]
 
     #Get boot partition.
     logger.info("assemble_grub2_menu_entry(): Getting menu entry's boot partition with "
@@ -268,18 +478,17 @@ def assemble_grub2_menu_entry(menu_entries, menu_ids, menu_entries_file_contents
 
         uuid = ""
 
-        for each_line in menu_entries[menu][menu_entry_name]["RawMenuEntryData"]:
-            if "search " in each_line:
-                uuid = each_line.split()[-1]
-                logger.info("assemble_grub2_menu_entry(): Found UUID...")
-                break
+        if node["Search"] is not None:
+            uuid = node["Search"].split()[-1]
+            logger.info("assemble_grub2_menu_entry(): Found UUID...")
 
         if uuid != "":
             #Convert to device name if possible.
             logger.info("assemble_grub2_menu_entry(): Matching UUID to disk...")
-            for disk in DISK_INFO:
-                if DISK_INFO[disk]["UUID"] == uuid:
-                    menu_entries[menu][menu_entry_name]["Partition"] = disk
+            disk = DeviceTools.DEVICE_INDEX.canonical("UUID="+uuid)
+
+            if disk is not None:
+                menu_entries[menu][menu_entry_name]["Partition"] = disk
 
     #If THAT fails, try to use the "set root=" line to find the device name.
     if menu_entries[menu][menu_entry_name]["Partition"] == "Unknown" \
@@ -288,15 +497,10 @@ def assemble_grub2_menu_entry(menu_entries, menu_ids, menu_entries_file_contents
         logger.info("assemble_grub2_menu_entry(): Getting menu entry's boot partition with "
                     + "GRUB2's 'set root=' line...")
 
-        root_line = ""
-
-        for each_line in menu_entries[menu][menu_entry_name]["RawMenuEntryData"]:
-            if "set root" in each_line:
-                root_line = each_line
-                logger.info("assemble_grub2_menu_entry(): Found GRUB2's 'set root=' line...")
-                break
+        root_line = node["Root"]
 
-        if root_line != "":
+        if root_line is not None:
+            logger.info("assemble_grub2_menu_entry(): Found GRUB2's 'set root=' line...")
             #Get the numbers used in this line.
             logger.info("assemble_grub2_menu_entry(): Finding GRUB device name numbers...")
             numbers = []
@@ -332,9 +536,8 @@ def assemble_grub2_menu_entry(menu_entries, menu_ids, menu_entries_file_contents
 
     menu_entries[menu][menu_entry_name]["KernelOptions"] = ["Unknown"]
 
-    for _line in menu_entries[menu][menu_entry_name]["RawMenuEntryData"]:
-        if "linux" in _line:
-            menu_entries[menu][menu_entry_name]["KernelOptions"] = _line.split()[3:]
+    if node["Linux"] is not None:
+        menu_entries[menu][menu_entry_name]["KernelOptions"] = node["Linux"].split()[3:]
 
     #Check we got them.
     if menu_entries[menu][menu_entry_name]["KernelOptions"] == ["Unknown"]:
@@ -347,18 +550,65 @@ def assemble_grub2_menu_entry(menu_entries, menu_ids, menu_entries_file_contents
 
     return menu_entries
 
-def get_grub2_config(config_file_path, grubenv_file_path, menu_entries):
-    """Get important bits of config from grub2 (MBR or UEFI)"""
-    logger.info("get_grub2_config(): Getting config at "+config_file_path+"...")
+def build_grub2_menu_index(menu_entries):
+    """
+    Index the menu entries made by parse_grub2_menu_data() by ID, by title, and by the
+    partition (device name and UUID) they boot from, so the default OS can be found without
+    searching every menu. Each entry is indexed as a (menu, entry name) tuple, and entries are
+    kept in the order they're in the menus, with the first one winning if there are duplicate
+    titles. Positions has where each entry is in its menu.
+    """
+
+    menu_index = {"IDs": {}, "Titles": {}, "Partitions": {}, "Positions": {}}
+
+    for menu in menu_entries:
+        #Bootloaders we couldn't read the config for have an empty menu with no order.
+        for position, entry in enumerate(menu_entries[menu].get("Order", ())):
+            found = (menu, entry)
+            partition = menu_entries[menu][entry]["Partition"]
+
+            menu_index["IDs"].setdefault(menu_entries[menu][entry]["ID"], found)
+            menu_index["Titles"].setdefault(entry, found)
+            menu_index["Positions"][found] = position
+
+            if partition == "Unknown":
+                continue
+
+            menu_index["Partitions"].setdefault(partition, []).append(found)
+
+            #Index the UUID too if we know it.
+            if partition in DISK_INFO and DISK_INFO[partition]["UUID"] != "Unknown":
+                menu_index["Partitions"].setdefault(DISK_INFO[partition]["UUID"],
+                                                    []).append(found)
+
+    return menu_index
+
+def find_grub2_menu_entry(menu_index, partitions, menu="MainMenu"):
+    """
+    Find the first menu entry in the given menu that boots from any of the given partitions
+    (device names or UUIDs), using an index from build_grub2_menu_index(). Returns a
+    (menu, entry name) tuple, or None if there isn't one.
+    """
+
+    matches = [found for partition in partitions
+               for found in menu_index["Partitions"].get(partition, ()) if found[0] == menu]
+
+    if not matches:
+        return None
+
+    return min(matches, key=lambda found: menu_index["Positions"][found])
+
+def parse_grub2_settings(config_file):
+    """
+    Get the timeout, global kernel options, and default OS settings from the lines of GRUB2's
+    config file (/etc/default/grub). As the default OS setting might have to be matched to
+    the menu entries, every GRUB_DEFAULT value is returned, in order.
+    """
 
     #Set temporary vars
     timeout = "Unknown"
     kernel_options = "Unknown"
-    default_os = "Unknown"
-
-    #Open the config file in read mode, so we can save the important bits of config.
-    logger.info("get_grub2_config(): Getting config...")
-    config_file = CoreTools.read_privileged_file(config_file_path)
+    defaults = []
 
     #Loop through each line in the file, paying attention only to the important ones.
     for line in config_file:
@@ -370,7 +620,7 @@ def get_grub2_config(config_file_path, grubenv_file_path, menu_entries):
             #Check this worked properly.
             if temp.isdigit():
                 #Great! We got it.
-                logger.info("get_grub2_config(): Found bootloader timeout...")
+                logger.info("parse_grub2_settings(): Found bootloader timeout...")
                 timeout = int(temp)
 
         #Look for kernel options used globally in all the boot options.
@@ -385,79 +635,93 @@ def get_grub2_config(config_file_path, grubenv_file_path, menu_entries):
 
             if temp != "":
                 kernel_options = temp
-                logger.info("get_grub2_config(): Found global kernel options...")
+                logger.info("parse_grub2_settings(): Found global kernel options...")
 
         #Look for default OS setting.
         elif "GRUB_DEFAULT" in line and "=" in line:
-            #Setup.
-            match_by_name = False
-            match_by_id = False
+            logger.info("parse_grub2_settings(): Found default OS line....")
+            defaults.append(line.split("=")[1].replace("\"", "").replace("\'", "")
+                            .replace("\n", ""))
+
+    return {"Timeout": timeout, "KernelOptions": kernel_options, "Defaults": defaults}
+
+def get_grub2_config(config_file_path, grubenv_file_path, menu_entries, menu_index=None):
+    """
+    Get important bits of config from grub2 (MBR or UEFI). menu_index is the index of
+    menu_entries from build_grub2_menu_index(), which is made here if it isn't given.
+    """
 
-            #If this is an integer or string that == "saved", we need to match it to GRUB's
-            #grub.cfg menu_entries.
-            logger.info("get_grub2_config(): Found default OS line....")
-            grub_default = line.split("=")[1].replace("\"", "").replace("\'", "").replace("\n", "")
+    logger.info("get_grub2_config(): Getting config at "+config_file_path+"...")
+
+    if menu_index is None:
+        menu_index = build_grub2_menu_index(menu_entries)
 
-            if grub_default.isdigit() or ">" in grub_default:
-                #Match By ID.
-                match_by_id = True
+    #Get the settings from the config file (or the cache if it hasn't changed).
+    logger.info("get_grub2_config(): Getting config...")
+    settings = get_grub2_file(config_file_path, parse_grub2_settings)[1]
+
+    timeout = settings["Timeout"]
+    kernel_options = settings["KernelOptions"]
+    default_os = "Unknown"
 
-            elif grub_default == "saved":
-                #Find the corresponding GRUB menuentry, matching by name or ID.
-                logger.info("get_grub2_config(): Looking for default OS in GRUB environment "
-                            + "file...")
+    for grub_default in settings["Defaults"]:
+        #Setup.
+        match_by_name = False
+        match_by_id = False
 
-                grubenv_file = CoreTools.read_privileged_file(grubenv_file_path)
+        #If this is an integer or string that == "saved", we need to match it to GRUB's
+        #grub.cfg menu_entries.
+        if grub_default.isdigit() or ">" in grub_default:
+            #Match By ID.
+            match_by_id = True
 
-                for variable in grubenv_file:
-                    if "saved_entry=" in variable or "default=" in variable:
-                        grub_default = variable.split("=")[1].replace("\n", "")
+        elif grub_default == "saved":
+            #Find the corresponding GRUB menuentry, matching by name or ID.
+            logger.info("get_grub2_config(): Looking for default OS in GRUB environment "
+                        + "file...")
 
-                #Match by ID if possible.
-                match_by_id = (grub_default.isdigit() or ">" in grub_default)
+            grubenv_file = CoreTools.read_privileged_file(grubenv_file_path)
 
-                #Otherwise match by name.
-                match_by_name = (not match_by_id)
+            for variable in grubenv_file:
+                if "saved_entry=" in variable or "default=" in variable:
+                    grub_default = variable.split("=")[1].replace("\n", "")
+
+            #Match by ID if possible.
+            match_by_id = (grub_default.isdigit() or ">" in grub_default)
+
+            #Otherwise match by name.
+            match_by_name = (not match_by_id)
+
+        else:
+            #Match by name.
+            match_by_name = True
+
+        if match_by_id:
+            #Find the corresponding GRUB menuentry, matching by ID.
+            logger.info("get_grub2_config(): Matching default OS by ID...")
+
+            if grub_default in menu_index["IDs"]:
+                default_os = menu_index["IDs"][grub_default][1]
+
+        if match_by_name:
+            #Check in the menuentries list.
+            logger.info("get_grub2_config(): Finding default OS by name...")
+
+            if grub_default in menu_index["Titles"]:
+                default_os = grub_default
+                logger.info("get_grub2_config(): Found default OS by name...")
 
             else:
-                #Match by name.
-                match_by_name = True
-
-            if match_by_id:
-                #Find the corresponding GRUB menuentry, matching by ID.
-                logger.info("get_grub2_config(): Matching default OS by ID...")
-                for menu in menu_entries.keys():
-                    for _os in menu_entries[menu]["Order"]:
-                        if menu_entries[menu][_os]["ID"] == grub_default:
-                            default_os = _os
-                            break
-
-            if match_by_name:
-                #Check in the menuentries list.
-                logger.info("get_grub2_config(): Finding default OS by name...")
-                found = False
-
-                for menu in menu_entries.keys():
-                    for menu_entry in menu_entries[menu]["Order"]:
-                        if grub_default == menu_entry:
-                            default_os = grub_default
-                            found = True
-
-                if found:
-                    logger.info("get_grub2_config(): Found default OS by name...")
-
-                else:
-                    logger.warning("get_grub2_config(): Didn't find default OS by name, setting "
-                                   + "it to the 1st menu entry instead...")
-
-                    #Find the 1st menu entry.
-                    for entry in menu_entries["MainMenu"]["Order"]:
-                        if menu_entries["MainMenu"][entry]["ID"] == 0:
-                            default_os = entry
-                            logger.info("get_grub2_config(): Set default OS to "+entry+" instead. "
-                                        + "Continuing...")
-
-            logger.info("get_grub2_config(): Done!")
+                logger.warning("get_grub2_config(): Didn't find default OS by name, setting "
+                               + "it to the 1st menu entry instead...")
+
+                #Find the 1st menu entry.
+                if "0" in menu_index["IDs"]:
+                    default_os = menu_index["IDs"]["0"][1]
+                    logger.info("get_grub2_config(): Set default OS to "+default_os+" instead. "
+                                + "Continuing...")
+
+        logger.info("get_grub2_config(): Done!")
 
     #Close the file.
     logger.info("get_grub2_config(): Done! Returning information...")
@@ -27,6 +27,7 @@ of WxFixBoot's startup procedures.
 #Import modules.
 from distutils.version import LooseVersion
 
+import concurrent.futures
 import os
 import sys
 import logging
@@ -34,17 +35,24 @@ import getdevinfo
 
 sys.path.append('../..') #Need to be able to import the Tools module from here.
 import Tools.coretools as CoreTools #pylint: disable=wrong-import-position
+import Tools.devicetools as DeviceTools #pylint: disable=wrong-import-position
 import Tools.dialogtools as DialogTools #pylint: disable=wrong-import-position
 from Tools.dictionaries import * #pylint: disable=wrong-import-position
 
 #Import other modules.
 from . import core as CoreStartupTools #pylint: disable=wrong-import-position
 from . import getbootloaderconfigtools as BootloaderConfigObtainingTools  #pylint: disable=wrong-import-position
+from . import osidentity as OSIdentityTools #pylint: disable=wrong-import-position
+from . import signatures as SignatureTools #pylint: disable=wrong-import-position
 
 #Set up logging.
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.getLogger("WxFixBoot").getEffectiveLevel())
 
+#Define global variables
+#How many partitions get_oss() looks for operating systems on at the same time.
+MAX_CONCURRENT_OS_PROBES = 4
+
 def check_depends():
     """
     Check dependencies, and show an error message and kill the app if the dependencies are not met.
@@ -60,10 +68,11 @@ def check_depends():
     #Create a list to contain names of failed commands.
     failed_list = []
 
-    for cmd in cmd_list:
-        #Run the command with its argument and log the output (if in debug mode)
-        retval, output = CoreTools.start_process("which "+cmd, return_output=True)
+    #Run the commands with their arguments all at once and log the output (if in debug mode)
+    results = CoreTools.start_processes(["which "+cmd for cmd in cmd_list], return_output=True,
+                                        idempotent=True)
 
+    for cmd, (retval, output) in zip(cmd_list, results):
         if retval != 0:
             logger.error("check_depends(): Dependency problems! Command: "+cmd
                          + " failed to execute or wasn't found.")
@@ -112,7 +121,7 @@ def check_for_live_disk():
                 + "live disk...")
 
     #Detect Parted Magic automatically.
-    if "pmagic" in CoreTools.start_process("uname -r", return_output=True)[1]:
+    if "pmagic" in CoreTools.start_process("uname -r", return_output=True, idempotent=True)[1]:
         logger.info("MainStartupTools(): check_for_live_disk(): Running on Parted Magic...")
         SYSTEM_INFO["IsLiveDisk"] = True
         SYSTEM_INFO["OnPartedMagic"] = True
@@ -205,258 +214,295 @@ def mount_core_filesystems():
 
         CoreTools.emergency_exit("Failed to re-mount your filesystems after checking them!")
 
-def get_oss():
-    """Get the names of all OSs on the HDDs."""
-    logger.info("get_oss(): Finding operating systems...")
-    root_filesystem = CoreTools.get_partition_mounted_at("/")
-    os_info = {}
+def new_probe_result(partition):
+    """Return an empty result for probe_partition()."""
+    return {"Partition": partition, "OSName": None, "OSInfo": None, "IsCurrentOS": False,
+            "NeedsName": False, "MountPoint": None, "Error": False}
 
-    #Get Linux OSs.
-    keys = list(DISK_INFO.keys())
-    keys.sort()
+def probe_partition(partition, root_filesystem):
+    """
+    Look for an operating system on the given partition. This is run for several partitions
+    at the same time by get_oss(), so it doesn't change OS_INFO or SYSTEM_INFO, or ask the
+    user anything. Returns a dictionary with what was found (see new_probe_result()).
+    """
 
-    for partition in keys:
-        if DISK_INFO[partition]["Type"] == "Device":
-            continue
+    #Don't bother mounting partitions that can't have an OS on them.
+    if not CoreTools.is_mounted(partition):
+        signature = SignatureTools.read_signature(partition)
 
-        elif DISK_INFO[partition]["FileSystem"] in ("hfsplus", "hfs", "apfs"):
-            #TODO Check if this is what APFS shows up as.
-            #Look for macOS.
-            os_name = "macOS ("+partition+")"
-            logger.debug("get_oss(): Looking for macOS on "+partition+"...")
+        if not signature["CanHostOS"]:
+            logger.info("probe_partition(): Skipping "+partition+", because "
+                        + signature["Reason"]+"...")
 
-            #Check if we need to mount the partition.
-            was_mounted = False
+            return new_probe_result(partition)
 
-            if CoreTools.is_mounted(partition):
-                #If mounted, get the mountpoint.
-                mount_point = CoreTools.get_mount_point_of(partition)
+    if DISK_INFO[partition]["FileSystem"] in ("hfsplus", "hfs", "apfs"):
+        #TODO Check if this is what APFS shows up as.
+        return probe_for_macos(partition)
 
-            else:
-                #Mount the partition and check if anything went wrong.
-                mount_point = "/mnt/wxfixboot/mountpoints"+partition
+    if DISK_INFO[partition]["FileSystem"] in ("vfat", "ntfs", "exfat"):
+        return probe_for_windows(partition)
 
-                if CoreTools.mount_partition(partition=partition, mount_point=mount_point) != 0:
-                    #Ignore the partition.
-                    logger.warning("get_oss(): Couldn't mount "+partition
-                                   + "! Skipping this partition...")
+    return probe_for_linux(partition, root_filesystem)
 
-                    continue
+def probe_for_macos(partition):
+    """Look for macOS on the given partition. Used by probe_partition()."""
+    result = new_probe_result(partition)
+    os_name = "macOS ("+partition+")"
+    logger.debug("probe_for_macos(): Looking for macOS on "+partition+"...")
 
-                was_mounted = True
+    #Check if we need to mount the partition.
+    was_mounted = False
 
-            if os.path.exists(mount_point+"/mach_kernel") \
-                or os.path.exists(mount_point+"/System/Library/Kernels/kernel"):
+    if CoreTools.is_mounted(partition):
+        #If mounted, get the mountpoint.
+        mount_point = CoreTools.get_mount_point_of(partition)
 
-                #Create OS_INFO entry for it.
-                logger.debug("get_oss(): Found "+os_name+"...")
-                os_info[os_name] = {}
-                os_info[os_name]["Name"] = os_name
-                os_info[os_name]["IsCurrentOS"] = False
-                os_info[os_name]["Arch"] = "Unknown"
-                os_info[os_name]["Partition"] = partition
-                os_info[os_name]["PackageManager"] = "Mac App Store"
+    else:
+        #Mount the partition and check if anything went wrong.
+        mount_point = "/mnt/wxfixboot/mountpoints"+partition
 
-                os_info[os_name]["RawFSTabInfo"], os_info[os_name]["EFIPartition"], \
-                os_info[os_name]["BootPartition"] = (["Unknown"], "Unknown", "Unknown")
+        #We're only looking, so use a read-only probe mount.
+        if CoreTools.acquire_mount(partition=partition, mount_point=mount_point,
+                                   probe=True) != 0:
+            #Ignore the partition.
+            logger.warning("probe_for_macos(): Couldn't mount "+partition
+                           + "! Skipping this partition...")
 
-            #unmount the filesystem if needed.
-            if was_mounted:
-                if CoreTools.unmount(mount_point) != 0:
-                    logger.error("get_oss(): Couldn't unmount "+partition
-                                 + "! Doing emergency exit...")
+            return result
 
-                    CoreTools.emergency_exit("Couldn't unmount "+partition+" after looking for "
-                                             + "operating systems on it! Please reboot your "
-                                             + "computer and try again.")
+        was_mounted = True
 
-        elif DISK_INFO[partition]["FileSystem"] in ("vfat", "ntfs", "exfat"):
-            #Look for Windows. NOTE: It seems NTFS volumes can't be mounted twice, which is why
-            #we're being more careful here.
-            #TODO ^ Check, I think it worked before. Good to be cautious either way.
-            logger.debug("get_oss(): Looking for Windows on "+partition+"...")
+    if os.path.exists(mount_point+"/mach_kernel") \
+        or os.path.exists(mount_point+"/System/Library/Kernels/kernel"):
 
-            #Check if we need to mount the partition.
-            was_mounted = False
+        #Create OS_INFO entry for it.
+        logger.debug("probe_for_macos(): Found "+os_name+"...")
+        result["OSName"] = os_name
+        result["OSInfo"] = {"Name": os_name, "IsCurrentOS": False, "Arch": "Unknown",
+                            "Partition": partition, "PackageManager": "Mac App Store",
+                            "RawFSTabInfo": ["Unknown"], "EFIPartition": "Unknown",
+                            "BootPartition": "Unknown"}
 
-            if CoreTools.is_mounted(partition):
-                #If mounted, get the mountpoint.
-                mount_point = CoreTools.get_mount_point_of(partition)
+    #unmount the filesystem if needed. Nothing else uses these, so don't keep them.
+    if was_mounted and CoreTools.release_mount(partition, mount_point, linger=False) != 0:
+        logger.error("probe_for_macos(): Couldn't unmount "+partition+"!")
+        result["Error"] = True
 
-            else:
-                #Mount the partition and check if anything went wrong.
-                mount_point = "/mnt/wxfixboot/mountpoints"+partition
+    return result
 
-                if CoreTools.mount_partition(partition=partition, mount_point=mount_point) != 0:
-                    #Ignore the partition.
-                    logger.warning("get_oss(): Couldn't mount "+partition
-                                   + "! Skipping this partition...")
+def probe_for_windows(partition):
+    """Look for Windows on the given partition. Used by probe_partition()."""
+    #NOTE: It seems NTFS volumes can't be mounted twice, which is why we're being more careful
+    #here.
+    #TODO ^ Check, I think it worked before. Good to be cautious either way.
+    result = new_probe_result(partition)
+    logger.debug("probe_for_windows(): Looking for Windows on "+partition+"...")
 
-                    continue
+    #Check if we need to mount the partition.
+    was_mounted = False
 
-                was_mounted = True
+    if CoreTools.is_mounted(partition):
+        #If mounted, get the mountpoint.
+        mount_point = CoreTools.get_mount_point_of(partition)
 
-            #Check if there's a Windows/WinNT dir.
-            if not (os.path.isdir(mount_point+"/WinNT") or os.path.isdir(mount_point+"/Windows") \
-                or os.path.isdir(mount_point+"/WINDOWS")):
+    else:
+        #Mount the partition and check if anything went wrong.
+        mount_point = "/mnt/wxfixboot/mountpoints"+partition
 
-                #Skip this partition, and unmount if needed.
-                logger.info("get_oss(): Windows wasn't found...")
+        #We're only looking, so use a read-only probe mount.
+        if CoreTools.acquire_mount(partition=partition, mount_point=mount_point,
+                                   probe=True) != 0:
+            #Ignore the partition.
+            logger.warning("probe_for_windows(): Couldn't mount "+partition
+                           + "! Skipping this partition...")
 
-            else:
-                #Look for lots of different Windows editions.
-                #Look for the newest ones first, due to references to old versions
-                #in the licenses messing up our version detection.
-                if CoreStartupTools.has_windows_10(mount_point):
-                    os_name = "Windows 10"
-
-                elif CoreStartupTools.has_windows_8(mount_point):
-                    os_name = "Windows 8/8.1"
-
-                elif CoreStartupTools.has_windows_7(mount_point):
-                    os_name = "Windows 7"
-
-                elif CoreStartupTools.has_windows_vista(mount_point):
-                    os_name = "Windows Vista"
-
-                elif CoreStartupTools.has_windows_xp(mount_point):
-                    os_name = "Windows XP"
-
-                elif CoreStartupTools.has_windows_9x(mount_point):
-                    os_name = "Windows 95/98/ME"
-
-                else:
-                    #Unknown Windows.
-                    os_name = "Windows"
-
-                #Create os_info entry for it.
-                os_name = os_name+" ("+partition+")"
-                logger.debug("get_oss(): Found "+os_name+"...")
-                os_info[os_name] = {}
-                os_info[os_name]["Name"] = os_name
-                os_info[os_name]["IsCurrentOS"] = False
-                os_info[os_name]["Arch"] = "Unknown"
-                os_info[os_name]["Partition"] = partition
-                os_info[os_name]["PackageManager"] = "Windows Installer"
-
-                os_info[os_name]["RawFSTabInfo"], os_info[os_name]["EFIPartition"], \
-                os_info[os_name]["BootPartition"] = (["Unknown"], "Unknown", "Unknown")
-
-            #unmount the filesystem if needed.
-            if was_mounted:
-                if CoreTools.unmount(mount_point) != 0:
-                    logger.error("get_oss(): Couldn't unmount "+partition
-                                 +"! Doing emergency exit...")
-
-                    CoreTools.emergency_exit("Couldn't unmount "+partition+" after looking for "
-                                             + "operating systems on it! Please reboot your "
-                                             + "computer and try again.")
+            return result
 
-        else:
-            #Look for Linux.
-            #The python command runs on python 3.
-            logger.debug("get_oss(): Looking for Linux on "+partition+"...")
+        was_mounted = True
 
-            #If there are aliases for partition, check if the root FS is one of those too.
-            root_filesystem_is_alias = False
+    #Look at the partition once to see which version of Windows (if any) is on it.
+    #Every stat is slow on NTFS partitions on USB disks, so this avoids looking at the
+    #same files several times.
+    fingerprint = OSIdentityTools.get_windows_fingerprint(mount_point)
+    os_name = OSIdentityTools.get_windows_edition(fingerprint)
 
-            if "Aliases" in DISK_INFO[partition]:
-                logger.debug("get_oss(): Checking if RootFS is an alias for "+partition+"...")
+    if os_name is None:
+        #Skip this partition, and unmount if needed.
+        logger.info("probe_for_windows(): Windows wasn't found...")
 
-                if root_filesystem in DISK_INFO[partition]["Aliases"]:
-                    logger.debug("get_oss(): RootFS is an alias...")
-                    root_filesystem_is_alias = True
+    else:
+        #Create os_info entry for it.
+        os_name = os_name+" ("+partition+")"
+        logger.debug("probe_for_windows(): Found "+os_name+"...")
+        result["OSName"] = os_name
+        result["OSInfo"] = {"Name": os_name, "IsCurrentOS": False, "Arch": "Unknown",
+                            "Partition": partition, "PackageManager": "Windows Installer",
+                            "RawFSTabInfo": ["Unknown"], "EFIPartition": "Unknown",
+                            "BootPartition": "Unknown"}
+
+    #unmount the filesystem if needed. Nothing else uses these, so don't keep them.
+    if was_mounted and CoreTools.release_mount(partition, mount_point, linger=False) != 0:
+        logger.error("probe_for_windows(): Couldn't unmount "+partition+"!")
+        result["Error"] = True
+
+    return result
+
+def probe_for_linux(partition, root_filesystem):
+    """Look for Linux on the given partition. Used by probe_partition()."""
+    result = new_probe_result(partition)
+
+    #The python command runs on python 3.
+    logger.debug("probe_for_linux(): Looking for Linux on "+partition+"...")
+
+    #Check if this is the root filesystem, or the root filesystem is an alias for it.
+    if DeviceTools.DEVICE_INDEX.same_device(partition, root_filesystem):
+        root = "/"
+        chroot = False
+        is_current_os = True
+        mount_point = ""
 
-                else:
-                    logger.debug("get_oss(): RootFS isn't an alias...")
-                    root_filesystem_is_alias = False
+    else:
+        mount_point = "/mnt/wxfixboot/mountpoints"+partition
+        root = mount_point
+        chroot = True
+        is_current_os = False
+
+        #Mount the partition and check if anything went wrong.
+        #We're only looking, so use a read-only probe mount.
+        if CoreTools.acquire_mount(partition=partition, mount_point=mount_point,
+                                   probe=True) != 0:
+            #Ignore the partition.
+            logger.warning("probe_for_linux(): Couldn't mount "+partition
+                           + "! Skipping this partition...")
+
+            return result
+
+    result["IsCurrentOS"] = is_current_os
+
+    #Look for Linux on this partition. Read os-release directly rather than running commands.
+    os_name = OSIdentityTools.get_os_name(root)
+
+    #Run the function to get the architechure.
+    os_architecture = CoreStartupTools.determine_os_architecture(mount_point=mount_point)
+
+    #If the OS's name wasn't found, but its architecture was, there must be an OS here, so
+    #try to use lsb_release if possible before asking the user.
+    if os_name is None and os_architecture != None:
+        os_name = CoreStartupTools.get_os_name_with_lsb(partition=partition,
+                                                        mount_point=mount_point,
+                                                        is_current_os=is_current_os)
+
+        #If we really have to, ask the user. get_oss() does this once all the probes are done.
+        result["NeedsName"] = os_name is None
+
+    #Look for APT or DNF.
+    package_manager = OSIdentityTools.get_package_manager(root)
+
+    if (os_name is not None or result["NeedsName"]) and os_architecture is not None \
+        and package_manager != "Unknown":
+
+        #Save the information for os_info. If we need to ask for the name, get_oss() adds it.
+        result["OSName"] = os_name
+        result["OSInfo"] = {"Name": os_name, "IsCurrentOS": is_current_os,
+                            "Arch": os_architecture, "Partition": partition,
+                            "PackageManager": package_manager}
+
+        result["OSInfo"]["RawFSTabInfo"], result["OSInfo"]["EFIPartition"], \
+        result["OSInfo"]["BootPartition"] = \
+        CoreStartupTools.get_fstab_info(mount_point, os_name or partition)
+
+    else:
+        result["NeedsName"] = False
 
-            if partition == root_filesystem or root_filesystem_is_alias:
-                cmd = "cat /etc/os-release"
+    if chroot:
+        if result["NeedsName"]:
+            #Keep hold of the filesystem until we know whether the user wants to keep this OS.
+            result["MountPoint"] = mount_point
 
-                apt_cmd = "which apt-get"
-                dnf_cmd = "which dnf"
-                chroot = False
-                is_current_os = True
-                mount_point = ""
+        #Release the filesystem. If we found an OS, keep it mounted for
+        #get_bootloaders() and the operations, otherwise unmount it now.
+        elif CoreTools.release_mount(partition, mount_point,
+                                     linger=result["OSInfo"] is not None) != 0:
+            logger.error("probe_for_linux(): Couldn't unmount "+partition+"!")
+            result["Error"] = True
+
+    return result
+
+def get_oss(max_concurrent=MAX_CONCURRENT_OS_PROBES):
+    """
+    Get the names of all OSs on the HDDs. Up to max_concurrent partitions are looked at at
+    the same time.
+    """
+
+    logger.info("get_oss(): Finding operating systems...")
+    root_filesystem = CoreTools.get_partition_mounted_at("/")
+    os_info = {}
+
+    keys = sorted([partition for partition in DISK_INFO
+                   if DISK_INFO[partition]["Type"] != "Device"])
+
+    #Look at several partitions at once. The results are merged in partition order
+    #afterwards, so we end up with the same os_info whichever probes finish first.
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrent) as executor:
+        futures = [executor.submit(probe_partition, partition, root_filesystem)
+                   for partition in keys]
+
+    #Get every result, even if a probe failed, so the mounts the others are holding for us
+    #are still released below.
+    results = []
+
+    for partition, future in zip(keys, futures):
+        try:
+            results.append(future.result())
+
+        except Exception as error: #pylint: disable=broad-except
+            logger.error("get_oss(): Error while looking for an OS on "+partition+": "
+                         + str(error))
+
+            result = new_probe_result(partition)
+            result["Error"] = True
+            results.append(result)
+
+    for result in results:
+        partition = result["Partition"]
+
+        if result["NeedsName"]:
+            #Questions for the user are only asked from here, one at a time, in order.
+            logger.warning("get_oss(): Asking user for OS name instead...")
+            result["OSName"] = CoreStartupTools.ask_for_os_name(partition=partition,
+                                                                is_current_os=result["IsCurrentOS"])
+
+            #If the user skipped naming the OS, ignore it.
+            if result["OSName"] is None:
+                result["OSInfo"] = None
 
             else:
-                mount_point = "/mnt/wxfixboot/mountpoints"+partition
-                cmd = "cat "+mount_point+"/etc/os-release"
-
-                apt_cmd = "chroot "+mount_point+" which apt-get"
-                dnf_cmd = "chroot "+mount_point+" which dnf"
-                chroot = True
-                is_current_os = False
-
-                #Mount the partition and check if anything went wrong.
-                if CoreTools.mount_partition(partition=partition, mount_point=mount_point) != 0:
-                    #Ignore the partition.
-                    logger.warning("get_oss(): Couldn't mount "+partition
-                                   + "! Skipping this partition...")
-
-                    continue
-
-            #Look for Linux on this partition.
-            retval, temp = CoreTools.start_process(cmd, return_output=True)
-
-            os_name = ""
-
-            try:
-                for line in temp.split("\n"):
-                    if "PRETTY_NAME" in line:
-                        os_name = line.split("=")[1].replace('\"', '')
-
-            except IndexError:
-                os_name = ""
-
-            #Run the function to get the architechure.
-            os_architecture = CoreStartupTools.determine_os_architecture(mount_point=mount_point)
-
-            #If the OS's name wasn't found, but its architecture was, there must be an OS here, so
-            #try to use lsb_release if possible before asking the user. Catch if the name is just
-            #whitespace too.
-            if (retval != 0 or os_name == "" or os_name.isspace()) and os_architecture != None:
-                os_name = CoreStartupTools.get_os_name_with_lsb(partition=partition,
-                                                                mount_point=mount_point,
-                                                                is_current_os=is_current_os)
-
-                #If we really have to, ask the user.
-                if os_name is None:
-                    logger.warning("get_oss(): Asking user for OS name instead...")
-                    os_name = CoreStartupTools.ask_for_os_name(partition=partition,
-                                                               is_current_os=is_current_os)
-
-            #Look for APT.
-            package_manager = CoreStartupTools.determine_package_manager(apt_cmd=apt_cmd,
-                                                                         dnf_cmd=dnf_cmd)
-
-            #Also check if CoreStartupTools.ask_for_os_name was used to determine the name.
-            #If the user skipped naming the OS, ignore it and skip the rest of this loop iteration.
-            if os_name is not None and os_architecture is not None and package_manager != "Unknown":
-                #Add this information to os_info.
-                os_info[os_name] = {}
-                os_info[os_name]["Name"] = os_name
-                os_info[os_name]["IsCurrentOS"] = is_current_os
-                os_info[os_name]["Arch"] = os_architecture
-                os_info[os_name]["Partition"] = partition
-                os_info[os_name]["PackageManager"] = package_manager
-
-                os_info[os_name]["RawFSTabInfo"], os_info[os_name]["EFIPartition"], \
-                os_info[os_name]["BootPartition"] = \
-                CoreStartupTools.get_fstab_info(mount_point, os_name)
-
-                if chroot is False:
-                    SYSTEM_INFO["CurrentOS"] = os_info[os_name].copy()
-
-            if chroot:
-                #unmount the filesystem.
-                if CoreTools.unmount(mount_point) != 0:
-                    logger.error("get_oss(): Couldn't unmount "+partition
-                                 + "! Doing emergency exit...")
-                    CoreTools.emergency_exit("Couldn't unmount "+partition+" after looking for "
-                                             + "operating systems on it! Please reboot your "
-                                             + "computer and try again.")
+                result["OSInfo"]["Name"] = result["OSName"]
+
+            #Release the filesystem. Keep it mounted for later if we're using this OS.
+            if result["MountPoint"] is not None \
+                and CoreTools.release_mount(partition, result["MountPoint"],
+                                            linger=result["OSInfo"] is not None) != 0:
+
+                result["Error"] = True
+
+        if result["Error"]:
+            logger.error("get_oss(): Couldn't look for an OS on "+partition+", or unmount it "
+                         + "afterwards! Doing emergency exit...")
+            CoreTools.emergency_exit("Couldn't look for operating systems on "+partition
+                                     + ", or unmount it afterwards! Please reboot your "
+                                     + "computer and try again.")
+
+        if result["OSInfo"] is None:
+            continue
+
+        os_name = result["OSName"]
+        logger.debug("get_oss(): Found "+os_name+" on "+partition+"...")
+        os_info[os_name] = result["OSInfo"]
+
+        if result["IsCurrentOS"]:
+            SYSTEM_INFO["CurrentOS"] = os_info[os_name].copy()
 
     #Check that at least one Linux OS was detected.
     linux_oss = []
@@ -496,19 +542,22 @@ def get_firmware_type():
 
     #Look for the UEFI vars in some common directories.
     if os.path.isdir("/sys/firmware/efi/vars") \
-        and CoreTools.start_process("ls /sys/firmware/efi/vars", return_output=True)[1] != "":
+        and CoreTools.start_process("ls /sys/firmware/efi/vars", return_output=True,
+                                    idempotent=True)[1] != "":
 
         uefi_variables = True
         logger.info("get_firmware_type(): Found UEFI Variables at /sys/firmware/efi/vars...")
 
     elif os.path.isdir("/proc/efi/vars") \
-        and CoreTools.start_process("ls /proc/efi/vars", return_output=True)[1] != "":
+        and CoreTools.start_process("ls /proc/efi/vars", return_output=True,
+                                    idempotent=True)[1] != "":
 
         uefi_variables = True
         logger.info("get_firmware_type(): Found UEFI Variables at /proc/efi/vars...")
 
     elif os.path.isdir("/sys/firmware/efi/efivars") \
-        and CoreTools.start_process("ls /sys/firmware/efi/efivars", return_output=True)[1] != "":
+        and CoreTools.start_process("ls /sys/firmware/efi/efivars", return_output=True,
+                                    idempotent=True)[1] != "":
 
         uefi_variables = True
         logger.info("get_firmware_type(): Found UEFI Variables at /sys/firmware/efi/efivars...")
@@ -528,7 +577,7 @@ def get_firmware_type():
     else:
         #Look a second way.
         output = CoreTools.start_process("dmidecode -q -t BIOS", return_output=True,
-                                         privileged=True)[1]
+                                         privileged=True, idempotent=True)[1]
 
         if "UEFI" not in output:
             #It's BIOS.
@@ -574,19 +623,24 @@ def get_bootloaders():
             #Mount the OS's partition.
             mount_point = "/mnt/wxfixboot/mountpoints"+OS_INFO[_os]["Partition"]
 
-            if CoreTools.mount_partition(OS_INFO[_os]["Partition"], mount_point) != 0:
+            #Bootloader detection only looks at things, so probe mounts are enough. These are
+            #made read-write when an operation needs to change something. DNF needs to write
+            #to its cache and lock files even for searches, though.
+            if CoreTools.acquire_mount(OS_INFO[_os]["Partition"], mount_point,
+                                       probe=OS_INFO[_os]["PackageManager"] != "dnf") != 0:
                 logger.error("get_bootloaders(): Failed to mount "+_os+"'s partition! Skipping "
                              + "bootloader detection for this OS.")
 
                 continue
 
             #Set up chroot.
-            if CoreTools.setup_chroot(mount_point) != 0:
+            if CoreTools.acquire_chroot(mount_point) != 0:
                 logger.error("get_bootloaders(): Couldn't set up chroot on "+mount_point
                              + "! Attempting to remove it in case it's partially set up, "
                              + "and then skipping this OS...")
 
                 CoreTools.teardown_chroot(mount_point)
+                CoreTools.release_mount(OS_INFO[_os]["Partition"], mount_point)
                 continue
 
         else:
@@ -594,27 +648,32 @@ def get_bootloaders():
 
         #Mount a /boot partition if it exists.
         if OS_INFO[_os]["BootPartition"] != "Unknown":
-            if CoreTools.mount_partition(OS_INFO[_os]["BootPartition"], mount_point+"/boot") != 0:
+            if CoreTools.acquire_mount(OS_INFO[_os]["BootPartition"], mount_point+"/boot",
+                                       probe=True) != 0:
+
                 logger.error("get_bootloaders(): Failed to mount "+_os+"'s /boot partition! "
                              + "Skipping bootloader detection for this OS.")
 
                 if not OS_INFO[_os]["IsCurrentOS"]:
                     CoreTools.teardown_chroot(mount_point)
-                    CoreTools.unmount(mount_point)
+                    CoreTools.release_mount(OS_INFO[_os]["Partition"], mount_point)
 
                 continue
 
         #Mount a /boot/efi partition if it exists.
         if OS_INFO[_os]["EFIPartition"] != "Unknown":
-            if CoreTools.mount_partition(OS_INFO[_os]["EFIPartition"],
-                                         mount_point+"/boot/efi") != 0:
+            if CoreTools.acquire_mount(OS_INFO[_os]["EFIPartition"],
+                                       mount_point+"/boot/efi", probe=True) != 0:
 
                 logger.error("get_bootloaders(): Failed to mount "+_os+"'s /boot/efi partition! "
                              + "Skipping bootloader detection for this OS.")
 
+                if OS_INFO[_os]["BootPartition"] != "Unknown":
+                    CoreTools.release_mount(OS_INFO[_os]["BootPartition"], mount_point+"/boot")
+
                 if not OS_INFO[_os]["IsCurrentOS"]:
                     CoreTools.teardown_chroot(mount_point)
-                    CoreTools.unmount(mount_point)
+                    CoreTools.release_mount(OS_INFO[_os]["Partition"], mount_point)
 
                 continue
 
@@ -643,6 +702,11 @@ def get_bootloaders():
             BootloaderConfigObtainingTools.parse_grub2_menu_data(menu_data="",
                                                                  mount_point=mount_point)[0:2]
 
+            #Index the menu entries, so we can find the default OS quickly.
+            BOOTLOADER_INFO[_os]["MenuIndex"] = \
+            BootloaderConfigObtainingTools.build_grub2_menu_index(BOOTLOADER_INFO[_os]
+                                                                  ["MenuEntries"])
+
             #Get GRUB2's config.
             #If we're using fedora, always look for grubenv in the EFI partition (the grubenv
             #symlink is in /boot/grub2 but it doesn't work when we're chrooting).
@@ -653,7 +717,8 @@ def get_bootloaders():
             BOOTLOADER_INFO[_os]["BLSpecificDefaultOS"] = \
             BootloaderConfigObtainingTools.get_grub2_config(mount_point+"/etc/default/grub",
                                                             grub_dir+"/grubenv",
-                                                            BOOTLOADER_INFO[_os]["MenuEntries"])
+                                                            BOOTLOADER_INFO[_os]["MenuEntries"],
+                                                            BOOTLOADER_INFO[_os]["MenuIndex"])
 
             #Try to find GRUB's location if this is GRUB2.
             if BOOTLOADER_INFO[_os]["Bootloader"] == "GRUB2":
@@ -729,33 +794,32 @@ def get_bootloaders():
         BOOTLOADER_INFO[_os]["GUIState"]["RestoreBootloaderCheckBoxState"] = True
         BOOTLOADER_INFO[_os]["GUIState"]["RestoreBootloaderChoiceState"] = False
 
-        #If there's a seperate EFI partition for this OS,
-        #make sure it's unmounted before removing the chroot.
+        #Release the EFI, /boot and OS partitions. They're kept mounted for the operations,
+        #and unmounted when WxFixBoot exits.
         if OS_INFO[_os]["EFIPartition"] != "Unknown":
-            if CoreTools.unmount(mount_point+"/boot/efi") != 0:
+            if CoreTools.release_mount(OS_INFO[_os]["EFIPartition"],
+                                       mount_point+"/boot/efi") != 0:
                 logger.error("MainBackendTools: get_bootloaders(): Failed to unmount "+mount_point
                              + "/boot/efi! This probably doesn't matter...")
 
-        #unmount a /boot partition if it exists.
         if OS_INFO[_os]["BootPartition"] != "Unknown":
-            if CoreTools.unmount(mount_point+"/boot") != 0:
+            if CoreTools.release_mount(OS_INFO[_os]["BootPartition"], mount_point+"/boot") != 0:
                 logger.error("get_bootloaders(): Failed to unmount "+_os+"'s /boot partition! "
                              + "Continuing anyway...")
 
-        #Clean up if needed.
+        #Clean up if needed. The chroot is kept set up for the operations.
         if not OS_INFO[_os]["IsCurrentOS"]:
-            #Remove chroot.
-            if CoreTools.teardown_chroot(mount_point) != 0:
-                logger.error("get_bootloaders(): Failed to remove chroot from "+mount_point
-                             + "! Attempting to continue anyway...")
+            CoreTools.release_chroot(mount_point)
 
-            #unmount the OS's partition.
-            if CoreTools.unmount(mount_point) != 0:
+            if CoreTools.release_mount(OS_INFO[_os]["Partition"], mount_point) != 0:
                 logger.error("get_bootloaders(): Failed to unmount "+_os+"'s partition! This "
                              + "could indicate that chroot wasn't removed correctly. Continuing "
                              + "anyway...")
 
-    #Get default OSs.
+    #Get default OSs. Index the OSs by partition first, so each default OS can be matched
+    #with one lookup.
+    os_index = CoreStartupTools.build_os_index()
+
     for _os in OS_INFO:
         #Set sensible defaults for Windows.
         if "Windows" in _os:
@@ -784,7 +848,7 @@ def get_bootloaders():
                          + "reinstall will be required for that bootloader...")
 
         #We have the partition, so now find the OS that resides on that partition.
-        CoreStartupTools.match_partition_to_os(_os)
+        CoreStartupTools.match_partition_to_os(_os, os_index)
 
         #Log if we couldn't match them.
         if BOOTLOADER_INFO[_os]["DefaultOS"] == "Unknown":
@@ -0,0 +1,563 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# OS Identity Tools in the StartupTools Package in the Tools Package for WxFixBoot
+# This file is part of WxFixBoot.
+# Copyright (C) 2013-2020 Hamish McIntyre-Bhatty
+# WxFixBoot is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3 or,
+# at your option, any later version.
+#
+# WxFixBoot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WxFixBoot.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=logging-not-lazy
+#
+# Reason (logging-not-lazy): This is a more readable way of logging.
+
+"""
+This module finds out about an OS by reading its files directly, instead of running commands
+in a chroot.
+
+For Linux, it reads the OS's name from os-release or lsb-release, its architecture from the
+ELF header of /sbin/init or /bin/sh, and which package manager it uses by looking for apt-get
+and dnf. Symlinks are followed inside the directory the OS is mounted at, so absolute links
+point into the OS, not our own filesystem.
+
+For Windows, it lists the root and Windows directories once to make a fingerprint of the
+installation, and works out the version from that. The fingerprint includes the ProductName
+from the SOFTWARE registry hive, if we can read it.
+
+Every function takes the directory the OS is mounted at (or / for the current OS).
+"""
+
+#Import modules.
+import logging
+import mmap
+import os
+import shlex
+import stat
+import struct
+
+#Set up logging.
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.getLogger("WxFixBoot").getEffectiveLevel())
+
+#Define global variables
+#How many symlinks we'll follow when resolving a path, like the kernel.
+MAX_SYMLINKS = 40
+
+#Where to look for each file, in order.
+OS_RELEASE_FILES = ("/etc/os-release", "/usr/lib/os-release")
+LSB_RELEASE_FILES = ("/etc/lsb-release",)
+ARCH_FILES = ("/sbin/init", "/bin/sh")
+
+#Where to look for programs, like the default PATH.
+PROGRAM_DIRECTORIES = ("/usr/local/sbin", "/usr/local/bin", "/usr/sbin", "/usr/bin", "/sbin",
+                       "/bin")
+
+#The package managers we support, in order of preference, with the names we use for them.
+PACKAGE_MANAGERS = (("apt-get", "apt-get"), ("dnf", "dnf"))
+
+#ELF machine numbers, and the architecture names we use for them. 32-bit x86 is i386 like
+#GRUB's target names. Some depend on whether the file is 64-bit.
+ELF_MACHINES = {3: "i386", 0x3E: "x86_64", 0xB7: "aarch64", 0x28: "armv7l", 0x32: "ia64",
+                0x14: "ppc"}
+
+ELF_MACHINES_BY_CLASS = {0x15: ("ppc", "ppc64"), 0x16: ("s390", "s390x"),
+                         0xF3: ("riscv32", "riscv64"), 8: ("mips", "mips64")}
+
+#The most directory entries we'll look at in each directory when looking for Windows.
+MAX_WINDOWS_ENTRIES = 4096
+
+#The most of Windows's license file we'll read.
+MAX_LICENSE_SIZE = 1048576
+
+#Registry keys and values holding the Windows version, from the root of the SOFTWARE hive.
+WINDOWS_VERSION_KEY = ("Microsoft", "Windows NT", "CurrentVersion")
+WINDOWS_VERSION_VALUES = ("ProductName", "CurrentBuildNumber")
+
+#Windows 11 still says it's Windows 10 in ProductName, so we go by the build number.
+WINDOWS_11_BUILD = 22000
+
+#Words in the ProductName, and the names we use for each version of Windows, newest first.
+WINDOWS_PRODUCT_NAMES = (("WINDOWS 10", "Windows 10"), ("WINDOWS 8", "Windows 8/8.1"),
+                         ("WINDOWS 7", "Windows 7"), ("VISTA", "Windows Vista"),
+                         ("WINDOWS XP", "Windows XP"))
+
+def resolve_path(root, path):
+    """
+    Return where the given path in the OS mounted at root really is, following symlinks
+    inside root. Returns None if there are too many symlinks (eg a loop).
+    """
+
+    parts = [part for part in path.split("/") if part]
+    resolved = []
+    links = 0
+
+    while parts:
+        part = parts.pop(0)
+
+        if part == ".":
+            continue
+
+        if part == "..":
+            #Can't go above root.
+            if resolved:
+                resolved.pop()
+
+            continue
+
+        candidate = os.path.join(root, *resolved, part)
+
+        if not os.path.islink(candidate):
+            resolved.append(part)
+            continue
+
+        links += 1
+
+        if links > MAX_SYMLINKS:
+            logger.warning("resolve_path(): Too many symlinks resolving "+path+" in "+root+"!")
+            return None
+
+        target = os.readlink(candidate)
+
+        if target.startswith("/"):
+            resolved = []
+
+        parts = [part for part in target.split("/") if part] + parts
+
+    return os.path.join(root, *resolved)
+
+def read_file(root, path, size=-1):
+    """
+    Read the given file from the OS mounted at root, in binary mode. Returns None if it
+    doesn't exist or can't be read.
+    """
+
+    real_path = resolve_path(root, path)
+
+    if real_path is None:
+        return None
+
+    try:
+        with open(real_path, "rb") as the_file:
+            return the_file.read(size)
+
+    except OSError:
+        return None
+
+def parse_release_file(data):
+    """
+    Parse an os-release or lsb-release file, and return a dictionary of its variables. Values
+    are unquoted like a shell would.
+    """
+
+    variables = {}
+
+    for line in data.decode("UTF-8", errors="ignore").split("\n"):
+        line = line.strip()
+
+        if line.startswith("#") or "=" not in line:
+            continue
+
+        key, value = line.split("=", 1)
+
+        try:
+            value = " ".join(shlex.split(value))
+
+        except ValueError:
+            #Unbalanced quotes. Just take them off.
+            value = value.strip("\"'")
+
+        variables[key.strip()] = value
+
+    return variables
+
+def get_os_name(root):
+    """
+    Return the name of the OS mounted at root, from PRETTY_NAME in os-release or
+    DISTRIB_DESCRIPTION in lsb-release. Returns None if we couldn't find it.
+    """
+
+    for files, key in ((OS_RELEASE_FILES, "PRETTY_NAME"), (LSB_RELEASE_FILES,
+                                                           "DISTRIB_DESCRIPTION")):
+        for path in files:
+            data = read_file(root, path)
+
+            if data is None:
+                continue
+
+            name = parse_release_file(data).get(key, "")
+
+            if name and not name.isspace():
+                logger.debug("get_os_name(): Found "+name+" in "+path+"...")
+                return name
+
+    return None
+
+def get_elf_architecture(data):
+    """
+    Return the architecture of an ELF binary, given at least the first 20 bytes of it.
+    Returns None if it isn't an ELF file, or we don't know the architecture.
+    """
+
+    if len(data) < 20 or data[0:4] != b"\x7fELF" or data[4] not in (1, 2) \
+        or data[5] not in (1, 2):
+
+        return None
+
+    is_64_bit = data[4] == 2
+    little_endian = data[5] == 1
+    machine = struct.unpack_from("<H" if little_endian else ">H", data, 18)[0]
+
+    if machine in ELF_MACHINES_BY_CLASS:
+        architecture = ELF_MACHINES_BY_CLASS[machine][is_64_bit]
+
+        if architecture == "ppc64" and little_endian:
+            architecture = "ppc64le"
+
+        return architecture
+
+    return ELF_MACHINES.get(machine)
+
+def get_architecture(root):
+    """
+    Return the architecture of the OS mounted at root, from the ELF header of /sbin/init or
+    /bin/sh. Returns None if we couldn't find it.
+    """
+
+    for path in ARCH_FILES:
+        data = read_file(root, path, 20)
+
+        if data is None:
+            continue
+
+        architecture = get_elf_architecture(data)
+
+        if architecture is not None:
+            logger.debug("get_architecture(): "+path+" in "+root+" is "+architecture+"...")
+            return architecture
+
+    return None
+
+def find_program(root, name):
+    """
+    Look for the given program in the OS mounted at root, like which would in a chroot.
+    Returns its path in the OS, or None if it isn't there.
+    """
+
+    for directory in PROGRAM_DIRECTORIES:
+        real_path = resolve_path(root, directory+"/"+name)
+
+        if real_path is None:
+            continue
+
+        try:
+            mode = os.stat(real_path).st_mode
+
+        except OSError:
+            continue
+
+        if stat.S_ISREG(mode) and mode & 0o111:
+            return directory+"/"+name
+
+    return None
+
+def get_package_manager(root):
+    """
+    Return the package manager used by the OS mounted at root, or "Unknown" if it doesn't
+    have one we support.
+    """
+
+    for program, package_manager in PACKAGE_MANAGERS:
+        if find_program(root, program) is not None:
+            logger.debug("get_package_manager(): Found "+package_manager+" in "+root+"...")
+            return package_manager
+
+    return "Unknown"
+
+def list_directory(path):
+    """
+    Return a dictionary of the lower-case names of the entries in the given directory, with
+    their real names and whether they're directories. At most MAX_WINDOWS_ENTRIES entries are
+    looked at. Returns an empty dictionary if the directory can't be read.
+    """
+
+    entries = {}
+
+    try:
+        with os.scandir(path) as iterator:
+            for entry in iterator:
+                try:
+                    is_dir = entry.is_dir()
+
+                except OSError:
+                    is_dir = False
+
+                entries[entry.name.lower()] = (entry.name, is_dir)
+
+                if len(entries) >= MAX_WINDOWS_ENTRIES:
+                    logger.warning("list_directory(): Too many entries in "+path
+                                   + ", ignoring the rest...")
+                    break
+
+    except OSError:
+        pass
+
+    return entries
+
+def has_entry(entries, name, is_dir=False):
+    """
+    Returns True if the given lower-case name is a file (or a directory, if is_dir is True)
+    in a listing from list_directory(), otherwise False.
+    """
+
+    return name in entries and entries[name][1] == is_dir
+
+def find_license_marker(data):
+    """
+    Return which version of Windows its license file (license.rtf) is for: "10", "8", "7",
+    "Vista", or None if we can't tell. Older licenses are mentioned in newer ones, so we look
+    for the newest first. Windows 10's license doesn't mention the version, but it starts with
+    a note about binding arbitration that comes before any mention of Windows 8.
+    """
+
+    first = None
+    text = data.decode("latin-1").upper()
+
+    for line in text.split("\n"):
+        if "WINDOWS 8" in line:
+            first = first or "8"
+
+        elif "BINDING ARBITRATION CLAUSE" in line:
+            first = first or "10"
+
+    if first is not None:
+        return first
+
+    if "WINDOWS 7" in text:
+        return "7"
+
+    if "VISTA" in text:
+        return "Vista"
+
+    return None
+
+def read_hive_cell(hive, offset):
+    """Return the data in the cell at the given offset in a registry hive."""
+    #Offsets are from the first hive bin, after the 4 KiB base block. Cells in use have a
+    #negative size.
+    start = 4096 + offset
+    size = -struct.unpack_from("<i", hive, start)[0]
+
+    if size < 8 or start + size > len(hive):
+        raise ValueError("Bad cell at offset "+str(offset))
+
+    return hive[start+4:start+size]
+
+def get_hive_subkey_offsets(hive, list_offset, depth=0):
+    """Return the offsets of the keys in a registry subkey list (li, lf, lh or ri)."""
+    cell = read_hive_cell(hive, list_offset)
+    signature = cell[0:2]
+    count = struct.unpack_from("<H", cell, 2)[0]
+
+    if signature == b"li":
+        return list(struct.unpack_from("<"+str(count)+"I", cell, 4))
+
+    if signature in (b"lf", b"lh"):
+        return list(struct.unpack_from("<"+str(count*2)+"I", cell, 4)[0::2])
+
+    if signature == b"ri" and depth == 0:
+        offsets = []
+
+        for sublist in struct.unpack_from("<"+str(count)+"I", cell, 4):
+            offsets.extend(get_hive_subkey_offsets(hive, sublist, depth+1))
+
+        return offsets
+
+    raise ValueError("Unknown subkey list "+str(signature))
+
+def get_hive_key_name(cell):
+    """Return the name of a registry key, given its cell."""
+    flags = struct.unpack_from("<H", cell, 2)[0]
+    length = struct.unpack_from("<H", cell, 0x48)[0]
+    name = cell[0x4C:0x4C+length]
+
+    #Names are stored as Latin-1 if they can be.
+    if flags & 0x20:
+        return bytes(name).decode("latin-1")
+
+    return bytes(name).decode("UTF-16-LE", errors="ignore")
+
+def get_hive_values(hive, path, names):
+    """
+    Return a dictionary of the given string values from the registry key at the given path
+    in a hive. Values that aren't there aren't included. Raises ValueError or struct.error if
+    the hive is damaged or the key isn't there.
+    """
+
+    cell = read_hive_cell(hive, struct.unpack_from("<I", hive, 0x24)[0])
+
+    for key_name in path:
+        subkey_count, _, subkey_list = struct.unpack_from("<III", cell, 0x14)
+
+        if subkey_count == 0:
+            raise ValueError("No key called "+key_name)
+
+        for offset in get_hive_subkey_offsets(hive, subkey_list):
+            subkey = read_hive_cell(hive, offset)
+
+            if subkey[0:2] == b"nk" and get_hive_key_name(subkey).lower() == key_name.lower():
+                cell = subkey
+                break
+
+        else:
+            raise ValueError("No key called "+key_name)
+
+    value_count, value_list = struct.unpack_from("<II", cell, 0x24)
+    values = {}
+
+    if value_count == 0:
+        return values
+
+    for offset in struct.unpack_from("<"+str(value_count)+"I", read_hive_cell(hive, value_list)):
+        value = read_hive_cell(hive, offset)
+
+        if value[0:2] != b"vk":
+            continue
+
+        name_length, size, data_offset, data_type, flags = struct.unpack_from("<HIIIH", value, 2)
+
+        if flags & 1:
+            name = bytes(value[20:20+name_length]).decode("latin-1")
+
+        else:
+            name = bytes(value[20:20+name_length]).decode("UTF-16-LE", errors="ignore")
+
+        #Only read strings (REG_SZ and REG_EXPAND_SZ).
+        if name not in names or data_type not in (1, 2):
+            continue
+
+        if size & 0x80000000:
+            #Small values are kept in the data offset field.
+            data = struct.pack("<I", data_offset)[:size & 0x7FFFFFFF]
+
+        else:
+            data = read_hive_cell(hive, data_offset)[:size]
+
+        values[name] = bytes(data).decode("UTF-16-LE", errors="ignore").split("\x00")[0]
+
+    return values
+
+def get_windows_version_info(path):
+    """
+    Return the ProductName and CurrentBuildNumber from the SOFTWARE registry hive at the
+    given path, as a dictionary. Only the parts of the hive we need are read. Returns an
+    empty dictionary if it can't be read.
+    """
+
+    try:
+        with open(path, "rb") as hive_file:
+            with mmap.mmap(hive_file.fileno(), 0, access=mmap.ACCESS_READ) as hive:
+                if hive[0:4] != b"regf":
+                    return {}
+
+                return get_hive_values(hive, WINDOWS_VERSION_KEY, WINDOWS_VERSION_VALUES)
+
+    except (OSError, ValueError, struct.error) as error:
+        logger.warning("get_windows_version_info(): Couldn't read "+path+": "+str(error))
+        return {}
+
+def get_windows_fingerprint(root, read_registry=True):
+    """
+    Look at the partition mounted at root once, and return a fingerprint of what's there for
+    get_windows_edition(). If read_registry is True, we also try to read the version of
+    Windows from the SOFTWARE registry hive.
+    """
+
+    fingerprint = {"WindowsDirectory": None, "RootEntries": list_directory(root),
+                   "License": None, "ProductName": None, "BuildNumber": None}
+
+    for name in ("windows", "winnt"):
+        if fingerprint["RootEntries"].get(name, ("", False))[1]:
+            fingerprint["WindowsDirectory"] = fingerprint["RootEntries"][name][0]
+            break
+
+    else:
+        return fingerprint
+
+    windows_directory = os.path.join(root, fingerprint["WindowsDirectory"])
+    system32 = list_directory(windows_directory).get("system32", (None, False))
+
+    if not system32[1]:
+        return fingerprint
+
+    system32 = os.path.join(windows_directory, system32[0])
+
+    if read_registry:
+        config = list_directory(os.path.join(system32, "config"))
+
+        if "software" in config:
+            version_info = get_windows_version_info(os.path.join(system32, "config",
+                                                                 config["software"][0]))
+
+            fingerprint["ProductName"] = version_info.get("ProductName")
+
+            if version_info.get("CurrentBuildNumber", "").isdigit():
+                fingerprint["BuildNumber"] = int(version_info["CurrentBuildNumber"])
+
+    if fingerprint["ProductName"] is None:
+        try:
+            with open(os.path.join(system32, "license.rtf"), "rb") as license_file:
+                fingerprint["License"] = find_license_marker(license_file.read(MAX_LICENSE_SIZE))
+
+        except OSError:
+            pass
+
+    return fingerprint
+
+def get_windows_edition(fingerprint):
+    """
+    Return the version of Windows described by a fingerprint from get_windows_fingerprint(),
+    like "Windows 7", or "Windows" if we can't tell which version it is. Returns None if
+    Windows isn't installed.
+    """
+
+    if fingerprint["WindowsDirectory"] is None:
+        return None
+
+    if fingerprint["ProductName"] is not None:
+        product_name = fingerprint["ProductName"].upper()
+
+        if "WINDOWS 11" in product_name or ("WINDOWS 10" in product_name
+                                            and (fingerprint["BuildNumber"] or 0)
+                                            >= WINDOWS_11_BUILD):
+            return "Windows 11"
+
+        for word, edition in WINDOWS_PRODUCT_NAMES:
+            if word in product_name:
+                return edition
+
+    if fingerprint["License"] is not None:
+        return {"10": "Windows 10", "8": "Windows 8/8.1", "7": "Windows 7",
+                "Vista": "Windows Vista"}[fingerprint["License"]]
+
+    entries = fingerprint["RootEntries"]
+
+    if has_entry(entries, "boot.ini") and has_entry(entries, "ntldr") \
+        and has_entry(entries, "ntdetect.com") \
+        and has_entry(entries, "documents and settings", is_dir=True):
+
+        return "Windows XP"
+
+    if has_entry(entries, "autoexec.bat") and has_entry(entries, "command.com") \
+        and has_entry(entries, "my documents", is_dir=True):
+
+        return "Windows 95/98/ME"
+
+    return "Windows"
@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Package Tools in the StartupTools Package in the Tools Package for WxFixBoot
+# This file is part of WxFixBoot.
+# Copyright (C) 2013-2020 Hamish McIntyre-Bhatty
+# WxFixBoot is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3 or,
+# at your option, any later version.
+#
+# WxFixBoot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WxFixBoot.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=logging-not-lazy
+#
+# Reason (logging-not-lazy): This is a more readable way of logging.
+
+"""
+This module reads an OS's package database directly, to find out which packages are installed
+without running dpkg or dnf in a chroot. On Debian-based OSs this is /var/lib/dpkg/status,
+and on Fedora-based OSs it's the rpm database, if it's in SQLite format (rpmdb.sqlite).
+
+Package names are matched like the old way of searching the output of dpkg --get-selections
+or dnf list installed: a package counts if its name contains the name we're looking for, so
+"grub-efi" matches "grub-efi-amd64".
+
+It can also build an index of the packages that can be installed in an OS, from the package
+lists apt or dnf downloaded (/var/lib/apt/lists or the dnf cache), instead of running
+apt-cache search or dnf search for each package. OSs that use the same package lists share
+one index.
+"""
+
+#Import modules.
+import bz2
+import gzip
+import logging
+import lzma
+import os
+import re
+import sqlite3
+import threading
+import urllib.parse
+
+try:
+    #Python 3.14 and newer. Fedora compresses its package lists with zstd.
+    from compression import zstd
+
+except ImportError:
+    zstd = None
+
+#Import other modules.
+from . import osidentity as OSIdentityTools
+
+#Set up logging.
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.getLogger("WxFixBoot").getEffectiveLevel())
+
+#Define global variables
+#Where the package databases are, in order. Newer versions of Fedora keep the rpm database
+#in /usr, with a symlink from /var/lib/rpm.
+DPKG_STATUS_FILES = ("/var/lib/dpkg/status",)
+RPMDB_FILES = ("/usr/lib/sysimage/rpm/rpmdb.sqlite", "/var/lib/rpm/rpmdb.sqlite")
+
+#How much of the dpkg status file to read at a time.
+DPKG_CHUNK_SIZE = 262144
+
+#Where apt keeps its package lists, and where dnf keeps its cache of repository metadata.
+APT_LISTS_DIRECTORY = "/var/lib/apt/lists"
+DNF_CACHE_DIRECTORIES = ("/var/cache/dnf", "/var/cache/libdnf5")
+
+#How to open package lists, by the compression they use (their extension).
+OPENERS = {"": open, ".gz": gzip.open, ".xz": lzma.open, ".bz2": bz2.open}
+
+if zstd is not None:
+    OPENERS[".zst"] = zstd.open
+
+#Indexes of the packages that can be installed, keyed by the package lists they were made
+#from (see get_package_lists()), so OSs using the same lists share one index.
+PACKAGE_INDEXES = {}
+PACKAGE_INDEXES_LOCK = threading.Lock()
+PACKAGE_INDEX_STATS = {"Hits": 0, "Misses": 0}
+
+#The name and status of each package in the dpkg status file. Status usually comes straight
+#after Package, but not always (eg Essential can be in between).
+_DPKG_PACKAGE = re.compile(rb"\nPackage: *([^\n]*)\n(?:[^\n]+\n)*?Status: *([^\n]*)")
+
+#Package names in apt's Packages lists, and in dnf's primary.xml repository metadata.
+_APT_LIST_PACKAGE = re.compile(rb"\nPackage: *([^\n]*)")
+_RPM_METADATA_PACKAGE = re.compile(rb"<name>([^<]*)</name>")
+
+#Where the primary metadata for a dnf repository is, according to repodata/repomd.xml.
+_RPM_PRIMARY_LOCATION = re.compile(rb'<data type="primary">.*?<location href="([^"]+)"', re.S)
+
+def match_packages(name, packages, found):
+    """Add any of the given packages that match the given package name to found."""
+    for package in packages:
+        if package not in found and package in name:
+            found.add(package)
+
+def read_dpkg_status(status_file, packages, chunk_size=DPKG_CHUNK_SIZE):
+    """
+    Return the set of the given packages that are selected for installation in the given
+    dpkg status file (an open binary file), like dpkg --get-selections would show. The file is
+    read chunk_size bytes at a time, and we stop as soon as we've found all of the packages.
+    """
+
+    found = set()
+    remainder = b""
+
+    while len(found) < len(packages):
+        chunk = status_file.read(chunk_size)
+
+        if chunk:
+            #Only look at whole paragraphs, and keep the rest for next time.
+            data = remainder + chunk
+            end = data.rfind(b"\n\n") + 2
+
+            if end == 1:
+                remainder = data
+                continue
+
+            data, remainder = data[:end], data[end:]
+
+        else:
+            data, remainder = remainder, b""
+
+        #Search for the fields we need rather than going through every line, which is much
+        #faster. The newline is so we match the first paragraph too.
+        for match in _DPKG_PACKAGE.finditer(b"\n"+data):
+            #The first word of the status is what the user wants (eg install, hold or deinstall).
+            if match.group(2).split()[0:1] == [b"install"]:
+                match_packages(match.group(1).decode("UTF-8", errors="ignore"), packages, found)
+
+                if len(found) == len(packages):
+                    break
+
+        if not chunk:
+            break
+
+    return found
+
+def read_rpmdb(path, packages):
+    """
+    Return the set of the given packages that are installed according to the given rpm
+    database in SQLite format.
+    """
+
+    #The OS is probably mounted read-only, so don't let SQLite try to write anything.
+    database = sqlite3.connect("file:"+urllib.parse.quote(path)+"?mode=ro&immutable=1", uri=True)
+    found = set()
+
+    try:
+        for (name,) in database.execute("SELECT key FROM Name"):
+            match_packages(name, packages, found)
+
+            if len(found) == len(packages):
+                break
+
+    finally:
+        database.close()
+
+    return found
+
+def get_installed_packages(root, package_manager, packages):
+    """
+    Return the set of the given packages that are installed in the OS mounted at root, using
+    the given package manager's database. Returns None if we can't read it, in which case the
+    package manager should be asked instead.
+    """
+
+    if package_manager == "apt-get":
+        paths, reader = DPKG_STATUS_FILES, "dpkg"
+
+    elif package_manager == "dnf":
+        paths, reader = RPMDB_FILES, "rpm"
+
+    else:
+        return None
+
+    for path in paths:
+        real_path = OSIdentityTools.resolve_path(root, path)
+
+        if real_path is None:
+            continue
+
+        try:
+            if reader == "dpkg":
+                with open(real_path, "rb") as status_file:
+                    found = read_dpkg_status(status_file, packages)
+
+            else:
+                found = read_rpmdb(real_path, packages)
+
+        except (OSError, sqlite3.Error) as error:
+            logger.debug("get_installed_packages(): Couldn't read "+path+" in "+root+": "
+                         + str(error))
+
+            continue
+
+        logger.info("get_installed_packages(): Found "+', '.join(sorted(found))+" in "+path
+                    + " in "+root+"...")
+
+        return found
+
+    logger.info("get_installed_packages(): Couldn't read the package database in "+root+"...")
+    return None
+
+def read_package_names(package_list, pattern, chunk_size=DPKG_CHUNK_SIZE):
+    """
+    Return the set of package names in the given package list (an open binary file), found
+    with the given pattern. The file is read chunk_size bytes at a time.
+    """
+
+    names = set()
+    remainder = b""
+
+    while True:
+        chunk = package_list.read(chunk_size)
+
+        #Only look at whole lines, and keep the rest for next time.
+        data = remainder + chunk
+        end = data.rfind(b"\n") + 1
+
+        if chunk and end == 0:
+            remainder = data
+            continue
+
+        if chunk:
+            data, remainder = data[:end], data[end:]
+
+        #The newline is so we match the first line too.
+        names.update(match.group(1).strip() for match in pattern.finditer(b"\n"+data))
+
+        if not chunk:
+            break
+
+    return names
+
+def split_extension(name, openers=OPENERS):
+    """
+    Return the given file name without its compression extension, and the function to open
+    it with (None if we don't know how to decompress it).
+    """
+
+    base, extension = os.path.splitext(name)
+
+    if extension in (".gz", ".xz", ".bz2", ".zst", ".lz4"):
+        return base, openers.get(extension)
+
+    return name, openers[""]
+
+def get_apt_package_lists(root):
+    """
+    Return a list of (path, name, opener) for apt's Packages lists in the OS mounted at root,
+    or None if there aren't any, or we can't read them all.
+    """
+
+    directory = OSIdentityTools.resolve_path(root, APT_LISTS_DIRECTORY)
+
+    if directory is None or not os.path.isdir(directory):
+        return None
+
+    package_lists = []
+
+    for name in sorted(os.listdir(directory)):
+        base, opener = split_extension(name)
+
+        if not base.endswith("_Packages"):
+            continue
+
+        if opener is None:
+            logger.info("get_apt_package_lists(): Can't read "+name+" in "+root+"...")
+            return None
+
+        package_lists.append((os.path.join(directory, name), name, opener))
+
+    return package_lists or None
+
+def get_dnf_package_lists(root):
+    """
+    Return a list of (path, name, opener) for the primary metadata of each repository in dnf's
+    cache in the OS mounted at root, or None if there aren't any, or we can't read them all.
+    """
+
+    package_lists = []
+
+    for cache_directory in DNF_CACHE_DIRECTORIES:
+        directory = OSIdentityTools.resolve_path(root, cache_directory)
+
+        if directory is None or not os.path.isdir(directory):
+            continue
+
+        for repository in sorted(os.listdir(directory)):
+            repodata = os.path.join(directory, repository, "repodata")
+
+            try:
+                with open(os.path.join(repodata, "repomd.xml"), "rb") as repomd:
+                    location = _RPM_PRIMARY_LOCATION.search(repomd.read())
+
+            except OSError:
+                continue
+
+            if location is None:
+                continue
+
+            name = os.path.basename(location.group(1).decode("UTF-8", errors="ignore"))
+            opener = split_extension(name)[1]
+
+            if opener is None:
+                logger.info("get_dnf_package_lists(): Can't read "+name+" in "+root+"...")
+                return None
+
+            #The name of the metadata file starts with its checksum.
+            package_lists.append((os.path.join(repodata, name), repository+"/"+name, opener))
+
+    return package_lists or None
+
+def get_package_lists(root, package_manager):
+    """
+    Return the package lists for the OS mounted at root, and a key that is the same for every
+    OS using the same lists, or (None, None) if we can't use them.
+    """
+
+    if package_manager == "apt-get":
+        package_lists = get_apt_package_lists(root)
+
+    elif package_manager == "dnf":
+        package_lists = get_dnf_package_lists(root)
+
+    else:
+        return (None, None)
+
+    if package_lists is None:
+        return (None, None)
+
+    #apt sets the modification time of its lists to when the mirror last changed them, so
+    #copies of the same lists have the same names, sizes, and times.
+    key = [package_manager]
+
+    try:
+        for path, name, _opener in package_lists:
+            info = os.stat(path)
+            key.append((name, info.st_size, int(info.st_mtime)))
+
+    except OSError:
+        return (None, None)
+
+    return (package_lists, tuple(key))
+
+def get_package_index(root, package_manager):
+    """
+    Return a frozenset of the names of the packages that can be installed in the OS mounted at
+    root, or None if we can't read its package lists, in which case the package manager should
+    be asked instead.
+    """
+
+    package_lists, key = get_package_lists(root, package_manager)
+
+    if package_lists is None:
+        logger.info("get_package_index(): Couldn't find readable package lists in "+root+"...")
+        return None
+
+    with PACKAGE_INDEXES_LOCK:
+        if key in PACKAGE_INDEXES:
+            PACKAGE_INDEX_STATS["Hits"] += 1
+            logger.debug("get_package_index(): Using the package index we already have for "
+                         + root+"...")
+
+            return PACKAGE_INDEXES[key]
+
+        #Build the index with the lock held, so OSs with the same lists don't all read them.
+        #This is only slow once per set of lists.
+        PACKAGE_INDEX_STATS["Misses"] += 1
+        pattern = _APT_LIST_PACKAGE if package_manager == "apt-get" else _RPM_METADATA_PACKAGE
+        names = set()
+
+        for path, name, opener in package_lists:
+            try:
+                with opener(path, "rb") as package_list:
+                    names.update(read_package_names(package_list, pattern))
+
+            except (OSError, EOFError, lzma.LZMAError) as error:
+                logger.info("get_package_index(): Couldn't read "+name+" in "+root+": "
+                            + str(error))
+
+                return None
+
+        index = frozenset(name.decode("UTF-8", errors="ignore") for name in names)
+        PACKAGE_INDEXES[key] = index
+
+    logger.info("get_package_index(): Found "+str(len(index))+" packages in "
+                + str(len(package_lists))+" package lists in "+root+"...")
+
+    return index
+
+def get_available_packages(root, package_manager, packages):
+    """
+    Return the set of the given packages that can be installed in the OS mounted at root,
+    or None if we can't read its package lists.
+    """
+
+    index = get_package_index(root, package_manager)
+
+    if index is None:
+        return None
+
+    return set(package for package in packages if package in index)
@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Filesystem Signature Tools in the StartupTools Package in the Tools Package for WxFixBoot
+# This file is part of WxFixBoot.
+# Copyright (C) 2013-2020 Hamish McIntyre-Bhatty
+# WxFixBoot is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3 or,
+# at your option, any later version.
+#
+# WxFixBoot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WxFixBoot.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=logging-not-lazy
+#
+# Reason (logging-not-lazy): This is a more readable way of logging.
+
+"""
+This module reads the first few KB of a partition to find out what is on it, without mounting
+it. get_oss() uses this to skip partitions that can't have an operating system on them, like
+swap, LUKS containers, empty partitions, EFI system partitions and data partitions.
+
+Only the structures we need are read: the ext2/3/4 superblock and root directory, the FAT boot
+sector and root directory, the NTFS boot sector, and the HFS+ volume header. Anything we don't
+recognise is assumed to possibly have an OS on it, so it's still looked at properly.
+"""
+
+#Import modules.
+import logging
+import os
+import struct
+import sys
+
+#Import other modules.
+sys.path.append('../..') #Need to be able to import the Tools module from here.
+import Tools.coretools as CoreTools #pylint: disable=wrong-import-position
+
+#Set up logging.
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.getLogger("WxFixBoot").getEffectiveLevel())
+
+#Define global variables
+#How much to read from the start of each partition.
+HEAD_SIZE = 8192
+
+#btrfs keeps its superblock 64 KiB in, so we have to look there too before deciding a
+#partition is empty.
+SECOND_BLOCK = (65536, 4096)
+
+#If we can't open a partition ourselves, this much of its start is read as root, in one go.
+#That covers the headers and superblocks we look at, but usually not root directories. Those
+#are then treated as unreadable, so the partition is mounted and looked at properly instead.
+PRIVILEGED_READ_SIZE = SECOND_BLOCK[0] + SECOND_BLOCK[1]
+
+#The most directory blocks we'll read to list a root directory.
+MAX_DIRECTORY_BLOCKS = 16
+
+#ext2/3/4 feature flags we care about.
+EXT_COMPAT_HAS_JOURNAL = 0x4
+EXT_INCOMPAT_JOURNAL_DEV = 0x8
+EXT_INCOMPAT_EXTENTS = 0x40
+EXT_INCOMPAT_64BIT = 0x80
+EXT_INCOMPAT_FLEX_BG = 0x200
+
+#ext2/3/4 inode flags we care about.
+EXT_INODE_EXTENTS = 0x80000
+EXT_INODE_INLINE_DATA = 0x10000000
+
+#Directories that are in the root directory of every Linux installation we can look at.
+LINUX_ROOT_MARKERS = ("etc",)
+
+#Directories that mean Windows is installed on a FAT partition.
+WINDOWS_ROOT_MARKERS = ("WINDOWS", "WINNT")
+
+class BlockReader:
+    """
+    Reads parts of a partition (or an image file). If we aren't allowed to open it ourselves,
+    the start of it is read as root with dd once instead (see PRIVILEGED_READ_SIZE).
+    """
+
+    def __init__(self, path):
+        """Set up the reader. The partition isn't opened until the first read."""
+        self.path = path
+        self.file_descriptor = None
+        self.data = None
+
+    def read(self, offset, size):
+        """Read size bytes from the given offset. Returns less at the end of the partition."""
+        if self.data is None and self.file_descriptor is None:
+            try:
+                self.file_descriptor = os.open(self.path, os.O_RDONLY)
+
+            except PermissionError:
+                self.read_as_root()
+
+        if self.data is None:
+            return os.pread(self.file_descriptor, size, offset)
+
+        #If dd got less than we asked for, we've got up to the end of the partition.
+        if offset + size > len(self.data) and len(self.data) == PRIVILEGED_READ_SIZE:
+            raise OSError("Only the first "+str(PRIVILEGED_READ_SIZE)+" bytes of "+self.path
+                          + " were read as root")
+
+        return self.data[offset:offset+size]
+
+    def read_as_root(self):
+        """Read the start of the partition as root, for all the reads after this."""
+        ret_val, capture = CoreTools.start_process("dd if="+self.path+" bs=65536 count="
+                                                   + str(PRIVILEGED_READ_SIZE)
+                                                   + " iflag=count_bytes status=none",
+                                                   show_output=False, privileged=True,
+                                                   capture_output=True)
+
+        with capture:
+            if ret_val != 0:
+                raise OSError("Couldn't read "+self.path+" with dd (return value "
+                              + str(ret_val)+")")
+
+            self.data = bytes(capture.data())
+
+    def close(self):
+        """Close the partition, if we opened it."""
+        if self.file_descriptor is not None:
+            os.close(self.file_descriptor)
+            self.file_descriptor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+def new_signature(signature, can_host_os, reason):
+    """Return a result for read_signature()."""
+    return {"Signature": signature, "CanHostOS": can_host_os, "Reason": reason}
+
+def parse_ext_directory(data):
+    """Return the names in some ext2/3/4 directory entries."""
+    names = []
+    position = 0
+
+    while position + 8 <= len(data):
+        inode, record_length, name_length = struct.unpack_from("<IHB", data, position)
+
+        if record_length < 8 or position + record_length > len(data):
+            break
+
+        if inode != 0 and name_length > 0:
+            names.append(data[position+8:position+8+name_length].decode("UTF-8",
+                                                                         errors="ignore"))
+
+        position += record_length
+
+    return names
+
+def get_ext_extent_blocks(reader, block_size, node, depth=0):
+    """
+    Return a list of the blocks in an extent tree node (from an inode's i_block, or a block
+    of the tree), following index nodes. Stops after MAX_DIRECTORY_BLOCKS blocks.
+    """
+
+    magic, entries, _, tree_depth = struct.unpack_from("<HHHH", node, 0)
+
+    if magic != 0xF30A or depth > 4:
+        return []
+
+    blocks = []
+
+    for number in range(min(entries, (len(node) - 12) // 12)):
+        offset = 12 + number * 12
+
+        if tree_depth == 0:
+            _, length, start_high, start_low = struct.unpack_from("<IHHI", node, offset)
+
+            #Uninitialised extents have the top bit of the length set.
+            if length > 32768:
+                length -= 32768
+
+            start = (start_high << 32) | start_low
+            blocks.extend(range(start, start + length))
+
+        else:
+            _, leaf_low, leaf_high = struct.unpack_from("<IIH", node, offset)
+            leaf = reader.read(((leaf_high << 32) | leaf_low) * block_size, block_size)
+            blocks.extend(get_ext_extent_blocks(reader, block_size, leaf, depth+1))
+
+        if len(blocks) >= MAX_DIRECTORY_BLOCKS:
+            break
+
+    return blocks[:MAX_DIRECTORY_BLOCKS]
+
+def list_ext_root_directory(reader, superblock):
+    """
+    List the root directory of an ext2/3/4 filesystem, by looking up the root inode (inode 2).
+    Returns a list of names, or None if it couldn't be read.
+    """
+
+    first_data_block, log_block_size = struct.unpack_from("<II", superblock, 0x14)
+    inodes_per_group = struct.unpack_from("<I", superblock, 0x28)[0]
+    revision = struct.unpack_from("<I", superblock, 0x4C)[0]
+    incompat = struct.unpack_from("<I", superblock, 0x60)[0]
+
+    if log_block_size > 6 or inodes_per_group == 0:
+        return None
+
+    block_size = 1024 << log_block_size
+    inode_size = 128
+
+    if revision >= 1:
+        inode_size = struct.unpack_from("<H", superblock, 0x58)[0]
+
+    #Find the inode table for the first block group, from its group descriptor.
+    descriptor = reader.read((first_data_block + 1) * block_size, 64)
+
+    if len(descriptor) < 32:
+        return None
+
+    inode_table = struct.unpack_from("<I", descriptor, 0x8)[0]
+
+    if incompat & EXT_INCOMPAT_64BIT and struct.unpack_from("<H", superblock, 0xFE)[0] >= 64 \
+        and len(descriptor) >= 64:
+
+        inode_table |= struct.unpack_from("<I", descriptor, 0x28)[0] << 32
+
+    #The root directory is always inode 2, the second in the table.
+    inode = reader.read(inode_table * block_size + inode_size, 128)
+
+    if len(inode) < 128:
+        return None
+
+    mode, _, size = struct.unpack_from("<HHI", inode, 0)
+    flags = struct.unpack_from("<I", inode, 0x20)[0]
+    i_block = inode[0x28:0x28+60]
+
+    if mode & 0xF000 != 0x4000:
+        return None
+
+    if flags & EXT_INODE_INLINE_DATA:
+        #Small directories can be stored in the inode itself, after the parent's inode number.
+        return parse_ext_directory(i_block[4:])
+
+    if flags & EXT_INODE_EXTENTS:
+        blocks = get_ext_extent_blocks(reader, block_size, i_block)
+
+    else:
+        blocks = [block for block in struct.unpack("<15I", i_block)[:12] if block != 0]
+
+    blocks = blocks[:-(-size // block_size)]
+
+    #Don't guess if the directory is too big to read all of it.
+    if not blocks or len(blocks) >= MAX_DIRECTORY_BLOCKS:
+        return None
+
+    names = []
+
+    for block in blocks:
+        names.extend(parse_ext_directory(reader.read(block * block_size, block_size)))
+
+    return names
+
+def identify_ext(reader, head):
+    """Identify an ext2/3/4 filesystem, and check if it has a Linux root directory."""
+    superblock = head[1024:2048]
+    compat, incompat = struct.unpack_from("<II", superblock, 0x5C)
+
+    if incompat & EXT_INCOMPAT_JOURNAL_DEV:
+        return new_signature("jbd", False, "it is an external ext3/4 journal")
+
+    if incompat & (EXT_INCOMPAT_EXTENTS|EXT_INCOMPAT_64BIT|EXT_INCOMPAT_FLEX_BG):
+        signature = "ext4"
+
+    elif compat & EXT_COMPAT_HAS_JOURNAL:
+        signature = "ext3"
+
+    else:
+        signature = "ext2"
+
+    try:
+        names = list_ext_root_directory(reader, superblock)
+
+    except OSError:
+        names = None
+
+    if names is None:
+        return new_signature(signature, True, "its root directory couldn't be read")
+
+    if not all(marker in names for marker in LINUX_ROOT_MARKERS):
+        return new_signature(signature, False, "there is no /etc in its root directory")
+
+    return new_signature(signature, True, "it looks like a Linux root filesystem")
+
+def list_fat_root_directory(reader, head):
+    """
+    List the directories in the root directory of a FAT12/16/32 filesystem. Returns a list
+    of short names, or None if it couldn't all be read.
+    """
+
+    bytes_per_sector, sectors_per_cluster, reserved_sectors, fats, root_entries = \
+    struct.unpack_from("<HBHBH", head, 11)
+
+    fat_size = struct.unpack_from("<H", head, 22)[0]
+
+    if bytes_per_sector not in (512, 1024, 2048, 4096) or sectors_per_cluster == 0 or fats == 0:
+        return None
+
+    if fat_size == 0:
+        #FAT32 keeps the root directory in the data area, like any other directory. We only
+        #read its first cluster.
+        fat_size, _, _, root_cluster = struct.unpack_from("<IHHI", head, 36)
+        offset = (reserved_sectors + fats * fat_size
+                  + (root_cluster - 2) * sectors_per_cluster) * bytes_per_sector
+
+        size = sectors_per_cluster * bytes_per_sector
+
+    else:
+        offset = (reserved_sectors + fats * fat_size) * bytes_per_sector
+        size = root_entries * 32
+
+    data = reader.read(offset, min(size, MAX_DIRECTORY_BLOCKS * 4096))
+    names = []
+
+    for position in range(0, len(data) - 31, 32):
+        entry = data[position:position+32]
+
+        if entry[0] == 0:
+            #End of the directory.
+            return names
+
+        #Skip deleted entries, long names and volume labels, and only keep directories.
+        if entry[0] == 0xE5 or entry[11] & 0x0F == 0x0F or entry[11] & 0x08 \
+            or not entry[11] & 0x10:
+
+            continue
+
+        names.append(entry[0:8].decode("ascii", errors="ignore").strip())
+
+    #We didn't get to the end of the directory, so we might have missed something.
+    return None
+
+def identify_fat(reader, head):
+    """Identify a FAT filesystem, and check if it has Windows on it."""
+    try:
+        names = list_fat_root_directory(reader, head)
+
+    except OSError:
+        names = None
+
+    if names is None:
+        return new_signature("vfat", True, "its root directory couldn't be read")
+
+    if not any(marker in names for marker in WINDOWS_ROOT_MARKERS):
+        return new_signature("vfat", False, "there is no Windows directory in its root "
+                             + "directory (eg an EFI system partition)")
+
+    return new_signature("vfat", True, "it has a Windows directory")
+
+def identify_hfsplus(head):
+    """Identify an HFS+ filesystem, and check if it has a blessed (bootable) system folder."""
+    #The Finder info in the volume header holds the IDs of the blessed system folders.
+    finder_info = struct.unpack_from(">8I", head, 1024+80)
+
+    if finder_info[0] == 0 and finder_info[5] == 0:
+        return new_signature("hfsplus", False, "it has no blessed system folder")
+
+    return new_signature("hfsplus", True, "it has a blessed system folder")
+
+def identify(reader):
+    """
+    Identify what's on a partition, using the given BlockReader. Returns a dictionary with
+    the signature we found, whether there could be an OS on the partition, and why.
+    """
+
+    head = reader.read(0, HEAD_SIZE)
+
+    if len(head) < 2048:
+        return new_signature("unknown", False, "it is too small")
+
+    if head[0:6] == b"LUKS\xba\xbe":
+        return new_signature("luks", False, "it is encrypted with LUKS")
+
+    if head[4086:4096] in (b"SWAPSPACE2", b"SWAP-SPACE"):
+        return new_signature("swap", False, "it is swap space")
+
+    if struct.unpack_from("<H", head, 1024+0x38)[0] == 0xEF53:
+        return identify_ext(reader, head)
+
+    if head[3:11] == b"NTFS    ":
+        return new_signature("ntfs", True, "it is NTFS")
+
+    if head[3:11] == b"EXFAT   ":
+        return new_signature("exfat", True, "it is exFAT")
+
+    if head[1024:1026] in (b"H+", b"HX"):
+        return identify_hfsplus(head)
+
+    if head[1024:1026] == b"BD":
+        return new_signature("hfs", True, "it is HFS")
+
+    if head[32:36] == b"NXSB":
+        return new_signature("apfs", True, "it is an APFS container")
+
+    if head[0:4] == b"XFSB":
+        return new_signature("xfs", True, "it is XFS")
+
+    if head[510:512] == b"\x55\xaa" and (head[54:57] == b"FAT" or head[82:87] == b"FAT32"):
+        return identify_fat(reader, head)
+
+    second_block = reader.read(*SECOND_BLOCK)
+
+    if second_block[64:72] == b"_BHRfS_M":
+        return new_signature("btrfs", True, "it is btrfs")
+
+    if second_block[-10:] in (b"SWAPSPACE2", b"SWAP-SPACE") and len(second_block) == 4096:
+        #Swap space made on a computer with 64 KiB pages.
+        return new_signature("swap", False, "it is swap space")
+
+    if not any(head) and not any(second_block):
+        return new_signature("empty", False, "it is empty")
+
+    return new_signature("unknown", True, "its filesystem wasn't recognised")
+
+def read_signature(partition):
+    """
+    Identify what's on the given partition without mounting it (see identify()). If it can't
+    be read, we assume there could be an OS on it.
+    """
+
+    try:
+        with BlockReader(partition) as reader:
+            signature = identify(reader)
+
+    except (OSError, struct.error) as error:
+        logger.warning("read_signature(): Couldn't read "+partition+": "+str(error))
+        return new_signature("unknown", True, "it couldn't be read")
+
+    logger.debug("read_signature(): "+partition+": "+str(signature))
+    return signature
@@ -15,6 +15,10 @@
 # You should have received a copy of the GNU General Public License
 # along with WxFixBoot.  If not, see <http://www.gnu.org/licenses/>.
 from . import dictionaries
+from . import brokertools
+from . import outputtools
+from . import devicetools
+from . import mounttools
 from . import coretools
 from . import dialogtools
 from . import notebookfunctions
@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Privileged Broker Tools in the Tools Package for WxFixBoot
+# This file is part of WxFixBoot.
+# Copyright (C) 2013-2020 Hamish McIntyre-Bhatty
+# WxFixBoot is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3 or,
+# at your option, any later version.
+#
+# WxFixBoot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WxFixBoot.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=logging-not-lazy
+#
+# Reason (logging-not-lazy): This is a more readable way of logging.
+
+"""
+This module talks to the privileged command broker (Tools/helpers/runasroot_linux_broker.py).
+The broker is started through pkexec once, and then runs all of our privileged commands
+for the rest of the session, so we don't have to go through pkexec and polkit every time.
+
+If the broker can't be started (eg the user dismissed the authentication dialog), everything
+falls back to running each command through pkexec, like before.
+"""
+
+#Import modules.
+import atexit
+import base64
+import itertools
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+
+#Set up logging.
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.getLogger("WxFixBoot").getEffectiveLevel())
+
+#Define global variables
+#The broker we're using, if any.
+BROKER = None
+
+#Where the broker is installed.
+BROKER_HELPER = "/usr/share/wxfixboot/Tools/helpers/runasroot_linux_broker.py"
+
+#The copy of the broker next to this module, used for the unprivileged stand-in.
+LOCAL_BROKER_HELPER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "helpers",
+                                   "runasroot_linux_broker.py")
+
+#How long to wait for the broker to exit when we close it, in seconds. The broker gives
+#commands that are still running up to 10 seconds to finish before it kills them.
+BROKER_EXIT_TIMEOUT = 20
+
+class BrokeredProcess:
+    """
+    A command running in the broker. This looks enough like a subprocess.Popen object
+    that the readers in CoreTools can use it without knowing the difference.
+    """
+
+    def __init__(self, broker, request_id, args):
+        """Set up the pipe that the command's output is sent through."""
+        self.broker = broker
+        self.request_id = request_id
+        self.args = args
+        self.returncode = None
+        self.results = None
+        self.done = threading.Event()
+
+        #Output that the reader hasn't made room for in the pipe yet, and the thread that
+        #waits to write it (see send_output()).
+        self.pending = bytearray()
+        self.pending_changed = threading.Condition()
+        self.writer = None
+        self.finishing = False
+        self.finish_retval = None
+
+        read_fd, self.write_fd = os.pipe()
+        os.set_blocking(self.write_fd, False)
+        self.stdout = os.fdopen(read_fd, "rb")
+
+    def send_output(self, data):
+        """
+        Pass some output from the broker on to whoever is reading it. This is called by the
+        broker's dispatcher thread, so it must never block, or one reader that stops reading
+        would hold up every other privileged command. If the pipe is full, the output is kept
+        here, and a writer thread for this request passes it on when the reader catches up.
+        """
+
+        with self.pending_changed:
+            if self.writer is not None:
+                self.pending += data
+                self.pending_changed.notify()
+                return
+
+            try:
+                written = os.write(self.write_fd, data)
+
+            except BlockingIOError:
+                written = 0
+
+            except OSError:
+                #Nobody is reading the output any more.
+                return
+
+            if written == len(data):
+                return
+
+            self.pending += data[written:]
+            self.writer = threading.Thread(target=self.write_pending, daemon=True)
+            self.writer.start()
+
+    def write_pending(self):
+        """Write output kept by send_output() to the pipe, waiting for the reader if needed."""
+        os.set_blocking(self.write_fd, True)
+        reading = True
+
+        while True:
+            with self.pending_changed:
+                while not self.pending and not self.finishing:
+                    self.pending_changed.wait()
+
+                data = bytes(self.pending)
+                self.pending.clear()
+
+                if not data:
+                    break
+
+            while data and reading:
+                try:
+                    data = data[os.write(self.write_fd, data):]
+
+                except OSError:
+                    #Nobody is reading the output any more, so throw the rest away.
+                    reading = False
+
+        self.close_pipe(self.finish_retval)
+
+    def close_pipe(self, retval):
+        """Close the pipe so the reader sees EOF, and record the return value."""
+        os.close(self.write_fd)
+        self.returncode = retval
+        self.done.set()
+
+    def finish(self, retval):
+        """
+        Record the return value, and close the pipe so the reader sees EOF, once any output
+        still waiting to be written has been.
+        """
+
+        with self.pending_changed:
+            if self.finishing:
+                return
+
+            self.finishing = True
+            self.finish_retval = retval
+
+            if self.writer is not None:
+                self.pending_changed.notify()
+                return
+
+        self.close_pipe(retval)
+
+    def send_signal(self, signum):
+        """Ask the broker to send a signal to the command's process group."""
+        if not self.done.is_set():
+            self.broker.send_signal(self.request_id, signum)
+
+    def poll(self):
+        """Return the return value if the command has finished, otherwise None"""
+        return self.returncode
+
+    def wait(self, timeout=None):
+        """Wait for the command to finish, and return its return value"""
+        if not self.done.wait(timeout):
+            raise subprocess.TimeoutExpired(self.args, timeout)
+
+        return self.returncode
+
+class PrivilegedBroker:
+    """
+    A connection to a running broker process. Requests can be made from any thread,
+    and several can run at the same time.
+    """
+
+    def __init__(self, cmdline):
+        """Start the broker and wait for it to say it's ready."""
+        self.cmdline = cmdline
+        self.request_ids = itertools.count(1)
+        self.requests = {}
+        self.lock = threading.Lock()
+        self.alive = False
+        self.closing = False
+
+        self.process = subprocess.Popen(cmdline, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        shell=False)
+
+        #pkexec will exit without starting the broker if authentication fails.
+        try:
+            hello = json.loads(self.process.stdout.readline().decode("utf-8"))
+
+        except ValueError:
+            hello = {}
+
+        if not hello.get("ready"):
+            self.process.wait()
+            raise OSError("Broker didn't start (return value "+str(self.process.returncode)+")")
+
+        self.pid = hello["pid"]
+        self.alive = True
+
+        self.dispatcher = threading.Thread(target=self.dispatch, daemon=True)
+        self.dispatcher.start()
+
+    def dispatch(self):
+        """Pass responses from the broker on to the requests they belong to."""
+        for line in self.process.stdout:
+            try:
+                response = json.loads(line.decode("utf-8"))
+
+            except ValueError:
+                logger.error("PrivilegedBroker().dispatch(): Bad response from broker: "
+                             + str(line))
+                continue
+
+            with self.lock:
+                request = self.requests.get(response.get("id"))
+
+            if request is None:
+                continue
+
+            if "output" in response:
+                request.send_output(base64.b64decode(response["output"]))
+
+            if "results" in response:
+                request.results = response["results"]
+
+            if "retval" in response:
+                with self.lock:
+                    del self.requests[response["id"]]
+
+                request.finish(response["retval"])
+
+        #The broker has gone away. Fail anything that was still running.
+        if not self.closing:
+            logger.error("PrivilegedBroker().dispatch(): Broker exited unexpectedly!")
+
+        with self.lock:
+            self.alive = False
+            requests = list(self.requests.values())
+            self.requests.clear()
+
+        for request in requests:
+            request.finish(1)
+
+    def send_request(self, request, args):
+        """Send a request to the broker, returning a BrokeredProcess for it."""
+        with self.lock:
+            if not self.alive:
+                raise OSError("Broker isn't running")
+
+            request["id"] = next(self.request_ids)
+            process = BrokeredProcess(self, request["id"], args)
+            self.requests[request["id"]] = process
+
+            try:
+                self.process.stdin.write(json.dumps(request).encode("utf-8")+b"\n")
+                self.process.stdin.flush()
+
+            except OSError:
+                del self.requests[request["id"]]
+                self.alive = False
+                raise
+
+        return process
+
+    def run(self, argv, env=None, stdin=None):
+        """
+        Run a command as root. argv is a list of arguments, like subprocess.Popen takes.
+        env is a dictionary of environment variables to override. stdin is bytes to send
+        to the command, if any.
+        """
+
+        request = {"op": "run", "argv": argv, "env": env or {}, "stdin": None}
+
+        if stdin is not None:
+            request["stdin"] = base64.b64encode(stdin).decode("ascii")
+
+        return self.send_request(request, argv)
+
+    def run_batch(self, steps, env=None):
+        """
+        Run several commands as root, one after the other, in one request. steps is a list of
+        argument lists. When it's done, the BrokeredProcess's results attribute has a
+        dictionary with the return value and run time of each step that was run.
+        """
+
+        request = {"op": "batch", "steps": steps, "env": env or {}}
+
+        return self.send_request(request, ["batch"]+[' '.join(step) for step in steps])
+
+    def write_file(self, path, data):
+        """Write the given bytes to a file as root, returning a BrokeredProcess."""
+        request = {"op": "write_file", "path": path,
+                   "data": base64.b64encode(data).decode("ascii")}
+
+        return self.send_request(request, ["write_file", path])
+
+    def send_signal(self, request_id, signum):
+        """Send a signal to the process group of the command run by the given request."""
+        with self.lock:
+            if not self.alive:
+                return
+
+            try:
+                self.process.stdin.write(json.dumps({"op": "signal", "target": request_id,
+                                                     "signal": int(signum)}).encode("utf-8")
+                                         + b"\n")
+                self.process.stdin.flush()
+
+            except OSError:
+                self.alive = False
+
+    def close(self):
+        """Ask the broker to exit, and wait for it to do so."""
+        with self.lock:
+            self.closing = True
+
+            if self.alive:
+                try:
+                    self.process.stdin.write(b"{\"op\": \"quit\"}\n")
+                    self.process.stdin.close()
+
+                except OSError:
+                    pass
+
+        try:
+            self.process.wait(timeout=BROKER_EXIT_TIMEOUT)
+
+        except subprocess.TimeoutExpired:
+            logger.error("PrivilegedBroker.close(): Broker didn't exit in time! Killing it...")
+
+            try:
+                self.process.terminate()
+                self.process.wait(timeout=BROKER_EXIT_TIMEOUT)
+
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+            except OSError:
+                #We aren't allowed to signal it (it's running as root). Give up on it.
+                pass
+
+        self.dispatcher.join(timeout=BROKER_EXIT_TIMEOUT)
+
+def start_broker(local=False):
+    """
+    Start the privileged broker, if it isn't already running. If local is True, start the
+    unprivileged stand-in, which runs the broker from this source tree without pkexec.
+    Returns True if the broker is running afterwards, otherwise False.
+    """
+
+    global BROKER
+
+    if broker_available():
+        return True
+
+    if local:
+        cmdline = [sys.executable, LOCAL_BROKER_HELPER]
+
+    else:
+        cmdline = ["pkexec", BROKER_HELPER]
+
+    logger.info("start_broker(): Starting privileged broker with: "+' '.join(cmdline)+"...")
+
+    try:
+        BROKER = PrivilegedBroker(cmdline)
+
+    except OSError as error:
+        logger.warning("start_broker(): Couldn't start broker: "+str(error)+". Falling back "
+                       + "to running each privileged command with pkexec...")
+
+        BROKER = None
+        return False
+
+    atexit.register(stop_broker)
+
+    logger.info("start_broker(): Broker is running with PID "+str(BROKER.pid)+".")
+    return True
+
+def stop_broker():
+    """Stop the broker, if it is running."""
+    global BROKER
+
+    if BROKER is None:
+        return
+
+    logger.info("stop_broker(): Stopping privileged broker...")
+
+    BROKER.close()
+    BROKER = None
+
+def broker_available():
+    """Returns True if the broker is running and can take requests, otherwise False"""
+    return BROKER is not None and BROKER.alive
@@ -25,15 +25,27 @@ This module contains the "core tools" used in various parts of WxFixBoot.
 
 #Import modules.
 import subprocess
+import asyncio
+import contextlib
+import functools
+import json
 import sys
 import time
 import logging
 import os
+import re
 import shlex
+import codecs
+import signal
+import selectors
+import threading
 import wx
 
 #Import other modules.
 from . import dialogtools as DialogTools
+from . import brokertools as BrokerTools
+from . import outputtools as OutputTools
+from . import mounttools as MountTools
 from .dictionaries import DISK_INFO #pylint: disable=wrong-import-position
 
 #Set up logging.
@@ -43,6 +55,112 @@ logger.setLevel(logging.getLogger("WxFixBoot").getEffectiveLevel())
 #Define global variables
 STARTUP = None
 
+#Which output readers start_process() uses. "chunked" reads output in large non-blocking
+#chunks, "bytewise" uses the original readers that read one byte at a time.
+READER_ENGINE = "chunked"
+
+#How many bytes the chunked readers ask for at once.
+CHUNK_SIZE = 65536
+
+#How many processes start_processes() runs at the same time by default.
+MAX_CONCURRENT_PROCESSES = 8
+
+#Results of commands marked as idempotent, so they only have to run once. Keyed by
+#cache_key(). This is kept when WxFixBoot restarts, apart from results that involve
+#WxFixBoot's mountpoints.
+RESULT_CACHE = {}
+CACHE_STATS = {"Hits": 0, "Misses": 0, "Invalidations": 0}
+CACHE_LOCK = threading.Lock()
+
+#Package manager commands, and the arguments that mean they'll change installed packages.
+#Running one of these invalidates the whole cache.
+PACKAGE_OPERATIONS = {"apt-get": ("install", "remove", "purge", "reinstall", "update",
+                                  "upgrade", "dist-upgrade", "autoremove"),
+                      "apt": ("install", "remove", "purge", "reinstall", "update", "upgrade",
+                              "full-upgrade", "autoremove"),
+                      "dnf": ("install", "remove", "erase", "reinstall", "upgrade",
+                              "distro-sync", "autoremove", "makecache"),
+                      "dpkg": ("-i", "--install", "-r", "--remove", "-P", "--purge",
+                               "--configure"),
+                      "rpm": ("-i", "--install", "-e", "--erase", "-U", "--upgrade")}
+
+#Every command that has been run, with timing information, in the order they finished.
+#See record_trace().
+TRACE = []
+TRACE_LOCK = threading.Lock()
+
+#When tracing started, so trace times can be given relative to it.
+TRACE_START = time.monotonic()
+
+#If set, the trace is written here when WxFixBoot exits (see the --trace option).
+TRACE_FILE = None
+
+#How long commands may run for, in seconds, unless start_process() is given a timeout.
+#None means commands can run for as long as they like.
+DEFAULT_TIMEOUT = None
+
+#Timeout for commands that use the network, like updating package lists, which can hang
+#forever if the connection drops.
+NETWORK_TIMEOUT = 900
+
+#How long a command has to exit after SIGTERM before it gets SIGKILL.
+KILL_GRACE_PERIOD = 5
+
+#Return values for commands that were killed because they timed out or were cancelled.
+#These match what the timeout command and shells use.
+TIMEOUT_RETVAL = 124
+CANCELLED_RETVAL = 130
+
+#Commands that are running now, with their arguments, and the return value to report for
+#them if we killed them (otherwise None). See watch_process().
+RUNNING_PROCESSES = {}
+PROCESS_LOCK = threading.Lock()
+
+#Set when the user cancels operations. See cancel_processes().
+CANCELLED = threading.Event()
+
+#Mounts held by mount sessions, keyed by (partition, mount point). Each has the number of
+#holders, and whether we mounted it (so we're the ones who should unmount it). Mounts we made
+#stay mounted after the last holder is done, in case something else wants them again, until
+#release_idle_mounts() or release_all_mounts() is called. See acquire_mount().
+MOUNT_HOLDS = {}
+MOUNT_LOCK = threading.RLock()
+MOUNT_STATS = {"Mounts": 0, "Unmounts": 0, "Reused": 0, "Upgrades": 0}
+
+#A lock for each (partition, mount point), held while it's being mounted or unmounted, so
+#different partitions can be mounted at the same time. Chroots have one too, keyed by
+#(None, mount point), held while they're set up or torn down. MOUNT_LOCK is only held to look
+#at or change MOUNT_HOLDS and CHROOT_POOL, and never while waiting for one of these or for
+#a command. See get_mount_lock().
+MOUNT_KEY_LOCKS = {}
+
+#Options for probe mounts, which are only used to look at what's on a partition. These are
+#read-only, and skip journal replay where the filesystem allows it, so looking at a dirty
+#filesystem is quick and doesn't write anything to it. See acquire_mount().
+PROBE_MOUNT_OPTIONS = {"ext3": "-o ro,noload", "ext4": "-o ro,noload",
+                       "xfs": "-o ro,norecovery", "btrfs": "-o ro,nologreplay"}
+
+#For everything else (ext2, ntfs, vfat, exfat, hfsplus, etc), read-only is enough.
+DEFAULT_PROBE_MOUNT_OPTIONS = "-o ro"
+
+#Chroots that are set up, keyed by mount point, so they can be reused instead of being set up
+#again for every operation. Each has the mount points inside it when /etc/mtab was last
+#updated, whether resolv.conf was backed up, and whether the mount was read-only when it was
+#set up (so resolv.conf and /etc/mtab weren't touched). See acquire_chroot().
+CHROOT_POOL = {}
+CHROOT_STATS = {"Built": 0, "Reused": 0, "Rebuilt": 0, "TornDown": 0}
+
+#Filesystems bound into every chroot.
+CHROOT_BIND_MOUNTS = ("/dev", "/dev/pts", "/proc", "/run", "/sys")
+
+#How long each chroot took to set up and tear down, keyed by mount point.
+CHROOT_TIMINGS = {}
+
+#Line framing for the chunked readers. At startup, lines end after every \n or \r. For the
+#output box, lines end after \n, \x08, \r\n, or \r plus whatever byte comes after it.
+_STARTUP_LINE_SPLIT = re.compile("(?<=[\r\n])")
+_OUTPUT_BOX_LINE = re.compile(b"[^\r\n\x08]*(?:\r\n|\r.|[\n\x08])", re.DOTALL)
+
 def get_helper(cmd):
     """Figure out which helper script to use."""
     helper = "/usr/share/wxfixboot/Tools/helpers/runasroot_linux.sh"
@@ -54,62 +172,508 @@ def get_helper(cmd):
     return "pkexec "+helper
 
 def start_process(exec_cmds, show_output=True, return_output=False, testing=False,
-                  privileged=False):
+                  privileged=False, idempotent=False, timeout=None, capture_output=False):
     """Start a process given a string of commands to execute.
     show_output is boolean and specifies whether to show output in the outputbox (if exists) or
     not.
 
     return_output is boolean and specifies whether to return the output back to the caller or not.
+
+    idempotent is boolean and specifies whether the command always gives the same result. If it
+    does, the result is cached, and the command is only run again if the cache is invalidated.
+
+    timeout is how many seconds the command may run for before it is killed, and
+    TIMEOUT_RETVAL returned. If it is None, DEFAULT_TIMEOUT is used, and 0 means no timeout.
+    If operations have been cancelled, CANCELLED_RETVAL is returned.
+
+    capture_output is boolean and specifies whether to return the output as an
+    OutputTools.OutputCapture, rather than a string. Use this for commands that can have
+    a lot of output, like listing installed packages, and read it with its lines() method.
+    The output is never cached.
     """
 
     #Save the command as it was passed, in case we need
     #to call recursively (pkexec auth failure/dismissal).
     origcmds = exec_cmds
 
+    if is_cancelled():
+        logger.info("start_process(): Operations have been cancelled, not running: "+exec_cmds)
+        return format_process_result(CANCELLED_RETVAL, [], return_output, testing,
+                                     capture_output)
+
+    idempotent = idempotent and not capture_output
+
+    if idempotent:
+        key = cache_key(exec_cmds, privileged, testing)
+        result = get_cached_result(key, show_output)
+
+        if result is not None:
+            record_cache_hit(key, privileged, result)
+            return format_process_result(result[0], result[1], return_output, testing)
+
+    #If the privileged broker is running, use it instead of pkexec.
+    use_broker = privileged and BrokerTools.broker_available() and get_helper(exec_cmds) != ""
+
     #If this is to be a privileged process, add the helper script to the cmdline.
-    if privileged:
+    if privileged and not use_broker:
         helper = get_helper(exec_cmds)
 
         exec_cmds = helper+" "+exec_cmds
 
-    #Make sure output is always in English.
-    environ = dict(os.environ, LC_ALL="C")
-
     exec_cmds = shlex.split(exec_cmds)
 
+    spawn_start = time.monotonic()
+
     #Run the command(s).
-    logger.debug("start_process(): Starting process: "+' '.join(exec_cmds))
-    cmd = subprocess.Popen(exec_cmds, stdout=subprocess.PIPE,
-                           stderr=subprocess.STDOUT, env=environ,
-                           shell=False)
+    if use_broker:
+        logger.debug("start_process(): Starting process with broker: "+' '.join(exec_cmds))
+
+        try:
+            #Make sure output is always in English.
+            cmd = BrokerTools.BROKER.run(exec_cmds, env={"LC_ALL": "C"})
+
+        except OSError:
+            #The broker has gone away. Fall back to pkexec.
+            logger.warning("start_process(): Broker unavailable, falling back to pkexec...")
+            return start_process(exec_cmds=origcmds, show_output=show_output,
+                                 return_output=return_output, testing=testing,
+                                 privileged=privileged, idempotent=idempotent, timeout=timeout,
+                                 capture_output=capture_output)
+
+    else:
+        #Make sure output is always in English.
+        environ = dict(os.environ, LC_ALL="C")
+
+        logger.debug("start_process(): Starting process: "+' '.join(exec_cmds))
+        #Start it in its own process group, so it can be killed along with its children.
+        cmd = subprocess.Popen(exec_cmds, stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT, env=environ,
+                               shell=False, start_new_session=True)
+
+    spawned = time.monotonic()
+    timer = watch_process(cmd, exec_cmds, timeout)
+
+    if capture_output:
+        line_list = capture_chunks(read_chunks(cmd), show_output)
 
     #Use a simpler output reader on startup to improve performance.
-    if STARTUP:
+    elif STARTUP and READER_ENGINE == "chunked":
+        line_list = read_chunked(cmd, testing=testing)
+
+    elif STARTUP:
         line_list = read(cmd, testing=testing)
 
+    elif READER_ENGINE == "chunked":
+        line_list = read_chunked_and_send_output(cmd, show_output)
+
     else:
         line_list = read_and_send_output(cmd, show_output)
 
+    #We've read everything, so close the pipe the output came through.
+    cmd.stdout.close()
+
+    if not STARTUP:
+        #Make sure all the output is shown before anything else goes to the output box.
+        OutputTools.OUTPUT_CHANNEL.finish()
+
     #Save runcmd.returncode, as it tends to reset fairly quickly.
-    ret_val = int(cmd.returncode)
+    ret_val = unwatch_process(cmd, timer, int(cmd.returncode))
+
+    record_trace(exec_cmds, privileged, (spawn_start, spawned, time.monotonic()), line_list,
+                 ret_val)
 
     #Log this info in a debug message.
     logger.debug("start_process(): Process: "+' '.join(exec_cmds)
                  +": Return Value: "+str(ret_val)
-                 + ", Output: \"\n\n"+'\n'.join(line_list)+"\"\n")
+                 + ", Output: "+describe_output(line_list)+"\n")
 
-    #Handle these error codes if pkexec is being used.
-    #When commands are not found, we get the same codes,
-    #potential for infinite recursion here... XXX
-    if privileged and (ret_val in (126, 127)) and "pkexec" in exec_cmds \
-        and "chroot" not in exec_cmds \
-        and "lsb_release" not in exec_cmds:
+    if privileged and pkexec_auth_failed(exec_cmds, ret_val):
         #Try again, auth dismissed / bad password 3 times.
         #A lot of recursion is allowed (~1000 times), so this shouldn't be a problem.
         logger.debug("start_process(): Bad auth or dismissed by user. Trying again...")
         return start_process(exec_cmds=origcmds, show_output=show_output,
                              return_output=return_output, testing=testing,
-                             privileged=privileged)
+                             privileged=privileged, idempotent=idempotent, timeout=timeout,
+                             capture_output=capture_output)
+
+    if idempotent and ret_val not in (TIMEOUT_RETVAL, CANCELLED_RETVAL):
+        cache_result(key, ret_val, line_list)
+
+    else:
+        invalidate_cache_for_command(exec_cmds)
+
+    return format_process_result(ret_val, line_list, return_output, testing, capture_output)
+
+def get_caller():
+    """
+    Return the name of the function outside CoreTools (and asyncio) that ran a command,
+    like "Tools.StartupTools.core.determine_package_manager", or "Unknown".
+    """
+
+    frame = sys._getframe(1) #pylint: disable=protected-access
+
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+
+        if module != __name__ and not module.startswith(("asyncio", "concurrent", "threading")):
+            return module+"."+frame.f_code.co_name
+
+        frame = frame.f_back
+
+    return "Unknown"
+
+def record_trace(exec_cmds, privileged, times, line_list, ret_val, cached=False):
+    """
+    Record a command that has just finished in the trace. times is a tuple of when we started
+    to spawn the command, when it had been spawned, and when it finished (from
+    time.monotonic()). line_list is the output, or an OutputTools.OutputCapture. cached is
+    True if the result came from the result cache, and the command wasn't run.
+    """
+
+    spawn_start, spawned, finished = times
+
+    if isinstance(line_list, OutputTools.OutputCapture):
+        output_bytes = line_list.size
+
+    else:
+        output_bytes = len('\n'.join(line_list).encode("utf-8"))
+
+    event = {"Command": exec_cmds, "Privileged": privileged,
+             "Caller": get_caller(), "Thread": threading.current_thread().name,
+             "Start": spawn_start - TRACE_START, "SpawnLatency": spawned - spawn_start,
+             "Runtime": finished - spawned,
+             "OutputBytes": output_bytes,
+             "ReturnValue": ret_val, "Cached": cached}
+
+    with TRACE_LOCK:
+        TRACE.append(event)
+
+def record_cache_hit(key, privileged, result):
+    """
+    Record a command whose result came from the cache in the trace, so the trace shows
+    every command we were asked to run. It took no time, as it wasn't run.
+    """
+
+    now = time.monotonic()
+    record_trace(list(key[0]), privileged, (now, now, now), result[1], result[0], cached=True)
+
+def get_slowest_commands(count=10):
+    """Return the trace events for the count slowest commands, slowest first."""
+    with TRACE_LOCK:
+        events = list(TRACE)
+
+    events.sort(key=lambda event: event["SpawnLatency"]+event["Runtime"], reverse=True)
+
+    return events[:count]
+
+def export_trace(filename=None):
+    """
+    Write the trace to a file in Chrome's trace event format, which can be loaded in
+    chrome://tracing or Perfetto. Uses TRACE_FILE if no filename is given.
+    Returns True if the trace was written, otherwise False.
+    """
+
+    filename = filename or TRACE_FILE
+
+    if filename is None:
+        return False
+
+    with TRACE_LOCK:
+        events = list(TRACE)
+
+    trace_events = []
+
+    for event in events:
+        trace_events.append({"name": ' '.join(event["Command"]), "cat": "process",
+                             "ph": "X", "pid": os.getpid(), "tid": event["Thread"],
+                             "ts": int(event["Start"] * 1000000),
+                             "dur": int((event["SpawnLatency"] + event["Runtime"]) * 1000000),
+                             "args": {"argv": event["Command"],
+                                      "privileged": event["Privileged"],
+                                      "caller": event["Caller"],
+                                      "spawn_latency_ms": round(event["SpawnLatency"] * 1000, 3),
+                                      "runtime_ms": round(event["Runtime"] * 1000, 3),
+                                      "output_bytes": event["OutputBytes"],
+                                      "return_value": event["ReturnValue"],
+                                      "cached": event["Cached"]}})
+
+    try:
+        with open(filename, "w") as trace_file:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, trace_file)
+
+    except OSError as error:
+        logger.error("export_trace(): Couldn't write trace to "+filename+": "+str(error))
+        return False
+
+    logger.info("export_trace(): Wrote trace of "+str(len(trace_events))+" commands to "
+                + filename+".")
+
+    return True
+
+def watch_process(cmd, exec_cmds, timeout=None):
+    """
+    Keep track of a command that has just been started, so it can be cancelled, and arrange
+    for it to be killed if it runs for longer than timeout seconds (see start_process()).
+    Returns the timer that will kill it, if any.
+    """
+
+    if timeout is None:
+        timeout = DEFAULT_TIMEOUT
+
+    with PROCESS_LOCK:
+        RUNNING_PROCESSES[cmd] = {"Command": exec_cmds, "Killed": None}
+
+    timer = None
+
+    if is_cancelled():
+        #cancel_processes() was called while we were starting this.
+        kill_process(cmd, CANCELLED_RETVAL)
+
+    elif timeout:
+        timer = threading.Timer(timeout, kill_process, args=(cmd, TIMEOUT_RETVAL))
+        timer.daemon = True
+        timer.start()
+
+    return timer
+
+def unwatch_process(cmd, timer, ret_val):
+    """
+    Stop keeping track of a command that has exited. Returns its return value, or
+    TIMEOUT_RETVAL or CANCELLED_RETVAL if we killed it.
+    """
+
+    if timer is not None:
+        timer.cancel()
+
+    with PROCESS_LOCK:
+        info = RUNNING_PROCESSES.pop(cmd)
+
+    if info["Killed"] is None:
+        return ret_val
+
+    if info["Killed"] == TIMEOUT_RETVAL:
+        logger.error("unwatch_process(): "+' '.join(info["Command"])+" timed out and was "
+                     + "killed!")
+
+    else:
+        logger.warning("unwatch_process(): "+' '.join(info["Command"])+" was cancelled.")
+
+    return info["Killed"]
+
+def kill_process(cmd, ret_val):
+    """
+    Kill a running command and all of its children with SIGTERM, and then with SIGKILL if it
+    hasn't exited after KILL_GRACE_PERIOD seconds. ret_val is what start_process() returns
+    for it.
+    """
+
+    with PROCESS_LOCK:
+        if cmd not in RUNNING_PROCESSES or RUNNING_PROCESSES[cmd]["Killed"] is not None:
+            #It has already exited, or is already being killed.
+            return
+
+        RUNNING_PROCESSES[cmd]["Killed"] = ret_val
+        exec_cmds = RUNNING_PROCESSES[cmd]["Command"]
+
+    logger.info("kill_process(): Killing "+' '.join(exec_cmds)+"...")
+    signal_process_group(cmd, signal.SIGTERM)
+
+    timer = threading.Timer(KILL_GRACE_PERIOD, signal_process_group,
+                            args=(cmd, signal.SIGKILL))
+
+    timer.daemon = True
+    timer.start()
+
+def signal_process_group(cmd, signum):
+    """Send a signal to a command's process group, if it is still running."""
+    with PROCESS_LOCK:
+        if cmd not in RUNNING_PROCESSES:
+            return
+
+    if isinstance(cmd, BrokerTools.BrokeredProcess):
+        #The broker is running as root, so it has to do this for us.
+        cmd.send_signal(signum)
+        return
+
+    try:
+        os.killpg(cmd.pid, signum)
+
+    except ProcessLookupError:
+        #It has already exited.
+        pass
+
+    except PermissionError:
+        #Commands run through pkexec are owned by root.
+        logger.warning("signal_process_group(): Not allowed to kill process group "
+                       + str(cmd.pid)+"! Privileged commands can only be killed when the "
+                       + "broker is running.")
+
+def cancel_processes():
+    """
+    Cancel operations: kill every running command, and make start_process() return
+    CANCELLED_RETVAL straight away instead of running anything else outside the GUI thread.
+    Commands run on the GUI thread (eg copying the log file when exiting) still work.
+    """
+
+    logger.warning("cancel_processes(): Cancelling operations...")
+    CANCELLED.set()
+
+    with PROCESS_LOCK:
+        running = list(RUNNING_PROCESSES)
+
+    for cmd in running:
+        kill_process(cmd, CANCELLED_RETVAL)
+
+def reset_cancellation():
+    """Allow commands to run again after cancel_processes()."""
+    CANCELLED.clear()
+
+def is_cancelled():
+    """
+    Returns True if operations have been cancelled and the current thread should stop running
+    commands, otherwise False.
+    """
+
+    return CANCELLED.is_set() and threading.current_thread() is not threading.main_thread()
+
+def pkexec_auth_failed(exec_cmds, ret_val):
+    """
+    Returns True if a privileged command (a list of arguments) looks like it failed because
+    pkexec authentication was dismissed or failed, otherwise False.
+    """
+
+    #Handle these error codes if pkexec is being used.
+    #When commands are not found, we get the same codes,
+    #potential for infinite recursion here... XXX
+    return (ret_val in (126, 127)) and "pkexec" in exec_cmds \
+        and "chroot" not in exec_cmds \
+        and "lsb_release" not in exec_cmds
+
+def cache_key(exec_cmds, privileged, testing):
+    """
+    Return the key for a command in the result cache. This is the normalised command line,
+    plus everything else that can change its result: the environment, whether it's privileged,
+    and how its output will be split into lines.
+    """
+
+    return (tuple(shlex.split(exec_cmds)), privileged, bool(STARTUP), testing,
+            ("LC_ALL=C", "PATH="+os.environ.get("PATH", "")))
+
+def get_cached_result(key, show_output):
+    """
+    Return the cached (return value, line list) for a command, or None if there isn't one.
+    The lines are sent to the output box again if needed, as if the command had been run.
+    """
+
+    with CACHE_LOCK:
+        result = RESULT_CACHE.get(key)
+
+        if result is None:
+            CACHE_STATS["Misses"] += 1
+
+        else:
+            CACHE_STATS["Hits"] += 1
+
+        hits, misses = CACHE_STATS["Hits"], CACHE_STATS["Misses"]
+
+    if result is None:
+        logger.debug("get_cached_result(): Cache miss for: "+' '.join(key[0])+" (hits: "
+                     + str(hits)+", misses: "+str(misses)+")")
+
+        return None
+
+    logger.debug("get_cached_result(): Cache hit for: "+' '.join(key[0])+" (hits: "
+                 + str(hits)+", misses: "+str(misses)+")")
+
+    if not STARTUP:
+        for line in result[1]:
+            OutputTools.OUTPUT_CHANNEL.put(line+"\n", show_output)
+
+        OutputTools.OUTPUT_CHANNEL.finish()
+
+    return (result[0], list(result[1]))
+
+def cache_result(key, ret_val, line_list):
+    """Save the result of an idempotent command in the cache."""
+    with CACHE_LOCK:
+        RESULT_CACHE[key] = (ret_val, list(line_list))
+
+def invalidate_cache(path=None):
+    """
+    Remove results from the cache. If path is given, only remove results for commands that
+    mention it (including in a longer path, eg a mountpoint named after a partition), otherwise
+    clear the whole cache.
+    """
+
+    with CACHE_LOCK:
+        if path is None:
+            keys = list(RESULT_CACHE.keys())
+
+        else:
+            keys = [key for key in RESULT_CACHE if any(path in arg for arg in key[0])]
+
+        for key in keys:
+            del RESULT_CACHE[key]
+
+        CACHE_STATS["Invalidations"] += len(keys)
+
+    if keys:
+        logger.debug("invalidate_cache(): Invalidated "+str(len(keys))+" cached results for "
+                     + str(path or "all commands")+"...")
+
+def invalidate_cache_for_command(exec_cmds):
+    """
+    Invalidate any cached results that the given command (a list of arguments) might have
+    made stale. Mounting and unmounting invalidates results that mention the paths involved,
+    and package operations invalidate everything. Called automatically by start_process().
+    """
+
+    #Skip over the privileged helper, and any chroot, to find the real command.
+    args = [arg for arg in exec_cmds if arg != "pkexec"
+            and not arg.startswith("/usr/share/wxfixboot/Tools/helpers/")]
+
+    if args[:1] == ["chroot"]:
+        args = args[2:]
+
+    #Skip any environment variables set before the command.
+    while args and re.match(r"^\w+=", args[0]):
+        args = args[1:]
+
+    if not args:
+        return
+
+    command = os.path.basename(args[0])
+
+    if command in ("sh", "bash") and args[1:2] == ["-c"] and len(args) > 2:
+        #Look at each of the commands sh is running instead.
+        for script in re.split(r"&&|\|\||;|\||\n", args[2]):
+            try:
+                invalidate_cache_for_command(shlex.split(script))
+
+            except ValueError:
+                #Couldn't split it, so play it safe.
+                invalidate_cache()
+
+    elif command in ("mount", "umount"):
+        MountTools.MOUNT_TABLE.invalidate()
+
+        for arg in args[1:]:
+            if arg.startswith("/"):
+                invalidate_cache(arg)
+
+    elif command in PACKAGE_OPERATIONS \
+        and any(arg in PACKAGE_OPERATIONS[command] for arg in args[1:]):
+
+        invalidate_cache()
+
+def format_process_result(ret_val, line_list, return_output, testing, capture_output=False):
+    """Return what start_process() should return, given a process's return value and output."""
+    if capture_output:
+        #Return the return code, as well as the captured output.
+        if not isinstance(line_list, OutputTools.OutputCapture):
+            line_list = OutputTools.OutputCapture()
+
+        return (ret_val, line_list)
 
     if return_output is False:
         #Return the return code back to whichever function ran this process, so it can handle
@@ -123,24 +687,186 @@ def start_process(exec_cmds, show_output=True, return_output=False, testing=Fals
     #Otherwise, just return the return code, as well as the output.
     return (ret_val, '\n'.join(line_list))
 
+async def start_process_async(exec_cmds, show_output=True, return_output=False, testing=False,
+                              privileged=False, idempotent=False, timeout=None,
+                              capture_output=False):
+    """
+    Start a process given a string of commands to execute, without blocking the event loop.
+    Takes the same arguments, and returns the same things, as start_process(). Output is
+    forwarded to the output box in the same way too.
+
+    Use start_processes() to run several commands at the same time.
+    """
+
+    #Save the command as it was passed, in case we need
+    #to call recursively (pkexec auth failure/dismissal).
+    origcmds = exec_cmds
+
+    if is_cancelled():
+        logger.info("start_process_async(): Operations have been cancelled, not running: "
+                    + exec_cmds)
+        return format_process_result(CANCELLED_RETVAL, [], return_output, testing,
+                                     capture_output)
+
+    if privileged and BrokerTools.broker_available() and get_helper(exec_cmds) != "":
+        #The broker runs requests concurrently by itself, so just wait for it in a
+        #thread. start_process() takes care of the cache.
+        return await asyncio.get_event_loop().run_in_executor(
+            None, functools.partial(start_process, exec_cmds, show_output=show_output,
+                                    return_output=return_output, testing=testing,
+                                    privileged=privileged, idempotent=idempotent,
+                                    timeout=timeout, capture_output=capture_output))
+
+    idempotent = idempotent and not capture_output
+
+    if idempotent:
+        key = cache_key(exec_cmds, privileged, testing)
+        result = get_cached_result(key, show_output)
+
+        if result is not None:
+            record_cache_hit(key, privileged, result)
+            return format_process_result(result[0], result[1], return_output, testing)
+
+    #If this is to be a privileged process, add the helper script to the cmdline.
+    if privileged:
+        exec_cmds = get_helper(exec_cmds)+" "+exec_cmds
+
+    exec_cmds = shlex.split(exec_cmds)
+
+    #Make sure output is always in English.
+    environ = dict(os.environ, LC_ALL="C")
+
+    #Run the command(s).
+    logger.debug("start_process_async(): Starting process: "+' '.join(exec_cmds))
+    spawn_start = time.monotonic()
+    cmd = await asyncio.create_subprocess_exec(*exec_cmds, stdout=subprocess.PIPE,
+                                               stderr=subprocess.STDOUT, env=environ,
+                                               start_new_session=True)
+    spawned = time.monotonic()
+    timer = watch_process(cmd, exec_cmds, timeout)
+
+    if capture_output:
+        capture = OutputTools.OutputCapture()
+        leftover = b""
+        chunk = await cmd.stdout.read(CHUNK_SIZE)
+
+        while chunk != b"":
+            leftover = capture_chunk(capture, chunk, leftover, show_output)
+            chunk = await cmd.stdout.read(CHUNK_SIZE)
+
+        line_list = finish_capture(capture, leftover, show_output)
+
+        if not STARTUP:
+            #Make sure all the output is shown before anything else goes to the output box.
+            OutputTools.OUTPUT_CHANNEL.finish()
+
+    elif STARTUP:
+        #Nothing is sent to the output box on startup, so just split the lines at the end.
+        chunks = []
+        chunk = await cmd.stdout.read(CHUNK_SIZE)
+
+        while chunk != b"":
+            chunks.append(chunk)
+            chunk = await cmd.stdout.read(CHUNK_SIZE)
+
+        line_list = frame_startup_output(chunks, testing=testing)
+
+    else:
+        line_list = []
+        leftover = b""
+        chunk = await cmd.stdout.read(CHUNK_SIZE)
+
+        while chunk != b"":
+            lines, leftover = split_output_box_lines(leftover+chunk)
+
+            for line in lines:
+                send_output_line(line, show_output, line_list)
+
+            chunk = await cmd.stdout.read(CHUNK_SIZE)
+
+        #Catch it if there's not a newline at the end.
+        if leftover != b"":
+            send_output_line(leftover, show_output, line_list)
+
+        #Make sure all the output is shown before anything else goes to the output box.
+        OutputTools.OUTPUT_CHANNEL.finish()
+
+    ret_val = unwatch_process(cmd, timer, await cmd.wait())
+
+    record_trace(exec_cmds, privileged, (spawn_start, spawned, time.monotonic()), line_list,
+                 ret_val)
+
+    #Log this info in a debug message.
+    logger.debug("start_process_async(): Process: "+' '.join(exec_cmds)
+                 +": Return Value: "+str(ret_val)
+                 + ", Output: "+describe_output(line_list)+"\n")
+
+    if privileged and pkexec_auth_failed(exec_cmds, ret_val):
+        logger.debug("start_process_async(): Bad auth or dismissed by user. Trying again...")
+        return await start_process_async(exec_cmds=origcmds, show_output=show_output,
+                                         return_output=return_output, testing=testing,
+                                         privileged=privileged, idempotent=idempotent,
+                                         timeout=timeout, capture_output=capture_output)
+
+    if idempotent and ret_val not in (TIMEOUT_RETVAL, CANCELLED_RETVAL):
+        cache_result(key, ret_val, line_list)
+
+    else:
+        invalidate_cache_for_command(exec_cmds)
+
+    return format_process_result(ret_val, line_list, return_output, testing, capture_output)
+
+async def gather_processes(commands, max_concurrent=MAX_CONCURRENT_PROCESSES, **kwargs):
+    """
+    Run all of the given commands with start_process_async(), at most max_concurrent at
+    a time, passing kwargs on to it. Returns a list of the results, in the same order as
+    the commands.
+    """
+
+    semaphore = asyncio.Semaphore(max_concurrent)
+
+    async def run(exec_cmds):
+        """Run one command when there's room for it."""
+        async with semaphore:
+            return await start_process_async(exec_cmds, **kwargs)
+
+    return await asyncio.gather(*[run(exec_cmds) for exec_cmds in commands])
+
+def start_processes(commands, max_concurrent=MAX_CONCURRENT_PROCESSES, **kwargs):
+    """
+    Run several independent commands at the same time, and wait for them all to finish.
+    Takes a list of command strings, plus the same keyword arguments as start_process(),
+    which apply to all of the commands. Returns a list of what start_process() would have
+    returned for each command, in the same order.
+
+    Call this from normal (not asyncio) code, eg the startup and backend threads.
+    """
+
+    loop = asyncio.new_event_loop()
+
+    try:
+        return loop.run_until_complete(gather_processes(commands, max_concurrent, **kwargs))
+
+    finally:
+        loop.close()
+
 def read(cmd, testing=False):
     """
     Read the cmd's output char by char, but do as little processing as possible to improve
     startup performance
     """
 
-    #Get ready to run the command(s). Read up to 100 empty "" characters after the process finishes
-    #to make sure we get all the output.
-    counter = 0
+    #Get ready to run the command(s). Keep reading until we get to the end of the output -
+    #read(1) blocks until there's more, so this doesn't spin while we wait.
     line = bytes(b"")
     line_list = []
 
-    while cmd.poll() is None or counter < 100:
+    while True:
         char = cmd.stdout.read(1)
 
         if char == b"":
-            counter += 1
-            continue
+            #EOF, the process has closed its output.
+            break
 
         line += char
 
@@ -168,24 +894,26 @@ def read(cmd, testing=False):
         else:
             line_list.append(line.replace("\n", "").replace("\r", ""))
 
+    #Wait for the process to exit, so the return value is available.
+    cmd.wait()
+
     return line_list
 
 def read_and_send_output(cmd, show_output):
     """Read the cmd's output char by char, and send the output to the output box"""
-    #Get ready to run the command(s). Read up to 100 empty "" characters after the process finishes
-    #to make sure we get all the output.
-    counter = 0
+    #Get ready to run the command(s). Keep reading until we get to the end of the output -
+    #read(1) blocks until there's more, so this doesn't spin while we wait.
     line = bytes(b"")
     line_list = []
     hold = False
     send_line = False
 
-    while cmd.poll() is None or counter < 100:
+    while True:
         char = cmd.stdout.read(1)
 
         if char == b"":
-            counter += 1
-            continue
+            #EOF, the process has closed its output.
+            break
 
         line += char
 
@@ -205,7 +933,7 @@ def read_and_send_output(cmd, show_output):
             #Interpret as Unicode and remove "NULL" characters.
             line = line.decode("UTF-8", errors="ignore").replace("\x00", "")
 
-            wx.CallAfter(wx.GetApp().TopWindow.update_output_box, line, show_output)
+            OutputTools.OUTPUT_CHANNEL.put(line, show_output)
             line_list.append(line.replace("\n", "").replace("\r", "").replace("\x08", ""))
 
             #Reset line.
@@ -221,17 +949,211 @@ def read_and_send_output(cmd, show_output):
         #Interpret as Unicode and remove "NULL" characters.
         line = line.decode("UTF-8", errors="ignore").replace("\x00", "")
 
-        wx.CallAfter(wx.GetApp().TopWindow.update_output_box, line, show_output)
+        OutputTools.OUTPUT_CHANNEL.put(line, show_output)
         line_list.append(line.replace("\n", "").replace("\r", "").replace("\x08", ""))
 
+    #Wait for the process to exit, so the return value is available.
+    cmd.wait()
+
     return line_list
 
+def read_chunks(cmd, chunk_size=CHUNK_SIZE):
+    """
+    Read the cmd's output in large chunks as soon as it is available, using a selector and
+    non-blocking reads. Yields each chunk as bytes, and waits for the process to exit once
+    its output reaches EOF.
+    """
+
+    fileno = cmd.stdout.fileno()
+    os.set_blocking(fileno, False)
+
+    with selectors.DefaultSelector() as selector:
+        selector.register(fileno, selectors.EVENT_READ)
+
+        while True:
+            selector.select()
+
+            try:
+                chunk = os.read(fileno, chunk_size)
+
+            except BlockingIOError:
+                #Spurious wakeup, nothing to read yet.
+                continue
+
+            if chunk == b"":
+                break
+
+            yield chunk
+
+    cmd.wait()
+
+def split_output_box_lines(data):
+    """
+    Split raw output into the lines that read_and_send_output() would send to the output box.
+    CRLF is converted to LF, and a lone CR keeps the byte after it, just like the bytewise
+    reader. Returns a list of the complete lines (still as bytes), and the leftover bytes that
+    can't be framed until more output arrives.
+    """
+
+    lines = []
+    position = 0
+
+    #Match anchored at the current position each time, so a long unterminated tail
+    #(eg a progress bar) is only scanned once.
+    match = _OUTPUT_BOX_LINE.match(data, position)
+
+    while match is not None:
+        line = match.group()
+
+        if line[-2:] == b"\r\n":
+            line = line[:-2]+b"\n"
+
+        lines.append(line)
+        position = match.end()
+        match = _OUTPUT_BOX_LINE.match(data, position)
+
+    return lines, data[position:]
+
+def read_chunked(cmd, testing=False):
+    """
+    Read the cmd's output in large chunks and split it into lines with the same rules as
+    read(), decoding it with an incremental UTF-8 decoder. Much faster than read() for
+    commands with lots of output.
+    """
+
+    return frame_startup_output(read_chunks(cmd), testing=testing)
+
+def frame_startup_output(chunks, testing=False):
+    """
+    Split chunks of raw output (any iterable of bytes) into lines with the same rules
+    as read(), and return them as a list.
+    """
+
+    decoder = codecs.getincrementaldecoder("UTF-8")(errors="ignore")
+    line_list = []
+    line = ""
+
+    #Whether there are any raw bytes after the last line ending, so we know whether to
+    #add a final line even if it decodes to nothing.
+    unterminated = False
+
+    for chunk in chunks:
+        last_line_end = max(chunk.rfind(b"\n"), chunk.rfind(b"\r"))
+        unterminated = (last_line_end < len(chunk) - 1) or (unterminated and last_line_end == -1)
+
+        lines = _STARTUP_LINE_SPLIT.split(line+decoder.decode(chunk))
+        line = lines.pop()
+
+        #Remove "NULL" characters.
+        if testing:
+            line_list.extend([_line.replace("\x00", "") for _line in lines])
+
+        else:
+            line_list.extend([_line[:-1].replace("\x00", "") for _line in lines])
+
+    #Catch it if there's not a newline at the end.
+    line += decoder.decode(b"", final=True)
+
+    if unterminated:
+        line_list.append(line.replace("\x00", ""))
+
+    return line_list
+
+def read_chunked_and_send_output(cmd, show_output):
+    """
+    Read the cmd's output in large chunks, and send the output to the output box with
+    the same line rules as read_and_send_output().
+    """
+
+    line_list = []
+    leftover = b""
+
+    for chunk in read_chunks(cmd):
+        lines, leftover = split_output_box_lines(leftover+chunk)
+
+        for line in lines:
+            send_output_line(line, show_output, line_list)
+
+    #Catch it if there's not a newline at the end.
+    if leftover != b"":
+        send_output_line(leftover, show_output, line_list)
+
+    return line_list
+
+def send_output_line(line, show_output, line_list):
+    """
+    Decode a raw line of output, send it to the output box, and add the cleaned-up line
+    to line_list.
+    """
+
+    #Interpret as Unicode and remove "NULL" characters.
+    line = line.decode("UTF-8", errors="ignore").replace("\x00", "")
+
+    OutputTools.OUTPUT_CHANNEL.put(line, show_output)
+    line_list.append(line.replace("\n", "").replace("\r", "").replace("\x08", ""))
+
+def capture_chunks(chunks, show_output):
+    """
+    Capture chunks of raw output (any iterable of bytes) in an OutputTools.OutputCapture,
+    sending it to the output box as well unless we're starting up. Returns the capture.
+    """
+
+    capture = OutputTools.OutputCapture()
+    leftover = b""
+
+    for chunk in chunks:
+        leftover = capture_chunk(capture, chunk, leftover, show_output)
+
+    return finish_capture(capture, leftover, show_output)
+
+def capture_chunk(capture, chunk, leftover, show_output):
+    """
+    Add a chunk of output to a capture, and send any complete lines to the output box unless
+    we're starting up. Returns the bytes left over that can't be framed until more output
+    arrives.
+    """
+
+    capture.write(chunk)
+
+    if STARTUP:
+        return b""
+
+    lines, leftover = split_output_box_lines(leftover+chunk)
+
+    for line in lines:
+        OutputTools.OUTPUT_CHANNEL.put(line.decode("UTF-8", errors="ignore").replace("\x00", ""),
+                                       show_output)
+
+    return leftover
+
+def finish_capture(capture, leftover, show_output):
+    """Send any leftover output to the output box, close the capture and return it."""
+    if leftover != b"":
+        OutputTools.OUTPUT_CHANNEL.put(leftover.decode("UTF-8", errors="ignore")
+                                       .replace("\x00", ""), show_output)
+
+    capture.close()
+
+    return capture
+
+def describe_output(line_list):
+    """Describe a command's output for the log. Captured output is too big to log."""
+    if isinstance(line_list, OutputTools.OutputCapture):
+        return "<"+str(line_list.size)+" bytes captured>"
+
+    return "\"\n\n"+'\n'.join(line_list)+"\""
+
 def read_privileged_file(filename):
     """
     Uses start_process() and a helper script to read privileged files
     and returns the content as a string.
     """
 
+    if BrokerTools.broker_available():
+        #The broker is already running as root, so this is all we need.
+        return start_process("cat "+filename, show_output=False, return_output=True,
+                             privileged=True)[1].split("\n")
+
     return start_process("pkexec /usr/share/wxfixboot/Tools/helpers/runasroot_linux_read_file.sh "
                          + filename,
                          show_output=False, return_output=True, privileged=True)[1].split("\n")
@@ -288,6 +1210,27 @@ def write_privileged_file(filename, file_contents):
     logger.info("write_privileged_file(): Writing to "+filename+", writing:\n\n"
                 + file_contents+"\n\n...")
 
+    if BrokerTools.broker_available():
+        #Write the file the same way the helper script would, with a newline on the end.
+        try:
+            cmd = BrokerTools.BROKER.write_file(filename,
+                                                file_contents.encode("UTF-8", errors="ignore")
+                                                + b"\n")
+
+        except OSError:
+            logger.warning("write_privileged_file(): Broker unavailable, falling back to "
+                           + "pkexec...")
+
+        else:
+            cmd.stdout.close()
+
+            if cmd.wait() != 0:
+                logger.error("write_privileged_file(): Failed to write to "+filename+"!")
+
+            logger.info("write_privileged_file(): Done.")
+
+            return 0
+
     #Start the process.
     cmd = subprocess.Popen("pkexec "
                            + "/usr/share/wxfixboot/Tools/helpers/runasroot_linux_write_file.sh "
@@ -312,25 +1255,14 @@ def is_mounted(partition, mount_point=None, lvm=False):
     partition is the given partition to check.
     If mount_point is specified, check if the partition is mounted there, rather than just if
     it's mounted.
+    Aliases of the partition (eg for LVM disks) are checked too, unless lvm is True.
 
     Return boolean True/False.
     """
 
-    #Handle LVM disks with aliases.
-    if not lvm \
-        and (partition in DISK_INFO and DISK_INFO[partition]["Product"] == "LVM Partition"):
-
-        return any_mounted(DISK_INFO[partition]["Aliases"], mount_point, lvm=True)
-
     if mount_point is None:
         logger.debug("is_mounted(): Checking if "+partition+" is mounted...")
-        mount_info = start_process("mount -l", show_output=False, return_output=True)[1]
-
-        mounted = False
-
-        for line in mount_info.split("\n"):
-            if line.split()[0] == partition:
-                mounted = True
+        mounted = MountTools.MOUNT_TABLE.is_mounted(partition, aliases=not lvm)
 
     else:
         #Check where it's mounted to.
@@ -372,14 +1304,7 @@ def get_partition_mounted_at(mount_point):
     logger.info("get_partition_mounted_at(): Trying to get partition mounted at "+mount_point
                 + "...")
 
-    mount_info = start_process("mount -l", show_output=False, return_output=True)[1]
-    partition = None
-
-    for line in mount_info.split("\n"):
-        split_line = line.split()
-
-        if mount_point == split_line[2]:
-            partition = split_line[0]
+    partition = MountTools.MOUNT_TABLE.get_partition_mounted_at(mount_point)
 
     if partition is not None:
         logger.info("get_partition_mounted_at(): Found it! partition is "+partition+"...")
@@ -390,24 +1315,12 @@ def get_partition_mounted_at(mount_point):
     return partition
 
 def get_mount_point_of(partition):
-    """Returns the mountpoint of the given partition, if any.
-    Otherwise, return None"""
-    logger.info("get_mount_point_of(): Trying to get mount point of partition "+partition+"...")
-
-    mount_info = start_process("mount -l", show_output=False, return_output=True)[1]
-    mount_point = None
-
-    for line in mount_info.split("\n"):
-        split_line = line.split()
-
-        if partition == split_line[0]:
-            mount_point = split_line[2]
-
-        #Handle LVM disks with aliases.
-        elif partition in DISK_INFO and DISK_INFO[partition]["Product"] == "LVM Partition" \
-            and split_line[0] in DISK_INFO[partition]["Aliases"]:
+    """Returns the mountpoint of the given partition, if any.
+    Otherwise, return None"""
+    logger.info("get_mount_point_of(): Trying to get mount point of partition "+partition+"...")
 
-            mount_point = split_line[2]
+    #This handles LVM disks with aliases too.
+    mount_point = MountTools.MOUNT_TABLE.get_mount_point(partition)
 
     if mount_point is not None:
         logger.info("get_mount_point_of(): Found it! mount_point is "+mount_point+"...")
@@ -441,8 +1354,6 @@ def mount_partition(partition, mount_point, options=""):
         logger.info("mount_partition(): Preparing to mount "+partition+" at "+mount_point
                     + " with no extra options...")
 
-    mount_info = start_process("mount -l", show_output=False, return_output=True)[1]
-
     #There is a partition mounted here. Check if our partition is already mounted in the right
     #place.
     if mount_point == get_mount_point_of(partition):
@@ -451,7 +1362,7 @@ def mount_partition(partition, mount_point, options=""):
                      + mount_point+". Continuing...")
         return 0
 
-    elif mount_point in mount_info:
+    elif MountTools.MOUNT_TABLE.is_mount_point(mount_point):
         #Something else is in the way. unmount that partition, and continue.
         logger.warning("mount_partition(): Unmounting filesystem in the way at "+mount_point
                        + "...")
@@ -515,7 +1426,10 @@ def unmount(mount_point):
     """
     logger.debug("unmount(): Preparing to unmount "+mount_point)
 
-    if mount_point not in start_process("mount -l", show_output=False, return_output=True)[1] \
+    #Mount sessions can't hold this any more, and anything idle inside it has to go first.
+    forget_mounts(mount_point)
+
+    if not MountTools.MOUNT_TABLE.is_mount_point(mount_point) \
         and is_mounted(mount_point) is False:
 
         logger.info("unmount(): "+mount_point+" was not mounted. Continuing...")
@@ -534,6 +1448,362 @@ def unmount(mount_point):
     #Return the return value
     return ret_val
 
+def get_unmount_levels(mounts, directory):
+    """
+    Work out what order to unmount everything mounted in the given directory (including the
+    directory itself) in. mounts is a list of mounts from the mount table. Returns a list of
+    lists of mount points. Everything in each list can be unmounted at the same time, as long
+    as everything in the lists before it has been unmounted first.
+    """
+
+    inside = [mount for mount in mounts
+              if mount["MountPoint"] == directory
+              or mount["MountPoint"].startswith(directory.rstrip("/")+"/")]
+
+    children = {}
+
+    for mount in inside:
+        children.setdefault(mount["ParentID"], []).append(mount)
+
+    #Leaves are level 0, and everything else is one level above its highest child, so each
+    #mount comes after everything mounted on top of it.
+    levels = {}
+
+    def get_level(mount):
+        """Find the level of a mount, and everything mounted on top of it."""
+        if mount["ID"] not in levels:
+            levels[mount["ID"]] = 1 + max([get_level(child)
+                                           for child in children.get(mount["ID"], [])],
+                                          default=-1)
+
+        return levels[mount["ID"]]
+
+    unmount_levels = []
+
+    for mount in inside:
+        level = get_level(mount)
+
+        while len(unmount_levels) <= level:
+            unmount_levels.append([])
+
+        unmount_levels[level].append(mount["MountPoint"])
+
+    return [sorted(level) for level in unmount_levels]
+
+def unmount_tree(directory, max_concurrent=MAX_CONCURRENT_PROCESSES):
+    """
+    Unmount everything mounted in the given directory, like what is left in our temporary
+    mountpoints directory after WxFixBoot crashed. Leaves are unmounted first, and separate
+    parts of the tree are unmounted at the same time. Returns 0 if nothing is mounted there
+    afterwards, otherwise 1.
+    """
+
+    logger.info("unmount_tree(): Unmounting everything in "+directory+"...")
+    start = time.monotonic()
+
+    #We're unmounting all of this ourselves, so forget about any mount sessions and chroots.
+    with MOUNT_LOCK:
+        for key in [key for key in MOUNT_HOLDS
+                    if key[1] == directory or key[1].startswith(directory.rstrip("/")+"/")]:
+
+            del MOUNT_HOLDS[key]
+
+        for mount_point in [mount_point for mount_point in CHROOT_POOL
+                            if mount_point.startswith(directory.rstrip("/")+"/")]:
+
+            del CHROOT_POOL[mount_point]
+
+    levels = get_unmount_levels(MountTools.MOUNT_TABLE.get_mounts(), directory)
+
+    for level in levels:
+        results = start_processes(["umount "+mount_point for mount_point in level],
+                                  max_concurrent, show_output=False, privileged=True)
+
+        failed = [mount_point for mount_point, ret_val in zip(level, results) if ret_val != 0]
+
+        if failed:
+            logger.error("unmount_tree(): Couldn't unmount "+', '.join(failed)+"!")
+            break
+
+    MountTools.MOUNT_TABLE.invalidate()
+
+    if get_unmount_levels(MountTools.MOUNT_TABLE.get_mounts(), directory):
+        logger.error("unmount_tree(): There are still filesystems mounted in "+directory+"!")
+        return 1
+
+    logger.info("unmount_tree(): Unmounted "+str(sum(len(level) for level in levels))
+                + " filesystems in "+str(len(levels))+" steps in "
+                + str(round(time.monotonic() - start, 3))+" seconds.")
+
+    return 0
+
+def get_probe_mount_options(partition):
+    """Return the mount options to use for a probe mount of the given partition."""
+    if partition in DISK_INFO:
+        return PROBE_MOUNT_OPTIONS.get(DISK_INFO[partition]["FileSystem"],
+                                       DEFAULT_PROBE_MOUNT_OPTIONS)
+
+    return DEFAULT_PROBE_MOUNT_OPTIONS
+
+def acquire_mount(partition, mount_point, options="", probe=False):
+    """
+    Mount the given partition at the given mount point for a mount session, or reuse the
+    mount if it's already there. Every successful call must be matched by a call to
+    release_mount(). Returns the return value from mount_partition(), or 0 if the mount was
+    reused.
+
+    If probe is True, this is only to look at what's on the partition, so it's mounted
+    read-only without replaying the journal (see PROBE_MOUNT_OPTIONS). If a probe mount is
+    acquired again without probe, it is mounted again read-write, once nothing is holding it
+    (see upgrade_mount()).
+    """
+
+    key = (partition, mount_point)
+
+    with get_mount_lock(key):
+        with MOUNT_LOCK:
+            hold = MOUNT_HOLDS.get(key)
+            upgrade = hold is not None and hold["ReadOnly"] and not probe
+
+        if upgrade and upgrade_mount(partition, mount_point) != 0:
+            return 1
+
+        with MOUNT_LOCK:
+            #This might have been dropped by upgrade_mount().
+            hold = MOUNT_HOLDS.get(key)
+
+            if hold is not None and is_mounted(partition, mount_point):
+                logger.debug("acquire_mount(): Reusing mount of "+partition+" at "+mount_point
+                             + " ("+str(hold["Holders"])+" other holders)...")
+
+                hold["Holders"] += 1
+
+                if hold["Owned"]:
+                    MOUNT_STATS["Reused"] += 1
+
+                return 0
+
+            #If it was unmounted behind our back, start again.
+            MOUNT_HOLDS.pop(key, None)
+
+        #Don't take ownership of mounts someone else made, like the current OS's /boot.
+        owned = not is_mounted(partition, mount_point)
+
+        if owned:
+            if probe:
+                ret_val = mount_partition(partition=partition, mount_point=mount_point,
+                                          options=(options+" "+get_probe_mount_options(partition)
+                                                   ).strip())
+
+                if ret_val != 0 and get_probe_mount_options(partition) \
+                    != DEFAULT_PROBE_MOUNT_OPTIONS:
+
+                    #Older kernels might not have the option to skip journal replay.
+                    logger.warning("acquire_mount(): Couldn't probe mount "+partition+" with "
+                                   + "journal replay disabled, trying plain read-only...")
+
+                    ret_val = mount_partition(partition=partition, mount_point=mount_point,
+                                              options=(options+" "+DEFAULT_PROBE_MOUNT_OPTIONS
+                                                       ).strip())
+
+            else:
+                ret_val = mount_partition(partition=partition, mount_point=mount_point,
+                                          options=options)
+
+            if ret_val != 0:
+                return ret_val
+
+        with MOUNT_LOCK:
+            if owned:
+                MOUNT_STATS["Mounts"] += 1
+
+            MOUNT_HOLDS[key] = {"Holders": 1, "Owned": owned, "ReadOnly": owned and probe}
+
+    return 0
+
+def get_mount_lock(key):
+    """Return the lock for the given (partition, mount point), making it if needed."""
+    with MOUNT_LOCK:
+        return MOUNT_KEY_LOCKS.setdefault(key, threading.RLock())
+
+def upgrade_mount(partition, mount_point):
+    """
+    Make a probe mount read-write, because something needs to write to it now. It's
+    unmounted so acquire_mount() can mount it again normally. Remounting it read-write isn't
+    enough, because the journal has to be replayed first (and XFS and btrfs refuse to do it),
+    so this fails if anything is still holding the probe mount. Returns 0 on success, 1 if it
+    is still held, otherwise the return value from unmount().
+    """
+
+    with MOUNT_LOCK:
+        holders = MOUNT_HOLDS[(partition, mount_point)]["Holders"]
+
+    if holders > 0:
+        logger.error("upgrade_mount(): Can't make probe mount of "+partition+" at "+mount_point
+                     + " read-write while "+str(holders)+" mount sessions are still "
+                     + "holding it!")
+
+        return 1
+
+    logger.info("upgrade_mount(): Making probe mount of "+partition+" at "+mount_point
+                + " read-write...")
+
+    #This also takes down any chroot, and anything idle inside it.
+    ret_val = unmount(mount_point)
+
+    if ret_val == 0:
+        with MOUNT_LOCK:
+            MOUNT_STATS["Unmounts"] += 1
+            MOUNT_STATS["Upgrades"] += 1
+
+    else:
+        logger.error("upgrade_mount(): Couldn't make "+mount_point+" read-write!")
+
+    return ret_val
+
+def release_mount(partition, mount_point, linger=True):
+    """
+    Release a mount acquired with acquire_mount(). If this was the last holder and we mounted
+    it, it is unmounted, unless linger is True, in which case it stays mounted until
+    release_idle_mounts() or release_all_mounts() is called. Returns the return value from
+    unmount(), or 0 if nothing was unmounted.
+    """
+
+    key = (partition, mount_point)
+
+    with get_mount_lock(key):
+        with MOUNT_LOCK:
+            hold = MOUNT_HOLDS.get(key)
+
+            if hold is None:
+                logger.warning("release_mount(): "+partition+" at "+mount_point+" isn't held by "
+                               + "a mount session! Ignoring...")
+                return 0
+
+            hold["Holders"] = max(hold["Holders"] - 1, 0)
+
+            if hold["Holders"] > 0 or (linger and hold["Owned"]):
+                return 0
+
+            del MOUNT_HOLDS[key]
+
+            if not hold["Owned"]:
+                return 0
+
+        ret_val = unmount(mount_point)
+
+        if ret_val == 0:
+            with MOUNT_LOCK:
+                MOUNT_STATS["Unmounts"] += 1
+
+        return ret_val
+
+@contextlib.contextmanager
+def mount_session(partition, mount_point, options="", linger=True, probe=False):
+    """
+    Context manager for acquire_mount() and release_mount(). Gives the return value from
+    acquire_mount(), and only releases the mount if that was 0.
+    """
+
+    ret_val = acquire_mount(partition, mount_point, options, probe)
+
+    try:
+        yield ret_val
+
+    finally:
+        if ret_val == 0:
+            release_mount(partition, mount_point, linger)
+
+def release_mounts(holds):
+    """
+    Unmount the given (partition, mount point) mounts from MOUNT_HOLDS, deepest first, and
+    forget about them. Returns 0 if everything was unmounted, otherwise the last failing
+    return value.
+    """
+
+    final_ret_val = 0
+
+    for key in sorted(holds, key=lambda key: key[1].count("/"), reverse=True):
+        with get_mount_lock(key):
+            with MOUNT_LOCK:
+                hold = MOUNT_HOLDS.pop(key, None)
+
+            if hold is None or not hold["Owned"]:
+                continue
+
+            ret_val = unmount(key[1])
+
+            if ret_val == 0:
+                with MOUNT_LOCK:
+                    MOUNT_STATS["Unmounts"] += 1
+
+            else:
+                final_ret_val = ret_val
+
+    return final_ret_val
+
+def release_idle_mounts(mount_point=None):
+    """
+    Unmount the mounts that have been kept around after their last holder released them.
+    If mount_point is given, only do this for mounts inside it.
+    """
+
+    with MOUNT_LOCK:
+        holds = [key for key, hold in MOUNT_HOLDS.items() if hold["Holders"] == 0
+                 and (mount_point is None or key[1].startswith(mount_point+"/"))]
+
+    return release_mounts(holds)
+
+def release_all_mounts():
+    """Unmount everything mounted for mount sessions, whether it's still held or not."""
+    logger.info("release_all_mounts(): Releasing all mounts. Statistics: "
+                + str(get_mount_stats())+", chroot pool: "+str(get_chroot_stats()))
+
+    teardown_chroots()
+
+    with MOUNT_LOCK:
+        holds = list(MOUNT_HOLDS)
+
+    return release_mounts(holds)
+
+def forget_mounts(target):
+    """
+    Called when something is about to be unmounted directly. Unmounts anything idle inside it,
+    and forgets about any mount sessions for it. target can be a mount point or a partition.
+    """
+
+    with MOUNT_LOCK:
+        keys = [key for key in MOUNT_HOLDS if target in key]
+
+    #None of this holds MOUNT_LOCK while it waits for commands, so mounting and unmounting
+    #other partitions isn't held up by it.
+    for mount_point in sorted(set([target] + [key[1] for key in keys])):
+        #Chroots have to go first, or their bind mounts will keep everything busy.
+        teardown_chroots(mount_point)
+        release_idle_mounts(mount_point)
+
+    with MOUNT_LOCK:
+        for key in keys:
+            hold = MOUNT_HOLDS.pop(key, None)
+
+            if hold is not None and hold["Holders"] > 0:
+                logger.warning("forget_mounts(): "+key[1]+" is being unmounted while it is "
+                               + "still held by "+str(hold["Holders"])+" mount sessions!")
+
+def get_mount_stats():
+    """
+    Return a copy of the mount session statistics: mounts and unmounts done, mounts reused,
+    probe mounts made read-write, mount and umount calls avoided by reusing mounts, and the
+    number of mounts being kept.
+    """
+
+    with MOUNT_LOCK:
+        stats = dict(MOUNT_STATS)
+        stats["Avoided"] = 2 * stats["Reused"]
+        stats["Kept"] = sum(1 for hold in MOUNT_HOLDS.values() if hold["Owned"])
+
+        return stats
+
 def update_chroot_mtab(mount_point):
     """Update /etc/mtab inside a chroot, so the list of mounted filesystems is always right."""
     logger.debug("update_chroot_mtab(): Updating /etc/mtab for chroot at: "+mount_point+"...")
@@ -551,72 +1821,387 @@ def update_chroot_mtab(mount_point):
     logger.debug("update_chroot_mtab(): Finished updating /etc/mtab for chroot at: "
                  + mount_point+".")
 
+def run_batch(steps, timeout=None):
+    """
+    Run several privileged commands (lists of arguments), one after the other. If the
+    privileged broker is running, they're all run in a single request to it, otherwise
+    they're run one at a time with start_process().
+
+    Returns a list with a dictionary for each step, with the command, its return value
+    and how long it took in seconds. Steps that didn't get to run have the return value
+    of the batch (eg CANCELLED_RETVAL).
+    """
+
+    if not BrokerTools.broker_available():
+        return run_steps(steps, timeout)
+
+    exec_cmds = ["batch:"]+[' '.join(step)+";" for step in steps]
+
+    if is_cancelled():
+        return [{"Command": step, "ReturnValue": CANCELLED_RETVAL, "Time": 0} for step in steps]
+
+    spawn_start = time.monotonic()
+
+    try:
+        #Make sure output is always in English.
+        cmd = BrokerTools.BROKER.run_batch(steps, env={"LC_ALL": "C"})
+
+    except OSError:
+        #The broker has gone away. Fall back to pkexec.
+        logger.warning("run_batch(): Broker unavailable, falling back to pkexec...")
+        return run_steps(steps, timeout)
+
+    spawned = time.monotonic()
+    timer = watch_process(cmd, exec_cmds, timeout)
+
+    output = b''.join(read_chunks(cmd)).decode("UTF-8", errors="ignore").split("\n")
+    cmd.stdout.close()
+
+    ret_val = unwatch_process(cmd, timer, int(cmd.returncode))
+
+    record_trace(exec_cmds, True, (spawn_start, spawned, time.monotonic()), output, ret_val)
+
+    logger.debug("run_batch(): Batch: "+' '.join(exec_cmds)+": Return Value: "+str(ret_val)
+                 + ", Output: "+describe_output(output)+"\n")
+
+    results = []
+
+    for step, result in zip(steps, cmd.results or []):
+        results.append({"Command": step, "ReturnValue": result["ReturnValue"],
+                        "Time": result["Time"]})
+
+    for step in steps[len(results):]:
+        results.append({"Command": step, "ReturnValue": ret_val or 1, "Time": 0})
+
+    for step in steps:
+        invalidate_cache_for_command(step)
+
+    return results
+
+def run_steps(steps, timeout=None):
+    """Run the steps of a batch (see run_batch()) one at a time, with start_process()."""
+    results = []
+
+    for step in steps:
+        start = time.monotonic()
+
+        ret_val = start_process(' '.join(shlex.quote(arg) for arg in step), show_output=False,
+                                privileged=True, timeout=timeout)
+
+        results.append({"Command": step, "ReturnValue": ret_val,
+                        "Time": time.monotonic() - start})
+
+    return results
+
+def log_batch_results(function, results):
+    """Log the results of run_batch() at debug level, for the given function."""
+    for result in results:
+        logger.debug(function+"(): '"+' '.join(result["Command"])+"' returned "
+                     + str(result["ReturnValue"])+" in "+str(round(result["Time"] * 1000, 1))
+                     + "ms.")
+
 def setup_chroot(mount_point):
-    """Set up a chroot for the given mountpoint."""
+    """
+    Set up a chroot for the given mountpoint. All of the steps are done in one privileged
+    batch, while holding the chroot's lock (see get_mount_lock()).
+    """
+
+    with get_mount_lock((None, mount_point)):
+        return _setup_chroot(mount_point)
+
+def _setup_chroot(mount_point):
+    """Set up a chroot for the given mountpoint. See setup_chroot()."""
     logger.debug("setup_chroot(): Setting up chroot for mount_point: "+mount_point+"...")
+    start = time.monotonic()
 
     #Mount /dev, /dev/pts, /proc, /run and /sys for the chroot.
     #We might also need internet access in chroot, so to do this first backup
     #mount_point/etc/resolv.conf to mount_point/etc/resolv.conf.bak (if it's a link, this
     #will also preserve it), then copy current system's /etc/resolv.conf (the contents, not
     #the link) to mount_point/etc/resolv.conf, enabling internet access.
+    #Finally, update /etc/mtab inside the chroot, so the list of mounted filesystems is right.
+    steps = []
+
+    for file_system in CHROOT_BIND_MOUNTS:
+        if MountTools.MOUNT_TABLE.is_mount_point(mount_point+file_system):
+            logger.debug("setup_chroot(): "+mount_point+file_system+" is already mounted...")
+            continue
 
-    mount_list = ("/dev", "/dev/pts", "/proc", "/run", "/sys")
+        if not os.path.isdir(mount_point+file_system):
+            steps.append(["mkdir", "-p", mount_point+file_system])
 
-    for file_system in mount_list:
-        if mount_partition(partition=file_system, mount_point=mount_point+file_system,
-                           options="--bind") != 0:
+        steps.append(["mount", "--bind", file_system, mount_point+file_system])
 
-            logger.error("setup_chroot(): Failed to bind "+file_system+" to "+mount_point
-                         + file_system+"! Chroot isn't set up properly! Attempting to continue "
-                         + "anyway...")
+    #Probe mounts are read-only, and only need the chroot to look at things.
+    if MountTools.MOUNT_TABLE.is_read_only(mount_point):
+        logger.debug("setup_chroot(): "+mount_point+" is read-only, so not setting up "
+                     + "resolv.conf or /etc/mtab...")
 
-    exec_list = ("mv -vf "+mount_point+"/etc/resolv.conf "+mount_point+"/etc/resolv.conf.bak",
-                 "cp -fv /etc/resolv.conf "+mount_point+"/etc/resolv.conf")
+    else:
+        steps.append(["mv", "-vf", mount_point+"/etc/resolv.conf",
+                      mount_point+"/etc/resolv.conf.bak"])
+        steps.append(["cp", "-fv", "/etc/resolv.conf", mount_point+"/etc/resolv.conf"])
+        steps.append(["cp", "-vf", "/proc/self/mounts", mount_point+"/etc/mtab"])
 
-    for exec_cmd in exec_list:
-        ret_val = start_process(exec_cmd, show_output=False, return_output=True,
-                                privileged=True)[0]
+    results = run_batch(steps)
+    log_batch_results("setup_chroot", results)
 
-        if ret_val != 0:
-            logger.error("setup_chroot(): Error: Failed to run command: '"+exec_cmd
-                         + "'! Chroot may not be set up properly! On Fedora systems this probably "
-                         + "doesn't matter. Continuing anyway...")
+    for result in results:
+        if result["ReturnValue"] == 0:
+            continue
 
+        command = ' '.join(result["Command"])
+
+        if result["Command"][0] in ("mkdir", "mount"):
+            logger.error("setup_chroot(): Failed to run command: '"+command+"'! Chroot isn't "
+                         + "set up properly! Attempting to continue anyway...")
+
+        elif result["Command"][-1].endswith("/etc/mtab"):
+            logger.warning("setup_chroot(): Failed to run command: '"+command+"'! If the "
+                           + "chrooted OS is Fedora-based, this is normal because /etc/mtab "
+                           + "is a symlink to /proc/self/mounts.")
+
+        else:
             #Ignore these errors, the only happen on Fedora and they don't really matter.
-            ret_val = 0
+            logger.error("setup_chroot(): Error: Failed to run command: '"+command
+                         + "'! Chroot may not be set up properly! On Fedora systems this "
+                         + "probably doesn't matter. Continuing anyway...")
 
-    update_chroot_mtab(mount_point=mount_point)
+    record_chroot_timing(mount_point, "Setup", time.monotonic() - start, results)
+
+    #The batch itself can only fail if it was cancelled or timed out.
+    ret_val = 0
+
+    if results and results[-1]["ReturnValue"] in (TIMEOUT_RETVAL, CANCELLED_RETVAL):
+        ret_val = results[-1]["ReturnValue"]
 
     logger.debug("setup_chroot(): Finished setting up chroot for mount_point: "+mount_point+"...")
     return ret_val
 
 def teardown_chroot(mount_point):
-    """Remove a chroot at the given mountpoint."""
+    """
+    Remove a chroot at the given mountpoint. All of the steps are done in one privileged
+    batch, while holding the chroot's lock (see get_mount_lock()).
+    """
+
+    with get_mount_lock((None, mount_point)):
+        return _teardown_chroot(mount_point)
+
+def _teardown_chroot(mount_point):
+    """Remove a chroot at the given mountpoint. See teardown_chroot()."""
     logger.debug("teardown_chroot(): Removing chroot at mount_point: "+mount_point+"...")
+    start = time.monotonic()
 
-    #unmount /dev/pts, /dev, /proc, /run and /sys in the chroot.
-    unmount_list = (mount_point+"/dev/pts", mount_point+"/dev", mount_point+"/proc",
-                    mount_point+"/run", mount_point+"/sys")
+    with MOUNT_LOCK:
+        if CHROOT_POOL.pop(mount_point, None) is not None:
+            CHROOT_STATS["TornDown"] += 1
 
-    for file_system in unmount_list:
-        if unmount(file_system) != 0:
-            logger.error("teardown_chroot(): Faied to unmount "+file_system
-                         + "! Chroot isn't removed properly! Attempting to continue anyway...")
+    #Lazily unmount each tree of bind mounts (/dev with /dev/pts inside it, /proc, /run and
+    #/sys) in one go.
+    steps = []
+
+    for file_system in CHROOT_BIND_MOUNTS:
+        if any(file_system.startswith(other+"/") for other in CHROOT_BIND_MOUNTS):
+            continue
+
+        if MountTools.MOUNT_TABLE.is_mount_point(mount_point+file_system):
+            steps.append(["umount", "--recursive", "--lazy", mount_point+file_system])
 
     #We'll also need to replace the mount_point/etc/resolv.conf with the backup file,
-    #mount_point/etc/resolv.conf.bak.
-    ret_val = start_process("mv -vf "+mount_point+"/etc/resolv.conf.bak "+mount_point
-                            + "/etc/resolv.conf", show_output=False, privileged=True)
+    #mount_point/etc/resolv.conf.bak, if we made one.
+    restore_resolv_conf = os.path.lexists(mount_point+"/etc/resolv.conf.bak")
+
+    if restore_resolv_conf:
+        steps.append(["mv", "-vf", mount_point+"/etc/resolv.conf.bak",
+                      mount_point+"/etc/resolv.conf"])
+
+    results = run_batch(steps)
+    log_batch_results("teardown_chroot", results)
+
+    for result in results:
+        if result["ReturnValue"] != 0 and result["Command"][0] == "umount":
+            logger.error("teardown_chroot(): Failed to unmount "+result["Command"][-1]
+                         + "! Chroot isn't removed properly! Attempting to continue anyway...")
+
+    ret_val = 0
+
+    if restore_resolv_conf:
+        ret_val = results[-1]["ReturnValue"]
 
     if ret_val != 0:
         logger.error("teardown_chroot(): Failed to run command: 'mv -vf "+mount_point
                      + "/etc/resolv.conf.bak "+mount_point+"/etc/resolv.conf'! Return value was: "
                      + str(ret_val)+". Chroot may not be removed properly!")
 
+    record_chroot_timing(mount_point, "Teardown", time.monotonic() - start, results)
+
     logger.debug("teardown_chroot(): Finished removing chroot at mount_point: "+mount_point+"...")
     return ret_val
 
+def record_chroot_timing(mount_point, stage, seconds, results):
+    """
+    Record how long setting up ("Setup") or tearing down ("Teardown") the chroot at the
+    given mount point took, and how many steps it needed.
+    """
+
+    logger.info(stage.lower()+" of chroot at "+mount_point+" took "
+                + str(round(seconds * 1000, 1))+"ms ("+str(len(results))+" steps in one batch).")
+
+    with MOUNT_LOCK:
+        timing = CHROOT_TIMINGS.setdefault(mount_point, {})
+        timing[stage] = seconds
+        timing[stage+"Steps"] = len(results)
+
+def get_chroot_timing(mount_point):
+    """
+    Return a copy of how long the chroot at the given mount point last took to set up and
+    tear down, in seconds, with the number of steps for each. Empty if it was never set up.
+    """
+
+    with MOUNT_LOCK:
+        return dict(CHROOT_TIMINGS.get(mount_point, {}))
+
+def get_mounts_inside(mount_point):
+    """Return a tuple of everything mounted inside the given mount point."""
+    return tuple(sorted(mount["MountPoint"] for mount in MountTools.MOUNT_TABLE.get_mounts()
+                        if mount["MountPoint"].startswith(mount_point+"/")))
+
+def chroot_is_healthy(mount_point):
+    """
+    Returns True if the pooled chroot at the given mount point still looks set up properly:
+    all of its bind mounts are there and resolv.conf hasn't been moved. Otherwise False.
+    Chroots set up on a read-only mount that is read-write now also count as broken, because
+    resolv.conf and /etc/mtab weren't set up for them.
+    """
+
+    with MOUNT_LOCK:
+        chroot = CHROOT_POOL.get(mount_point)
+
+    if chroot is None:
+        logger.warning("chroot_is_healthy(): There's no chroot at "+mount_point+" any more!")
+        return False
+
+    if chroot["ReadOnly"] and not MountTools.MOUNT_TABLE.is_read_only(mount_point):
+        logger.info("chroot_is_healthy(): "+mount_point+" was read-only when the chroot was "
+                    + "set up, but it's read-write now...")
+        return False
+
+    for file_system in CHROOT_BIND_MOUNTS:
+        if not MountTools.MOUNT_TABLE.is_mount_point(mount_point+file_system):
+            logger.warning("chroot_is_healthy(): "+mount_point+file_system+" isn't mounted!")
+            return False
+
+    if not os.path.lexists(mount_point+"/etc/resolv.conf") \
+        or os.path.lexists(mount_point+"/etc/resolv.conf.bak") != chroot["ResolvConfBackup"]:
+
+        logger.warning("chroot_is_healthy(): resolv.conf in "+mount_point+" has changed!")
+        return False
+
+    return True
+
+def acquire_chroot(mount_point):
+    """
+    Set up a chroot at the given mount point, or reuse the one from the pool if it's still
+    healthy. Chroots stay set up until teardown_chroots() is called, or the partition is
+    unmounted. Returns the return value from setup_chroot(), or 0 if the chroot was reused.
+    """
+
+    with get_mount_lock((None, mount_point)):
+        with MOUNT_LOCK:
+            pooled = mount_point in CHROOT_POOL
+
+        if pooled:
+            if chroot_is_healthy(mount_point):
+                logger.debug("acquire_chroot(): Reusing chroot at "+mount_point+"...")
+
+                with MOUNT_LOCK:
+                    CHROOT_STATS["Reused"] += 1
+                    chroot = CHROOT_POOL[mount_point]
+
+                #Only update /etc/mtab if something has been mounted or unmounted since.
+                mounts = get_mounts_inside(mount_point)
+
+                if mounts != chroot["Mounts"] \
+                    and not MountTools.MOUNT_TABLE.is_read_only(mount_point):
+
+                    update_chroot_mtab(mount_point=mount_point)
+
+                    with MOUNT_LOCK:
+                        chroot["Mounts"] = mounts
+
+                return 0
+
+            logger.warning("acquire_chroot(): Chroot at "+mount_point+" is broken! Setting it "
+                           + "up again...")
+
+            teardown_chroot(mount_point)
+
+            with MOUNT_LOCK:
+                CHROOT_STATS["Rebuilt"] += 1
+
+        ret_val = setup_chroot(mount_point)
+
+        if ret_val == 0:
+            chroot = {"Mounts": get_mounts_inside(mount_point),
+                      "ResolvConfBackup": os.path.lexists(mount_point+"/etc/resolv.conf.bak"),
+                      "ReadOnly": MountTools.MOUNT_TABLE.is_read_only(mount_point)}
+
+            with MOUNT_LOCK:
+                CHROOT_STATS["Built"] += 1
+                CHROOT_POOL[mount_point] = chroot
+
+        return ret_val
+
+def release_chroot(mount_point):
+    """
+    Say we're done with the chroot at the given mount point for now. It is kept in the pool,
+    so this doesn't tear it down. Always returns 0.
+    """
+
+    logger.debug("release_chroot(): Keeping chroot at "+mount_point+" for later...")
+    return 0
+
+def teardown_chroots(mount_point=None):
+    """
+    Tear down the pooled chroots, or only the ones at or inside the given mount point.
+    Returns 0 if everything was torn down, otherwise the last failing return value.
+    """
+
+    final_ret_val = 0
+
+    with MOUNT_LOCK:
+        chroots = [chroot for chroot in CHROOT_POOL
+                   if mount_point is None or chroot == mount_point
+                   or chroot.startswith(mount_point+"/")]
+
+    for chroot in chroots:
+        with get_mount_lock((None, chroot)):
+            #Something else might have torn it down while we were waiting.
+            with MOUNT_LOCK:
+                pooled = chroot in CHROOT_POOL
+
+            if not pooled:
+                continue
+
+            ret_val = teardown_chroot(chroot)
+
+        if ret_val != 0:
+            final_ret_val = ret_val
+
+    return final_ret_val
+
+def get_chroot_stats():
+    """
+    Return a copy of the chroot pool statistics: chroots set up, reused, set up again because
+    they were broken, and torn down, plus the number in the pool now.
+    """
+
+    with MOUNT_LOCK:
+        stats = dict(CHROOT_STATS)
+        stats["Pooled"] = len(CHROOT_POOL)
+
+        return stats
+
 def send_notification(msg):
     """Send a notification, created to reduce clutter in the rest of the code."""
     #Use notify-send.
@@ -636,6 +2221,12 @@ def emergency_exit(message):
                              + "If you email me at hamishmb@live.co.uk with the contents of that "
                              + "file I'll be happy to help you fix this problem.", kind="error")
 
+    #Unmount anything left over from mount sessions, stop the privileged broker, and save
+    #the trace if we're tracing. We can't rely on atexit for this.
+    release_all_mounts()
+    BrokerTools.stop_broker()
+    export_trace()
+
     #Shut down the logger.
     logging.shutdown()
 
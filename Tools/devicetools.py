@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Device Tools in the Tools Package for WxFixBoot
+# This file is part of WxFixBoot.
+# Copyright (C) 2013-2020 Hamish McIntyre-Bhatty
+# WxFixBoot is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3 or,
+# at your option, any later version.
+#
+# WxFixBoot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WxFixBoot.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=logging-not-lazy
+#
+# Reason (logging-not-lazy): This is a more readable way of logging.
+
+"""
+This module keeps an index of all the names each device in DISK_INFO is known by:
+its aliases (like /dev/mapper/<vg>-<lv> and /dev/dm-N for LVM volumes), its UUID, and its
+PARTUUID and label. This means we can find the device behind any of these names, or check
+whether two names are the same device, without searching through DISK_INFO every time.
+"""
+
+#Import modules.
+import logging
+import os
+import re
+import threading
+
+#Import other modules.
+from .dictionaries import DISK_INFO
+
+#Set up logging.
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.getLogger("WxFixBoot").getEffectiveLevel())
+
+#Define global variables
+#Where udev keeps symlinks to devices by PARTUUID and label.
+BY_PARTUUID = "/dev/disk/by-partuuid"
+BY_LABEL = "/dev/disk/by-label"
+
+#Values getdevinfo uses when it doesn't know something.
+UNKNOWN_VALUES = ("Unknown", "N/A", "")
+
+#Spaces, slashes and other unsafe characters in labels are escaped like this by udev.
+_HEX_ESCAPE = re.compile(r"\\x([0-9a-fA-F]{2})")
+
+def unescape_label(label):
+    """Undo the escapes udev uses for some characters in /dev/disk/by-label."""
+    return _HEX_ESCAPE.sub(lambda match: chr(int(match.group(1), 16)), label)
+
+def read_symlinks(directory, unescape=False):
+    """
+    Return a dictionary mapping the names of the symlinks in the given directory to the
+    devices they point to. Returns an empty dictionary if the directory doesn't exist.
+    """
+
+    links = {}
+
+    try:
+        entries = list(os.scandir(directory))
+
+    except OSError:
+        return links
+
+    for entry in entries:
+        name = entry.name
+
+        if unescape:
+            name = unescape_label(name)
+
+        links[name] = os.path.realpath(entry.path)
+
+    return links
+
+class DeviceIndex:
+    """
+    An index of DISK_INFO, mapping every name a device is known by to its canonical name
+    (its key in DISK_INFO). Names can be device paths, or "UUID=", "PARTUUID=" and "LABEL="
+    specifiers like the ones used in fstab.
+
+    The index is built after we get the disk information, and rebuilt automatically if
+    DISK_INFO changes size. Call invalidate() if you change DISK_INFO in any other way.
+    """
+
+    def __init__(self, by_partuuid=BY_PARTUUID, by_label=BY_LABEL):
+        """Set up the index. It isn't built until the first lookup."""
+        self.by_partuuid = by_partuuid
+        self.by_label = by_label
+        self.lock = threading.RLock()
+        self.stale = True
+        self.size = 0
+
+        self.canonical_names = {}
+        self.names = {}
+
+        self.stats = {"Builds": 0, "Lookups": 0}
+
+    def invalidate(self):
+        """Make the next lookup rebuild the index. Call this after changing DISK_INFO."""
+        self.stale = True
+
+    def refresh(self):
+        """Rebuild the index, if DISK_INFO might have changed."""
+        with self.lock:
+            if not self.stale and self.size == len(DISK_INFO):
+                return
+
+            self.build(DISK_INFO)
+
+    def build(self, disk_info):
+        """Build the index from the given disk information."""
+        logger.debug("DeviceIndex().build(): Indexing "+str(len(disk_info))+" devices...")
+
+        canonical_names = {}
+        names = {}
+
+        for device, info in disk_info.items():
+            aliases = [alias for alias in info.get("Aliases", []) if alias != device]
+
+            names[device] = tuple([device]+aliases)
+            canonical_names[device] = device
+
+            for alias in aliases:
+                canonical_names.setdefault(alias, device)
+
+            if info.get("UUID", "Unknown") not in UNKNOWN_VALUES:
+                canonical_names.setdefault("UUID="+info["UUID"], device)
+
+        #The udev symlinks point at device paths, so we can only add these once we have them all.
+        for prefix, directory, unescape in (("PARTUUID=", self.by_partuuid, False),
+                                            ("LABEL=", self.by_label, True)):
+
+            for name, target in read_symlinks(directory, unescape).items():
+                if target in canonical_names:
+                    canonical_names.setdefault(prefix+name, canonical_names[target])
+
+        with self.lock:
+            self.canonical_names = canonical_names
+            self.names = names
+            self.size = len(disk_info)
+            self.stale = False
+            self.stats["Builds"] += 1
+
+    def canonical(self, name):
+        """
+        Returns the name of the device in DISK_INFO that the given name refers to, or None
+        if we don't know about it.
+        """
+
+        with self.lock:
+            self.refresh()
+            self.stats["Lookups"] += 1
+
+            return self.canonical_names.get(name)
+
+    def canonical_or_same(self, name):
+        """Like canonical(), but returns the given name unchanged if we don't know about it."""
+        canonical = self.canonical(name)
+
+        if canonical is None:
+            return name
+
+        return canonical
+
+    def names_for(self, device):
+        """
+        Return all the device paths a device in DISK_INFO might be mounted under, including
+        its aliases. Devices we don't know about only have their own name.
+        """
+
+        with self.lock:
+            self.refresh()
+            self.stats["Lookups"] += 1
+
+            return self.names.get(device, (device,))
+
+    def same_device(self, first, second):
+        """Returns True if the given names refer to the same device, otherwise False"""
+        if first == second:
+            return True
+
+        canonical = self.canonical(first)
+
+        return canonical is not None and canonical == self.canonical(second)
+
+    def get_stats(self):
+        """Return a copy of the statistics: times the index was built, and lookups made."""
+        with self.lock:
+            stats = dict(self.stats)
+            stats["Names"] = len(self.canonical_names)
+
+            return stats
+
+#The device index for this process.
+DEVICE_INDEX = DeviceIndex()
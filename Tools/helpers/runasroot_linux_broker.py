@@ -0,0 +1,284 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# Long-lived privileged command broker for Linux for WxFixBoot.
+# This file is part of WxFixBoot.
+# Copyright (C) 2013-2020 Hamish McIntyre-Bhatty
+# WxFixBoot is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3 or,
+# at your option, any later version.
+#
+# WxFixBoot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WxFixBoot.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Runs privileged commands for WxFixBoot for the whole session, so the user only has to
+authenticate once. This is started through pkexec by Tools/brokertools.py, or without
+pkexec as an unprivileged stand-in for testing.
+
+Requests are read from stdin, and responses written to stdout, one JSON object per line.
+
+Requests:
+    {"id": 1, "op": "run", "argv": ["mount"], "env": {"LC_ALL": "C"}, "stdin": null}
+    {"id": 2, "op": "write_file", "path": "/etc/default/grub", "data": "<base64>"}
+    {"id": 3, "op": "batch", "steps": [["mount", "--bind", "/dev", "/mnt/dev"], ...],
+     "env": {"LC_ALL": "C"}}                        (runs each step in turn)
+    {"op": "signal", "target": 1, "signal": 15}     (signals request 1's process group)
+    {"op": "quit"}
+
+Responses:
+    {"ready": true, "pid": 1234}                    (once, when the broker starts)
+    {"id": 1, "output": "<base64>"}                 (any number of times)
+    {"id": 3, "results": [{"ReturnValue": 0, "Time": 0.01}, ...]}
+                                                    (once, before a batch's retval)
+    {"id": 1, "retval": 0}                          (once, when the request is done)
+
+Requests run concurrently, and output from them may be interleaved. Each command runs in
+its own process group, so it can be killed along with its children. NB: Like
+runasroot_linux.sh, stderr is merged into stdout.
+"""
+
+#Import modules.
+import base64
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+#Guards writes to stdout, so responses from different requests don't get mixed up.
+WRITE_LOCK = threading.Lock()
+
+#Commands that are running, by request ID, so they can be signalled.
+PROCESSES = {}
+PROCESSES_LOCK = threading.Lock()
+
+#How long to give commands that are still running to finish when we're told to quit, and
+#then to exit after being sent SIGTERM, before they are killed (in seconds).
+QUIT_GRACE_PERIOD = 5
+
+def send(response):
+    """Send a response back to WxFixBoot."""
+    with WRITE_LOCK:
+        sys.stdout.buffer.write(json.dumps(response).encode("utf-8")+b"\n")
+        sys.stdout.buffer.flush()
+
+def send_output(request_id, data):
+    """Send some output for the given request."""
+    send({"id": request_id, "output": base64.b64encode(data).decode("ascii")})
+
+def feed_stdin(cmd, data):
+    """Write the given data to a command's stdin, and then close it."""
+    try:
+        cmd.stdin.write(data)
+        cmd.stdin.close()
+
+    except OSError:
+        #The command exited without reading everything.
+        pass
+
+def run(request):
+    """Run a command, and stream its output and return value back to WxFixBoot."""
+    env = dict(os.environ, **request.get("env", {}))
+
+    if request.get("stdin") is not None:
+        stdin = subprocess.PIPE
+
+    else:
+        stdin = subprocess.DEVNULL
+
+    try:
+        cmd = subprocess.Popen(request["argv"], stdin=stdin, stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT, env=env, shell=False,
+                               start_new_session=True)
+
+    except FileNotFoundError:
+        #Do what sh would do.
+        send_output(request["id"], (request["argv"][0]+": not found\n").encode("utf-8"))
+        return 127
+
+    except PermissionError:
+        send_output(request["id"], (request["argv"][0]+": Permission denied\n").encode("utf-8"))
+        return 126
+
+    with PROCESSES_LOCK:
+        PROCESSES[request["id"]] = cmd
+
+    if stdin == subprocess.PIPE:
+        #Feed stdin from another thread, so a command that writes a lot before reading can't
+        #deadlock with us.
+        threading.Thread(target=feed_stdin, args=(cmd, base64.b64decode(request["stdin"])),
+                         daemon=True).start()
+
+    while True:
+        data = os.read(cmd.stdout.fileno(), 65536)
+
+        if data == b"":
+            break
+
+        send_output(request["id"], data)
+
+    cmd.stdout.close()
+    retval = cmd.wait()
+
+    with PROCESSES_LOCK:
+        del PROCESSES[request["id"]]
+
+    #Report signals like sh would.
+    if retval < 0:
+        retval = 128 - retval
+
+    return retval
+
+def write_file(request):
+    """Write the given data to a file."""
+    try:
+        with open(request["path"], "wb") as _file:
+            _file.write(base64.b64decode(request["data"]))
+
+    except OSError as error:
+        send_output(request["id"], (str(error)+"\n").encode("utf-8"))
+        return 1
+
+    return 0
+
+def run_batch(request):
+    """
+    Run several commands one after the other, and send back the return value and run time
+    of each. Stops early if a step is killed by a signal (eg because it was cancelled).
+    Returns 0 if every step succeeded, otherwise the last failing return value.
+    """
+
+    results = []
+    final_retval = 0
+
+    for argv in request["steps"]:
+        start = time.monotonic()
+
+        retval = run({"id": request["id"], "argv": argv, "env": request.get("env", {}),
+                      "stdin": None})
+
+        results.append({"ReturnValue": retval, "Time": time.monotonic() - start})
+
+        if retval != 0:
+            final_retval = retval
+
+        if retval > 128:
+            break
+
+    send({"id": request["id"], "results": results})
+
+    return final_retval
+
+def send_signal(request):
+    """Send a signal to the process group of a running command, if it is still running."""
+    with PROCESSES_LOCK:
+        cmd = PROCESSES.get(request.get("target"))
+
+        if cmd is None or cmd.returncode is not None:
+            return
+
+        try:
+            os.killpg(cmd.pid, request["signal"])
+
+        except (OSError, ValueError):
+            #It has already exited.
+            pass
+
+def signal_all(signum):
+    """Send a signal to the process group of every command that is still running."""
+    with PROCESSES_LOCK:
+        for cmd in PROCESSES.values():
+            if cmd.returncode is not None:
+                continue
+
+            try:
+                os.killpg(cmd.pid, signum)
+
+            except (OSError, ValueError):
+                #It has already exited.
+                pass
+
+def join_threads(threads, timeout):
+    """
+    Wait up to timeout seconds in total for the given threads to finish. Returns the ones
+    that are still running.
+    """
+
+    deadline = time.monotonic() + timeout
+
+    for thread in threads:
+        thread.join(max(deadline - time.monotonic(), 0))
+
+    return [thread for thread in threads if thread.is_alive()]
+
+def handle_request(request):
+    """Handle a request, making sure it always gets a return value."""
+    retval = 1
+
+    try:
+        if request["op"] == "run":
+            retval = run(request)
+
+        elif request["op"] == "write_file":
+            retval = write_file(request)
+
+        elif request["op"] == "batch":
+            retval = run_batch(request)
+
+        else:
+            send_output(request["id"], ("Unknown operation: "+request["op"]+"\n").encode("utf-8"))
+
+    finally:
+        send({"id": request["id"], "retval": retval})
+
+def main():
+    """Handle requests until told to quit, or until WxFixBoot goes away."""
+    #If WxFixBoot is killed, we'll get EOF on stdin, so ignore SIGINT from the terminal.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    send({"ready": True, "pid": os.getpid()})
+
+    threads = []
+
+    for line in sys.stdin.buffer:
+        try:
+            request = json.loads(line.decode("utf-8"))
+
+        except ValueError:
+            continue
+
+        if request.get("op") == "quit":
+            break
+
+        if request.get("op") == "signal":
+            send_signal(request)
+            continue
+
+        thread = threading.Thread(target=handle_request, args=(request,), daemon=True)
+        thread.start()
+        threads.append(thread)
+
+        threads = [thread for thread in threads if thread.is_alive()]
+
+    #Let anything still running finish, but don't wait forever for a command that has hung.
+    threads = join_threads(threads, QUIT_GRACE_PERIOD)
+
+    if threads:
+        signal_all(signal.SIGTERM)
+        threads = join_threads(threads, QUIT_GRACE_PERIOD)
+
+    if threads:
+        signal_all(signal.SIGKILL)
+        join_threads(threads, QUIT_GRACE_PERIOD)
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
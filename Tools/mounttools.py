@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Mount Tools in the Tools Package for WxFixBoot
+# This file is part of WxFixBoot.
+# Copyright (C) 2013-2020 Hamish McIntyre-Bhatty
+# WxFixBoot is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3 or,
+# at your option, any later version.
+#
+# WxFixBoot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WxFixBoot.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=logging-not-lazy
+#
+# Reason (logging-not-lazy): This is a more readable way of logging.
+
+"""
+This module keeps an index of what is mounted where, read straight from
+/proc/self/mountinfo, so we don't have to run mount and parse its output every time
+we want to know. The index is only re-read when the kernel says the mount table has
+changed, or after we've mounted or unmounted something ourselves.
+"""
+
+#Import modules.
+import logging
+import os
+import re
+import select
+import threading
+
+#Import other modules.
+from .devicetools import DEVICE_INDEX
+
+#Set up logging.
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.getLogger("WxFixBoot").getEffectiveLevel())
+
+#Define global variables
+MOUNTINFO = "/proc/self/mountinfo"
+
+#Spaces, tabs, newlines and backslashes in paths are escaped like this in mountinfo.
+_OCTAL_ESCAPE = re.compile(r"\\([0-7]{3})")
+
+def unescape(path):
+    """Undo the octal escapes the kernel uses for some characters in mountinfo."""
+    return _OCTAL_ESCAPE.sub(lambda match: chr(int(match.group(1), 8)), path)
+
+def resolve_root_device(device_number):
+    """
+    Find the real device for the "/dev/root" that mountinfo sometimes shows for the root
+    filesystem, from its major:minor number. Returns /dev/root if it can't be found.
+    """
+
+    try:
+        return "/dev/"+os.path.basename(os.path.realpath("/sys/dev/block/"+device_number,
+                                                         strict=True))
+
+    except OSError:
+        return "/dev/root"
+
+def parse_mountinfo(data):
+    """
+    Parse the contents of a mountinfo file (as bytes). Returns a list of dictionaries, one per
+    mount, in the same order as the file.
+    """
+
+    mounts = []
+
+    for line in data.decode("UTF-8", errors="ignore").split("\n"):
+        fields = line.split()
+
+        #Optional fields come before the separator, so find it.
+        try:
+            separator = fields.index("-", 6)
+
+        except ValueError:
+            continue
+
+        mount = {"ID": fields[0], "ParentID": fields[1], "DeviceNumber": fields[2],
+                 "Root": unescape(fields[3]), "MountPoint": unescape(fields[4]),
+                 "Options": fields[5], "FileSystem": fields[separator+1],
+                 "Source": unescape(fields[separator+2]),
+                 "SuperOptions": ' '.join(fields[separator+3:])}
+
+        if mount["Source"] == "/dev/root":
+            mount["Source"] = resolve_root_device(mount["DeviceNumber"])
+
+        mounts.append(mount)
+
+    return mounts
+
+class MountTable:
+    """
+    An index of the mount table, with lookups by source device and by mount point. Where
+    the same device is mounted in several places, or several things are mounted on top of
+    each other, the last mount wins, like it did when we parsed the output of mount.
+    """
+
+    def __init__(self, path=MOUNTINFO):
+        """Set up the index. It isn't read until the first lookup."""
+        self.path = path
+        self.lock = threading.RLock()
+        self.file = None
+        self.poller = None
+        self.stale = True
+
+        self.mounts = []
+        self.by_source = {}
+        self.by_mount_point = {}
+
+        self.stats = {"Reads": 0, "Lookups": 0}
+
+    def invalidate(self):
+        """Make the next lookup re-read the mount table. Call this after mounting things."""
+        self.stale = True
+
+    def changed(self):
+        """Returns True if the mount table might have changed since we last read it"""
+        if self.stale or self.poller is None:
+            return True
+
+        #The kernel flags POLLPRI and POLLERR on mountinfo when the mount table changes.
+        #Regular files (like the test fixtures) never do this.
+        return bool(self.poller.poll(0))
+
+    def refresh(self):
+        """Re-read the mount table, if it has changed."""
+        with self.lock:
+            if not self.changed():
+                return
+
+            if self.file is None:
+                self.file = open(self.path, "rb")
+                self.poller = select.poll()
+                self.poller.register(self.file.fileno(), select.POLLPRI|select.POLLERR)
+
+            self.file.seek(0)
+            self.load(self.file.read())
+
+            self.stale = False
+            self.stats["Reads"] += 1
+
+    def load(self, data):
+        """Build the index from the contents of a mountinfo file."""
+        self.mounts = parse_mountinfo(data)
+        self.by_source = {}
+        self.by_mount_point = {}
+
+        for order, mount in enumerate(self.mounts):
+            self.by_source.setdefault(mount["Source"], []).append((order, mount["MountPoint"]))
+            self.by_mount_point[mount["MountPoint"]] = (order, mount["Source"])
+
+    def close(self):
+        """Close the mountinfo file."""
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+                self.poller = None
+
+            self.stale = True
+
+    def names_for(self, partition):
+        """
+        Return all the names a partition might be mounted under. For LVM volumes, this
+        includes its aliases, like /dev/mapper/<vg>-<lv>.
+        """
+
+        return DEVICE_INDEX.names_for(partition)
+
+    def get_mount_point(self, partition):
+        """Returns the mount point of the given partition, if any. Otherwise, return None"""
+        with self.lock:
+            self.refresh()
+            self.stats["Lookups"] += 1
+
+            mounts = []
+
+            for name in self.names_for(partition):
+                mounts.extend(self.by_source.get(name, []))
+
+        if not mounts:
+            return None
+
+        return max(mounts)[1]
+
+    def get_partition_mounted_at(self, mount_point):
+        """Returns the partition mounted at the given mount point, if any. Otherwise, return None"""
+        with self.lock:
+            self.refresh()
+            self.stats["Lookups"] += 1
+
+            return self.by_mount_point.get(mount_point, (None, None))[1]
+
+    def is_mounted(self, partition, aliases=False):
+        """
+        Returns True if the given partition is mounted, otherwise False. Its aliases are only
+        checked too if aliases is True.
+        """
+
+        if aliases:
+            names = self.names_for(partition)
+
+        else:
+            names = (partition,)
+
+        with self.lock:
+            self.refresh()
+            self.stats["Lookups"] += 1
+
+            return any(name in self.by_source for name in names)
+
+    def is_mount_point(self, mount_point):
+        """Returns True if anything is mounted at the given mount point, otherwise False"""
+        with self.lock:
+            self.refresh()
+            self.stats["Lookups"] += 1
+
+            return mount_point in self.by_mount_point
+
+    def is_read_only(self, mount_point):
+        """Returns True if whatever is mounted at the given mount point is read-only"""
+        with self.lock:
+            self.refresh()
+            self.stats["Lookups"] += 1
+
+            if mount_point not in self.by_mount_point:
+                return False
+
+            return "ro" in self.mounts[self.by_mount_point[mount_point][0]]["Options"].split(",")
+
+    def get_mounts(self):
+        """Returns a copy of the list of mounts."""
+        with self.lock:
+            self.refresh()
+
+            return [dict(mount) for mount in self.mounts]
+
+    def get_stats(self):
+        """Return a copy of the statistics: times the table was read, and lookups made."""
+        with self.lock:
+            return dict(self.stats)
+
+#The mount table for this process.
+MOUNT_TABLE = MountTable()
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Output Tools in the Tools Package for WxFixBoot
+# This file is part of WxFixBoot.
+# Copyright (C) 2013-2020 Hamish McIntyre-Bhatty
+# WxFixBoot is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3 or,
+# at your option, any later version.
+#
+# WxFixBoot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WxFixBoot.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=logging-not-lazy
+#
+# Reason (logging-not-lazy): This is a more readable way of logging.
+
+"""
+This module batches up output from running commands and sends it to the output box
+in ProgressWindow at a limited frame rate, rather than once per line. Commands like
+badblocks, which print backspaces constantly, would otherwise flood the event queue
+and make the GUI lag far behind.
+
+It also has OutputCapture, which holds command output that might be too big to keep
+in memory comfortably, like the list of installed packages.
+"""
+
+#Import modules.
+import collections
+import logging
+import mmap
+import re
+import tempfile
+import threading
+import time
+import wx
+
+#Set up logging.
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.getLogger("WxFixBoot").getEffectiveLevel())
+
+#Define global variables
+#How many times a second the output box is updated, at most.
+FRAME_RATE = 30
+
+#How many pieces of output the buffer holds. When it's full, new output is merged into the
+#newest piece with the same show_output setting instead, so nothing is lost.
+BUFFER_SIZE = 4096
+
+#Characters that end a line in the output box.
+LINE_ENDINGS = ("\n", "\r", "\x08")
+
+#How much output OutputCapture keeps in memory before writing it to a temporary file.
+SPILL_THRESHOLD = 1024 * 1024
+
+#Line endings for captured output. \r\n counts as one.
+_CAPTURE_LINE_END = re.compile(b"\r\n|[\r\n]")
+
+class OutputChannel:
+    """
+    A ring buffer of output waiting to go to the output box. Reader threads put() output
+    into it, and it's flushed on the GUI thread at most frame_rate times a second, with all
+    the output since the last flush sent in as few update_output_box() calls as possible.
+    """
+
+    def __init__(self, frame_rate=FRAME_RATE, buffer_size=BUFFER_SIZE, target=None):
+        """
+        Set up the buffer. target is the function to send output to. By default this is
+        update_output_box() in whichever window is on top when the output is flushed.
+        """
+
+        self.frame_interval = 1 / frame_rate
+        self.buffer = collections.deque()
+        self.buffer_size = buffer_size
+        self.target = target
+        self.lock = threading.Lock()
+        self.pending = False
+        self.last_flush = 0
+
+        self.stats = {"Pieces": 0, "Frames": 0, "Updates": 0, "DroppedRedraws": 0,
+                      "QueueDepth": 0, "MaxQueueDepth": 0}
+
+    def put(self, text, show_output=True):
+        """Add some output to the buffer. Can be called from any thread."""
+        with self.lock:
+            if len(self.buffer) >= self.buffer_size and self.buffer[-1][1] == show_output:
+                #Full, so merge this into the newest piece of output.
+                self.buffer[-1] = (self.buffer[-1][0]+text, show_output)
+
+            elif len(self.buffer) >= self.buffer_size and len(self.buffer) > 1 \
+                and self.buffer[-2][1] == show_output:
+
+                #Full, and shown and hidden output are mixed together, so merge this into the
+                #piece before. It only moves in front of one piece of the other kind.
+                self.buffer[-2] = (self.buffer[-2][0]+text, show_output)
+
+            else:
+                if len(self.buffer) >= self.buffer_size:
+                    #Full, and the two newest pieces are the same kind, so join up pieces
+                    #that are next to each other and the same kind to make room.
+                    self.buffer = collections.deque((''.join(texts), kind)
+                                                    for texts, kind in self.group(self.buffer))
+
+                self.buffer.append((text, show_output))
+
+            self.stats["Pieces"] += 1
+            self.stats["QueueDepth"] = len(self.buffer)
+            self.stats["MaxQueueDepth"] = max(self.stats["MaxQueueDepth"], len(self.buffer))
+
+            schedule = not self.pending
+            self.pending = True
+
+        if schedule:
+            wx.CallAfter(self.flush)
+
+    def finish(self):
+        """
+        Send everything in the buffer to the output box, including any unfinished line,
+        as soon as possible. Call this when a command exits, so its output is shown before
+        anything that is sent to the output box afterwards.
+        """
+
+        with self.lock:
+            if not self.buffer:
+                return
+
+        wx.CallAfter(self.flush, True)
+
+    def flush(self, final=False):
+        """
+        Send the output in the buffer to the output box. Must be called on the GUI thread.
+        Unless final is True, this waits until the next frame is due, and keeps any
+        unfinished line back until the rest of it arrives, so carriage returns and backspaces
+        are always handled with the whole line.
+        """
+
+        wait = self.frame_interval - (time.monotonic() - self.last_flush)
+
+        if not final and wait > 0:
+            #Too soon, come back when the next frame is due.
+            wx.CallLater(max(int(wait * 1000), 1), self.flush)
+            return
+
+        with self.lock:
+            pieces = list(self.buffer)
+            self.buffer.clear()
+
+            groups = self.group(pieces)
+
+            if not final and groups:
+                #Keep back anything after the last line ending.
+                text, show_output = groups[-1]
+                cut = max(text.rfind(ending) for ending in LINE_ENDINGS) + 1
+
+                if cut < len(text):
+                    self.buffer.append((text[cut:], show_output))
+
+                    if cut == 0:
+                        groups.pop()
+
+                    else:
+                        groups[-1] = (text[:cut], show_output)
+
+            #Any unfinished line is sent with the next frame, or by finish().
+            self.pending = False
+            self.last_flush = time.monotonic()
+
+            self.stats["Frames"] += 1
+            self.stats["Updates"] += len(groups)
+            self.stats["DroppedRedraws"] = max(self.stats["Pieces"] - self.stats["Updates"]
+                                               - len(self.buffer), 0)
+            self.stats["QueueDepth"] = len(self.buffer)
+
+        target = self.target or wx.GetApp().TopWindow.update_output_box
+
+        for text, show_output in groups:
+            target(text, show_output)
+
+    @staticmethod
+    def group(pieces):
+        """Join consecutive pieces of output that have the same show_output setting."""
+        groups = []
+
+        for text, show_output in pieces:
+            if groups and groups[-1][1] == show_output:
+                groups[-1][0].append(text)
+
+            else:
+                groups.append(([text], show_output))
+
+        return [(''.join(texts), show_output) for texts, show_output in groups]
+
+    def get_stats(self):
+        """
+        Return a copy of the statistics: pieces of output received, frames flushed, calls to
+        update_output_box(), redraws saved by batching, and the current and maximum number of
+        pieces waiting in the buffer.
+        """
+
+        with self.lock:
+            return dict(self.stats)
+
+class OutputCapture:
+    """
+    Output captured from a command. This is kept in memory until there is more than
+    spill_threshold bytes of it, and then written to a temporary file, which is mapped into
+    memory with mmap when the command is done. Either way, lines() reads it back one line at
+    a time, so the whole thing never has to be copied into a string or list.
+    """
+
+    def __init__(self, spill_threshold=SPILL_THRESHOLD):
+        """Set up the buffer."""
+        self.spill_threshold = spill_threshold
+        self.buffer = bytearray()
+        self.spill_file = None
+        self.map = None
+        self.size = 0
+
+    def write(self, data):
+        """Add some raw output."""
+        self.size += len(data)
+
+        if self.spill_file is not None:
+            self.spill_file.write(data)
+            return
+
+        self.buffer += data
+
+        if len(self.buffer) > self.spill_threshold:
+            #Too big, move it to a temporary file.
+            self.spill_file = tempfile.TemporaryFile(prefix="wxfixboot-output-")
+            self.spill_file.write(self.buffer)
+            self.buffer = bytearray()
+
+    def close(self):
+        """Call this when all of the output has been written."""
+        if self.spill_file is None or self.map is not None:
+            return
+
+        self.spill_file.flush()
+        self.map = mmap.mmap(self.spill_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def spilled(self):
+        """Returns True if the output was written to a temporary file, otherwise False"""
+        return self.spill_file is not None
+
+    def data(self):
+        """
+        Return the raw output as a bytes-like object, without copying it. Regular expressions
+        can search this directly.
+        """
+
+        if self.map is not None:
+            return self.map
+
+        return self.buffer
+
+    def lines(self):
+        """
+        Yield the output a line at a time, decoded, without the line endings or "NULL"
+        characters.
+        """
+
+        data = self.data()
+        position = 0
+
+        for match in _CAPTURE_LINE_END.finditer(data):
+            yield data[position:match.start()].decode("UTF-8", errors="ignore").replace("\x00", "")
+            position = match.end()
+
+        #Catch it if there's not a newline at the end.
+        if position < len(data):
+            yield data[position:].decode("UTF-8", errors="ignore").replace("\x00", "")
+
+    def __iter__(self):
+        """Iterate over the lines of output."""
+        return self.lines()
+
+    def release(self):
+        """Free the memory or temporary file used for the output."""
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+
+        if self.spill_file is not None:
+            self.spill_file.close()
+            self.spill_file = None
+
+        self.buffer = bytearray()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+#The channel all command output goes through.
+OUTPUT_CHANNEL = OutputChannel()
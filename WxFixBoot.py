@@ -27,6 +27,7 @@ being offloaded into Tools/dialogtools.py and Tools/notebookfunctions.py.
 #Import other modules
 from distutils.version import LooseVersion
 
+import atexit
 import traceback
 import threading
 import sys
@@ -35,6 +36,7 @@ import logging
 import os
 import time
 import plistlib
+import tempfile
 import ast
 import requests
 
@@ -62,6 +64,13 @@ OUTPUT_LOG = None
 OPERATIONS = None
 NUMBER_OF_OPERATIONS = None
 STOP_PROGRESSTEXT_HANDLER_THREAD = None
+TRACE_FILE = None
+TRACING = False
+
+#How long to wait for cancelled operations to stop when exiting, in seconds, and how often to
+#check if they have, in milliseconds.
+BACKEND_THREAD_EXIT_TIMEOUT = 15
+BACKEND_THREAD_POLL_INTERVAL = 200
 
 def usage():
     """Prints usage information to the command line"""
@@ -78,14 +87,19 @@ def usage():
     print("                                     information, warnings, errors and critical ")
     print("                                     errors. Usually used for diagnostic purposes.")
     print("                                     The default, as it's very helpful if problems ")
-    print("                                     are encountered, and the user needs help\n")
+    print("                                     are encountered, and the user needs help")
+    print("       -t, --trace:                  Record how long every command takes, and save ")
+    print("                                     the trace to a new file in /tmp on exit. The")
+    print("                                     file's name is shown when WxFixBoot starts, and")
+    print("                                     it can be opened in chrome://tracing.\n")
     print("WxFixBoot "+VERSION+" is released under the GNU GPL Version 3")
     print("Copyright (C) Hamish McIntyre-Bhatty 2013-2020")
 
 if __name__ == "__main__":
     #Set up according to cmdline options.
     try:
-        OPTIONS = getopt.getopt(sys.argv[1:], "hqvd", ("help", "quiet", "verbose", "debug"))[0]
+        OPTIONS = getopt.getopt(sys.argv[1:], "hqvdt", ("help", "quiet", "verbose", "debug",
+                                                        "trace"))[0]
 
     except getopt.GetoptError as err:
         #Invalid option. Show the help message and then exit.
@@ -119,6 +133,9 @@ if __name__ == "__main__":
         elif OPTION in ("-d", "--debug"):
             logger.setLevel(logging.DEBUG)
 
+        elif OPTION in ("-t", "--trace"):
+            TRACING = True
+
         elif OPTION in ("-h", "--help"):
             usage()
             sys.exit()
@@ -132,13 +149,27 @@ if __name__ == "__main__":
 import Tools #pylint: disable=wrong-import-position
 from Tools.dictionaries import *  #pylint: disable=wrong-import-position
 import Tools.coretools as CoreTools  #pylint: disable=wrong-import-position
+import Tools.devicetools as DeviceTools  #pylint: disable=wrong-import-position
 import Tools.dialogtools as DialogTools  #pylint: disable=wrong-import-position
+import Tools.StartupTools.core as CoreStartupTools  #pylint: disable=wrong-import-position
 import Tools.StartupTools.main as MainStartupTools  #pylint: disable=wrong-import-position
 import Tools.BackendTools.essentials as EssentialBackendTools  #pylint: disable=wrong-import-position
 import Tools.BackendTools.main as MainBackendTools  #pylint: disable=wrong-import-position
 
 import Tools.notebookfunctions as NoteBookSharedFunctions  #pylint: disable=wrong-import-position
 
+#Save the command trace on exit if we were asked to. Use a new file that only we can write
+#to, so nobody else can make us write it somewhere else, and runs don't overwrite each other.
+if TRACING:
+    TRACE_FD, TRACE_FILE = tempfile.mkstemp(prefix="wxfixboot-trace-", suffix=".json")
+    os.close(TRACE_FD)
+
+    CoreTools.TRACE_FILE = TRACE_FILE
+    atexit.register(CoreTools.export_trace)
+
+    logger.info("Tracing commands. The trace will be saved to "+TRACE_FILE+" on exit.")
+    print("Tracing commands. The trace will be saved to "+TRACE_FILE+" on exit.")
+
 #Begin Disk Information Handler thread.
 class GetDiskInformation(threading.Thread):
     """
@@ -412,6 +443,9 @@ class InitThread(threading.Thread):
         """Receive disk info"""
         DISK_INFO.update(info)
 
+        #Index all the names each device is known by, so we can look them up quickly.
+        DeviceTools.DEVICE_INDEX.build(DISK_INFO)
+
         self.disk_info_collected = True
 
     def main_code(self):
@@ -438,23 +472,24 @@ class InitThread(threading.Thread):
         SETTINGS["MakeSystemSummary"] = True
         SETTINGS["SaveOutput"] = True
 
+        #Start the privileged broker, so the user only has to authenticate once.
+        #If this fails, privileged commands will use pkexec each time instead.
+        logger.info("InitThread(): Starting privileged broker...")
+        Tools.brokertools.start_broker()
+
         #Remove the temporary directory if it exists.
         if os.path.isdir("/mnt/wxfixboot/mountpoints"):
-            #Check nothing is using it first.
-            for line in CoreTools.start_process("mount", return_output=True)[1].split("\n"):
-                if "/mnt/wxfixboot/mountpoints" in line:
-                    #Unmount this filesystem if possible.
-                    filesystem = line.split(" on ")[0]
-
-                    if CoreTools.unmount(filesystem) != 0:
-                        #If it can't be mounted, do an emergency exit.
-                        CoreTools.emergency_exit("There are mounted filesystems in "
-                                                 + "/mnt/wxfixboot/mountpoints, WxFixBoot's "
-                                                 + "temporary mountpoints directory! Please "
-                                                 + "unmount any filesystems there and try "
-                                                 + "again.")
-
-            CoreTools.start_process("rm -rvf --one-file-system /mnt/wxfixboot/mountpoints", privileged=True)
+            #Unmount anything left there (eg if WxFixBoot crashed) first.
+            if CoreTools.unmount_tree("/mnt/wxfixboot/mountpoints") != 0:
+                #If it can't be unmounted, do an emergency exit.
+                CoreTools.emergency_exit("There are mounted filesystems in "
+                                         + "/mnt/wxfixboot/mountpoints, WxFixBoot's "
+                                         + "temporary mountpoints directory! Please "
+                                         + "unmount any filesystems there and try "
+                                         + "again.")
+
+            CoreTools.start_process("rm -rf --one-file-system /mnt/wxfixboot/mountpoints",
+                                    privileged=True)
 
         CoreTools.start_process("mkdir /mnt/wxfixboot/mountpoints", privileged=True)
         CoreTools.start_process("chmod a+rw -R /mnt/wxfixboot", privileged=True)
@@ -1075,6 +1110,9 @@ class MainWindow(wx.Frame): #pylint: disable=too-many-ancestors, too-many-instan
         #Run the exit sequence
         logger.info("MainWindow().on_exit(): Exiting...")
 
+        #Unmount anything we kept mounted for later operations.
+        CoreTools.release_all_mounts()
+
         #Shutdown the logger.
         logging.shutdown()
 
@@ -2569,7 +2607,10 @@ class BootloaderOptionsWindow(wx.Frame): #pylint: disable=too-many-ancestors, to
         self.new_kerneloptions_textctrl.GetValue()
 
         BOOTLOADER_INFO[_os]["Settings"]["DefaultOS"] = self.defaultos_choice.GetStringSelection()
-        BOOTLOADER_INFO[_os]["Settings"]["DefaultBootDevice"] = BOOTLOADER_INFO[BOOTLOADER_INFO[_os]["Settings"]["DefaultOS"]]["DefaultBootDevice"]
+        #Find the partition this bootloader will boot the new default OS from.
+        BOOTLOADER_INFO[_os]["Settings"]["DefaultBootDevice"] = \
+        CoreStartupTools.find_default_boot_device(_os, BOOTLOADER_INFO[_os]["Settings"]
+                                                  ["DefaultOS"])
 
         BOOTLOADER_INFO[_os]["Settings"]["InstallNewBootloader"] = \
         self.install_new_bootloader_checkbox.GetValue()
@@ -2698,8 +2739,9 @@ class ProgressWindow(wx.Frame): #pylint: disable=too-many-ancestors
         logger.debug("ProgressWindow().__init__(): Starting Backend Thread...")
 
         self.running_operations = True
+        self.exiting = False
 
-        BackendThread(self)
+        self.backend_thread = BackendThread(self)
 
     def create_text(self):
         """Create the Text"""
@@ -2719,7 +2761,6 @@ class ProgressWindow(wx.Frame): #pylint: disable=too-many-ancestors
         self.restart_button = wx.Button(self.panel, -1, "Restart WxFixBoot")
         self.exit_button = wx.Button(self.panel, -1, "Exit")
         self.restart_button.Disable()
-        self.exit_button.Disable()
 
     def create_progressbars(self):
         """Create both progress bars"""
@@ -2936,12 +2977,15 @@ class ProgressWindow(wx.Frame): #pylint: disable=too-many-ancestors
 
     def backend_thread_finished(self):
         """
-        Called when the BackendThread is finished, enables self.restart_button and self.exit_button
+        Called when the BackendThread is finished, enables self.restart_button
         """
 
         self.running_operations = False
+
+        logger.debug("ProgressWindow().backend_thread_finished(): Output box statistics: "
+                     + str(Tools.outputtools.OUTPUT_CHANNEL.get_stats()))
+
         self.restart_button.Enable()
-        self.exit_button.Enable()
 
     def restart_wxfixboot(self, event=None): #pylint: disable=unused-argument
         """Restart WxFixBoot"""
@@ -2949,20 +2993,22 @@ class ProgressWindow(wx.Frame): #pylint: disable=too-many-ancestors
         logger.debug("ProgressWindow().restart_wxfixboot(): Checking no filesystems are mounted "
                      + "in the temporary directory, and unmounting them if they are...")
 
+        #Unmount anything we kept mounted for later operations first.
+        CoreTools.release_all_mounts()
+
         if os.path.isdir("/mnt/wxfixboot/mountpoints"):
             #Check nothing is using it first.
-            for line in CoreTools.start_process("mount", return_output=True)[1].split("\n"):
-                if "/mnt/wxfixboot/mountpoints" in line:
-                    #Unmount this filesystem if possible.
-                    filesystem = line.split(" on ")[0]
-
-                    if CoreTools.unmount(filesystem) != 0:
-                        #If it can't be unmounted, do an emergency exit.
-                        CoreTools.emergency_exit("There are mounted filesystems in "
-                                                 + "/mnt/wxfixboot/mountpoints, WxFixBoot's "
-                                                 + "temporary mountpoints directory! Please "
-                                                 + "unmount any filesystems there and try "
-                                                 + "again.")
+            if CoreTools.unmount_tree("/mnt/wxfixboot/mountpoints") != 0:
+                #If it can't be unmounted, do an emergency exit.
+                CoreTools.emergency_exit("There are mounted filesystems in "
+                                         + "/mnt/wxfixboot/mountpoints, WxFixBoot's "
+                                         + "temporary mountpoints directory! Please "
+                                         + "unmount any filesystems there and try "
+                                         + "again.")
+
+        #Keep cached command results for the next run, apart from anything that involved our
+        #temporary mountpoints, which are about to be removed.
+        CoreTools.invalidate_cache("/mnt/wxfixboot")
 
         self.Hide()
 
@@ -3004,7 +3050,8 @@ class ProgressWindow(wx.Frame): #pylint: disable=too-many-ancestors
         """Exits the programs, and sorts out log file saving/deleting stuff"""
         #Check if the session is ending.
         if SESSION_ENDING:
-            #Delete the log file and exit ASAP.
+            #Stop anything that's running, delete the log file and exit ASAP.
+            CoreTools.cancel_processes()
             logging.shutdown()
 
             try:
@@ -3016,13 +3063,64 @@ class ProgressWindow(wx.Frame): #pylint: disable=too-many-ancestors
 
             self.Destroy()
 
-        if not DialogTools.show_yes_no_dlg("Are you sure you want to exit?",
-                                           "WxFixBoot - Question!"):
+        #We're already waiting for the backend thread to stop.
+        if self.exiting:
+            return
+
+        if self.running_operations:
+            #Exiting now will cancel whatever is running.
+            if not DialogTools.show_yes_no_dlg("Operations are still running! If you exit now, "
+                                               + "they will be cancelled, which could leave "
+                                               + "your operating systems unbootable. Are you "
+                                               + "sure you want to exit?",
+                                               "WxFixBoot - Question!"):
+                return
+
+            logger.warning("ProgressWindow().on_exit(): Cancelling running operations...")
+            CoreTools.cancel_processes()
+
+        elif not DialogTools.show_yes_no_dlg("Are you sure you want to exit?",
+                                             "WxFixBoot - Question!"):
             return
 
         #Run the exit sequence
         logger.info("ProgressWindow().on_exit(): Exiting...")
+        self.exiting = True
 
+        #Wait for the backend thread to stop, so we don't unmount filesystems it's still
+        #using (eg while grub-install is running in a chroot). Don't block the GUI thread while
+        #we wait, or the backend thread can't show the dialogs it uses to report the
+        #cancelled operations.
+        wx.BeginBusyCursor()
+        self.wait_for_backend_thread(time.monotonic() + BACKEND_THREAD_EXIT_TIMEOUT)
+
+    def wait_for_backend_thread(self, deadline):
+        """
+        Check every BACKEND_THREAD_POLL_INTERVAL milliseconds if the backend thread has
+        stopped, then carry on with the exit sequence. Gives up waiting at the given deadline
+        (from time.monotonic()).
+        """
+
+        if self.backend_thread.is_alive() and time.monotonic() < deadline:
+            wx.CallLater(BACKEND_THREAD_POLL_INTERVAL, self.wait_for_backend_thread, deadline)
+            return
+
+        wx.EndBusyCursor()
+
+        if self.backend_thread.is_alive():
+            #Leave its mounts alone. They'll be cleaned up next time WxFixBoot starts.
+            logger.error("ProgressWindow().wait_for_backend_thread(): Backend thread didn't "
+                         + "stop within "+str(BACKEND_THREAD_EXIT_TIMEOUT)+" seconds! Not "
+                         + "unmounting filesystems it might still be using...")
+
+        else:
+            #Unmount anything we kept mounted for later operations.
+            CoreTools.release_all_mounts()
+
+        self.finish_exit()
+
+    def finish_exit(self):
+        """Save or delete the log file, and close the window"""
         #Shutdown the logger.
         logging.shutdown()
 
@@ -3095,8 +3193,9 @@ class BackendThread(threading.Thread):
         #Set up the backend tools.
         self.parent_window = parent_window
 
-        #Start the main part of this thread.
-        threading.Thread.__init__(self)
+        #Start the main part of this thread. If operations are cancelled, this may be left
+        #waiting for a dialog when the GUI closes, so don't let it keep WxFixBoot running.
+        threading.Thread.__init__(self, daemon=True)
         self.start()
 
     def run(self):
@@ -3133,6 +3232,12 @@ class BackendThread(threading.Thread):
 
         #Run functions to do operations.
         for function in OPERATIONS:
+            #Stop if the user has cancelled operations.
+            if CoreTools.is_cancelled():
+                logger.warning("BackendThread().start_operations(): Operations were cancelled. "
+                               + "Stopping...")
+                return
+
             #Run the function.
             if not isinstance(function, tuple):
                 function()
@@ -3368,6 +3473,55 @@ class BackendThread(threading.Thread):
 
         report_list.write("Number of operations to do: "+str(NUMBER_OF_OPERATIONS)+"\n")
 
+        #Save the mount session statistics.
+        mount_stats = CoreTools.get_mount_stats()
+
+        report_list.write("\n##########Mount Sessions##########\n")
+        report_list.write("Mounts: "+str(mount_stats["Mounts"])+", Unmounts: "
+                          + str(mount_stats["Unmounts"])+", Mounts Reused: "
+                          + str(mount_stats["Reused"])+"\n")
+
+        report_list.write("Mount/Unmount Commands Avoided: "+str(mount_stats["Avoided"])+"\n")
+
+        #Save the chroot pool statistics.
+        chroot_stats = CoreTools.get_chroot_stats()
+
+        report_list.write("Chroots Set Up: "+str(chroot_stats["Built"])+", Reused: "
+                          + str(chroot_stats["Reused"])+", Set Up Again: "
+                          + str(chroot_stats["Rebuilt"])+", Torn Down: "
+                          + str(chroot_stats["TornDown"])+"\n")
+
+        #Save how long each OS's chroot took to set up and tear down.
+        for _os in sorted(OS_INFO):
+            timing = CoreTools.get_chroot_timing("/mnt/wxfixboot/mountpoints"
+                                                 + OS_INFO[_os]["Partition"])
+
+            if not timing:
+                continue
+
+            report_list.write("\tChroot for "+_os+": Set Up In: "
+                              + str(round(timing.get("Setup", 0) * 1000, 1))+"ms ("
+                              + str(timing.get("SetupSteps", 0))+" steps), Torn Down In: "
+                              + str(round(timing.get("Teardown", 0) * 1000, 1))+"ms ("
+                              + str(timing.get("TeardownSteps", 0))+" steps)\n")
+
+        #Save the slowest commands.
+        report_list.write("\n##########Slowest Commands##########\n")
+
+        for event in CoreTools.get_slowest_commands():
+            report_list.write(' '.join(event["Command"])+"\n")
+            report_list.write("\tTotal Time: "
+                              + str(round((event["SpawnLatency"]+event["Runtime"]) * 1000, 1))
+                              + "ms (Spawn Latency: "+str(round(event["SpawnLatency"] * 1000, 1))
+                              + "ms)\n")
+
+            report_list.write("\tReturn Value: "+str(event["ReturnValue"])+", Output: "
+                              + str(event["OutputBytes"])+" bytes, Privileged: "
+                              + str(event["Privileged"])+", Cached: "
+                              + str(event["Cached"])+"\n")
+
+            report_list.write("\tCalled By: "+event["Caller"]+"\n")
+
         #Save terminal output.
         if SETTINGS["SaveOutput"]:
             report_list.write("\n##########Terminal Output##########\n")
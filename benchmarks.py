@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Benchmarks for WxFixBoot
+# This file is part of WxFixBoot.
+# Copyright (C) 2013-2020 Hamish McIntyre-Bhatty
+# WxFixBoot is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 3 or,
+# at your option, any later version.
+#
+# WxFixBoot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with WxFixBoot.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+This module contains the code used to run the benchmarks for WxFixBoot.
+"""
+
+#Import modules.
+import logging
+import getopt
+import sys
+
+#Global vars.
+VERSION = "3.0.2"
+
+#Set up the logger (silence all except critical logging messages).
+logger = logging.getLogger('WxFixBoot')
+
+#Log only critical messages by default.
+LOGGER_LEVEL = logging.CRITICAL
+
+logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s: %(message)s',
+                    datefmt='%d/%m/%Y %I:%M:%S %p', level=LOGGER_LEVEL)
+
+def usage():
+    print("\nUsage: benchmarks.py [OPTION]\n\n")
+    print("Options:\n")
+    print("       -h, --help:                   Display this help text.")
+    print("       -D, --debug:                  Set logging level to debug, to show all logging")
+    print("                                     messages. Default: show only critical logging")
+    print("                                     messages.")
+    print("       -c, --coretools:              Run benchmarks for CoreTools module.")
+    print("       -v, --devicetools:            Run benchmarks for DeviceTools module.")
+    print("       -p, --packagetools:           Run benchmarks for PackageTools module.")
+    print("       -g, --getbootloaderconfigtools:")
+    print("                                     Run benchmarks for GetBootloaderConfigTools")
+    print("                                     module.")
+    print("       -a, --all:                    Run all the benchmarks. The default.\n")
+    print("WxFixBoot "+VERSION+" is released under the GNU GPL Version 3")
+    print("Copyright (C) Hamish McIntyre-Bhatty 2013-2020")
+
+if __name__ == "__main__":
+    #Check all cmdline options are valid.
+    try:
+        OPTS = getopt.getopt(sys.argv[1:], "hDcvpga", ["help", "debug", "coretools",
+                                                       "devicetools", "packagetools",
+                                                       "getbootloaderconfigtools", "all"])[0]
+
+    except getopt.GetoptError as err:
+        #Invalid option. Show the help message and then exit.
+        #Show the error.
+        print(str(err))
+        usage()
+        sys.exit(2)
+
+    #Handle debugging mode here, before the benchmark modules are imported.
+    for o, a in OPTS:
+        if o in ["-D", "--debug"]:
+            LOGGER_LEVEL = logging.DEBUG
+
+    logger.setLevel(LOGGER_LEVEL)
+
+    #Import benchmark modules here so the logging level is right.
+    from Benchmarks import CoreToolsBenchmarks
+    from Benchmarks import DeviceToolsBenchmarks
+    from Benchmarks import PackageToolsBenchmarks
+    from Benchmarks import GetBootloaderConfigToolsBenchmarks
+
+    #Set up which benchmarks to run based on options given.
+    BENCHMARKS = [CoreToolsBenchmarks, DeviceToolsBenchmarks, PackageToolsBenchmarks,
+                  GetBootloaderConfigToolsBenchmarks]
+
+    for o, a in OPTS:
+        if o in ["-c", "--coretools"]:
+            BENCHMARKS = [CoreToolsBenchmarks]
+        elif o in ["-v", "--devicetools"]:
+            BENCHMARKS = [DeviceToolsBenchmarks]
+        elif o in ["-p", "--packagetools"]:
+            BENCHMARKS = [PackageToolsBenchmarks]
+        elif o in ["-g", "--getbootloaderconfigtools"]:
+            BENCHMARKS = [GetBootloaderConfigToolsBenchmarks]
+        elif o in ["-a", "--all"]:
+            BENCHMARKS = [CoreToolsBenchmarks, DeviceToolsBenchmarks, PackageToolsBenchmarks,
+                          GetBootloaderConfigToolsBenchmarks]
+        elif o in ["-D", "--debug"]:
+            pass
+        elif o in ["-h", "--help"]:
+            usage()
+            sys.exit()
+        else:
+            assert False, "unhandled option"
+
+    for BenchmarkModule in BENCHMARKS:
+        print("\n\nBenchmarks in "+str(BenchmarkModule)+"\n\n")
+        BenchmarkModule.run_benchmarks()
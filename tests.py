@@ -48,6 +48,10 @@ def usage():
     print("       -s, --startuptools            Run tests for all StartupTools modules.")
     print("       -b, --backendtools            Run tests for all BackendTools modules.")
     print("       -c, --coretools:              Run tests for CoreTools module.")
+    print("       -r, --brokertools:            Run tests for BrokerTools module.")
+    print("       -o, --outputtools:            Run tests for OutputTools module.")
+    print("       -n, --mounttools:             Run tests for MountTools module.")
+    print("       -v, --devicetools:            Run tests for DeviceTools module.")
     print("       -d, --dialogtools:            Run tests for DialogTools module.")
     print("       -m, --main:                   Run tests for main file (WxFixBoot.py).")
     print("       -a, --all:                    Run all the tests. The default.\n")
@@ -62,9 +66,11 @@ if __name__ == "__main__":
 
     #Check all cmdline options are valid.
     try:
-        OPTS = getopt.getopt(sys.argv[1:], "hDdsbcmat", ["help", "debug", "startuptools",
-                                                         "backendtools", "coretools", "main",
-                                                         "all", "tests"])[0]
+        OPTS = getopt.getopt(sys.argv[1:], "hDdsbcronvmat", ["help", "debug", "startuptools",
+                                                             "backendtools", "coretools",
+                                                             "brokertools", "outputtools",
+                                                             "mounttools", "devicetools",
+                                                             "main", "all", "tests"])[0]
 
     except getopt.GetoptError as err:
         #Invalid option. Show the help message and then exit.
@@ -83,27 +89,48 @@ if __name__ == "__main__":
 
     #Import test modules here so the logging level is right - debug mode will work.
     from Tests.Tools import CoreToolsTests
+    from Tests.Tools import BrokerToolsTests
+    from Tests.Tools import OutputToolsTests
+    from Tests.Tools import MountToolsTests
+    from Tests.Tools import DeviceToolsTests
     from Tests.Tools import DialogToolsTests
 
     from Tests.Tools.BackendTools import HelperBackendToolsTests
     from Tests.Tools.BackendTools import EssentialBackendToolsTests
 
     from Tests.Tools.StartupTools import CoreStartupToolsTests
+    from Tests.Tools.StartupTools import GetBootloaderConfigStartupToolsTests
     from Tests.Tools.StartupTools import MainStartupToolsTests
+    from Tests.Tools.StartupTools import OSIdentityStartupToolsTests
+    from Tests.Tools.StartupTools import PackageStartupToolsTests
+    from Tests.Tools.StartupTools import SignatureStartupToolsTests
 
     #Set up which tests to run based on options given.
     #TODO Set up full defaults when finished.
-    TESTSUITES = [CoreToolsTests, DialogToolsTests, HelperBackendToolsTests,
+    TESTSUITES = [CoreToolsTests, BrokerToolsTests, OutputToolsTests, MountToolsTests,
+                  DeviceToolsTests, DialogToolsTests, HelperBackendToolsTests,
                   EssentialBackendToolsTests, CoreStartupToolsTests,
-                  MainStartupToolsTests]
+                  GetBootloaderConfigStartupToolsTests, MainStartupToolsTests,
+                  OSIdentityStartupToolsTests, PackageStartupToolsTests,
+                  SignatureStartupToolsTests]
 
     for o, a in OPTS:
         if o in ["-c", "--coretools"]:
             TESTSUITES = [CoreToolsTests]
+        elif o in ["-r", "--brokertools"]:
+            TESTSUITES = [BrokerToolsTests]
+        elif o in ["-o", "--outputtools"]:
+            TESTSUITES = [OutputToolsTests]
+        elif o in ["-n", "--mounttools"]:
+            TESTSUITES = [MountToolsTests]
+        elif o in ["-v", "--devicetools"]:
+            TESTSUITES = [DeviceToolsTests]
         elif o in ["-d", "--dialogtools"]:
             TESTSUITES = [DialogToolsTests]
         elif o in ["-s", "--startuptools"]:
-            TESTSUITES = [CoreStartupToolsTests, MainStartupToolsTests]
+            TESTSUITES = [CoreStartupToolsTests, GetBootloaderConfigStartupToolsTests,
+                          MainStartupToolsTests, OSIdentityStartupToolsTests,
+                          PackageStartupToolsTests, SignatureStartupToolsTests]
             #Implementation isn't finished ***
         elif o in ["-b", "--backendtools"]:
             TESTSUITES = [HelperBackendToolsTests, EssentialBackendToolsTests]
@@ -112,8 +139,12 @@ if __name__ == "__main__":
             #TESTSUITES = [MainTests]
             assert False, "Not implemented yet"
         elif o in ["-a", "--all"]:
-            TESTSUITES = [CoreToolsTests, DialogToolsTests, HelperBackendToolsTests,
-                          EssentialBackendToolsTests, CoreStartupToolsTests, MainStartupToolsTests]
+            TESTSUITES = [CoreToolsTests, BrokerToolsTests, OutputToolsTests, MountToolsTests,
+                          DeviceToolsTests, DialogToolsTests, HelperBackendToolsTests,
+                          EssentialBackendToolsTests, CoreStartupToolsTests,
+                          GetBootloaderConfigStartupToolsTests, MainStartupToolsTests,
+                          OSIdentityStartupToolsTests, PackageStartupToolsTests,
+                          SignatureStartupToolsTests]
             #TESTSUITES.append(MainTests)
         elif o in ["-t", "--tests"]:
             pass